@@ -1,87 +1,147 @@
 # app/__init__.py
 
-from flask import Flask, jsonify
-from .config import DevelopmentConfig, ProductionConfig, TestingConfig
+from flask import Flask, g, jsonify
+from flask_jwt_extended import decode_token
+from .config import get_config_class
 import os
 import logging
 from werkzeug.exceptions import HTTPException
 
-from app.extensions import jwt, bcrypt, limiter, mail
+from app.extensions import jwt, limiter, mail, hasher, metrics, tracing
+from app.services.revocation import is_token_revoked
+from app.services.storage import init_storage, is_process_local
+from app.services.redis_pool import create_redis_pool
+from app.services.metrics import InstrumentedRedis
+from app.services.json_provider import init_json_provider
+from app.services.keyring import ASYMMETRIC_ALGORITHMS, Keyring, decode_algorithms, decode_key
+from app.services.introspection import TokenIntrospector
+from app.services.ratelimit import HybridRateLimiter
 from flask_cors import CORS
 from logging.handlers import RotatingFileHandler
 
-from mongoengine import connect
-import redis
+from mongoengine import connect, disconnect
 
-def create_app(config_class=None):
+def configure_logging(app):
     """
-    Crée et configure l'application Flask.
+    Configure la journalisation de l'application dans un fichier avec rotation.
     """
-    app = Flask(__name__)
-
-    # Charger les variables d'environnement
-    from dotenv import load_dotenv
-    load_dotenv()
-
-    # Configuration de CORS avec origines explicitement spécifiées
-    CORS(app, resources={r"/*": {"origins": [os.environ.get('FRONTEND_URL', 'http://localhost:3000')]}},
-         supports_credentials=True)
-
-    env = os.getenv('FLASK_ENV', 'development')
-
-    if not config_class:
-        if env == 'production':
-            config_class = ProductionConfig
-        elif env == 'testing':
-            config_class = TestingConfig
-        else:
-            config_class = DevelopmentConfig
-
-    app.config.from_object(config_class)
-
     # ** Configuration avancée de la journalisation **
     log_level = app.config.get('LOG_LEVEL', 'INFO').upper()
     log_filename = app.config.get('LOG_FILE', 'app.log')
     max_log_size = int(app.config.get('MAX_LOG_SIZE', 10 * 1024 * 1024))  # 10 MB par défaut
     backup_count = int(app.config.get('BACKUP_COUNT', 5))  # 5 fichiers de sauvegarde par défaut
 
+    app.logger.setLevel(log_level)
+    # LOG_FILE vide : journalisation sur la sortie d'erreur uniquement (plusieurs workers gunicorn
+    # ne peuvent pas partager un même fichier à rotation)
+    if not log_filename:
+        return
+
     # Configuration du gestionnaire de rotation des fichiers de logs
     handler = RotatingFileHandler(log_filename, maxBytes=max_log_size, backupCount=backup_count)
     handler.setLevel(log_level)
     formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s')
     handler.setFormatter(formatter)
     app.logger.addHandler(handler)
-    app.logger.setLevel(log_level)
 
-    # Connexion à MongoDB avec mongoengine
-    connect(host=app.config['MONGO_URI'])
+def init_worker(app):
+    """
+    Réinitialise dans un processus worker les clients hérités du processus maître
+    (hook post_fork de gunicorn avec preload_app) : les clients MongoDB ne sont pas fork-safe.
+
+    Les autres ressources vérifient déjà le pid à l'usage : pool Redis, abonnement
+    aux révocations, pool de hachage et fichiers de métriques Prometheus.
+    """
+    disconnect()
+    connect(host=app.config['MONGO_URI'], connect=False)
+    app.redis_pool.reset()
+
+def create_app(config_class=None):
+    """
+    Crée et configure l'application Flask.
+    """
+    app = Flask(__name__)
+
+    # Configuration de CORS avec origines explicitement spécifiées
+    CORS(app, resources={r"/*": {"origins": [os.environ.get('FRONTEND_URL', 'http://localhost:3000')]}},
+         supports_credentials=True)
+
+    app.config.from_object(config_class or get_config_class())
+    configure_logging(app)
+    init_json_provider(app)
+
+    # Instrumentation, avant la connexion MongoDB (écouteurs de commandes) et Flask-Limiter (refus)
+    metrics.init_app(app)
+    tracing.init_app(app)
+
+    # Connexion à MongoDB avec mongoengine, établie à la première requête (connect=False) :
+    # aucun socket ni thread de surveillance n'est ouvert avant le fork des workers gunicorn
+    connect(host=app.config['MONGO_URI'], connect=False)
 
     # Initialisation des extensions
+    app.config['JWT_DECODE_ALGORITHMS'] = decode_algorithms(app.config)
     jwt.init_app(app)
-    bcrypt.init_app(app)
+    # Pool de connexions Redis unique : client de l'application, Flask-Limiter et pub/sub
+    app.redis_pool = create_redis_pool(app.config)
+    app.config['RATELIMIT_STORAGE_OPTIONS'] = {
+        **app.config.get('RATELIMIT_STORAGE_OPTIONS', {}),
+        'connection_pool': app.redis_pool
+    }
+    if is_process_local(app.config):
+        # État propre au processus : compteurs du limiteur en mémoire, sans Redis
+        app.config['RATELIMIT_STORAGE_URI'] = 'memory://'
+    elif app.config.get('RATELIMIT_STORAGE_URI', '').startswith('hybrid+'):
+        # Paramètres des seaux de jetons locaux du stockage hybride
+        app.config['RATELIMIT_STORAGE_OPTIONS'].update(HybridRateLimiter.options_from_config(app.config))
+
     limiter.init_app(app)
     mail.init_app(app)
-
-    # Initialisation du client Redis
-    redis_client = redis.Redis(
-        host=app.config['REDIS_HOST'],
-        port=app.config['REDIS_PORT'],
-        db=app.config['REDIS_DB'],
-        decode_responses=True  # Pour obtenir des chaînes de caractères
-    )
-    app.redis_client = redis_client
+    hasher.init_app(app)
+
+    # Initialisation du client Redis (chaque commande est mesurée)
+    app.redis_client = InstrumentedRedis(connection_pool=app.redis_pool)
+
+    # Utilisateurs, sessions, révocations et codes à usage unique du moteur STORAGE_BACKEND,
+    # file d'envoi des emails et freinage des connexions
+    init_storage(app)
+
+    # Trousseau de clés de signature asymétriques (kid dans l'en-tête des tokens), chargé au premier usage
+    if app.config['JWT_ALGORITHM'] in ASYMMETRIC_ALGORITHMS:
+        # Refus dès le démarrage plutôt qu'à la première connexion : le trousseau est dans MongoDB
+        if app.config.get('STORAGE_BACKEND', 'mongo') != 'mongo':
+            raise ValueError(f"JWT_ALGORITHM={app.config['JWT_ALGORITHM']!r} requiert STORAGE_BACKEND='mongo' "
+                             f"(trousseau de clés dans MongoDB).")
+        app.keyring = Keyring.from_app(app)
+    else:
+        app.keyring = None
+
+    @jwt.additional_headers_loader
+    def add_key_id(identity):
+        if app.keyring is None:
+            return {}
+        # Même clé pour l'en-tête et la signature, même si une rotation survient entre les deux ;
+        # l'algorithme est celui de la clé (une rotation peut passer d'EdDSA à RS256)
+        g.signing_key = app.keyring.signing_key()
+        return {'kid': g.signing_key.kid, 'alg': g.signing_key.algorithm}
+
+    @jwt.encode_key_loader
+    def signing_key(identity):
+        if app.keyring is None:
+            return app.config['JWT_SECRET_KEY']
+        return (g.pop('signing_key', None) or app.keyring.signing_key()).private_key
+
+    @jwt.decode_key_loader
+    def verification_key(jwt_header, jwt_payload):
+        return decode_key(app, jwt_header)
+
+    # Introspection groupée des tokens (vérifications mises en cache, révocations en un MGET)
+    app.introspector = TokenIntrospector.from_app(app, decode_token)
     
     # Fonction pour vérifier si un token est révoqué
     @jwt.token_in_blocklist_loader
     def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload['jti']
         if app.redis_client:
-            try:
-                entry = app.redis_client.get(jti)
-                return entry == 'true'
-            except Exception as e:
-                app.logger.error(f'Erreur lors de la vérification du token: {e}')
-                return True  # Considérer le token comme révoqué en cas d'erreur
+            return is_token_revoked(app, jwt_payload)
         else:
             app.logger.warning("Redis client non disponible. Tous les tokens sont considérés comme révoqués.")
             return True
@@ -89,6 +149,18 @@ def create_app(config_class=None):
     # Enregistrement des blueprints
     from app.controllers.user import user_bp
     app.register_blueprint(user_bp, url_prefix='/user')
+    from app.controllers.jwks import jwks_bp
+    app.register_blueprint(jwks_bp)
+    from app.controllers.introspection import introspection_bp
+    app.register_blueprint(introspection_bp, url_prefix='/token')
+
+    # Enregistrement des commandes CLI
+    from app.commands.user import user_cli
+    from app.commands.keys import keys_cli
+    from app.commands.revocations import revocations_cli
+    app.cli.add_command(user_cli)
+    app.cli.add_command(keys_cli)
+    app.cli.add_command(revocations_cli)
 
     # Gestion des erreurs HTTP
     @app.errorhandler(HTTPException)
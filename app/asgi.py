@@ -0,0 +1,258 @@
+# app/asgi.py
+
+import os
+import time
+import asyncio
+from functools import wraps
+
+import jwt as pyjwt
+import redis
+from limits import parse as parse_limit
+from pymongo import AsyncMongoClient
+from mongoengine import connect
+from mongoengine.connection import get_db
+from quart import Quart, current_app, jsonify, g, request
+from werkzeug.exceptions import HTTPException, TooManyRequests
+
+from app import configure_logging
+from app.config import get_config_class
+from app.extensions import hasher
+from app.services.revocation import RevocationCache, RevocationStore, is_token_revoked_async
+from app.services.session import AsyncSessionStore
+from app.services.outbox import AsyncEmailOutbox
+from app.services.metrics import REQUEST_LATENCY, RATELIMIT_REJECTIONS, register_mongo_listener, render_metrics
+from app.services.redis_pool import create_async_redis_client, create_redis_pool
+from app.services.json_provider import init_json_provider
+from app.services.keyring import ASYMMETRIC_ALGORITHMS, Keyring
+from app.services.introspection import TokenIntrospector
+from app.services.tracing import Tracer, register_mongo_tracing
+from app.services.ratelimit import AsyncHybridRateLimiter
+from app.services.login_throttle import AsyncLoginThrottle
+from app.services.one_time_code import AsyncOneTimeCodeStore
+from app.services.user_cache import AsyncUserCache
+from app.services.user_async import decode_token
+
+
+def create_asgi_app(config_class=None):
+    """
+    Crée et configure l'application ASGI (Quart) exposant le service utilisateur en mode asyncio.
+    Les connexions MongoDB et Redis sont établies à la demande par les clients asynchrones.
+    """
+    app = Quart(__name__)
+
+    app.config.from_object(config_class or get_config_class())
+    if app.config.get('STORAGE_BACKEND', 'mongo') != 'mongo':
+        # Les services asynchrones n'ont que le moteur MongoDB et Redis
+        raise ValueError("L'application ASGI requiert STORAGE_BACKEND='mongo'.")
+    configure_logging(app)
+    init_json_provider(app)
+
+    hasher.init_app(app)
+
+    # Écouteurs de commandes MongoDB, à enregistrer avant la création du client
+    if app.config.get('METRICS_ENABLED', True):
+        register_mongo_listener()
+    app.tracer = Tracer.from_app(app)
+    if app.tracer is not None:
+        register_mongo_tracing()
+
+    # Client MongoDB asynchrone : même collection que le modèle mongoengine User
+    app.mongo_client = AsyncMongoClient(app.config['MONGO_URI'])
+    app.users = app.mongo_client.get_default_database()['users']
+
+    # Clients Redis : asynchrone pour les requêtes, synchrone pour l'abonnement aux révocations
+    app.redis_client = create_async_redis_client(app.config)
+    app.redis_pool = create_redis_pool(app.config)
+    app.revocation_cache = RevocationCache.from_app(app, redis_client=redis.Redis(connection_pool=app.redis_pool))
+    app.revocation_store = RevocationStore.from_app(app, redis_client=app.revocation_cache.redis_client)
+    app.session_store = AsyncSessionStore.from_app(app)
+    app.email_outbox = AsyncEmailOutbox.from_app(app)
+    app.rate_limiter = AsyncHybridRateLimiter.from_app(app)
+    app.login_throttle = AsyncLoginThrottle.from_app(app)
+    app.one_time_codes = AsyncOneTimeCodeStore.from_app(app)
+    app.user_cache = AsyncUserCache.from_app(app)
+
+    # Trousseau de clés de signature : chargé au démarrage du serveur puis rechargé par une tâche
+    # de fond (client MongoDB synchrone, jamais appelé depuis la boucle d'événements)
+    if app.config['JWT_ALGORITHM'] in ASYMMETRIC_ALGORITHMS:
+        connect(host=app.config['MONGO_URI'], connect=False)
+        app.keyring = Keyring.from_app(app, auto_refresh=False)
+    else:
+        app.keyring = None
+
+    app.introspector = TokenIntrospector.from_app(app, decode_token)
+
+    async def refresh_keyring():
+        while True:
+            await asyncio.sleep(app.keyring.refresh_interval)
+            try:
+                await asyncio.to_thread(app.keyring.refresh, True)
+            except Exception:
+                app.logger.exception('Rechargement du trousseau de clés impossible :')
+
+    @app.before_serving
+    async def startup():
+        await app.users.create_index('username', unique=True)
+        await app.users.create_index('email', unique=True)
+        await app.session_store.preload()
+        await asyncio.to_thread(app.revocation_cache.start)
+        if app.keyring is not None:
+            await asyncio.to_thread(app.keyring.ensure_key)
+            app.keyring_task = asyncio.create_task(refresh_keyring())
+
+    @app.after_serving
+    async def shutdown():
+        if app.keyring is not None:
+            app.keyring_task.cancel()
+        app.revocation_cache.stop()
+        await app.redis_client.aclose()
+        await app.mongo_client.close()
+        if app.tracer is not None:
+            await asyncio.to_thread(app.tracer.exporter.flush)
+
+    # CORS : seule l'origine du frontend est autorisée
+    frontend_url = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+
+    @app.after_request
+    async def add_cors_headers(response):
+        if request.headers.get('Origin') == frontend_url:
+            response.headers['Access-Control-Allow-Origin'] = frontend_url
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.headers['Access-Control-Allow-Headers'] = 'Authorization, Content-Type'
+            response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+            response.headers['Vary'] = 'Origin'
+        return response
+
+    # Span racine par requête (hooks asynchrones : le contexte de trace reste celui de la vue)
+    if app.tracer is not None:
+        @app.before_request
+        async def start_request_span():
+            g.trace_span = app.tracer.start_request(request)
+
+        @app.after_request
+        async def record_response_status(response):
+            root = g.get('trace_span')
+            if root is not None:
+                root.set_status_code(response.status_code)
+            return response
+
+        @app.teardown_request
+        async def end_request_span(exc):
+            root = g.pop('trace_span', None)
+            if root is not None:
+                root.end(exc)
+
+    # Latence des requêtes par route et endpoint /metrics
+    if app.config.get('METRICS_ENABLED', True):
+        @app.before_request
+        async def start_timer():
+            g.request_start = time.perf_counter()
+
+        @app.after_request
+        async def observe_request(response):
+            start = g.pop('request_start', None)
+            if start is not None and request.endpoint != 'metrics':
+                REQUEST_LATENCY.labels(
+                    request.method, request.endpoint or 'unmatched', response.status_code
+                ).observe(time.perf_counter() - start)
+            return response
+
+        @app.route(app.config.get('METRICS_PATH', '/metrics'), endpoint='metrics')
+        async def metrics_endpoint():
+            body, content_type = await asyncio.to_thread(render_metrics)
+            return body, 200, {'Content-Type': content_type}
+
+    @app.route('/.well-known/jwks.json', endpoint='jwks')
+    async def jwks():
+        body, etag = app.keyring.jwks() if app.keyring is not None else (b'{"keys":[]}', 'empty')
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config.get('JWKS_MAX_AGE', 300)
+        return await response.make_conditional(request)
+
+    # Enregistrement des blueprints
+    from app.controllers.user_async import user_async_bp
+    app.register_blueprint(user_async_bp, url_prefix='/user')
+    from app.controllers.introspection_async import introspection_async_bp
+    app.register_blueprint(introspection_async_bp, url_prefix='/token')
+
+    # Gestion des erreurs HTTP
+    @app.errorhandler(HTTPException)
+    async def handle_http_exception(e):
+        return jsonify({'error': e.description}), e.code
+
+    # Gestion des autres exceptions
+    @app.errorhandler(Exception)
+    async def handle_general_exception(e):
+        app.logger.exception('Une erreur est survenue:')
+        return jsonify({'error': 'Une erreur interne est survenue.'}), 500
+
+    return app
+
+
+def get_jwt():
+    """
+    Renvoie les claims du token JWT de la requête courante.
+    """
+    return g.jwt_payload
+
+
+def get_jwt_identity():
+    """
+    Renvoie l'identité portée par le token JWT de la requête courante.
+    """
+    return g.jwt_payload[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')]
+
+
+def jwt_required(refresh: bool = False):
+    """
+    Équivalent asynchrone de flask_jwt_extended.jwt_required : mêmes réponses d'erreur,
+    vérification de révocation via le cache local puis redis.asyncio.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            auth_header = request.headers.get('Authorization')
+            if not auth_header:
+                return {'msg': 'Missing Authorization Header'}, 401
+            parts = auth_header.split()
+            if len(parts) != 2 or parts[0] != 'Bearer':
+                return {'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}, 422
+            try:
+                payload = decode_token(parts[1])
+            except pyjwt.ExpiredSignatureError:
+                return {'msg': 'Token has expired'}, 401
+            except pyjwt.InvalidTokenError as e:
+                return {'msg': str(e)}, 422
+            if refresh and payload.get('type') != 'refresh':
+                return {'msg': 'Only refresh tokens are allowed'}, 422
+            if not refresh and payload.get('type') == 'refresh':
+                return {'msg': 'Only non-refresh tokens are allowed'}, 422
+            if await is_token_revoked_async(current_app, payload):
+                return {'msg': 'Token has been revoked'}, 401
+            g.jwt_payload = payload
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def rate_limit(limit_value: str):
+    """
+    Limitation de débit par adresse IP (équivalent asynchrone de @limiter.limit) : seau de jetons
+    local devant la fenêtre glissante Redis, comme le stockage hybride de Flask-Limiter.
+    """
+    item = parse_limit(limit_value)
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            if current_app.config.get('RATELIMIT_ENABLED', True):
+                window = item.get_expiry()
+                key = f"LIMITER_ASYNC/{request.endpoint}/{request.remote_addr}/{item.amount}/{window}"
+                if not await current_app.rate_limiter.acquire(key, item.amount, window):
+                    RATELIMIT_REJECTIONS.labels(request.endpoint or 'unmatched').inc()
+                    raise TooManyRequests(str(item))
+            return await view(*args, **kwargs)
+        return wrapper
+    return decorator
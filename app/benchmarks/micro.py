@@ -0,0 +1,205 @@
+# app/benchmarks/micro.py
+
+"""
+Micro-benchmarks des fonctions chaudes du service :
+- vérification de révocation appelée par le blocklist loader (cache local chaud, puis Redis) ;
+- UserService.authenticate_user (recherche, bcrypt, émission des tokens), et pour un identifiant
+  bloqué par le freinage des connexions (refus avant recherche et bcrypt) ;
+- chargement des schémas marshmallow des requêtes les plus fréquentes : instance construite
+  à chaque requête (ancien chemin) contre instance partagée ;
+- décodage de la requête et encodage de la réponse de /login : json de la bibliothèque standard
+  (fournisseur par défaut de Flask) contre le fournisseur orjson de l'application ;
+- limiteur de débit sur une clé très sollicitée, requête acceptée puis refusée : fenêtre fixe
+  Redis de Flask-Limiter (un aller-retour par requête) contre le stockage hybride (seau de jetons local) ;
+- surcoût du traçage pour un appel mesuré par timed() : hors trace, dans une trace non
+  échantillonnée et dans une trace échantillonnée (span racine, span enfant et mise en file d'export).
+
+Chaque opération est répétée par séries ; la latence par appel est rapportée en percentiles.
+Les résultats sont comparés à la référence enregistrée (app/benchmarks/baselines/micro.json).
+
+Usage :
+    python -m app.benchmarks.micro --stand-ins
+    python -m app.benchmarks.micro --save-baseline   # mongod/redis locaux
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+from typing import Callable, Dict
+
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import decode_token
+from limits import parse as parse_limit
+from limits.storage import RedisStorage
+from limits.strategies import FixedWindowRateLimiter, MovingWindowRateLimiter
+
+from app import create_app
+from app.benchmarks.flows import PASSWORD, benchmark_config
+from app.benchmarks.report import check_against_baseline, print_table, save_baseline, summarize
+from app.models.user import User
+from app.schemas.user import (
+    LoginSchema,
+    RegisterSchema,
+    VerifyOneTimeCodeSchema,
+    login_schema,
+    register_schema,
+    verify_one_time_code_schema
+)
+from app.services.metrics import timed
+from app.services.ratelimit import HybridRateLimiter, HybridRedisStorage
+from app.services.revocation import is_token_revoked
+from app.services.tracing import BatchSpanExporter, Tracer
+from app.services.user import UserService
+
+
+def measure(func: Callable[[], object], rounds: int, number: int) -> Dict[str, float]:
+    """
+    Exécute func par séries de `number` appels et résume la latence moyenne par appel de chaque série.
+    """
+    timings = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        series_start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - series_start) / number)
+    result = summarize(timings, time.perf_counter() - start)
+    result['count'] = rounds * number
+    result['rps'] = rounds * number / (time.perf_counter() - start)
+    return result
+
+
+class DiscardSink:
+    """
+    Destination d'export qui ignore les lots : seul le coût côté requête est mesuré.
+    """
+
+    def write(self, payload) -> None:
+        pass
+
+
+def traced_call(tracer: Tracer, traceparent: str) -> Callable[[], None]:
+    def call():
+        with tracer.trace('micro', traceparent):
+            with timed('redis', 'GET'):
+                pass
+    return call
+
+
+def untraced_call() -> None:
+    with timed('redis', 'GET'):
+        pass
+
+
+def run(app, rounds: int, number: int) -> Dict[str, Dict[str, float]]:
+    service = UserService()
+    with app.app_context():
+        User.drop_collection()
+        service.register_user('microbench', 'microbench@example.com', PASSWORD)
+        tokens = service.authenticate_user('microbench', PASSWORD)[0]
+        payload = decode_token(tokens['access_token'])
+
+        def revoked_uncached():
+            app.revocation_cache.clear()
+            is_token_revoked(app, payload)
+
+        register_data = {'username': 'microbench', 'email': 'microbench@example.com', 'password': PASSWORD}
+        login_data = {'identifier': 'microbench', 'password': PASSWORD}
+        otc_data = {'email': 'microbench@example.com', 'code': '123456'}
+        login_body = json.dumps(login_data).encode()
+        # Identifiant visé par du bourrage d'identifiants : bloqué pour la durée du benchmark
+        for _ in range(app.config['LOGIN_THROTTLE_FREE_ATTEMPTS'] + 1):
+            app.login_throttle.record_failure('stuffed')
+
+        default_json = DefaultJSONProvider(app)
+        tracer = Tracer(BatchSpanExporter(DiscardSink(), max_queue=100000), 1.0)
+        trace_id = '0af7651916cd43dd8448eb211c80319c'
+
+        fixed_window = FixedWindowRateLimiter(RedisStorage('redis://', connection_pool=app.redis_pool))
+        hybrid = MovingWindowRateLimiter(HybridRedisStorage(
+            'hybrid+redis://', connection_pool=app.redis_pool, **HybridRateLimiter.options_from_config(app.config)
+        ))
+        allowed_limit = parse_limit('1000000 per minute')
+        rejected_limit = parse_limit('1 per minute')
+        fixed_window.storage.reset()
+
+        def json_stdlib():
+            default_json.loads(login_body)
+            default_json.response(tokens)
+
+        def json_provider():
+            app.json.loads(login_body)
+            app.json.response(tokens)
+
+        benchmarks = {
+            'check_if_token_revoked (cache)': lambda: is_token_revoked(app, payload),
+            'check_if_token_revoked (redis)': revoked_uncached,
+            'authenticate_user': lambda: service.authenticate_user('microbench', PASSWORD),
+            'authenticate_user (identifiant bloqué)': lambda: service.authenticate_user('stuffed', PASSWORD),
+            'RegisterSchema().load': lambda: RegisterSchema().load(register_data),
+            'register_schema.load': lambda: register_schema.load(register_data),
+            'LoginSchema().load': lambda: LoginSchema().load(login_data),
+            'login_schema.load': lambda: login_schema.load(login_data),
+            'VerifyOneTimeCodeSchema().load': lambda: VerifyOneTimeCodeSchema().load(otc_data),
+            'verify_one_time_code_schema.load': lambda: verify_one_time_code_schema.load(otc_data),
+            'login JSON (DefaultJSONProvider)': json_stdlib,
+            'login JSON (OrjsonProvider)': json_provider,
+            'limiteur fenêtre fixe (accepté)': lambda: fixed_window.hit(allowed_limit, 'micro'),
+            'limiteur hybride (accepté)': lambda: hybrid.hit(allowed_limit, 'micro'),
+            'limiteur fenêtre fixe (refusé)': lambda: fixed_window.hit(rejected_limit, 'micro'),
+            'limiteur hybride (refusé)': lambda: hybrid.hit(rejected_limit, 'micro'),
+            'timed (hors trace)': untraced_call,
+            'trace + timed (non échantillonnée)': traced_call(tracer, f'00-{trace_id}-b7ad6b7169203331-00'),
+            'trace + timed (échantillonnée)': traced_call(tracer, f'00-{trace_id}-b7ad6b7169203331-01'),
+        }
+        # authenticate_user est dominé par bcrypt : moins d'appels par série
+        results = {}
+        for name, func in benchmarks.items():
+            calls = max(1, number // 100) if name == 'authenticate_user' else number
+            results[name] = measure(func, rounds, calls)
+        fixed_window.storage.reset()
+        app.login_throttle.reset('stuffed')
+        User.drop_collection()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=50, help='Nombre de séries par opération.')
+    parser.add_argument('--number', type=int, default=1000, help='Appels par série.')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4)
+    parser.add_argument('--stand-ins', action='store_true', help='Utilise mongomock et fakeredis au lieu des serveurs.')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistre les résultats comme référence.')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Dégradation tolérée de la médiane.')
+    args = parser.parse_args()
+
+    settings = {
+        'rounds': args.rounds,
+        'number': args.number,
+        'bcrypt_rounds': args.bcrypt_rounds,
+        'stand_ins': args.stand_ins,
+    }
+    if args.stand_ins:
+        from app.benchmarks.standins import stand_ins
+        context = stand_ins()
+    else:
+        context = contextlib.nullcontext()
+
+    with context:
+        app = create_app(benchmark_config(args.bcrypt_rounds))
+    try:
+        results = run(app, args.rounds, args.number)
+    finally:
+        app.revocation_cache.stop()
+
+    print_table(results)
+    if args.save_baseline:
+        print(f"Référence enregistrée : {save_baseline('micro', results, settings)}")
+        return
+    sys.exit(check_against_baseline('micro', results, settings, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# app/benchmarks/report.py
+
+"""
+Outils communs aux benchmarks : percentiles, affichage et comparaison à une référence enregistrée.
+"""
+
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, List, Sequence
+
+# Répertoire des références enregistrées (une par suite de benchmarks)
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """
+    Percentile par rang le plus proche sur des valeurs déjà triées.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(timings: List[float], elapsed: float) -> Dict[str, float]:
+    """
+    Résume des latences (en secondes) : percentiles en millisecondes et débit.
+
+    :param timings: Latences individuelles.
+    :param elapsed: Durée totale de la mesure (pour le débit), en secondes.
+    """
+    timings = sorted(timings)
+    return {
+        'count': len(timings),
+        'p50_ms': percentile(timings, 0.50) * 1000,
+        'p95_ms': percentile(timings, 0.95) * 1000,
+        'p99_ms': percentile(timings, 0.99) * 1000,
+        'rps': len(timings) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'opération':<44} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>10}")
+    for name, result in results.items():
+        print(f"{name:<44} {result['count']:>7} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+              f"{result['p99_ms']:>9.3f} {result['rps']:>10.1f}")
+
+
+def baseline_path(suite: str) -> str:
+    return os.path.join(BASELINE_DIR, f'{suite}.json')
+
+
+def save_baseline(suite: str, results: Dict[str, Dict[str, float]], settings: Dict[str, Any]) -> str:
+    """
+    Enregistre les résultats comme référence de la suite, avec les paramètres de la mesure.
+    """
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(suite)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'settings': settings,
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+        f.write('\n')
+    return path
+
+
+def load_baseline(suite: str) -> Dict[str, Any]:
+    with open(baseline_path(suite), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float = 0.10, metric: str = 'p50_ms') -> List[str]:
+    """
+    Compare des résultats à une référence et renvoie les régressions au-delà de la tolérance.
+
+    La médiane est comparée par défaut : les percentiles élevés sont trop bruités
+    pour détecter de façon fiable un écart de 10 %.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if not reference or not reference.get(metric):
+            continue
+        ratio = result[metric] / reference[metric]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f'{name} : {metric} {result[metric]:.3f} contre {reference[metric]:.3f} '
+                f'(+{(ratio - 1) * 100:.1f} %, tolérance {tolerance * 100:.0f} %)'
+            )
+    return regressions
+
+
+def check_against_baseline(suite: str, results: Dict[str, Dict[str, float]], settings: Dict[str, Any],
+                           tolerance: float) -> int:
+    """
+    Affiche les régressions par rapport à la référence enregistrée et renvoie le code de sortie.
+    """
+    if not os.path.exists(baseline_path(suite)):
+        print(f'Aucune référence pour la suite {suite} : utiliser --save-baseline.')
+        return 0
+    baseline = load_baseline(suite)
+    if baseline.get('settings') != settings:
+        print(f"Attention : paramètres différents de la référence ({baseline.get('settings')}).")
+    regressions = compare(results, baseline['results'], tolerance)
+    for regression in regressions:
+        print(f'RÉGRESSION {regression}')
+    if not regressions:
+        print(f"Aucune régression par rapport à la référence du {baseline['recorded_at']}.")
+    return 1 if regressions else 0
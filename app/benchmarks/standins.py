@@ -0,0 +1,127 @@
+# app/benchmarks/standins.py
+
+"""
+Doublures locales de MongoDB (mongomock) et de Redis (fakeredis) pour exécuter
+les benchmarks et les tests sans serveur. Dépendances optionnelles, à installer à part :
+
+    pip install mongomock fakeredis lupa
+
+Les tests liés à MongoDB ou à Redis passent par use_stand_ins : doublures par défaut,
+serveurs réels avec TEST_SERVICES=live (MONGO_URI et REDIS_URL de la configuration).
+"""
+
+import os
+import unittest
+from contextlib import ExitStack, contextmanager
+from typing import Any, Iterator
+from unittest.mock import patch
+
+import mongoengine
+from pymongo.uri_parser import parse_uri
+
+from app.services import redis_pool
+
+try:
+    import fakeredis
+    import mongomock
+except ImportError:  # mongomock et fakeredis sont optionnels
+    fakeredis = mongomock = None
+
+
+class AsyncMongomockCollection:
+    """
+    Collection mongomock dont chaque méthode est une coroutine, comme celles d'AsyncMongoClient.
+    """
+
+    def __init__(self, collection) -> None:
+        self.collection = collection
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncMongomockDatabase:
+    def __init__(self, database) -> None:
+        self.database = database
+
+    def __getitem__(self, name: str) -> AsyncMongomockCollection:
+        return AsyncMongomockCollection(self.database[name])
+
+
+class AsyncMongomockClient:
+    """
+    Doublure d'AsyncMongoClient limitée à ce qu'utilise app.asgi : base par défaut et fermeture.
+    """
+
+    def __init__(self, uri: str, **kwargs) -> None:
+        self.client = mongomock.MongoClient()
+        self.database = self.client[parse_uri(uri)['database']]
+
+    def get_default_database(self) -> AsyncMongomockDatabase:
+        return AsyncMongomockDatabase(self.database)
+
+    async def close(self) -> None:
+        self.client.close()
+
+
+@contextmanager
+def stand_ins(asgi: bool = False) -> Iterator[None]:
+    """
+    Pendant le bloc, create_app se connecte à mongomock et à un serveur fakeredis en mémoire.
+    Le pool de connexions Redis (et son instrumentation) est conservé : seul le transport change.
+    Avec `asgi`, create_asgi_app reçoit aussi les doublures (client MongoDB et Redis asynchrones).
+    """
+    if fakeredis is None or mongomock is None:
+        raise RuntimeError("Les doublures nécessitent les paquets mongomock, fakeredis et lupa.")
+    server = fakeredis.FakeServer()
+
+    def connect(*args, **kwargs):
+        return mongoengine.connect(*args, mongo_client_class=mongomock.MongoClient, **kwargs)
+
+    def create_redis_pool(config):
+        pool = redis_pool.create_redis_pool(config)
+        pool.connection_class = fakeredis.FakeRedisConnection
+        pool.connection_kwargs = {
+            'server': server,
+            'db': pool.connection_kwargs.get('db', 0),
+            'decode_responses': pool.connection_kwargs.get('decode_responses', True),
+        }
+        return pool
+
+    def create_async_redis_client(config):
+        client = redis_pool.create_async_redis_client(config)
+        pool = client.connection_pool
+        pool.connection_class = fakeredis.FakeAsyncRedisConnection
+        pool.connection_kwargs = {
+            'server': server,
+            'db': pool.connection_kwargs.get('db', 0),
+            'decode_responses': pool.connection_kwargs.get('decode_responses', True),
+        }
+        return client
+
+    with ExitStack() as stack:
+        stack.enter_context(patch('app.connect', connect))
+        stack.enter_context(patch('app.create_redis_pool', create_redis_pool))
+        if asgi:
+            stack.enter_context(patch('app.asgi.connect', connect))
+            stack.enter_context(patch('app.asgi.create_redis_pool', create_redis_pool))
+            stack.enter_context(patch('app.asgi.create_async_redis_client', create_async_redis_client))
+            stack.enter_context(patch('app.asgi.AsyncMongoClient', AsyncMongomockClient))
+        yield
+
+
+def use_stand_ins(test_case: unittest.TestCase, asgi: bool = False) -> None:
+    """
+    À appeler en tête de setUp, avant la création de l'application : le test s'exécute sur les
+    doublures jusqu'à sa fin, ou sur les serveurs réels avec TEST_SERVICES=live.
+    Sans mongomock ni fakeredis, le test est sauté plutôt que d'attendre des serveurs absents.
+    """
+    if os.environ.get('TEST_SERVICES') == 'live':
+        return
+    if fakeredis is None or mongomock is None:
+        raise unittest.SkipTest('Doublures mongomock et fakeredis non installées ; TEST_SERVICES=live pour MongoDB et Redis.')
+    test_case.enterContext(stand_ins(asgi=asgi))
@@ -0,0 +1,182 @@
+# app/benchmarks/startup.py
+
+"""
+Coût de démarrage d'un worker : processus neuf (import + create_app, comme un worker gunicorn
+sans preload) contre fork d'un maître préchargé suivi de init_worker (preload_app + post_fork).
+
+Pour chaque mode : délai jusqu'au worker prêt (et jusqu'à sa première réponse avec --first-request),
+et mémoire du worker d'après /proc/self/smaps_rollup (privée contre partagée avec le maître).
+
+Usage :
+    python -m app.benchmarks.startup --workers 8
+    python -m app.benchmarks.startup --stand-ins --first-request
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+from app import create_app, init_worker
+from app.benchmarks.flows import benchmark_config
+from app.benchmarks.report import check_against_baseline, print_table, save_baseline, summarize
+
+
+def memory_usage() -> Optional[Dict[str, float]]:
+    """
+    Mémoire du processus courant en Mo : RSS, PSS, privée et partagée (Linux uniquement).
+    """
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f.read().splitlines()[1:])
+    except OSError:
+        return None
+
+    def mb(*names):
+        return sum(int(fields[name].split()[0]) for name in names) / 1024
+
+    return {
+        'rss_mb': mb('Rss'),
+        'pss_mb': mb('Pss'),
+        'private_mb': mb('Private_Clean', 'Private_Dirty'),
+        'shared_mb': mb('Shared_Clean', 'Shared_Dirty'),
+    }
+
+
+def first_request(app) -> None:
+    response = app.test_client().get('/.well-known/jwks.json')
+    if response.status_code != 200:
+        raise RuntimeError(f'Première requête : statut {response.status_code}')
+
+
+def stand_ins_context(enabled: bool):
+    if not enabled:
+        return contextlib.nullcontext()
+    from app.benchmarks.standins import stand_ins
+    return stand_ins()
+
+
+def worker_main(args) -> None:
+    """
+    Worker sans preload (processus neuf) : signale qu'il est prêt en écrivant sa mémoire sur stdout.
+    """
+    with stand_ins_context(args.stand_ins):
+        app = create_app(benchmark_config(args.bcrypt_rounds))
+        if args.first_request:
+            first_request(app)
+        sys.stdout.write(json.dumps(memory_usage()) + '\n')
+        sys.stdout.flush()
+
+
+def fresh_worker(args) -> Dict:
+    command = [sys.executable, '-m', 'app.benchmarks.startup', '--worker', '--bcrypt-rounds', str(args.bcrypt_rounds)]
+    if args.stand_ins:
+        command.append('--stand-ins')
+    if args.first_request:
+        command.append('--first-request')
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    elapsed = time.perf_counter() - start
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError('Le worker neuf a échoué.')
+    return {'elapsed': elapsed, 'memory': json.loads(line)}
+
+
+def forked_worker(app, args) -> Dict:
+    read_fd, write_fd = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        status = 0
+        try:
+            init_worker(app)
+            if args.first_request:
+                first_request(app)
+            os.write(write_fd, (json.dumps(memory_usage()) + '\n').encode())
+        except Exception as e:
+            sys.stderr.write(f'Worker forké : {e}\n')
+            status = 1
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as reader:
+        line = reader.readline()
+    elapsed = time.perf_counter() - start
+    _, status = os.waitpid(pid, 0)
+    if status != 0 or not line:
+        raise RuntimeError('Le worker forké a échoué.')
+    return {'elapsed': elapsed, 'memory': json.loads(line)}
+
+
+def average_memory(samples) -> Optional[Dict[str, float]]:
+    samples = [sample['memory'] for sample in samples if sample['memory']]
+    if not samples:
+        return None
+    return {key: sum(sample[key] for sample in samples) / len(samples) for key in samples[0]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='Workers démarrés dans chaque mode.')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4)
+    parser.add_argument('--first-request', action='store_true',
+                        help='Mesure jusqu\'à la première réponse (nécessite MongoDB/Redis ou --stand-ins).')
+    parser.add_argument('--stand-ins', action='store_true', help='Utilise mongomock et fakeredis au lieu des serveurs.')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistre les résultats comme référence.')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Dégradation tolérée de la médiane.')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    settings = {
+        'workers': args.workers,
+        'bcrypt_rounds': args.bcrypt_rounds,
+        'first_request': args.first_request,
+        'stand_ins': args.stand_ins,
+    }
+    start = time.perf_counter()
+    fresh = [fresh_worker(args) for _ in range(args.workers)]
+    fresh_elapsed = time.perf_counter() - start
+
+    with stand_ins_context(args.stand_ins):
+        # Maître préchargé, comme gunicorn avec preload_app (when_ready gèle le ramasse-miettes)
+        start = time.perf_counter()
+        app = create_app(benchmark_config(args.bcrypt_rounds))
+        preload_elapsed = time.perf_counter() - start
+        gc.freeze()
+        start = time.perf_counter()
+        forked = [forked_worker(app, args) for _ in range(args.workers)]
+        forked_elapsed = time.perf_counter() - start
+        gc.unfreeze()
+
+    results = {
+        'worker neuf (import + create_app)': summarize([w['elapsed'] for w in fresh], fresh_elapsed),
+        'worker forké (init_worker)': summarize([w['elapsed'] for w in forked], forked_elapsed),
+    }
+    print_table(results)
+    print(f'Préchargement du maître (create_app, une fois) : {preload_elapsed * 1000:.1f} ms')
+    for name, samples in (('neuf', fresh), ('forké', forked)):
+        memory = average_memory(samples)
+        if memory:
+            print(f"Mémoire par worker {name} : RSS {memory['rss_mb']:.1f} Mo, PSS {memory['pss_mb']:.1f} Mo, "
+                  f"privée {memory['private_mb']:.1f} Mo, partagée {memory['shared_mb']:.1f} Mo")
+
+    if args.save_baseline:
+        print(f"Référence enregistrée : {save_baseline('startup', results, settings)}")
+        return
+    sys.exit(check_against_baseline('startup', results, settings, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# app/commands/keys.py
+
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.services.keyring import ASYMMETRIC_ALGORITHMS
+
+keys_cli = AppGroup('keys', help='Gestion des clés de signature des tokens JWT.')
+
+
+def get_keyring():
+    if current_app.keyring is None:
+        raise click.ClickException("JWT_ALGORITHM='HS256' : aucun trousseau de clés.")
+    return current_app.keyring
+
+
+@keys_cli.command('list')
+def list_keys():
+    """
+    Affiche les clés du trousseau (publiées dans le JWKS).
+    """
+    keyring = get_keyring()
+    keyring.refresh(force=True)
+    now = time.time()
+    signing_kid = keyring.signing_key().kid
+    for key in keyring.keys():
+        if key.kid == signing_kid:
+            state = 'signature'
+        elif key.activates_at > now:
+            state = f'active dans {key.activates_at - now:.0f} s'
+        else:
+            state = f'vérification seule, expire dans {key.expires_at - now:.0f} s'
+        click.echo(f'{key.kid}  {key.algorithm:<6}  {state}')
+
+
+@keys_cli.command('rotate')
+@click.option('--algorithm', type=click.Choice(ASYMMETRIC_ALGORITHMS), default=None,
+              help='Algorithme de la nouvelle clé (par défaut JWT_ALGORITHM).')
+@click.option('--immediate', is_flag=True,
+              help='Signe immédiatement avec la nouvelle clé, sans attendre sa publication dans les caches JWKS.')
+@click.option('--if-older-than', 'max_age_days', type=int, default=None,
+              help='Ne crée une clé que si la plus récente a plus de N jours (pour une tâche planifiée).')
+def rotate(algorithm, immediate, max_age_days):
+    """
+    Crée une nouvelle clé de signature ; les clés précédentes restent acceptées
+    jusqu'à l'expiration des tokens qu'elles ont signés.
+    """
+    keyring = get_keyring()
+    keyring.refresh(force=True)
+    keys = keyring.keys()
+    if max_age_days is not None and keys and time.time() - keys[-1].created_at < max_age_days * 86400:
+        click.echo(f'Clé la plus récente ({keys[-1].kid}) créée il y a moins de {max_age_days} jours.')
+        return
+    key = keyring.rotate(algorithm=algorithm, immediate=immediate)
+    click.echo(f'Nouvelle clé {key.kid} ({key.algorithm}), active dans {max(0, key.activates_at - time.time()):.0f} s.')
+
+
+@keys_cli.command('prune')
+def prune():
+    """
+    Supprime les clés expirées.
+    """
+    click.echo(f'{get_keyring().prune()} clé(s) expirée(s) supprimée(s).')
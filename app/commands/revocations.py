@@ -0,0 +1,35 @@
+# app/commands/revocations.py
+
+import json
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+revocations_cli = AppGroup('revocations', help='Administration du stockage des révocations de tokens.')
+
+
+def revocation_store():
+    # Les révocations ne sont dans Redis qu'avec le moteur de stockage 'mongo'
+    if current_app.revocation_store is None:
+        raise click.ClickException(
+            f"Révocations hors de Redis avec STORAGE_BACKEND={current_app.config['STORAGE_BACKEND']!r}.")
+    return current_app.revocation_store
+
+
+@revocations_cli.command('report')
+@click.option('--batch-size', default=1000, show_default=True, help='Clés lues par itération de SCAN.')
+def report(batch_size):
+    """
+    Affiche l'empreinte mémoire des révocations : hashes, jti, encodages et octets par jti.
+    """
+    click.echo(json.dumps(revocation_store().memory_report(batch_size=batch_size), indent=2))
+
+
+@revocations_cli.command('migrate')
+@click.option('--batch-size', default=1000, show_default=True, help='Clés lues par itération de SCAN.')
+def migrate(batch_size):
+    """
+    Reprend les révocations de l'ancien schéma (une clé par jti) dans les hashes par tranche.
+    """
+    migrated = revocation_store().migrate_legacy(batch_size=batch_size)
+    click.echo(f'{migrated} révocation(s) reprise(s).')
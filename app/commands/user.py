@@ -0,0 +1,64 @@
+# app/commands/user.py
+
+import json
+import click
+from flask.cli import AppGroup
+from app.models.user import User
+from app.services.user import UserService
+from app.services.user_import import READERS, UserImporter
+
+user_cli = AppGroup('user', help='Commandes d\'administration des utilisateurs.')
+
+
+@user_cli.command('hash-census')
+@click.option('--batch-size', default=1000, show_default=True, help='Taille des lots lus depuis MongoDB.')
+def hash_census(batch_size):
+    """
+    Affiche la répartition des paramètres de hachage des mots de passe.
+    """
+    click.echo(json.dumps(User.hash_parameter_census(batch_size=batch_size), indent=2))
+
+
+@user_cli.command('logout-all')
+@click.argument('identifier')
+def logout_all(identifier):
+    """
+    Déconnecte toutes les sessions d'un utilisateur (nom d'utilisateur ou email).
+    """
+    user = User.find_by_identifier(identifier)
+    if not user:
+        raise click.ClickException('Utilisateur non trouvé.')
+    UserService().revoke_all_tokens(str(user.id))
+    click.echo(f'Toutes les sessions de {user.username} ont été déconnectées.')
+
+
+@user_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'input_format', type=click.Choice(sorted(READERS)), default=None,
+              help='Format du fichier (déduit de l\'extension par défaut).')
+@click.option('--batch-size', default=1000, show_default=True, help='Nombre de lignes par insert_many.')
+@click.option('--workers', type=int, default=None, help='Processus de hachage (par défaut HASHING_WORKERS).')
+@click.option('--executor', type=click.Choice(['process', 'thread']), default='process', show_default=True,
+              help='Pool utilisé pour hacher les mots de passe en clair.')
+@click.option('--errors', 'errors_file', type=click.File('w', encoding='utf-8'), default='-', show_default=True,
+              help='Fichier NDJSON recevant les erreurs par ligne.')
+def import_users(source, input_format, batch_size, workers, executor, errors_file):
+    """
+    Importe des utilisateurs depuis un fichier NDJSON ou CSV ('-' pour l'entrée standard).
+
+    Colonnes : username, email et password (en clair) ou password_hash (bcrypt ou argon2id).
+    """
+    if input_format is None:
+        input_format = 'csv' if source.name.lower().endswith('.csv') else 'ndjson'
+
+    def on_error(line_number, errors):
+        errors_file.write(json.dumps({'line': line_number, 'errors': errors}, ensure_ascii=False) + '\n')
+
+    def on_progress(stats):
+        click.echo(f"{stats['total']} lignes traitées, {stats['inserted']} insérées "
+                   f"({stats['rows_per_second']} lignes/s)", err=True)
+
+    importer = UserImporter(batch_size=batch_size, workers=workers, executor=executor,
+                            on_error=on_error, on_progress=on_progress)
+    stats = importer.run(READERS[input_format](source))
+    click.echo(json.dumps(stats, indent=2), err=True)
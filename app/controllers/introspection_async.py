@@ -0,0 +1,22 @@
+# app/controllers/introspection_async.py
+
+from quart import Blueprint, current_app, request
+from marshmallow import ValidationError
+from app.schemas.user import introspect_schema
+
+introspection_async_bp = Blueprint('introspection_async_bp', __name__)
+
+@introspection_async_bp.route('/introspect', methods=['POST'])
+async def introspect():
+    """
+    Endpoint d'introspection groupée des tokens, réservé aux passerelles d'API.
+    """
+    introspector = current_app.introspector
+    if not introspector.authorize(request.headers.get('Authorization')):
+        return {'errors': 'Clé d\'API de passerelle invalide.'}, 401
+    json_data = await request.get_json()
+    try:
+        data = introspect_schema.load(json_data)
+    except ValidationError as err:
+        return {'errors': err.messages}, 400
+    return await introspector.introspect_async(current_app, data['tokens'])
@@ -0,0 +1,20 @@
+# app/controllers/jwks.py
+
+from flask import Blueprint, current_app, request
+
+jwks_bp = Blueprint('jwks_bp', __name__)
+
+EMPTY_JWKS = (b'{"keys":[]}', 'empty')
+
+@jwks_bp.route('/.well-known/jwks.json', methods=['GET'])
+def jwks():
+    """
+    Endpoint JWKS : clés publiques de vérification des tokens, mises en cache par les consommateurs.
+    """
+    keyring = current_app.keyring
+    body, etag = keyring.jwks() if keyring is not None else EMPTY_JWKS
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get('JWKS_MAX_AGE', 300)
+    return response.make_conditional(request)
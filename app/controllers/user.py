@@ -3,19 +3,25 @@
 from flask import Blueprint, request
 from app.services.user import UserService
 from app.schemas.user import (
-    RegisterSchema,
-    LoginSchema,
-    RequestPasswordResetSchema,
-    ResetPasswordSchema,
-    RequestOneTimeCodeSchema,
-    VerifyOneTimeCodeSchema
+    register_schema,
+    login_schema,
+    request_password_reset_schema,
+    reset_password_schema,
+    request_one_time_code_schema,
+    verify_one_time_code_schema
+)
+from app.controllers.user_base import (
+    AUTH_LIMIT,
+    SESSIONS_LIMIT,
+    VERIFY_CODE_LIMIT,
+    LOGOUT_MESSAGE,
+    LOGOUT_ALL_MESSAGE,
+    load
 )
-from marshmallow import ValidationError
 from app.extensions import limiter
 from flask_jwt_extended import (
     jwt_required,
     get_jwt_identity,
-    create_access_token,
     get_jwt
 )
 
@@ -23,117 +29,126 @@ user_bp = Blueprint('user_bp', __name__)
 user_service = UserService()
 
 @user_bp.route('/register', methods=['POST'])
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def register():
     """
     Endpoint pour l'enregistrement d'un nouvel utilisateur.
     """
-    json_data = request.get_json()
-    try:
-        data = RegisterSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(register_schema, request.get_json())
+    if error:
+        return error
     username = data['username']
     email = data['email']
     password = data['password']
     return user_service.register_user(username, email, password)
 
 @user_bp.route('/login', methods=['POST'])
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def login():
     """
     Endpoint pour l'authentification d'un utilisateur.
     """
-    json_data = request.get_json()
-    try:
-        data = LoginSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(login_schema, request.get_json())
+    if error:
+        return error
     identifier = data['identifier']
     password = data['password']
     return user_service.authenticate_user(identifier, password)
 
 @user_bp.route('/request_password_reset', methods=['POST'])
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def request_password_reset():
     """
     Endpoint pour demander une réinitialisation de mot de passe.
     """
-    json_data = request.get_json()
-    try:
-        data = RequestPasswordResetSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(request_password_reset_schema, request.get_json())
+    if error:
+        return error
     email = data['email']
     return user_service.request_password_reset(email)
 
 @user_bp.route('/reset_password', methods=['POST'])
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def reset_password():
     """
     Endpoint pour réinitialiser le mot de passe avec le token fourni.
     """
-    json_data = request.get_json()
-    try:
-        data = ResetPasswordSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(reset_password_schema, request.get_json())
+    if error:
+        return error
     token = data['token']
     new_password = data['password']
     return user_service.reset_password(token, new_password)
 
 @user_bp.route('/refresh', methods=['POST'])
 @jwt_required(refresh=True)
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def refresh():
     """
     Endpoint pour rafraîchir le token d'accès.
     """
     current_user = get_jwt_identity()
-    new_access_token = create_access_token(identity=current_user)
-    return {'access_token': new_access_token}, 200
+    # Le jti du token de rafraîchissement identifie la session
+    return user_service.refresh_access_token(current_user, get_jwt()['jti'])
 
 @user_bp.route('/logout', methods=['POST'])
 @jwt_required()
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def logout():
     """
     Endpoint pour la déconnexion de l'utilisateur.
-    Révoque le token d'accès courant.
+    Révoque le token d'accès courant et la session dont il dérive.
     """
     jwt_data = get_jwt()
     jti = jwt_data['jti']
     token_type = jwt_data['type']
     exp = jwt_data['exp']
     user_id = get_jwt_identity()
-    user_service.revoke_token(jti, token_type, exp, user_id)
-    return {'message': 'Déconnexion réussie.'}, 200
+    user_service.revoke_token(jti, token_type, exp, user_id, jwt_data.get('sid'))
+    return {'message': LOGOUT_MESSAGE}, 200
+
+@user_bp.route('/sessions', methods=['GET'])
+@jwt_required()
+@limiter.limit(SESSIONS_LIMIT)
+def sessions():
+    """
+    Endpoint listant les sessions actives de l'utilisateur.
+    """
+    return user_service.list_sessions(get_jwt_identity(), get_jwt().get('sid'))
+
+@user_bp.route('/logout_all', methods=['POST'])
+@jwt_required()
+@limiter.limit(AUTH_LIMIT)
+def logout_all():
+    """
+    Endpoint pour la déconnexion de toutes les sessions de l'utilisateur.
+    Révoque tous les tokens émis jusqu'à présent.
+    """
+    user_id = get_jwt_identity()
+    user_service.revoke_all_tokens(user_id)
+    return {'message': LOGOUT_ALL_MESSAGE}, 200
 
 @user_bp.route('/request_one_time_code', methods=['POST'])
-@limiter.limit("5 per minute")
+@limiter.limit(AUTH_LIMIT)
 def request_one_time_code():
     """
     Endpoint pour demander un code à usage unique envoyé par email.
     """
-    json_data = request.get_json()
-    try:
-        data = RequestOneTimeCodeSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(request_one_time_code_schema, request.get_json())
+    if error:
+        return error
     email = data['email']
     return user_service.request_one_time_code(email)
 
 @user_bp.route('/verify_one_time_code', methods=['POST'])
-@limiter.limit("10 per minute")
+@limiter.limit(VERIFY_CODE_LIMIT)
 def verify_one_time_code():
     """
     Endpoint pour vérifier le code à usage unique et authentifier l'utilisateur.
     """
-    json_data = request.get_json()
-    try:
-        data = VerifyOneTimeCodeSchema().load(json_data)
-    except ValidationError as err:
-        return {'errors': err.messages}, 400
+    data, error = load(verify_one_time_code_schema, request.get_json())
+    if error:
+        return error
     email = data['email']
     code = data['code']
     return user_service.verify_one_time_code(email, code)
@@ -0,0 +1,132 @@
+# app/controllers/user_async.py
+
+from quart import Blueprint, request
+from app.services.user_async import AsyncUserService
+from app.schemas.user import (
+    register_schema,
+    login_schema,
+    request_password_reset_schema,
+    reset_password_schema,
+    request_one_time_code_schema,
+    verify_one_time_code_schema
+)
+from app.controllers.user_base import (
+    AUTH_LIMIT,
+    SESSIONS_LIMIT,
+    VERIFY_CODE_LIMIT,
+    LOGOUT_MESSAGE,
+    LOGOUT_ALL_MESSAGE,
+    load
+)
+from app.asgi import jwt_required, rate_limit, get_jwt, get_jwt_identity
+
+user_async_bp = Blueprint('user_async_bp', __name__)
+user_service = AsyncUserService()
+
+@user_async_bp.route('/register', methods=['POST'])
+@rate_limit(AUTH_LIMIT)
+async def register():
+    """
+    Endpoint pour l'enregistrement d'un nouvel utilisateur.
+    """
+    data, error = load(register_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.register_user(data['username'], data['email'], data['password'])
+
+@user_async_bp.route('/login', methods=['POST'])
+@rate_limit(AUTH_LIMIT)
+async def login():
+    """
+    Endpoint pour l'authentification d'un utilisateur.
+    """
+    data, error = load(login_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.authenticate_user(data['identifier'], data['password'])
+
+@user_async_bp.route('/request_password_reset', methods=['POST'])
+@rate_limit(AUTH_LIMIT)
+async def request_password_reset():
+    """
+    Endpoint pour demander une réinitialisation de mot de passe.
+    """
+    data, error = load(request_password_reset_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.request_password_reset(data['email'])
+
+@user_async_bp.route('/reset_password', methods=['POST'])
+@rate_limit(AUTH_LIMIT)
+async def reset_password():
+    """
+    Endpoint pour réinitialiser le mot de passe avec le token fourni.
+    """
+    data, error = load(reset_password_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.reset_password(data['token'], data['password'])
+
+@user_async_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+@rate_limit(AUTH_LIMIT)
+async def refresh():
+    """
+    Endpoint pour rafraîchir le token d'accès.
+    """
+    # Le jti du token de rafraîchissement identifie la session
+    return await user_service.refresh_access_token(get_jwt_identity(), get_jwt()['jti'])
+
+@user_async_bp.route('/logout', methods=['POST'])
+@jwt_required()
+@rate_limit(AUTH_LIMIT)
+async def logout():
+    """
+    Endpoint pour la déconnexion de l'utilisateur.
+    Révoque le token d'accès courant et la session dont il dérive.
+    """
+    jwt_data = get_jwt()
+    await user_service.revoke_token(jwt_data['jti'], jwt_data['type'], jwt_data['exp'], get_jwt_identity(),
+                                    jwt_data.get('sid'))
+    return {'message': LOGOUT_MESSAGE}, 200
+
+@user_async_bp.route('/sessions', methods=['GET'])
+@jwt_required()
+@rate_limit(SESSIONS_LIMIT)
+async def sessions():
+    """
+    Endpoint listant les sessions actives de l'utilisateur.
+    """
+    return await user_service.list_sessions(get_jwt_identity(), get_jwt().get('sid'))
+
+@user_async_bp.route('/logout_all', methods=['POST'])
+@jwt_required()
+@rate_limit(AUTH_LIMIT)
+async def logout_all():
+    """
+    Endpoint pour la déconnexion de toutes les sessions de l'utilisateur.
+    """
+    await user_service.revoke_all_tokens(get_jwt_identity())
+    return {'message': LOGOUT_ALL_MESSAGE}, 200
+
+@user_async_bp.route('/request_one_time_code', methods=['POST'])
+@rate_limit(AUTH_LIMIT)
+async def request_one_time_code():
+    """
+    Endpoint pour demander un code à usage unique envoyé par email.
+    """
+    data, error = load(request_one_time_code_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.request_one_time_code(data['email'])
+
+@user_async_bp.route('/verify_one_time_code', methods=['POST'])
+@rate_limit(VERIFY_CODE_LIMIT)
+async def verify_one_time_code():
+    """
+    Endpoint pour vérifier le code à usage unique et authentifier l'utilisateur.
+    """
+    data, error = load(verify_one_time_code_schema, await request.get_json())
+    if error:
+        return error
+    return await user_service.verify_one_time_code(data['email'], data['code'])
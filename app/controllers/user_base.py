@@ -0,0 +1,30 @@
+# app/controllers/user_base.py
+
+"""
+Éléments communs aux contrôleurs utilisateur WSGI (app.controllers.user) et ASGI
+(app.controllers.user_async) : limites de débit, validation des corps JSON et messages.
+Chaque contrôleur ne garde que la lecture de la requête et l'appel à son service.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+from marshmallow import Schema, ValidationError
+
+# Limites de débit par endpoint
+AUTH_LIMIT = "5 per minute"
+SESSIONS_LIMIT = "30 per minute"
+VERIFY_CODE_LIMIT = "10 per minute"
+
+LOGOUT_MESSAGE = 'Déconnexion réussie.'
+LOGOUT_ALL_MESSAGE = 'Toutes les sessions ont été déconnectées.'
+
+
+def load(schema: Schema, json_data: Any) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[Dict[str, Any], int]]]:
+    """
+    Valide un corps JSON avec `schema`.
+
+    :return: Les données validées et None, ou None et la réponse d'erreur 400.
+    """
+    try:
+        return schema.load(json_data), None
+    except ValidationError as err:
+        return None, ({'errors': err.messages}, 400)
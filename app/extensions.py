@@ -1,18 +1,19 @@
 # app/extensions.py
 
-import os
 from flask_jwt_extended import JWTManager
-from flask_bcrypt import Bcrypt
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_mail import Mail
+from app.services.hashing import HashingEngine
+from app.services.metrics import Metrics
+from app.services.tracing import Tracing
 
 jwt = JWTManager()
-bcrypt = Bcrypt()
 mail = Mail()
+hasher = HashingEngine()
+metrics = Metrics()
+tracing = Tracing()
 
-# Configuration de Flask-Limiter avec storage_uri
-limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri=os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
-)
+# Configuration de Flask-Limiter : stockage et stratégie lus dans la configuration
+# (RATELIMIT_STORAGE_URI, RATELIMIT_STRATEGY), seaux de jetons locaux devant Redis par défaut
+limiter = Limiter(key_func=get_remote_address)
@@ -0,0 +1,65 @@
+# app/gunicorn_config.py
+
+"""
+Configuration gunicorn : `gunicorn --config python:app.gunicorn_config app.server:app`
+
+L'application est chargée une seule fois par le processus maître (preload_app), puis les workers
+sont créés par fork : ils partagent en copie sur écriture le code et les objets chargés, et sont
+prêts sans refaire les imports ni create_app. Aucune connexion n'est ouverte avant le fork ;
+post_fork recrée les clients MongoDB de chaque worker (les autres ressources vérifient le pid).
+"""
+
+import gc
+import os
+import shutil
+from distutils.util import strtobool
+
+# Répertoire partagé des métriques Prometheus : défini avant l'import de l'application par les workers
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+# Journalisation sur la sortie d'erreur : un fichier à rotation ne peut pas être partagé entre workers
+os.environ.setdefault('LOG_FILE', '')
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))  # Une connexion Redis par thread (REDIS_MAX_CONNECTIONS)
+preload_app = bool(strtobool(os.environ.get('GUNICORN_PRELOAD', 'True')))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recyclage périodique des workers, décalé pour ne pas les redémarrer tous en même temps
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    # Les fichiers d'une exécution précédente fausseraient les compteurs agrégés
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def when_ready(server):
+    # Objets chargés par le maître exclus du ramasse-miettes : ses passages n'écrivent plus
+    # dans leurs en-têtes, les pages restent partagées entre workers
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app import init_worker
+        init_worker(server.app.wsgi())
+
+
+def worker_exit(server, worker):
+    # Derniers spans du worker exportés avant sa sortie
+    app = server.app.wsgi()
+    if getattr(app, 'tracer', None) is not None:
+        app.tracer.exporter.flush(timeout=2.0)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,7 +1,11 @@
 # app/models/user.py
 
-from mongoengine import Document, StringField, EmailField, Q
-from app.extensions import bcrypt
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional
+from mongoengine import Document, StringField, EmailField, NotUniqueError
+from app.extensions import hasher
+from app.services.hashing import identify_hash, describe_params
 
 class User(Document):
     """
@@ -21,11 +25,11 @@ class User(Document):
 
     def set_password(self, password: str) -> None:
         """
-        Hash le mot de passe et le stocke dans password_hash.
+        Hash le mot de passe (dans le pool de hachage) et le stocke dans password_hash.
 
         :param password: Le mot de passe en clair.
         """
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hasher.generate_password_hash(password)
 
     def check_password(self, password: str) -> bool:
         """
@@ -34,14 +38,67 @@ class User(Document):
         :param password: Le mot de passe en clair.
         :return: True si le mot de passe est correct, False sinon.
         """
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return hasher.check_password_hash(self.password_hash, password)
 
     @staticmethod
-    def find_by_identifier(identifier: str):
+    def hash_parameter_census(batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Recense les paramètres de hachage des mots de passe stockés.
+        Seul le champ password_hash est lu, par lots, sans hydrater de Document.
+
+        :param batch_size: Taille des lots lus depuis MongoDB.
+        :return: Le nombre de comptes par paramètres et le nombre à rehacher.
+        """
+        census = Counter()
+        outdated = 0
+        total = 0
+        for doc in User.objects.only('password_hash').as_pymongo().batch_size(batch_size):
+            pw_hash = doc.get('password_hash', '')
+            census[describe_params(identify_hash(pw_hash))] += 1
+            if hasher.needs_rehash(pw_hash):
+                outdated += 1
+            total += 1
+        return {
+            'policy': describe_params(hasher.policy()),
+            'total': total,
+            'outdated': outdated,
+            'params': dict(census.most_common()),
+        }
+
+    @staticmethod
+    def duplicate_key_field(error: Exception) -> Optional[str]:
+        """
+        Détermine le champ dont l'index unique est entré en collision lors d'une insertion.
+
+        :param error: L'erreur levée par mongoengine (ou directement par pymongo).
+        :return: Le nom du champ ('username', 'email') ou None s'il ne peut être déterminé.
+        """
+        # mongoengine ne conserve que le message : les détails sont sur l'erreur pymongo d'origine
+        for candidate in (error, error.__cause__, error.__context__):
+            details = getattr(candidate, 'details', None) or {}
+            key_pattern = details.get('keyPattern') or details.get('keyValue')
+            if key_pattern:
+                return next(iter(key_pattern))
+        match = re.search(r'index: (\w+?)_-?1\b', str(error))
+        return match.group(1) if match else None
+
+    @staticmethod
+    def find_by_identifier(identifier: str, only: Optional[Iterable[str]] = None, raw: bool = False):
         """
         Trouve un utilisateur par nom d'utilisateur ou email.
 
+        Les noms d'utilisateur ne peuvent pas contenir '@' : la forme de l'identifiant suffit
+        à choisir une requête d'égalité sur un seul index plutôt qu'un $or sur les deux.
+
         :param identifier: Le nom d'utilisateur ou l'email.
-        :return: Un objet User ou None.
+        :param only: Champs à projeter (tous par défaut).
+        :param raw: Renvoie le document brut (dict pymongo) sans hydrater de Document.
+        :return: Un objet User, un dict (raw=True) ou None.
         """
-        return User.objects(Q(username=identifier) | Q(email=identifier)).first()
+        field = 'email' if '@' in identifier else 'username'
+        queryset = User.objects(**{field: identifier})
+        if only:
+            queryset = queryset.only(*only)
+        if raw:
+            queryset = queryset.as_pymongo()
+        return queryset.first()
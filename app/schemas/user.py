@@ -1,13 +1,21 @@
 # app/schemas/user.py
 
+import re
+
 from marshmallow import Schema, fields, validate
 
+# Expressions compilées une seule fois au chargement du module
+USERNAME_REGEX = re.compile(r'^[a-zA-Z0-9_]+$')
+PASSWORD_REGEX = re.compile(r'^(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*#?&]).{8,}$')
+CODE_REGEX = re.compile(r'^\d{6}$')
+PASSWORD_ERROR = 'Le mot de passe doit contenir au moins 8 caractères, dont des lettres, des chiffres et des caractères spéciaux.'
+
 class RegisterSchema(Schema):
     username = fields.Str(
         required=True,
         validate=[
             validate.Length(min=3, max=50, error='Le nom d\'utilisateur doit contenir entre 3 et 50 caractères.'),
-            validate.Regexp('^[a-zA-Z0-9_]+$', error='Le nom d\'utilisateur ne peut contenir que des lettres, des chiffres et des underscores.')
+            validate.Regexp(USERNAME_REGEX, error='Le nom d\'utilisateur ne peut contenir que des lettres, des chiffres et des underscores.')
         ]
     )
     email = fields.Email(required=True)
@@ -16,10 +24,7 @@ class RegisterSchema(Schema):
         load_only=True,
         validate=[
             validate.Length(min=8),
-            validate.Regexp(
-                '^(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*#?&]).{8,}$',
-                error='Le mot de passe doit contenir au moins 8 caractères, dont des lettres, des chiffres et des caractères spéciaux.'
-            )
+            validate.Regexp(PASSWORD_REGEX, error=PASSWORD_ERROR)
         ]
     )
 
@@ -37,10 +42,7 @@ class ResetPasswordSchema(Schema):
         load_only=True,
         validate=[
             validate.Length(min=8),
-            validate.Regexp(
-                '^(?=.*[A-Za-z])(?=.*\d)(?=.*[@$!%*#?&]).{8,}$',
-                error='Le mot de passe doit contenir au moins 8 caractères, dont des lettres, des chiffres et des caractères spéciaux.'
-            )
+            validate.Regexp(PASSWORD_REGEX, error=PASSWORD_ERROR)
         ]
     )
 
@@ -53,6 +55,23 @@ class VerifyOneTimeCodeSchema(Schema):
         required=True,
         validate=[
             validate.Length(equal=6, error="Le code doit contenir exactement 6 chiffres."),
-            validate.Regexp('^\d{6}$', error="Le code doit contenir uniquement des chiffres.")
+            validate.Regexp(CODE_REGEX, error="Le code doit contenir uniquement des chiffres.")
         ]
     )
+
+class IntrospectSchema(Schema):
+    tokens = fields.List(
+        fields.Str(),
+        required=True,
+        validate=validate.Length(min=1, error="Au moins un token est requis.")
+    )
+
+# Instances partagées : marshmallow copie les champs déclarés à chaque instanciation,
+# les schémas sont donc construits une fois et réutilisés (load() ne modifie pas l'instance).
+register_schema = RegisterSchema()
+login_schema = LoginSchema()
+request_password_reset_schema = RequestPasswordResetSchema()
+reset_password_schema = ResetPasswordSchema()
+request_one_time_code_schema = RequestOneTimeCodeSchema()
+verify_one_time_code_schema = VerifyOneTimeCodeSchema()
+introspect_schema = IntrospectSchema()
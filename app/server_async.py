@@ -0,0 +1,5 @@
+# app/server_async.py
+
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,417 @@
+# app/services/hashing.py
+
+import os
+import math
+import asyncio
+import time
+import statistics
+import threading
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import bcrypt
+from werkzeug.exceptions import ServiceUnavailable
+
+from app.services.metrics import timed
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi est optionnel
+    argon2 = None
+
+
+class HashingUnavailable(ServiceUnavailable):
+    """
+    Le moteur de hachage ne peut pas traiter la demande (file pleine ou délai dépassé).
+    Hérite de ServiceUnavailable pour être rendue en 503 par le gestionnaire d'erreurs HTTP.
+    """
+    description = 'Service temporairement indisponible.'
+
+
+class HashingQueueFull(HashingUnavailable):
+    """
+    La file d'attente du moteur de hachage est pleine.
+    """
+
+
+class HashingTimeout(HashingUnavailable):
+    """
+    Le calcul du hachage a dépassé le délai autorisé.
+    """
+
+
+def _timed(func: Callable, *args) -> Tuple[Any, float]:
+    """
+    Exécute func dans le worker et renvoie (résultat, durée d'exécution).
+    Fonction de module pour rester sérialisable par le pool de processus.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def _bcrypt_hash(password: bytes, rounds: int, prefix: bytes) -> str:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds, prefix=prefix)).decode('utf-8')
+
+
+def _bcrypt_check(pw_hash: bytes, password: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, pw_hash)
+    except ValueError:
+        # Hachage stocké invalide (sel mal formé)
+        return False
+
+
+def _argon2_hash(password: str, time_cost: int, memory_cost: int, parallelism: int) -> str:
+    hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    return hasher.hash(password)
+
+
+def _argon2_check(pw_hash: str, password: str) -> bool:
+    try:
+        return argon2.PasswordHasher().verify(pw_hash, password)
+    except argon2.exceptions.VerificationError:
+        return False
+    except argon2.exceptions.InvalidHashError:
+        return False
+
+
+def identify_hash(pw_hash: str) -> Dict[str, Any]:
+    """
+    Extrait le schéma et les paramètres de coût d'un hachage stocké.
+
+    :param pw_hash: Le hachage stocké.
+    :return: Un dictionnaire contenant au moins la clé 'scheme'.
+    """
+    if pw_hash.startswith(('$2a$', '$2b$', '$2y$')) and len(pw_hash) >= 7:
+        try:
+            return {'scheme': 'bcrypt', 'rounds': int(pw_hash[4:6])}
+        except ValueError:
+            return {'scheme': 'unknown'}
+    if pw_hash.startswith('$argon2id$'):
+        # Format : $argon2id$v=19$m=65536,t=3,p=4$sel$hachage
+        try:
+            params = dict(item.split('=') for item in pw_hash.split('$')[3].split(','))
+            return {
+                'scheme': 'argon2id',
+                'time_cost': int(params['t']),
+                'memory_cost': int(params['m']),
+                'parallelism': int(params['p']),
+            }
+        except (IndexError, KeyError, ValueError):
+            return {'scheme': 'unknown'}
+    return {'scheme': 'unknown'}
+
+
+def describe_params(params: Dict[str, Any]) -> str:
+    """
+    Représentation compacte des paramètres d'un hachage (ex. 'bcrypt$12').
+    """
+    if params['scheme'] == 'bcrypt':
+        return f"bcrypt${params['rounds']}"
+    if params['scheme'] == 'argon2id':
+        return f"argon2id$m={params['memory_cost']},t={params['time_cost']},p={params['parallelism']}"
+    return params['scheme']
+
+
+class HashingEngine:
+    """
+    Exécute les calculs bcrypt dans un pool dédié (threads ou processus)
+    avec une profondeur de file bornée, un délai par appel et des statistiques.
+
+    bcrypt libère le GIL pendant le calcul : le mode 'thread' suffit à répartir
+    la charge sur plusieurs cœurs ; le mode 'process' isole complètement le CPU.
+
+    Le moteur porte aussi la politique de hachage courante (schéma et coût),
+    éventuellement calibrée au démarrage pour viser une latence donnée.
+    """
+
+    def __init__(self, app=None):
+        self.mode = 'thread'
+        self.max_workers = os.cpu_count() or 1
+        self.max_queue = 64
+        self.timeout = 5.0
+        self.scheme = 'bcrypt'
+        self.rounds = 12
+        self.min_rounds = 10
+        self.max_rounds = 16
+        self.prefix = b'2b'
+        self.argon2_params = {'time_cost': 3, 'memory_cost': 65536, 'parallelism': 1}
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Configure le moteur à partir de la configuration de l'application.
+        """
+        mode = app.config.get('HASHING_EXECUTOR', 'thread')
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"HASHING_EXECUTOR invalide : {mode}")
+        self.shutdown()
+        self.mode = mode
+        self.max_workers = int(app.config.get('HASHING_WORKERS') or os.cpu_count() or 1)
+        self.max_queue = int(app.config.get('HASHING_MAX_QUEUE', 64))
+        self.timeout = float(app.config.get('HASHING_TIMEOUT', 5.0))
+        self.rounds = int(app.config.get('BCRYPT_LOG_ROUNDS', 12))
+        self.min_rounds = int(app.config.get('BCRYPT_MIN_ROUNDS', 10))
+        self.max_rounds = int(app.config.get('BCRYPT_MAX_ROUNDS', 16))
+        self.prefix = app.config.get('BCRYPT_HASH_PREFIX', '2b').encode('utf-8')
+
+        scheme = app.config.get('PASSWORD_HASH_SCHEME', 'bcrypt')
+        if scheme not in ('bcrypt', 'argon2id'):
+            raise ValueError(f"PASSWORD_HASH_SCHEME invalide : {scheme}")
+        if scheme == 'argon2id' and argon2 is None:
+            raise RuntimeError("PASSWORD_HASH_SCHEME='argon2id' nécessite le paquet argon2-cffi.")
+        self.scheme = scheme
+        self.argon2_params = {
+            'time_cost': int(app.config.get('ARGON2_TIME_COST', 3)),
+            'memory_cost': int(app.config.get('ARGON2_MEMORY_COST', 65536)),
+            'parallelism': int(app.config.get('ARGON2_PARALLELISM', 1)),
+        }
+
+        target_ms = app.config.get('PASSWORD_HASH_TARGET_MS')
+        if target_ms:
+            self.calibrate(float(target_ms))
+            app.logger.info(f'Politique de hachage calibrée : {describe_params(self.policy())}')
+        app.extensions['hashing'] = self
+
+    def _reset_stats(self) -> None:
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'in_flight': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'run_time_total': 0.0,
+            'run_time_max': 0.0,
+        }
+
+    def _get_executor(self):
+        # Le pool est créé à la demande et recréé après un fork (workers gunicorn)
+        pid = os.getpid()
+        if self._executor is None or self._executor_pid != pid:
+            with self._lock:
+                if self._executor is None or self._executor_pid != pid:
+                    if self.mode == 'process':
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context('spawn')
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers,
+                            thread_name_prefix='hashing'
+                        )
+                    self._executor_pid = pid
+                    self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+                    self._reset_stats()
+        return self._executor
+
+    def shutdown(self) -> None:
+        """
+        Arrête le pool courant (s'il appartient à ce processus).
+        """
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._executor_pid = None
+
+    def _start(self, func: Callable, *args) -> Tuple[Future, float]:
+        executor = self._get_executor()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashingQueueFull()
+
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['in_flight'] += 1
+
+        def _done(_future):
+            with self._lock:
+                self._stats['in_flight'] -= 1
+            slots.release()
+
+        future = executor.submit(_timed, func, *args)
+        future.add_done_callback(_done)
+        return future, submitted_at
+
+    def _timed_out(self, future: Future) -> None:
+        future.cancel()
+        with self._lock:
+            self._stats['timeouts'] += 1
+        raise HashingTimeout()
+
+    def _finish(self, submitted_at: float, run_time: float) -> None:
+        wait_time = max(0.0, time.perf_counter() - submitted_at - run_time)
+        with self._lock:
+            stats = self._stats
+            stats['completed'] += 1
+            stats['wait_time_total'] += wait_time
+            stats['wait_time_max'] = max(stats['wait_time_max'], wait_time)
+            stats['run_time_total'] += run_time
+            stats['run_time_max'] = max(stats['run_time_max'], run_time)
+
+    def _submit(self, func: Callable, *args) -> Any:
+        future, submitted_at = self._start(func, *args)
+        try:
+            result, run_time = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._timed_out(future)
+        self._finish(submitted_at, run_time)
+        return result
+
+    async def _submit_async(self, func: Callable, *args) -> Any:
+        # Le calcul reste dans le pool : la boucle d'événements n'est jamais bloquée
+        future, submitted_at = self._start(func, *args)
+        try:
+            result, run_time = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out(future)
+        self._finish(submitted_at, run_time)
+        return result
+
+    def _hash_call(self, password: str, rounds: Optional[int]) -> Tuple[Callable, tuple]:
+        if self.scheme == 'argon2id':
+            params = self.argon2_params
+            return _argon2_hash, (password, params['time_cost'], params['memory_cost'], params['parallelism'])
+        return _bcrypt_hash, (password.encode('utf-8'), rounds or self.rounds, self.prefix)
+
+    def _check_call(self, pw_hash: str, password: str) -> Optional[Tuple[Callable, tuple]]:
+        if pw_hash.startswith('$argon2'):
+            if argon2 is None:
+                return None
+            return _argon2_check, (pw_hash, password)
+        return _bcrypt_check, (pw_hash.encode('utf-8'), password.encode('utf-8'))
+
+    def generate_password_hash(self, password: str, rounds: Optional[int] = None) -> str:
+        """
+        Calcule le hachage du mot de passe dans le pool selon la politique courante.
+
+        :param password: Le mot de passe en clair.
+        :param rounds: Facteur de coût bcrypt (par défaut celui de la politique).
+        :return: Le hachage encodé en chaîne.
+        """
+        func, args = self._hash_call(password, rounds)
+        with timed('hashing', 'hash'):
+            return self._submit(func, *args)
+
+    def check_password_hash(self, pw_hash: str, password: str) -> bool:
+        """
+        Vérifie le mot de passe contre le hachage dans le pool.
+        Le schéma est déduit du hachage stocké, quelle que soit la politique courante.
+
+        :param pw_hash: Le hachage stocké.
+        :param password: Le mot de passe en clair.
+        :return: True si le mot de passe correspond.
+        """
+        call = self._check_call(pw_hash, password)
+        if call is None:
+            return False
+        with timed('hashing', 'check'):
+            return self._submit(call[0], *call[1])
+
+    async def generate_password_hash_async(self, password: str, rounds: Optional[int] = None) -> str:
+        """
+        Variante asynchrone de generate_password_hash, à attendre depuis une boucle asyncio.
+        """
+        func, args = self._hash_call(password, rounds)
+        with timed('hashing', 'hash'):
+            return await self._submit_async(func, *args)
+
+    async def check_password_hash_async(self, pw_hash: str, password: str) -> bool:
+        """
+        Variante asynchrone de check_password_hash, à attendre depuis une boucle asyncio.
+        """
+        call = self._check_call(pw_hash, password)
+        if call is None:
+            return False
+        with timed('hashing', 'check'):
+            return await self._submit_async(call[0], *call[1])
+
+    def hash_task(self, password: str, rounds: Optional[int] = None) -> Tuple[Callable, tuple]:
+        """
+        Renvoie la fonction de hachage de la politique courante et ses arguments (sérialisables),
+        pour un calcul hors du pool du moteur, par exemple dans le pool dédié d'un import en masse.
+        """
+        return self._hash_call(password, rounds)
+
+    def policy(self) -> Dict[str, Any]:
+        """
+        Renvoie les paramètres de la politique de hachage courante.
+        """
+        if self.scheme == 'argon2id':
+            return {'scheme': 'argon2id', **self.argon2_params}
+        return {'scheme': 'bcrypt', 'rounds': self.rounds}
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        """
+        Indique si un hachage stocké diffère de la politique courante.
+
+        Pour bcrypt, une tolérance d'un cran est appliquée à la baisse : deux nœuds
+        calibrés à un cran d'écart ne se renvoient pas indéfiniment le même compte.
+
+        :param pw_hash: Le hachage stocké.
+        :return: True si le mot de passe doit être rehaché.
+        """
+        params = identify_hash(pw_hash)
+        if params['scheme'] != self.scheme:
+            return True
+        if self.scheme == 'bcrypt':
+            return params['rounds'] < self.rounds or params['rounds'] > self.rounds + 1
+        return params != self.policy()
+
+    def calibrate(self, target_ms: float, samples: int = 3) -> Dict[str, Any]:
+        """
+        Choisit le facteur de coût qui s'approche le plus de la latence visée sur
+        la machine courante. Le calcul est fait directement, hors du pool.
+
+        :param target_ms: Latence visée par hachage, en millisecondes.
+        :param samples: Nombre de mesures (la médiane est retenue).
+        :return: La politique retenue.
+        """
+        target = target_ms / 1000.0
+        if self.scheme == 'argon2id':
+            params = dict(self.argon2_params, time_cost=1)
+            elapsed = statistics.median(
+                _timed(_argon2_hash, 'calibration', *params.values())[1] for _ in range(samples)
+            )
+            # Le temps de calcul d'argon2 croît linéairement avec time_cost
+            self.argon2_params['time_cost'] = max(1, round(target / elapsed))
+        else:
+            base = min(8, self.min_rounds)
+            elapsed = statistics.median(
+                _timed(_bcrypt_hash, b'calibration', base, self.prefix)[1] for _ in range(samples)
+            )
+            # Chaque cran supplémentaire double le temps de calcul de bcrypt
+            rounds = base + round(math.log2(target / elapsed))
+            self.rounds = min(self.max_rounds, max(self.min_rounds, rounds))
+        return self.policy()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie un instantané des statistiques de file et de latence.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed']
+        stats.update({
+            'mode': self.mode,
+            'workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'queue_depth': max(0, stats['in_flight'] - self.max_workers),
+            'wait_time_avg': stats['wait_time_total'] / completed if completed else 0.0,
+            'run_time_avg': stats['run_time_total'] / completed if completed else 0.0,
+        })
+        return stats
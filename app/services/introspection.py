@@ -0,0 +1,183 @@
+# app/services/introspection.py
+
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import jwt as pyjwt
+from flask_jwt_extended.exceptions import JWTExtendedException
+
+from app.services.revocation import pending_revocations, resolve_revocations
+
+# Résultat de vérification d'un token : (claims, None) ou (None, erreur)
+Verification = Tuple[Optional[Dict[str, Any]], Optional[str]]
+
+
+class VerificationCache:
+    """
+    Cache local (par worker) des vérifications de signature, indexé par empreinte SHA-256 du token.
+
+    Seule la vérification (signature, expiration, claims) est mise en cache : l'état de révocation
+    est toujours résolu par le cache de révocation, invalidé par pub/sub.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def token_hash(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[Verification]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                verification, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return verification
+                del self._entries[key]
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key: bytes, verification: Verification) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        claims = verification[0]
+        if claims is not None and 'exp' in claims:
+            # Un token valide n'est jamais servi depuis le cache après son expiration
+            expires_at = min(expires_at, float(claims['exp']))
+        with self._lock:
+            self._entries[key] = (verification, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+class TokenIntrospector:
+    """
+    Introspection groupée de tokens pour les passerelles d'API.
+
+    Les signatures sont vérifiées (ou lues dans le cache de vérification), puis l'état
+    de révocation de tous les tokens valides est résolu par le cache local et un seul MGET Redis.
+
+    :param decode: Fonction de décodage d'un token (flask_jwt_extended ou mode asynchrone).
+    """
+
+    def __init__(self, decode: Callable[[str], Dict[str, Any]], max_batch: int = 100,
+                 cache_size: int = 10000, cache_ttl: float = 30.0, api_keys: Optional[List[str]] = None):
+        self.decode = decode
+        self.max_batch = max_batch
+        self.cache = VerificationCache(cache_size, cache_ttl)
+        self.api_keys = [key.encode() for key in (api_keys or [])]
+
+    @classmethod
+    def from_app(cls, app, decode: Callable[[str], Dict[str, Any]]) -> 'TokenIntrospector':
+        """
+        Construit le service à partir de la configuration de l'application.
+        """
+        api_keys = app.config.get('INTROSPECTION_API_KEYS') or ''
+        return cls(
+            decode,
+            max_batch=int(app.config.get('INTROSPECTION_MAX_BATCH', 100)),
+            cache_size=int(app.config.get('INTROSPECTION_CACHE_SIZE', 10000)),
+            cache_ttl=float(app.config.get('INTROSPECTION_CACHE_TTL', 30.0)),
+            api_keys=[key.strip() for key in api_keys.split(',') if key.strip()]
+        )
+
+    def authorize(self, auth_header: Optional[str]) -> bool:
+        """
+        Vérifie la clé d'API de la passerelle (en-tête `Authorization: Bearer <clé>`).
+        """
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return False
+        candidate = auth_header[len('Bearer '):].encode()
+        # Comparaison à temps constant avec chaque clé configurée
+        return any([hmac.compare_digest(candidate, key) for key in self.api_keys])
+
+    def verify(self, token: str) -> Verification:
+        key = self.cache.token_hash(token)
+        verification = self.cache.get(key)
+        if verification is None:
+            try:
+                verification = (self.decode(token), None)
+            except pyjwt.ExpiredSignatureError:
+                verification = (None, 'expired')
+            except (pyjwt.InvalidTokenError, JWTExtendedException):
+                verification = (None, 'invalid')
+            self.cache.set(key, verification)
+        return verification
+
+    # -- Introspection -----------------------------------------------------
+
+    def _validate(self, tokens: List[str]) -> Optional[Tuple[Dict[str, Any], int]]:
+        if len(tokens) > self.max_batch:
+            return {'errors': f'Au plus {self.max_batch} tokens par requête.'}, 400
+        return None
+
+    def _prepare(self, app, tokens: List[str]):
+        verifications = [self.verify(token) for token in tokens]
+        payloads = [claims for claims, _ in verifications if claims is not None]
+        states, reads = pending_revocations(app, payloads)
+        return verifications, payloads, states, reads
+
+    @staticmethod
+    def _results(app, verifications: List[Verification], payloads, states, reads, values) -> Dict[str, Any]:
+        revoked = iter(resolve_revocations(app, payloads, states, reads, values))
+        results = []
+        for claims, error in verifications:
+            if claims is None:
+                results.append({'active': False, 'error': error})
+            elif next(revoked):
+                results.append({'active': False, 'error': 'revoked'})
+            else:
+                results.append({'active': True, **claims})
+        return {'results': results}
+
+    def introspect(self, app, tokens: List[str]) -> Tuple[Dict[str, Any], int]:
+        """
+        Renvoie, dans l'ordre des tokens reçus, leur état (`active`) et leurs claims ou le motif du refus.
+        """
+        error = self._validate(tokens)
+        if error:
+            return error
+        verifications, payloads, states, reads = self._prepare(app, tokens)
+        try:
+            # Toutes les lectures en un seul aller-retour
+            values = app.session_store.fetch_revocations(reads)
+        except Exception as e:
+            app.logger.error(f'Erreur lors de la vérification des tokens: {e}')
+            return {'errors': 'État de révocation indisponible.'}, 503
+        return self._results(app, verifications, payloads, states, reads, values), 200
+
+    async def introspect_async(self, app, tokens: List[str]) -> Tuple[Dict[str, Any], int]:
+        """
+        Variante asynchrone de introspect pour un client redis.asyncio.
+        """
+        error = self._validate(tokens)
+        if error:
+            return error
+        verifications, payloads, states, reads = self._prepare(app, tokens)
+        try:
+            values = await app.session_store.fetch_revocations(reads)
+        except Exception as e:
+            app.logger.error(f'Erreur lors de la vérification des tokens: {e}')
+            return {'errors': 'État de révocation indisponible.'}, 503
+        return self._results(app, verifications, payloads, states, reads, values), 200
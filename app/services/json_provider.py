@@ -0,0 +1,75 @@
+# app/services/json_provider.py
+
+"""
+Fournisseur JSON basé sur orjson pour Flask et Quart : décodage des corps de requête
+et encodage des réponses (jsonify et dicts renvoyés par les vues).
+"""
+
+import decimal
+from datetime import date
+from typing import Any, Union
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le fournisseur par défaut
+    orjson = None
+
+
+def _default(o: Any) -> Any:
+    """
+    Types non gérés nativement par orjson (les UUID et dataclasses le sont),
+    sérialisés comme le fournisseur par défaut de Flask.
+    """
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Même comportement que DefaultJSONProvider (tri des clés, dates HTTP, indentation en debug),
+    avec l'encodage et le décodage d'orjson ; les réponses sont écrites directement en octets.
+    """
+
+    def _options(self, **kwargs: Any) -> int:
+        # Dates transmises à _default pour conserver le format HTTP de Flask
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=self._options(**kwargs))
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        # orjson.JSONDecodeError hérite de ValueError : les erreurs de requête restent des 400
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent) + b'\n', mimetype=self.mimetype
+        )
+
+
+def init_json_provider(app) -> None:
+    """
+    Installe le fournisseur orjson si le paquet est disponible.
+    """
+    if orjson is None:
+        app.logger.info("orjson non installé : fournisseur JSON par défaut.")
+        return
+    app.json = OrjsonProvider(app)
@@ -0,0 +1,304 @@
+# app/services/keyring.py
+
+"""
+Trousseau de clés de signature asymétriques des tokens JWT (EdDSA ou RS256).
+
+Les clés sont conservées dans la collection MongoDB `signing_keys` (clé privée chiffrée
+par JWT_KEY_PASSPHRASE) et partagées par tous les workers. Chaque token porte le `kid`
+de sa clé ; les services consommateurs vérifient localement avec /.well-known/jwks.json.
+
+Cycle de vie d'une clé lors d'une rotation :
+- publiée dans le JWKS `publish_delay` secondes avant de signer, pour que les caches
+  des consommateurs (et les trousseaux des autres workers) la connaissent déjà ;
+- clé de signature tant qu'aucune clé plus récente n'est active ;
+- conservée pour la vérification jusqu'à expiration des derniers tokens qu'elle a signés,
+  puis retirée du JWKS (et supprimée par `flask keys prune`).
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+import jwt as pyjwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
+
+ASYMMETRIC_ALGORITHMS = ('EdDSA', 'RS256')
+COLLECTION = 'signing_keys'
+
+# Membres requis de l'empreinte JWK (RFC 7638), par type de clé
+_THUMBPRINT_MEMBERS = {'OKP': ('crv', 'kty', 'x'), 'RSA': ('e', 'kty', 'n')}
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    algorithm: str
+    private_key: Any
+    public_key: Any
+    public_jwk: Dict[str, str]
+    created_at: float
+    activates_at: float
+    expires_at: Optional[float] = None
+
+    def is_valid(self, now: float) -> bool:
+        return self.expires_at is None or self.expires_at > now
+
+
+def generate_private_key(algorithm: str, rsa_key_size: int = 2048):
+    if algorithm == 'EdDSA':
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == 'RS256':
+        return rsa.generate_private_key(public_exponent=65537, key_size=rsa_key_size)
+    raise ValueError(f"Algorithme de signature invalide : {algorithm}")
+
+
+def public_jwk(algorithm: str, public_key) -> Dict[str, str]:
+    """
+    Représentation JWK de la clé publique, avec son `kid` (empreinte RFC 7638).
+    """
+    serializer = OKPAlgorithm if algorithm == 'EdDSA' else RSAAlgorithm
+    jwk = serializer.to_jwk(public_key, as_dict=True)
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk['kty']]}
+    digest = hashlib.sha256(json.dumps(members, separators=(',', ':'), sort_keys=True).encode()).digest()
+    jwk.update({
+        'kid': base64.urlsafe_b64encode(digest).rstrip(b'=').decode(),
+        'alg': algorithm,
+        'use': 'sig',
+    })
+    return jwk
+
+
+class Keyring:
+    """
+    Clés de signature chargées depuis MongoDB et rafraîchies toutes les `refresh_interval` secondes.
+
+    :param collection: Collection pymongo synchrone des clés.
+    :param max_token_ttl: Durée de vie maximale d'un token : une clé remplacée reste
+        publiée et acceptée pendant cette durée après l'activation de la suivante.
+    :param auto_refresh: Rafraîchissement à la demande lors des accès (désactivé en mode ASGI,
+        où il est fait par une tâche de fond pour ne pas bloquer la boucle d'événements).
+    """
+
+    def __init__(self, collection, algorithm: str = 'EdDSA', passphrase: Optional[str] = None,
+                 publish_delay: float = 360.0, refresh_interval: float = 60.0, max_token_ttl: float = 86400.0,
+                 rsa_key_size: int = 2048, auto_refresh: bool = True):
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Algorithme de signature invalide : {algorithm}")
+        self.collection = collection
+        self.algorithm = algorithm
+        self.passphrase = passphrase.encode() if passphrase else None
+        self.publish_delay = publish_delay
+        self.refresh_interval = refresh_interval
+        self.max_token_ttl = max_token_ttl
+        self.rsa_key_size = rsa_key_size
+        self.auto_refresh = auto_refresh
+        self._keys: Dict[str, SigningKey] = {}
+        self._loaded_at = 0.0
+        self._forced_at = 0.0
+        self._jwks: Optional[Tuple[bytes, str]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app, collection=None, auto_refresh: bool = True) -> 'Keyring':
+        """
+        Construit le trousseau à partir de la configuration de l'application.
+
+        :param collection: Collection des clés (par défaut celle de la base mongoengine).
+        """
+        if collection is None:
+            from mongoengine.connection import get_db
+            collection = get_db()[COLLECTION]
+        config = app.config
+        max_token_ttl = max(config['JWT_ACCESS_TOKEN_EXPIRES'], config['JWT_REFRESH_TOKEN_EXPIRES']).total_seconds()
+        return cls(
+            collection,
+            algorithm=config['JWT_ALGORITHM'],
+            passphrase=config.get('JWT_KEY_PASSPHRASE') or config['SECRET_KEY'],
+            publish_delay=float(config.get('JWKS_MAX_AGE', 300)) + float(config.get('JWT_KEYRING_REFRESH', 60)),
+            refresh_interval=float(config.get('JWT_KEYRING_REFRESH', 60)),
+            max_token_ttl=max_token_ttl + float(config.get('JWT_DECODE_LEEWAY', 0)),
+            rsa_key_size=int(config.get('JWT_RSA_KEY_SIZE', 2048)),
+            auto_refresh=auto_refresh
+        )
+
+    # -- Chargement --------------------------------------------------------
+
+    def _deserialize(self, document: Dict[str, Any]) -> SigningKey:
+        private_key = serialization.load_pem_private_key(document['private_key'].encode(), password=self.passphrase)
+        public_key = private_key.public_key()
+        return SigningKey(
+            kid=document['_id'],
+            algorithm=document['algorithm'],
+            private_key=private_key,
+            public_key=public_key,
+            public_jwk=public_jwk(document['algorithm'], public_key),
+            created_at=document['created_at'],
+            activates_at=document['activates_at'],
+            expires_at=document.get('expires_at')
+        )
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Recharge les clés non expirées. Seules les nouvelles clés sont déchiffrées.
+        """
+        now = time.time()
+        if not force and now - self._loaded_at < self.refresh_interval:
+            return
+        with self._lock:
+            if not force and now - self._loaded_at < self.refresh_interval:
+                return
+            keys = {}
+            query = {'$or': [{'expires_at': None}, {'expires_at': {'$gt': now}}]}
+            for document in self.collection.find(query):
+                known = self._keys.get(document['_id'])
+                if known is not None:
+                    keys[known.kid] = replace(known, expires_at=document.get('expires_at'))
+                else:
+                    keys[document['_id']] = self._deserialize(document)
+            if keys != self._keys:
+                self._jwks = None
+            self._keys = keys
+            self._loaded_at = now
+
+    def _maybe_refresh(self) -> None:
+        if self.auto_refresh:
+            self.refresh()
+
+    # -- Signature et vérification -----------------------------------------
+
+    def keys(self) -> List[SigningKey]:
+        now = time.time()
+        return sorted((k for k in self._keys.values() if k.is_valid(now)), key=lambda k: k.activates_at)
+
+    def signing_key(self) -> SigningKey:
+        """
+        Clé active la plus récente. Au premier usage d'un trousseau vide, une clé est créée.
+        """
+        self._maybe_refresh()
+        active = [k for k in self.keys() if k.activates_at <= time.time()]
+        if not active and self.auto_refresh:
+            self.ensure_key()
+            active = [k for k in self.keys() if k.activates_at <= time.time()]
+        if not active:
+            raise RuntimeError("Aucune clé de signature active : exécuter `flask keys rotate --immediate`.")
+        return active[-1]
+
+    def verification_key(self, kid: Optional[str], algorithm: Optional[str]):
+        """
+        Clé publique correspondant au `kid` d'un token.
+
+        Un `kid` inconnu déclenche au plus un rechargement par seconde (clé créée par un autre worker).
+
+        :raises jwt.InvalidTokenError: Si la clé est inconnue, expirée ou d'un autre algorithme.
+        """
+        self._maybe_refresh()
+        key = self._keys.get(kid) if kid else None
+        now = time.time()
+        if key is None and kid and self.auto_refresh and now - self._forced_at >= 1.0:
+            self._forced_at = now
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+        if key is None or not key.is_valid(now) or key.algorithm != algorithm:
+            raise pyjwt.InvalidTokenError('Clé de signature inconnue ou expirée.')
+        return key.public_key
+
+    def jwks(self) -> Tuple[bytes, str]:
+        """
+        Document JWKS sérialisé et son ETag, recalculés uniquement quand le jeu de clés change.
+        """
+        self._maybe_refresh()
+        if not self._keys and self.auto_refresh:
+            self.ensure_key()
+        cached = self._jwks
+        if cached is None:
+            body = json.dumps({'keys': [k.public_jwk for k in self.keys()]}, separators=(',', ':')).encode()
+            cached = self._jwks = (body, hashlib.sha256(body).hexdigest()[:32])
+        return cached
+
+    # -- Administration ----------------------------------------------------
+
+    def rotate(self, algorithm: Optional[str] = None, immediate: bool = False,
+               retire_previous: bool = True) -> SigningKey:
+        """
+        Crée une nouvelle clé, active après `publish_delay` secondes (ou immédiatement).
+
+        Les clés existantes restent acceptées `max_token_ttl` secondes après l'activation
+        de la nouvelle clé : aucun token en circulation n'est invalidé.
+
+        :param retire_previous: Fixe l'expiration des clés existantes (désactivé à l'amorçage,
+            où plusieurs workers peuvent créer une première clé simultanément).
+        """
+        algorithm = algorithm or self.algorithm
+        private_key = generate_private_key(algorithm, self.rsa_key_size)
+        jwk = public_jwk(algorithm, private_key.public_key())
+        encryption = (serialization.BestAvailableEncryption(self.passphrase) if self.passphrase
+                      else serialization.NoEncryption())
+        now = time.time()
+        activates_at = now if immediate else now + self.publish_delay
+        expires_at = activates_at + self.max_token_ttl
+        if retire_previous:
+            self.collection.update_many(
+                {'$or': [{'expires_at': None}, {'expires_at': {'$gt': expires_at}}]},
+                {'$set': {'expires_at': expires_at}}
+            )
+        self.collection.insert_one({
+            '_id': jwk['kid'],
+            'algorithm': algorithm,
+            'private_key': private_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption
+            ).decode(),
+            'created_at': now,
+            'activates_at': activates_at,
+            'expires_at': None,
+        })
+        logging.info(f"Nouvelle clé de signature {jwk['kid']} ({algorithm}), active à {activates_at:.0f}.")
+        self.refresh(force=True)
+        return self._keys[jwk['kid']]
+
+    def ensure_key(self) -> None:
+        """
+        Crée une première clé active si le trousseau n'en contient aucune.
+
+        Les clés créées en même temps par plusieurs workers restent toutes valides
+        jusqu'à la rotation suivante ; la plus récente signe.
+        """
+        self.refresh(force=True)
+        now = time.time()
+        if not any(k.activates_at <= now for k in self.keys()):
+            self.rotate(immediate=True, retire_previous=False)
+
+    def prune(self) -> int:
+        """
+        Supprime les clés expirées et renvoie leur nombre.
+        """
+        result = self.collection.delete_many({'expires_at': {'$ne': None, '$lte': time.time()}})
+        return result.deleted_count
+
+
+def decode_key(app, jwt_header: Dict[str, Any]):
+    """
+    Clé de vérification d'un token d'après son en-tête (Flask et Quart).
+
+    Sans trousseau (JWT_ALGORITHM='HS256'), ou pour un token HS256 sans `kid` lorsque
+    JWT_ACCEPT_HS256 est activé (migration), le secret partagé est utilisé.
+    """
+    if app.keyring is None:
+        return app.config['JWT_SECRET_KEY']
+    if jwt_header.get('alg') == 'HS256':
+        if 'kid' not in jwt_header and app.config.get('JWT_ACCEPT_HS256'):
+            return app.config['JWT_SECRET_KEY']
+        raise pyjwt.InvalidTokenError('Algorithme de signature refusé.')
+    return app.keyring.verification_key(jwt_header.get('kid'), jwt_header.get('alg'))
+
+
+def decode_algorithms(config) -> List[str]:
+    if config['JWT_ALGORITHM'] not in ASYMMETRIC_ALGORITHMS:
+        return [config['JWT_ALGORITHM']]
+    return list(ASYMMETRIC_ALGORITHMS) + (['HS256'] if config.get('JWT_ACCEPT_HS256') else [])
@@ -0,0 +1,241 @@
+# app/services/login_throttle.py
+
+"""
+Freinage des connexions par identifiant, contre le bourrage d'identifiants distribué
+(que la limite par IP de /user/login n'arrête pas).
+
+Chaque échec d'authentification est compté dans Redis, dans un hash de deux champs
+(`n` : échecs consécutifs, `u` : blocage jusqu'à, en secondes epoch) sous une clé dérivée
+de l'identifiant normalisé (condensat tronqué : ni donnée personnelle ni longueur arbitraire).
+Un échec sur un compte existant est compté sous son nom d'utilisateur et sous son email : alterner
+les deux formes ne double pas le nombre d'essais.
+Au-delà de `free_attempts` échecs, l'identifiant est bloqué pour un délai qui double à chaque
+nouvel échec, borné par `max_delay`. L'état expire `window` secondes après le dernier échec.
+
+La vérification a lieu avant la lecture de l'utilisateur et le contrôle du mot de passe :
+une tentative bloquée ne coûte ni requête MongoDB ni bcrypt. Les blocages lus dans Redis sont
+retenus localement (par worker) jusqu'à leur échéance, ce qui épargne aussi l'aller-retour Redis
+aux tentatives suivantes.
+
+Un identifiant bloqué l'est aussi pour son titulaire : le délai maximal borne ce déni de service.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.metrics import LOGIN_FAILURES, LOGIN_THROTTLED
+
+# KEYS : états de l'identifiant saisi et de ses alias (formes du même compte)
+# ARGV[1] : maintenant (s) ; ARGV[2] : échecs tolérés ; ARGV[3] : délai de base (s) ;
+# ARGV[4] : délai maximal (s) ; ARGV[5] : durée de rétention des échecs (s)
+# Renvoie le blocage le plus lointain parmi les clés
+RECORD_FAILURE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local result = 0
+for _, key in ipairs(KEYS) do
+    local failures = redis.call('HINCRBY', key, 'n', 1)
+    local excess = failures - tonumber(ARGV[2])
+    local blocked_until = 0
+    if excess > 0 then
+        local delay = math.min(tonumber(ARGV[3]) * 2 ^ (excess - 1), tonumber(ARGV[4]))
+        blocked_until = now + math.ceil(delay)
+        redis.call('HSET', key, 'u', blocked_until)
+    end
+    redis.call('EXPIRE', key, math.max(tonumber(ARGV[5]), blocked_until - now))
+    result = math.max(result, blocked_until)
+end
+return result
+"""
+
+
+class LoginThrottle:
+    """
+    Compteur d'échecs de connexion par identifiant avec attente exponentielle.
+
+    :param free_attempts: Échecs consécutifs tolérés avant le premier blocage.
+    :param base_delay: Durée du premier blocage, en secondes (doublée à chaque échec suivant).
+    :param max_delay: Durée maximale d'un blocage, en secondes.
+    :param window: Rétention des échecs après le dernier d'entre eux, en secondes.
+    :param local_size: Blocages retenus localement (0 pour toujours interroger Redis).
+    """
+
+    def __init__(self, redis_client, free_attempts: int = 5, base_delay: int = 1, max_delay: int = 900,
+                 window: int = 900, local_size: int = 10000, prefix: str = 'login_throttle'):
+        self.redis_client = redis_client
+        self.free_attempts = free_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window = window
+        self.local_size = local_size
+        self.prefix = prefix
+        self._blocked = OrderedDict()
+        self._lock = threading.Lock()
+        self._record = redis_client.register_script(RECORD_FAILURE_SCRIPT)
+
+    @staticmethod
+    def options_from_config(config) -> Dict[str, int]:
+        """
+        Paramètres du freinage, communs au compteur Redis et à sa variante en mémoire.
+        """
+        return {
+            'free_attempts': int(config.get('LOGIN_THROTTLE_FREE_ATTEMPTS', 5)),
+            'base_delay': int(config.get('LOGIN_THROTTLE_BASE_DELAY', 1)),
+            'max_delay': int(config.get('LOGIN_THROTTLE_MAX_DELAY', 900)),
+            'window': int(config.get('LOGIN_THROTTLE_WINDOW', 900)),
+            'local_size': int(config.get('LOGIN_THROTTLE_LOCAL_SIZE', 10000)),
+        }
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> Optional['LoginThrottle']:
+        """
+        Construit le freinage à partir de la configuration de l'application (None si désactivé).
+        """
+        if not app.config.get('LOGIN_THROTTLE_ENABLED', True):
+            return None
+        return cls(redis_client or app.redis_client, **cls.options_from_config(app.config))
+
+    def key(self, identifier: str) -> str:
+        digest = hashlib.sha256(identifier.strip().lower().encode()).hexdigest()[:32]
+        return f'{self.prefix}:{digest}'
+
+    def keys(self, identifier: str, aliases) -> list:
+        """
+        Clés de l'identifiant saisi puis de ses alias, sans doublon.
+        """
+        return list(dict.fromkeys(self.key(name) for name in (identifier, *aliases) if name))
+
+    def _local(self, key: str, now: float) -> int:
+        """
+        Délai restant d'un blocage retenu localement (0 si aucun).
+        """
+        with self._lock:
+            blocked_until = self._blocked.get(key)
+            if blocked_until is None:
+                return 0
+            if blocked_until <= now:
+                del self._blocked[key]
+                return 0
+        LOGIN_THROTTLED.labels('local').inc()
+        return math.ceil(blocked_until - now)
+
+    def _remember(self, keys, blocked_until: int, now: float) -> int:
+        """
+        Retient un blocage lu ou posé dans Redis et renvoie le délai restant (0 si expiré).
+        """
+        if blocked_until <= now:
+            return 0
+        if self.local_size > 0:
+            with self._lock:
+                for key in keys:
+                    self._blocked[key] = blocked_until
+                    self._blocked.move_to_end(key)
+                while len(self._blocked) > self.local_size:
+                    self._blocked.popitem(last=False)
+        return math.ceil(blocked_until - now)
+
+    def _checked(self, key: str, state, now: float, source: str = 'redis') -> Tuple[int, bool]:
+        failures, blocked_until = state
+        retry_after = self._remember([key], int(blocked_until or 0), now)
+        if retry_after:
+            LOGIN_THROTTLED.labels(source).inc()
+        return retry_after, bool(failures)
+
+    def _script_args(self, now: float) -> list:
+        return [int(now), self.free_attempts, self.base_delay, self.max_delay, self.window]
+
+    def check(self, identifier: str) -> Tuple[int, bool]:
+        """
+        Renvoie (délai d'attente en secondes, 0 si la tentative est permise ; échecs déjà comptés).
+        Une erreur Redis laisse passer la tentative.
+        """
+        key, now = self.key(identifier), time.time()
+        retry_after = self._local(key, now)
+        if retry_after:
+            return retry_after, True
+        try:
+            state = self.redis_client.hmget(key, ['n', 'u'])
+        except Exception as e:
+            logging.error(f'Erreur lors de la lecture du freinage des connexions: {e}')
+            return 0, False
+        return self._checked(key, state, now)
+
+    def record_failure(self, identifier: str, *aliases: str) -> int:
+        """
+        Compte un échec d'authentification ; renvoie le délai de blocage qui en résulte (0 si aucun).
+
+        :param aliases: Autres identifiants du compte visé, s'il existe (nom d'utilisateur et email).
+        """
+        keys, now = self.keys(identifier, aliases), time.time()
+        LOGIN_FAILURES.inc()
+        try:
+            blocked_until = self._record(keys=keys, args=self._script_args(now))
+        except Exception as e:
+            logging.error(f'Erreur lors de l\'enregistrement d\'un échec de connexion: {e}')
+            return 0
+        return self._remember(keys, int(blocked_until), now)
+
+    def _forget(self, keys) -> None:
+        with self._lock:
+            for key in keys:
+                self._blocked.pop(key, None)
+
+    def reset(self, identifier: str, *aliases: str) -> None:
+        """
+        Oublie les échecs d'un identifiant et de ses alias (connexion réussie ou déblocage manuel).
+        Les blocages retenus par les autres workers expirent d'eux-mêmes.
+        """
+        keys = self.keys(identifier, aliases)
+        self._forget(keys)
+        try:
+            self.redis_client.delete(*keys)
+        except Exception as e:
+            logging.error(f'Erreur lors de la réinitialisation du freinage des connexions: {e}')
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie le nombre d'identifiants bloqués retenus localement.
+        """
+        now = time.time()
+        with self._lock:
+            return {'blocked_keys': sum(1 for until in self._blocked.values() if until > now)}
+
+
+class AsyncLoginThrottle(LoginThrottle):
+    """
+    Variante de LoginThrottle pour un client redis.asyncio : même script, méthodes à attendre.
+    """
+
+    async def check(self, identifier: str) -> Tuple[int, bool]:
+        key, now = self.key(identifier), time.time()
+        retry_after = self._local(key, now)
+        if retry_after:
+            return retry_after, True
+        try:
+            state = await self.redis_client.hmget(key, ['n', 'u'])
+        except Exception as e:
+            logging.error(f'Erreur lors de la lecture du freinage des connexions: {e}')
+            return 0, False
+        return self._checked(key, state, now)
+
+    async def record_failure(self, identifier: str, *aliases: str) -> int:
+        keys, now = self.keys(identifier, aliases), time.time()
+        LOGIN_FAILURES.inc()
+        try:
+            blocked_until = await self._record(keys=keys, args=self._script_args(now))
+        except Exception as e:
+            logging.error(f'Erreur lors de l\'enregistrement d\'un échec de connexion: {e}')
+            return 0
+        return self._remember(keys, int(blocked_until), now)
+
+    async def reset(self, identifier: str, *aliases: str) -> None:
+        keys = self.keys(identifier, aliases)
+        self._forget(keys)
+        try:
+            await self.redis_client.delete(*keys)
+        except Exception as e:
+            logging.error(f'Erreur lors de la réinitialisation du freinage des connexions: {e}')
@@ -0,0 +1,245 @@
+# app/services/metrics.py
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+import redis
+import redis.asyncio
+import redis.client
+from flask import Response, g, request
+from pymongo import monitoring
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from app.services.tracing import dependency_span
+
+# Mode multiprocessus : les compteurs sans label ouvrent leur fichier dans PROMETHEUS_MULTIPROC_DIR dès leur
+# création ci-dessous. Le répertoire est donc créé à l'import, pour tout processus de l'image (worker d'emails,
+# commandes flask) et pas seulement par le hook on_starting de gunicorn
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Bornes adaptées aux latences d'un service d'authentification (de 0,5 ms à 5 s)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Durée de traitement des requêtes HTTP par route.',
+    ['method', 'endpoint', 'status'],
+    buckets=LATENCY_BUCKETS
+)
+DEPENDENCY_LATENCY = Histogram(
+    'dependency_duration_seconds',
+    'Durée des appels aux dépendances (mongo, redis, hashing, jwt) par opération.',
+    ['dependency', 'operation'],
+    buckets=LATENCY_BUCKETS
+)
+DEPENDENCY_ERRORS = Counter(
+    'dependency_errors_total',
+    'Appels aux dépendances terminés en erreur.',
+    ['dependency', 'operation']
+)
+RATELIMIT_REJECTIONS = Counter(
+    'ratelimit_rejections_total',
+    'Requêtes refusées par le limiteur de débit.',
+    ['endpoint']
+)
+RATELIMIT_DECISIONS = Counter(
+    'ratelimit_decisions_total',
+    'Décisions du limiteur hybride, prises localement ou après un aller-retour Redis.',
+    ['source', 'result']
+)
+LOGIN_FAILURES = Counter(
+    'login_failures_total',
+    'Échecs d\'authentification comptés par le freinage des connexions.'
+)
+ONE_TIME_CODE_VERIFICATIONS = Counter(
+    'one_time_code_verifications_total',
+    'Vérifications de codes à usage unique, tranchées localement, par le script Redis ou par le moteur de stockage.',
+    ['source', 'result']
+)
+USER_CACHE_REQUESTS = Counter(
+    'user_cache_requests_total',
+    'Recherches d\'utilisateurs par résultat : succès local ou Redis, lecture MongoDB, recherche regroupée.',
+    ['result']
+)
+LOGIN_THROTTLED = Counter(
+    'login_throttled_total',
+    'Tentatives de connexion refusées avant vérification du mot de passe, selon l\'origine du blocage.',
+    ['source']
+)
+SESSIONS_EVICTED = Counter(
+    'sessions_evicted_total',
+    'Sessions évincées (token de rafraîchissement révoqué) au-delà du maximum par utilisateur.'
+)
+
+
+@contextmanager
+def timed(dependency: str, operation: str) -> Iterator[None]:
+    """
+    Mesure la durée d'un appel à une dépendance et compte ses échecs ;
+    dans une trace échantillonnée, l'appel est aussi enregistré comme span.
+    """
+    span = dependency_span(dependency, operation)
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = e
+        DEPENDENCY_ERRORS.labels(dependency, operation).inc()
+        raise
+    finally:
+        DEPENDENCY_LATENCY.labels(dependency, operation).observe(time.perf_counter() - start)
+        if span is not None:
+            span.end(error)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Mesure chaque commande MongoDB (find, insert, update...) à partir des événements du driver.
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        DEPENDENCY_LATENCY.labels('mongo', event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        DEPENDENCY_LATENCY.labels('mongo', event.command_name).observe(event.duration_micros / 1e6)
+        DEPENDENCY_ERRORS.labels('mongo', event.command_name).inc()
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    """
+    Pipeline Redis mesuré : un seul aller-retour, enregistré sous l'opération PIPELINE.
+    """
+
+    def execute(self, raise_on_error: bool = True):
+        with timed('redis', 'PIPELINE'):
+            return super().execute(raise_on_error)
+
+
+class InstrumentedRedis(redis.Redis):
+    """
+    Client Redis qui mesure chaque commande (GET, MGET, EVALSHA...) et chaque pipeline.
+    """
+
+    def execute_command(self, *args, **options):
+        with timed('redis', str(args[0]).upper()):
+            return super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedAsyncPipeline(redis.asyncio.client.Pipeline):
+    """
+    Variante d'InstrumentedPipeline pour redis.asyncio.
+    """
+
+    async def execute(self, raise_on_error: bool = True):
+        with timed('redis', 'PIPELINE'):
+            return await super().execute(raise_on_error)
+
+
+class InstrumentedAsyncRedis(redis.asyncio.Redis):
+    """
+    Variante d'InstrumentedRedis pour redis.asyncio.
+    """
+
+    async def execute_command(self, *args, **options):
+        with timed('redis', str(args[0]).upper()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> InstrumentedAsyncPipeline:
+        return InstrumentedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def on_ratelimit_breach(request_limit) -> None:
+    """
+    Callback Flask-Limiter (RATELIMIT_ON_BREACH_CALLBACK) : compte les refus par route.
+    """
+    RATELIMIT_REJECTIONS.labels(request.endpoint or 'unmatched').inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Rend les métriques au format texte Prometheus et renvoie (contenu, type de contenu).
+
+    Sous gunicorn, PROMETHEUS_MULTIPROC_DIR désigne le répertoire partagé où chaque worker
+    écrit ses compteurs : les valeurs de tous les workers sont alors agrégées à la lecture.
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def metrics_view() -> Response:
+    """
+    Endpoint /metrics.
+    """
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+_mongo_listener = None
+
+
+def register_mongo_listener() -> None:
+    """
+    Enregistre l'écouteur de commandes MongoDB (une seule fois, avant la création des clients).
+    """
+    global _mongo_listener
+    if _mongo_listener is None:
+        _mongo_listener = MongoCommandListener()
+        monitoring.register(_mongo_listener)
+
+
+class Metrics:
+    """
+    Extension d'instrumentation : latence des requêtes par route, commandes MongoDB,
+    refus du limiteur et endpoint /metrics.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Installe les hooks de mesure et l'endpoint /metrics (si METRICS_ENABLED).
+        """
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+        register_mongo_listener()
+        app.config.setdefault('RATELIMIT_ON_BREACH_CALLBACK', on_ratelimit_breach)
+
+        @app.before_request
+        def start_timer():
+            g.request_start = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            start = g.pop('request_start', None)
+            if start is not None and request.endpoint != 'metrics':
+                REQUEST_LATENCY.labels(
+                    request.method, request.endpoint or 'unmatched', response.status_code
+                ).observe(time.perf_counter() - start)
+            return response
+
+        app.add_url_rule(app.config.get('METRICS_PATH', '/metrics'), 'metrics', metrics_view)
+        app.extensions['metrics'] = self
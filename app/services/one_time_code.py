@@ -0,0 +1,186 @@
+# app/services/one_time_code.py
+
+"""
+Codes à usage unique stockés dans Redis : un hash par email avec le condensat du code
+(HMAC keyé par SECRET_KEY, le code en clair n'est jamais stocké), l'identifiant de l'utilisateur
+résolu à l'émission et le nombre d'essais restants.
+
+La vérification est un seul script Lua (lecture, comparaison, décompte, consommation) : atomique,
+un aller-retour, et aucune requête MongoDB puisque l'identifiant est dans l'entrée.
+Une entrée absente, expirée ou épuisée est retenue localement (par worker) pendant `miss_ttl`
+secondes : les essais suivants sur le même email sont refusés sans appel à Redis.
+Chaque émission est annoncée sur un canal pub/sub : tous les workers oublient alors l'échec retenu
+pour cet email, et le nouveau code est vérifiable partout sans attendre `miss_ttl`.
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.metrics import ONE_TIME_CODE_VERIFICATIONS
+
+# Résultats de la vérification
+VALID = 'valid'
+INCORRECT = 'incorrect'
+EXPIRED = 'expired'
+
+# KEYS[1] : entrée du code ; ARGV[1] : condensat du code proposé
+# Renvoie {1, identifiant} si le code est bon (entrée consommée), {-1, essais restants} sinon,
+# {0} si l'entrée est absente ou expirée. L'entrée est supprimée au dernier essai manqué.
+VERIFY_SCRIPT = """
+local entry = redis.call('HMGET', KEYS[1], 'h', 'uid')
+if not entry[1] then
+    return {0}
+end
+if entry[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return {1, entry[2]}
+end
+local remaining = redis.call('HINCRBY', KEYS[1], 'a', -1)
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return {-1, remaining}
+"""
+
+
+class OneTimeCodeStore:
+    """
+    Émission et vérification des codes à usage unique.
+
+    :param secret: Clé du HMAC des codes (SECRET_KEY).
+    :param max_attempts: Essais permis par code émis.
+    :param miss_ttl: Durée de rétention locale d'une entrée absente ou épuisée (0 pour désactiver).
+    :param channel: Canal pub/sub des émissions, qui effacent les échecs retenus par les autres workers.
+    """
+
+    def __init__(self, redis_client, secret: str, expiration: int = 600, max_attempts: int = 5,
+                 miss_ttl: float = 5.0, max_size: int = 10000, channel: str = 'one_time_code_issues',
+                 prefix: str = 'one_time_code'):
+        self.redis_client = redis_client
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.expiration = expiration
+        self.max_attempts = max_attempts
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        self.channel = channel
+        self.prefix = prefix
+        self._misses = OrderedDict()
+        self._lock = threading.Lock()
+        self._verify = redis_client.register_script(VERIFY_SCRIPT)
+
+    @staticmethod
+    def options_from_config(config) -> dict:
+        """
+        Paramètres des codes, communs à tous les moteurs de stockage (hors clé du HMAC).
+        """
+        return {
+            'expiration': int(config.get('ONE_TIME_CODE_EXPIRATION', 600)),
+            'max_attempts': int(config.get('ONE_TIME_CODE_MAX_ATTEMPTS', 5)),
+            'miss_ttl': float(config.get('ONE_TIME_CODE_MISS_TTL', 5.0)),
+            'channel': config.get('ONE_TIME_CODE_CHANNEL', 'one_time_code_issues'),
+        }
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> 'OneTimeCodeStore':
+        """
+        Construit le stockage à partir de la configuration de l'application ; les émissions
+        des autres workers arrivent par le thread d'abonnement des révocations.
+        """
+        store = cls(redis_client or app.redis_client, app.config['SECRET_KEY'],
+                    **cls.options_from_config(app.config))
+        app.revocation_cache.subscribe(store.channel, store._handle_message)
+        return store
+
+    def key(self, email: str) -> str:
+        return f'{self.prefix}:{email}'
+
+    def digest(self, email: str, code: str) -> str:
+        # Lié à l'email : un condensat n'est valable que pour son entrée
+        return hmac.new(self.secret, f'{email}:{code}'.encode(), hashlib.sha256).hexdigest()[:32]
+
+    def _forget_miss(self, email: str) -> None:
+        with self._lock:
+            self._misses.pop(email, None)
+
+    def _fields(self, email: str, user_id: str, code: str) -> dict:
+        self._forget_miss(email)
+        return {'h': self.digest(email, code), 'uid': user_id, 'a': self.max_attempts}
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        # Code émis par un autre worker : l'échec retenu ici pour cet email n'est plus valable
+        self._forget_miss(message['data'])
+
+    def _missed(self, email: str) -> bool:
+        """
+        Indique si l'entrée de l'email est connue localement comme absente ou épuisée.
+        """
+        with self._lock:
+            until = self._misses.get(email)
+            if until is None:
+                return False
+            if until > time.monotonic():
+                return True
+            del self._misses[email]
+        return False
+
+    def _settle(self, email: str, result, source: str = 'redis') -> Tuple[str, Optional[str], int]:
+        # result : réponse du script de vérification, {1, identifiant}, {-1, essais restants} ou {0}
+        status = int(result[0])
+        if status == 1:
+            ONE_TIME_CODE_VERIFICATIONS.labels(source, VALID).inc()
+            return VALID, result[1], 0
+        remaining = int(result[1]) if status == -1 else 0
+        if remaining <= 0 and self.miss_ttl > 0:
+            with self._lock:
+                self._misses[email] = time.monotonic() + self.miss_ttl
+                self._misses.move_to_end(email)
+                while len(self._misses) > self.max_size:
+                    self._misses.popitem(last=False)
+        outcome = INCORRECT if status == -1 else EXPIRED
+        ONE_TIME_CODE_VERIFICATIONS.labels(source, outcome).inc()
+        return outcome, None, remaining
+
+    def issue(self, email: str, user_id: str, code: str) -> None:
+        """
+        Enregistre un code pour l'email (remplace le précédent et rétablit les essais).
+        """
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self.key(email), mapping=self._fields(email, user_id, code))
+        pipe.expire(self.key(email), self.expiration)
+        pipe.publish(self.channel, email)
+        pipe.execute()
+
+    def verify(self, email: str, code: str) -> Tuple[str, Optional[str], int]:
+        """
+        Vérifie et consomme un code.
+
+        :return: (VALID, identifiant de l'utilisateur, 0), (INCORRECT, None, essais restants)
+            ou (EXPIRED, None, 0).
+        """
+        if self._missed(email):
+            ONE_TIME_CODE_VERIFICATIONS.labels('local', EXPIRED).inc()
+            return EXPIRED, None, 0
+        return self._settle(email, self._verify(keys=[self.key(email)], args=[self.digest(email, code)]))
+
+
+class AsyncOneTimeCodeStore(OneTimeCodeStore):
+    """
+    Variante d'OneTimeCodeStore pour un client redis.asyncio : même script, méthodes à attendre.
+    """
+
+    async def issue(self, email: str, user_id: str, code: str) -> None:
+        pipe = self.redis_client.pipeline()
+        pipe.hset(self.key(email), mapping=self._fields(email, user_id, code))
+        pipe.expire(self.key(email), self.expiration)
+        pipe.publish(self.channel, email)
+        await pipe.execute()
+
+    async def verify(self, email: str, code: str) -> Tuple[str, Optional[str], int]:
+        if self._missed(email):
+            ONE_TIME_CODE_VERIFICATIONS.labels('local', EXPIRED).inc()
+            return EXPIRED, None, 0
+        return self._settle(email, await self._verify(keys=[self.key(email)], args=[self.digest(email, code)]))
@@ -0,0 +1,133 @@
+# app/services/outbox.py
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+from flask_mail import Message
+from werkzeug.exceptions import ServiceUnavailable
+
+from app.services.tracing import current_traceparent
+
+# KEYS[1] : flux de la file d'envoi
+# ARGV[1] : nombre maximal de messages en attente ; ARGV[2..n] : champs et valeurs du message
+ENQUEUE_SCRIPT = """
+if tonumber(ARGV[1]) > 0 and redis.call('XLEN', KEYS[1]) >= tonumber(ARGV[1]) then
+    return false
+end
+return redis.call('XADD', KEYS[1], '*', unpack(ARGV, 2))
+"""
+
+
+class OutboxFull(ServiceUnavailable):
+    """
+    La file d'envoi des emails a atteint sa capacité maximale.
+    """
+    description = 'Service temporairement indisponible.'
+
+
+class EmailOutbox:
+    """
+    File d'envoi durable des emails, stockée dans un flux Redis.
+
+    Les requêtes se contentent d'un XADD (un aller-retour) ; l'envoi SMTP est assuré
+    par le worker app.workers.mailer, qui lit le flux via un groupe de consommateurs.
+    Au-delà de `max_pending` messages non traités, le dépôt est refusé (OutboxFull).
+    """
+
+    def __init__(self, redis_client, stream: str = 'mail_outbox', group: str = 'mailers',
+                 dead_letter: str = 'mail_outbox:dead', max_pending: int = 10000):
+        self.redis_client = redis_client
+        self.stream = stream
+        self.group = group
+        self.dead_letter = dead_letter
+        self.max_pending = max_pending
+        self._enqueue = redis_client.register_script(ENQUEUE_SCRIPT)
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> 'EmailOutbox':
+        """
+        Construit la file d'envoi à partir de la configuration de l'application.
+        """
+        return cls(
+            redis_client or app.redis_client,
+            stream=app.config.get('MAIL_OUTBOX_STREAM', 'mail_outbox'),
+            group=app.config.get('MAIL_OUTBOX_GROUP', 'mailers'),
+            dead_letter=app.config.get('MAIL_OUTBOX_DEAD_LETTER', 'mail_outbox:dead'),
+            max_pending=int(app.config.get('MAIL_OUTBOX_MAX_PENDING', 10000))
+        )
+
+    @staticmethod
+    def message_fields(subject: str, recipients: Iterable[str], body: str,
+                       sender: Optional[str] = None) -> Dict[str, str]:
+        """
+        Sérialise un email en champs de flux Redis, avec le contexte de trace de la requête
+        (le worker d'envoi rattache l'envoi SMTP à la même trace).
+        """
+        fields = {
+            'subject': subject,
+            'recipients': json.dumps(list(recipients)),
+            'body': body,
+            'sender': sender or '',
+        }
+        traceparent = current_traceparent()
+        if traceparent:
+            fields['traceparent'] = traceparent
+        return fields
+
+    @staticmethod
+    def build_message(fields: Dict[str, str], default_sender: Optional[str] = None) -> Message:
+        """
+        Reconstruit un message Flask-Mail à partir des champs lus dans le flux.
+        """
+        return Message(
+            subject=fields['subject'],
+            recipients=json.loads(fields['recipients']),
+            body=fields['body'],
+            sender=fields.get('sender') or default_sender
+        )
+
+    def _script_args(self, subject: str, recipients: Iterable[str], body: str,
+                     sender: Optional[str]) -> list:
+        fields = self.message_fields(subject, recipients, body, sender)
+        return [self.max_pending, *(item for pair in fields.items() for item in pair)]
+
+    def enqueue(self, subject: str, recipients: Iterable[str], body: str,
+                sender: Optional[str] = None) -> str:
+        """
+        Dépose un email dans la file d'envoi et renvoie l'identifiant de l'entrée.
+
+        :raises OutboxFull: Si la file contient déjà `max_pending` messages.
+        """
+        message_id = self._enqueue(keys=[self.stream], args=self._script_args(subject, recipients, body, sender))
+        if message_id is None:
+            raise OutboxFull()
+        return message_id
+
+    def backlog(self) -> Dict[str, Any]:
+        """
+        Renvoie la taille de la file, le nombre de messages en cours de traitement et de messages abandonnés.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.xlen(self.stream)
+        pipe.xlen(self.dead_letter)
+        queued, dead = pipe.execute()
+        try:
+            pending = self.redis_client.xpending(self.stream, self.group)['pending']
+        except Exception:
+            # Groupe pas encore créé par le worker
+            pending = 0
+        return {'queued': queued, 'pending': pending, 'dead': dead}
+
+
+class AsyncEmailOutbox(EmailOutbox):
+    """
+    Variante d'EmailOutbox pour un client redis.asyncio : même script, méthodes à attendre.
+    """
+
+    async def enqueue(self, subject: str, recipients: Iterable[str], body: str,
+                      sender: Optional[str] = None) -> str:
+        message_id = await self._enqueue(keys=[self.stream], args=self._script_args(subject, recipients, body, sender))
+        if message_id is None:
+            raise OutboxFull()
+        return message_id
@@ -0,0 +1,271 @@
+# app/services/ratelimit.py
+
+"""
+Limitation de débit à deux niveaux : un seau de jetons local (par processus worker) devant
+un compteur à fenêtre glissante stocké dans Redis.
+
+Le compteur Redis fait foi : chaque aller-retour réserve atomiquement (script Lua) un lot de jetons,
+consommés ensuite localement sans appel à Redis. Après un refus, les requêtes suivantes sur la même
+clé sont refusées localement pendant `deny_ttl` secondes.
+
+Les jetons étant réservés avant d'être consommés, la limite globale n'est jamais dépassée (à
+l'approximation de la fenêtre glissante près) ; l'erreur est une sous-admission bornée par
+workers × (lot - 1) jetons réservés mais inutilisés, plus les refus servis localement.
+La taille du lot (`lease_ratio` de la limite, 0 pour un décompte exact) est réglable par route.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from limits.storage import RedisStorage
+
+from app.services.metrics import RATELIMIT_DECISIONS, InstrumentedRedis
+
+# KEYS[1] : hash du compteur (un champ par fenêtre fixe, indexé par son numéro)
+# ARGV[1] : limite ; ARGV[2] : durée de la fenêtre (s) ; ARGV[3] : numéro de la fenêtre courante ;
+# ARGV[4] : poids de la fenêtre précédente (part restant à couvrir) ; ARGV[5] : jetons demandés ; ARGV[6] : minimum
+SLIDING_WINDOW_SCRIPT = """
+local index = tonumber(ARGV[3])
+local current = tonumber(redis.call('HGET', KEYS[1], index) or '0')
+local previous = tonumber(redis.call('HGET', KEYS[1], index - 1) or '0')
+local available = math.floor(tonumber(ARGV[1]) - previous * tonumber(ARGV[4]) - current)
+local granted = math.min(tonumber(ARGV[5]), available)
+if granted < tonumber(ARGV[6]) then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], index, granted)
+if current == 0 then
+    redis.call('HDEL', KEYS[1], index - 2)
+    redis.call('EXPIRE', KEYS[1], 2 * tonumber(ARGV[2]))
+end
+return granted
+"""
+
+
+def parse_route_ratios(value: str) -> Dict[str, float]:
+    """
+    Analyse RATELIMIT_ROUTE_LEASE_RATIOS : `endpoint=ratio` séparés par des virgules.
+    """
+    ratios = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            endpoint, ratio = item.split('=', 1)
+            ratios[endpoint.strip()] = float(ratio)
+    return ratios
+
+
+class _Bucket:
+    __slots__ = ('tokens', 'lease_expires', 'denied_until', 'ratio')
+
+    def __init__(self, ratio: float):
+        self.tokens = 0
+        self.lease_expires = 0.0
+        self.denied_until = 0.0
+        self.ratio = ratio
+
+
+class HybridRateLimiter:
+    """
+    Seaux de jetons locaux devant le compteur à fenêtre glissante Redis.
+
+    :param lease_ratio: Part de la limite réservée par aller-retour Redis (0 : un jeton à la fois, sans refus local).
+    :param route_ratios: Taux propre à certaines routes (endpoint Flask ou Quart présent dans la clé).
+    """
+
+    def __init__(self, redis_client, lease_ratio: float = 0.1, max_lease: int = 100, lease_ttl: float = 1.0,
+                 deny_ttl: float = 1.0, max_keys: int = 10000, route_ratios: Optional[Dict[str, float]] = None):
+        self.redis_client = redis_client
+        self.lease_ratio = lease_ratio
+        self.max_lease = max_lease
+        self.lease_ttl = lease_ttl
+        self.deny_ttl = deny_ttl
+        self.max_keys = max_keys
+        self.route_ratios = route_ratios or {}
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._script = redis_client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    @staticmethod
+    def options_from_config(config) -> Dict[str, Any]:
+        """
+        Paramètres du limiteur lus dans la configuration de l'application.
+        """
+        return {
+            'lease_ratio': float(config.get('RATELIMIT_LEASE_RATIO', 0.1)),
+            'max_lease': int(config.get('RATELIMIT_MAX_LEASE', 100)),
+            'lease_ttl': float(config.get('RATELIMIT_LEASE_TTL', 1.0)),
+            'deny_ttl': float(config.get('RATELIMIT_DENY_TTL', 1.0)),
+            'max_keys': int(config.get('RATELIMIT_LOCAL_KEYS', 10000)),
+            'route_ratios': parse_route_ratios(config.get('RATELIMIT_ROUTE_LEASE_RATIOS', '')),
+        }
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> 'HybridRateLimiter':
+        """
+        Construit le limiteur à partir de la configuration de l'application.
+        """
+        return cls(redis_client or app.redis_client, **cls.options_from_config(app.config))
+
+    def _ratio_for(self, key: str) -> float:
+        for segment in key.split('/'):
+            if segment in self.route_ratios:
+                return self.route_ratios[segment]
+        return self.lease_ratio
+
+    def _bucket(self, key: str) -> _Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self._ratio_for(key))
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    # -- Décision ----------------------------------------------------------
+
+    def _local(self, key: str, cost: int, now: float) -> Tuple[Optional[bool], float]:
+        """
+        Décision locale : (True, _) jetons disponibles, (False, _) refus récent,
+        (None, ratio) aller-retour Redis nécessaire.
+        """
+        with self._lock:
+            bucket = self._bucket(key)
+            if bucket.lease_expires <= now:
+                bucket.tokens = 0
+            if bucket.tokens >= cost:
+                bucket.tokens -= cost
+                return True, bucket.ratio
+            if bucket.denied_until > now:
+                return False, bucket.ratio
+            return None, bucket.ratio
+
+    def _script_args(self, limit: int, window: int, cost: int, ratio: float, now: float) -> list:
+        index, elapsed = divmod(now, window)
+        lease = max(cost, min(int(limit * ratio), self.max_lease)) if ratio > 0 else cost
+        return [limit, window, int(index), 1 - elapsed / window, lease, cost]
+
+    def _settle(self, key: str, granted: int, window: int, cost: int, ratio: float, now: float) -> bool:
+        with self._lock:
+            bucket = self._bucket(key)
+            if granted:
+                bucket.tokens = (bucket.tokens if bucket.lease_expires > now else 0) + granted - cost
+                bucket.lease_expires = now + min(self.lease_ttl, window)
+            elif ratio > 0:
+                bucket.denied_until = now + min(self.deny_ttl, window)
+        return bool(granted)
+
+    def acquire(self, key: str, limit: int, window: int, cost: int = 1) -> bool:
+        """
+        Consomme `cost` jetons de la clé (limite `limit` par fenêtre glissante de `window` secondes).
+        """
+        now = time.time()
+        allowed, ratio = self._local(key, cost, now)
+        if allowed is not None:
+            RATELIMIT_DECISIONS.labels('local', 'allowed' if allowed else 'rejected').inc()
+            return allowed
+        granted = self._script(keys=[key], args=self._script_args(limit, window, cost, ratio, now))
+        allowed = self._settle(key, int(granted), window, cost, ratio, now)
+        RATELIMIT_DECISIONS.labels('redis', 'allowed' if allowed else 'rejected').inc()
+        return allowed
+
+    def _usage(self, counts, limit: int, window: int, now: float) -> Tuple[int, int]:
+        index, elapsed = divmod(now, window)
+        current, previous = (int(count or 0) for count in counts)
+        used = previous * (1 - elapsed / window) + current
+        return int(index * window), min(limit, int(used + 0.999999))
+
+    def usage(self, key: str, limit: int, window: int) -> Tuple[int, int]:
+        """
+        Renvoie le début de la fenêtre courante et le nombre de jetons consommés (arrondi au supérieur).
+        """
+        now = time.time()
+        index = int(now // window)
+        return self._usage(self.redis_client.hmget(key, [index, index - 1]), limit, window, now)
+
+    def clear(self, key: Optional[str] = None) -> None:
+        """
+        Oublie l'état local d'une clé, ou de toutes les clés.
+        """
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie le nombre de clés suivies localement et de jetons réservés non consommés.
+        """
+        now = time.time()
+        with self._lock:
+            leased = sum(b.tokens for b in self._buckets.values() if b.lease_expires > now)
+            denied = sum(1 for b in self._buckets.values() if b.denied_until > now)
+            return {'keys': len(self._buckets), 'leased_tokens': leased, 'denied_keys': denied}
+
+
+class AsyncHybridRateLimiter(HybridRateLimiter):
+    """
+    Variante de HybridRateLimiter pour un client redis.asyncio : même script, méthodes à attendre.
+    """
+
+    async def acquire(self, key: str, limit: int, window: int, cost: int = 1) -> bool:
+        now = time.time()
+        allowed, ratio = self._local(key, cost, now)
+        if allowed is not None:
+            RATELIMIT_DECISIONS.labels('local', 'allowed' if allowed else 'rejected').inc()
+            return allowed
+        granted = await self._script(keys=[key], args=self._script_args(limit, window, cost, ratio, now))
+        allowed = self._settle(key, int(granted), window, cost, ratio, now)
+        RATELIMIT_DECISIONS.labels('redis', 'allowed' if allowed else 'rejected').inc()
+        return allowed
+
+    async def usage(self, key: str, limit: int, window: int) -> Tuple[int, int]:
+        now = time.time()
+        index = int(now // window)
+        return self._usage(await self.redis_client.hmget(key, [index, index - 1]), limit, window, now)
+
+
+class HybridRedisStorage(RedisStorage):
+    """
+    Stockage Flask-Limiter (`hybrid+redis://`, stratégie `moving-window`) délégant
+    les décisions à HybridRateLimiter. Les autres opérations sont celles de RedisStorage.
+
+    Les paramètres du limiteur sont passés par RATELIMIT_STORAGE_OPTIONS (voir create_app).
+    """
+
+    STORAGE_SCHEME = ['hybrid+redis', 'hybrid+rediss']
+
+    def prefixed_key(self, key: str) -> str:
+        # Espace de clés distinct des compteurs (chaînes) des autres stratégies : pas de conflit
+        # de type lors d'un changement de stratégie ; reset() couvre toujours le préfixe LIMITS
+        return f'{self.PREFIX}:hybrid:{key}'
+
+    def __init__(self, uri: str, connection_pool=None, lease_ratio: float = 0.1, max_lease: int = 100,
+                 lease_ttl: float = 1.0, deny_ttl: float = 1.0, max_keys: int = 10000,
+                 route_ratios: Optional[Dict[str, float]] = None, **options):
+        super().__init__(uri[len('hybrid+'):], connection_pool=connection_pool, **options)
+        if connection_pool is not None:
+            # Commandes du limiteur mesurées comme celles du client de l'application
+            self.storage = InstrumentedRedis(connection_pool=connection_pool, **options)
+            self.initialize_storage(uri)
+        self.limiter = HybridRateLimiter(
+            self.storage, lease_ratio=lease_ratio, max_lease=max_lease, lease_ttl=lease_ttl,
+            deny_ttl=deny_ttl, max_keys=max_keys, route_ratios=route_ratios
+        )
+
+    def acquire_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        return self.limiter.acquire(self.prefixed_key(key), limit, expiry, amount)
+
+    def get_moving_window(self, key: str, limit: int, expiry: int) -> Tuple[int, int]:
+        return self.limiter.usage(self.prefixed_key(key), limit, expiry)
+
+    def clear(self, key: str) -> None:
+        self.limiter.clear(self.prefixed_key(key))
+        return super().clear(key)
+
+    def reset(self) -> Optional[int]:
+        self.limiter.clear()
+        return super().reset()
@@ -0,0 +1,132 @@
+# app/services/redis_pool.py
+
+import threading
+import time
+from typing import Any, Dict
+
+import redis
+import redis.asyncio
+
+from app.services.metrics import InstrumentedAsyncRedis
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    Pool de connexions Redis borné (BlockingConnectionPool) qui mesure son utilisation.
+
+    Au-delà de `max_connections` connexions simultanées, les appelants attendent qu'une
+    connexion se libère (au plus `timeout` secondes) au lieu d'en ouvrir de nouvelles :
+    le temps d'attente mesuré indique directement si le pool est sous-dimensionné.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self) -> None:
+        self._stats = {
+            'acquired': 0,
+            'created': 0,
+            'timeouts': 0,
+            'in_use': 0,
+            'in_use_max': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def reset(self) -> None:
+        # Appelé à la création et après un fork : les compteurs repartent de zéro dans chaque worker
+        super().reset()
+        if hasattr(self, '_stats_lock'):
+            with self._stats_lock:
+                self._reset_stats()
+
+    def make_connection(self):
+        connection = super().make_connection()
+        with self._stats_lock:
+            self._stats['created'] += 1
+        return connection
+
+    def get_connection(self, command_name=None, *keys, **options):
+        start = time.perf_counter()
+        try:
+            connection = super().get_connection(command_name, *keys, **options)
+        except redis.ConnectionError as e:
+            if 'No connection available' in str(e):
+                with self._stats_lock:
+                    self._stats['timeouts'] += 1
+            raise
+        wait_time = time.perf_counter() - start
+        with self._stats_lock:
+            stats = self._stats
+            stats['acquired'] += 1
+            stats['in_use'] += 1
+            stats['in_use_max'] = max(stats['in_use_max'], stats['in_use'])
+            stats['wait_time_total'] += wait_time
+            stats['wait_time_max'] = max(stats['wait_time_max'], wait_time)
+        return connection
+
+    def release(self, connection) -> None:
+        super().release(connection)
+        with self._stats_lock:
+            self._stats['in_use'] = max(0, self._stats['in_use'] - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie l'utilisation du pool (connexions ouvertes, utilisées, attentes) du processus courant.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        acquired = stats['acquired']
+        stats.update({
+            'max_connections': self.max_connections,
+            'utilisation': stats['in_use'] / self.max_connections,
+            'peak_utilisation': stats['in_use_max'] / self.max_connections,
+            'wait_time_avg': stats['wait_time_total'] / acquired if acquired else 0.0,
+        })
+        return stats
+
+
+def redis_connection_options(config) -> Dict[str, Any]:
+    """
+    Paramètres de connexion Redis communs aux clients synchrone et asynchrone.
+    """
+    return {
+        'host': config['REDIS_HOST'],
+        'port': config['REDIS_PORT'],
+        'db': config['REDIS_DB'],
+        'password': config.get('REDIS_PASSWORD'),
+        'socket_timeout': config.get('REDIS_SOCKET_TIMEOUT'),
+        'socket_connect_timeout': config.get('REDIS_SOCKET_CONNECT_TIMEOUT'),
+        'socket_keepalive': config.get('REDIS_SOCKET_KEEPALIVE', True),
+        'health_check_interval': config.get('REDIS_HEALTH_CHECK_INTERVAL', 0),
+        'retry_on_timeout': config.get('REDIS_RETRY_ON_TIMEOUT', False),
+        'decode_responses': config.get('REDIS_DECODE_RESPONSES', True),
+    }
+
+
+def create_redis_pool(config) -> InstrumentedConnectionPool:
+    """
+    Crée le pool de connexions Redis partagé par le client de l'application,
+    le stockage de Flask-Limiter et l'abonnement pub/sub aux révocations.
+    """
+    return InstrumentedConnectionPool(
+        max_connections=int(config.get('REDIS_MAX_CONNECTIONS', 10)),
+        timeout=float(config.get('REDIS_POOL_TIMEOUT', 5.0)),
+        **redis_connection_options(config)
+    )
+
+
+def create_async_redis_client(config) -> redis.asyncio.Redis:
+    """
+    Crée un client redis.asyncio avec un pool borné et les mêmes paramètres de connexion
+    (chaque commande est mesurée).
+    """
+
+    pool = redis.asyncio.BlockingConnectionPool(
+        max_connections=int(config.get('REDIS_MAX_CONNECTIONS', 10)),
+        timeout=float(config.get('REDIS_POOL_TIMEOUT', 5.0)),
+        **redis_connection_options(config)
+    )
+    return InstrumentedAsyncRedis(connection_pool=pool)
@@ -0,0 +1,479 @@
+# app/services/revocation.py
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+import redis
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class RevocationCache:
+    """
+    Cache local (par worker) de l'état de révocation des tokens JWT.
+
+    - Les jti révoqués sont conservés jusqu'à l'expiration du token (la révocation est définitive).
+    - Les jti valides sont conservés au plus `staleness` secondes, et jamais au-delà de l'expiration.
+    - Les époques de révocation par utilisateur (« tokens émis jusqu'à T invalides ») sont conservées
+      au plus `staleness` secondes lorsqu'elles sont lues depuis Redis.
+    - Les révocations sont diffusées sur un canal pub/sub Redis pour invalider les caches des autres workers.
+    """
+
+    def __init__(self, redis_client, max_size: int = 10000, staleness: float = 5.0,
+                 channel: str = 'token_revocations'):
+        self.redis_client = redis_client
+        self.max_size = max_size
+        self.staleness = staleness
+        self.channel = channel
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._subscriber = None
+        self._subscriber_pid = None
+        self._handlers = {}
+        self._stats = {'hits': 0, 'misses': 0, 'epoch_hits': 0, 'epoch_misses': 0,
+                       'invalidations': 0, 'evictions': 0}
+
+    @classmethod
+    def from_app(cls, app, redis_client=None, standalone: bool = False) -> 'RevocationCache':
+        """
+        Construit le cache à partir de la configuration de l'application.
+
+        :param redis_client: Client Redis synchrone pour l'abonnement (par défaut app.redis_client).
+        :param standalone: Sans abonnement pub/sub, pour un stockage propre au processus.
+        """
+        return cls(
+            None if standalone else redis_client or app.redis_client,
+            max_size=int(app.config.get('REVOCATION_CACHE_SIZE', 10000)),
+            staleness=float(app.config.get('REVOCATION_CACHE_STALENESS', 5.0)),
+            channel=app.config.get('REVOCATION_CHANNEL', 'token_revocations')
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get(self, jti: str) -> Optional[bool]:
+        """
+        Renvoie l'état en cache d'un jti (True révoqué, False valide) ou None si inconnu.
+        """
+        return self._lookup(jti, 'hits', 'misses')
+
+    def _lookup(self, key, hit: str, miss: str) -> Any:
+        # Les jti et les époques ont leurs propres compteurs : chaque vérification de token lit les deux
+        self._ensure_subscriber()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats[hit] += 1
+                    return value
+                del self._entries[key]
+            self._stats[miss] += 1
+        return None
+
+    def set(self, jti: str, revoked: bool, exp: int) -> None:
+        """
+        Enregistre l'état d'un jti. Les entrées valides sont bornées par la tolérance d'obsolescence.
+        """
+        if not self.enabled:
+            return
+        expires_at = float(exp) if revoked else min(float(exp), time.time() + self.staleness)
+        with self._lock:
+            self._entries[jti] = (revoked, expires_at)
+            self._entries.move_to_end(jti)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get_epoch(self, user_id: str) -> Optional[float]:
+        """
+        Renvoie l'époque de révocation en cache d'un utilisateur (0 si aucune) ou None si inconnue.
+        """
+        cached = self._lookup(('epoch', user_id), 'epoch_hits', 'epoch_misses')
+        return None if cached is None else float(cached)
+
+    def set_epoch(self, user_id: str, epoch: float, expires_at: Optional[float] = None) -> None:
+        """
+        Enregistre l'époque de révocation d'un utilisateur. Une époque ne peut qu'augmenter.
+
+        :param expires_at: Fin de validité de l'entrée (par défaut la tolérance d'obsolescence).
+        """
+        if not self.enabled:
+            return
+        key = ('epoch', user_id)
+        if expires_at is None:
+            expires_at = time.time() + self.staleness
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current[0] > epoch and current[1] > time.time():
+                return
+            self._entries[key] = (epoch, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def publish(self, jtis: Iterable[str], exp: int, pipeline=None) -> None:
+        """
+        Marque les jti comme révoqués localement et diffuse la révocation aux autres workers
+        (sauf pour un cache autonome, sans client Redis).
+
+        :param pipeline: Pipeline Redis optionnel pour grouper la publication avec l'écriture.
+        """
+        jtis = list(jtis)
+        if not jtis:
+            return
+        for jti in jtis:
+            self.set(jti, True, exp)
+        if pipeline is not None or self.redis_client is not None:
+            (pipeline or self.redis_client).publish(self.channel, self.revocation_message(jtis, exp))
+
+    @staticmethod
+    def revocation_message(jtis: Iterable[str], exp: int) -> str:
+        """
+        Message pub/sub annonçant la révocation de jti.
+        """
+        return json.dumps({'jtis': list(jtis), 'exp': exp})
+
+    @staticmethod
+    def epoch_message(user_id: str, epoch: float, exp: float) -> str:
+        """
+        Message pub/sub annonçant une nouvelle époque de révocation.
+        """
+        return json.dumps({'user_id': user_id, 'epoch': epoch, 'exp': exp})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        try:
+            payload = json.loads(message['data'])
+            if 'user_id' in payload:
+                self.set_epoch(payload['user_id'], float(payload['epoch']), float(payload['exp']))
+                invalidations = 1
+            else:
+                for jti in payload['jtis']:
+                    self.set(jti, True, int(payload['exp']))
+                invalidations = len(payload['jtis'])
+            with self._lock:
+                self._stats['invalidations'] += invalidations
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f'Message de révocation invalide: {e}')
+
+    def _handle_subscriber_error(self, e, pubsub, thread) -> None:
+        # La cohérence n'est plus garantie : on vide le cache et on relancera l'abonnement
+        logging.error(f'Abonnement aux révocations interrompu: {e}')
+        thread.stop()
+        pubsub.close()
+        self.clear()
+        self._subscriber = None
+
+    def _ensure_subscriber(self) -> None:
+        # L'abonnement est démarré à la demande dans chaque worker (après le fork)
+        if not self.enabled or self.redis_client is None:
+            return
+        pid = os.getpid()
+        if self._subscriber is not None and self._subscriber_pid == pid:
+            return
+        with self._lock:
+            if self._subscriber is not None and self._subscriber_pid == pid:
+                return
+            self._entries.clear()
+            try:
+                pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{self.channel: self._handle_message, **self._handlers})
+                self._subscriber = pubsub.run_in_thread(
+                    sleep_time=1.0,
+                    daemon=True,
+                    exception_handler=self._handle_subscriber_error
+                )
+                self._subscriber_pid = pid
+            except Exception as e:
+                logging.error(f'Impossible de s\'abonner aux révocations: {e}')
+
+    def subscribe(self, channel: str, handler) -> None:
+        """
+        Ajoute un canal écouté par le même thread d'abonnement (un seul abonnement par worker).
+        À appeler avant le démarrage de l'abonnement.
+        """
+        self._handlers[channel] = handler
+
+    def start(self) -> None:
+        """
+        Démarre l'abonnement aux révocations dans le processus courant (sinon fait au premier accès).
+        """
+        self._ensure_subscriber()
+
+    def stop(self) -> None:
+        """
+        Arrête le thread d'abonnement du processus courant.
+        """
+        if self._subscriber is not None and self._subscriber_pid == os.getpid():
+            self._subscriber.stop()
+        self._subscriber = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs du cache (succès, échecs, invalidations, évictions) ;
+        hit_rate porte sur les jti, epoch_hit_rate sur les époques.
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        for prefix in ('', 'epoch_'):
+            lookups = stats[f'{prefix}hits'] + stats[f'{prefix}misses']
+            stats[f'{prefix}hit_rate'] = stats[f'{prefix}hits'] / lookups if lookups else 0.0
+        return stats
+
+
+# Fonction Lua revoke(jti, exp), à placer en tête des scripts qui révoquent : même schéma de clés
+# que RevocationStore.key (tranche de l'expiration, shard par condensat djb2 du jti).
+# La clé est calculée dans le script, hors de KEYS : Redis sur un seul nœud (voir app.services.session)
+REVOKE_FUNCTION = """
+local function revoke(jti, exp)
+    local bucket = math.floor(tonumber(exp) / {bucket_seconds})
+    local shard = 5381
+    for i = 1, #jti do
+        shard = (shard * 33 + string.byte(jti, i)) % {shards}
+    end
+    local key = '{prefix}:' .. bucket .. ':' .. shard
+    redis.call('HSET', key, jti, 1)
+    redis.call('EXPIREAT', key, (bucket + 1) * {bucket_seconds})
+end
+"""
+
+
+class RevocationStore:
+    """
+    Stockage compact des jti révoqués dans Redis.
+
+    Un jti révoqué est un champ d'un petit hash `{prefix}:{tranche}:{shard}`, où la tranche découpe
+    l'expiration du token (une heure par défaut) et le shard répartit les jti d'une même tranche.
+    Le hash expire d'un bloc à la fin de sa tranche, une fois tous ses tokens expirés : ni clé
+    ni entrée d'expiration par jti. Avec assez de shards, chaque hash reste sous
+    hash-max-listpack-entries et garde l'encodage listpack, quelques dizaines d'octets par jti.
+
+    :param bucket_seconds: Largeur d'une tranche d'expiration.
+    :param shards: Hashes par tranche (environ révocations par tranche / 100).
+    """
+
+    def __init__(self, redis_client=None, bucket_seconds: int = 3600, shards: int = 512, prefix: str = 'revoked'):
+        self.redis_client = redis_client
+        self.bucket_seconds = bucket_seconds
+        self.shards = shards
+        self.prefix = prefix
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> 'RevocationStore':
+        """
+        Construit le stockage à partir de la configuration de l'application.
+
+        :param redis_client: Client Redis synchrone du rapport et de la migration (par défaut app.redis_client).
+        """
+        return cls(
+            redis_client or app.redis_client,
+            bucket_seconds=int(app.config.get('REVOCATION_BUCKET_SECONDS', 3600)),
+            shards=int(app.config.get('REVOCATION_SHARDS', 512)),
+            prefix=app.config.get('REVOCATION_PREFIX', 'revoked')
+        )
+
+    def shard(self, jti: str) -> int:
+        shard = 5381
+        for byte in jti.encode():
+            shard = (shard * 33 + byte) % self.shards
+        return shard
+
+    def key(self, jti: str, exp: float) -> str:
+        return f'{self.prefix}:{int(float(exp) // self.bucket_seconds)}:{self.shard(jti)}'
+
+    def expire_at(self, exp: float) -> int:
+        return (int(float(exp) // self.bucket_seconds) + 1) * self.bucket_seconds
+
+    def script(self, body: str) -> str:
+        """
+        Préfixe un script Lua de la fonction revoke(jti, exp) pour ce schéma de clés.
+        """
+        return REVOKE_FUNCTION.format(
+            bucket_seconds=self.bucket_seconds, shards=self.shards, prefix=self.prefix) + body
+
+    def queue_revoke(self, pipe, jti: str, exp: float) -> None:
+        """
+        Ajoute au pipeline l'inscription d'un jti révoqué.
+        """
+        key = self.key(jti, exp)
+        pipe.hset(key, jti, 1)
+        pipe.expireat(key, self.expire_at(exp))
+
+    def queue_check(self, pipe, jti: str, exp: float) -> None:
+        """
+        Ajoute au pipeline la lecture de l'état d'un jti (vrai s'il est révoqué).
+        """
+        pipe.hexists(self.key(jti, exp), jti)
+
+    def migrate_legacy(self, batch_size: int = 1000) -> int:
+        """
+        Reprend les révocations de l'ancien schéma (une clé `jti` valant 'true' par token) :
+        chaque jti est inscrit dans sa tranche avec l'expiration restante de sa clé, puis la clé supprimée.
+
+        :return: Le nombre de jti repris.
+        """
+        migrated = 0
+        now = time.time()
+        for key in self.redis_client.scan_iter(match='*-*-*-*-*', count=batch_size):
+            if self.redis_client.type(key) != 'string' or self.redis_client.get(key) != 'true':
+                continue
+            ttl = self.redis_client.ttl(key)
+            if ttl <= 0:
+                continue
+            pipe = self.redis_client.pipeline()
+            self.queue_revoke(pipe, key, now + ttl)
+            pipe.delete(key)
+            pipe.execute()
+            migrated += 1
+        return migrated
+
+    def memory_report(self, batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Parcourt les hashes de révocation et renvoie leur nombre, les jti qu'ils contiennent,
+        leur encodage et leur empreinte mémoire (MEMORY USAGE), au total et par jti.
+        Les champs mémoire et encodage valent None si le serveur ne fournit pas ces commandes.
+        """
+        keys, entries, buckets = 0, 0, set()
+        memory, encodings = 0, {}
+        for key in self.redis_client.scan_iter(match=f'{self.prefix}:*', count=batch_size):
+            keys += 1
+            entries += self.redis_client.hlen(key)
+            buckets.add(key.split(':')[-2])
+            if memory is not None:
+                try:
+                    memory += self.redis_client.memory_usage(key, samples=0) or 0
+                except redis.ResponseError:
+                    memory = None
+            if encodings is not None:
+                try:
+                    encoding = self.redis_client.object('encoding', key)
+                    encodings[encoding] = encodings.get(encoding, 0) + 1
+                except redis.ResponseError:
+                    encodings = None
+        return {
+            'keys': keys,
+            'buckets': len(buckets),
+            'entries': entries,
+            'bytes': memory,
+            'bytes_per_entry': round(memory / entries, 1) if memory is not None and entries else None,
+            'encodings': encodings
+        }
+
+
+def issued_at() -> float:
+    """
+    Horodatage à la milliseconde, commun au claim `iat` des tokens émis et aux époques de révocation.
+    À la seconde près, un token émis juste après une déconnexion globale serait refusé avec les autres.
+    """
+    return math.floor(time.time() * 1000) / 1000
+
+
+def revocation_epoch_key(user_id: str) -> str:
+    """
+    Clé Redis de l'époque de révocation d'un utilisateur.
+    """
+    return f"revoked_before:{user_id}"
+
+
+def _resolve_revocation(cache: RevocationCache, jwt_payload: Dict[str, Any], user_id: str,
+                        revoked: Optional[bool], epoch: Optional[float], entry, stored_epoch) -> bool:
+    # Complète les états absents du cache avec les valeurs lues dans Redis
+    if revoked is None:
+        revoked = bool(entry)
+        cache.set(jwt_payload['jti'], revoked, jwt_payload['exp'])
+    if epoch is None:
+        epoch = float(stored_epoch or 0)
+        cache.set_epoch(user_id, epoch)
+    return revoked or jwt_payload.get('iat', 0) <= epoch
+
+
+def is_token_revoked(app, jwt_payload: Dict[str, Any]) -> bool:
+    """
+    Vérifie si un token est révoqué, en consultant le cache local avant Redis.
+
+    Un token est révoqué si son jti a été révoqué, ou s'il a été émis au plus tard
+    à l'époque de révocation de son utilisateur (à la milliseconde, voir issued_at). En cas d'erreur Redis,
+    le token est considéré comme révoqué.
+    """
+    jti = jwt_payload['jti']
+    user_id = str(jwt_payload[app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+    cache = app.revocation_cache
+    revoked = cache.get(jti)
+    epoch = cache.get_epoch(user_id)
+    if revoked is not None and epoch is not None:
+        return revoked or jwt_payload.get('iat', 0) <= epoch
+    try:
+        # Un seul aller-retour pour le jti et l'époque de l'utilisateur
+        entry, stored_epoch = app.session_store.fetch_revocations(
+            {('jti', jti): jwt_payload['exp'], ('epoch', user_id): None})
+    except Exception as e:
+        app.logger.error(f'Erreur lors de la vérification du token: {e}')
+        return True  # Considérer le token comme révoqué en cas d'erreur
+    return _resolve_revocation(cache, jwt_payload, user_id, revoked, epoch, entry, stored_epoch)
+
+
+async def is_token_revoked_async(app, jwt_payload: Dict[str, Any]) -> bool:
+    """
+    Variante asynchrone de is_token_revoked pour un client redis.asyncio.
+    """
+    jti = jwt_payload['jti']
+    user_id = str(jwt_payload[app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+    cache = app.revocation_cache
+    revoked = cache.get(jti)
+    epoch = cache.get_epoch(user_id)
+    if revoked is not None and epoch is not None:
+        return revoked or jwt_payload.get('iat', 0) <= epoch
+    try:
+        entry, stored_epoch = await app.session_store.fetch_revocations(
+            {('jti', jti): jwt_payload['exp'], ('epoch', user_id): None})
+    except Exception as e:
+        app.logger.error(f'Erreur lors de la vérification du token: {e}')
+        return True  # Considérer le token comme révoqué en cas d'erreur
+    return _resolve_revocation(cache, jwt_payload, user_id, revoked, epoch, entry, stored_epoch)
+
+
+def pending_revocations(app, payloads: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, Optional[bool], Optional[float]]], Dict[Tuple[str, str], Any]]:
+    """
+    Prépare la vérification groupée de plusieurs tokens.
+
+    :return: Pour chaque token, (user_id, état en cache, époque en cache), et les lectures
+        nécessaires pour compléter les états absents du cache (sans doublon) : ('jti', jti) -> exp
+        et ('epoch', user_id) -> None, à passer à session_store.fetch_revocations.
+    """
+    cache = app.revocation_cache
+    identity_claim = app.config.get('JWT_IDENTITY_CLAIM', 'sub')
+    states, reads = [], {}
+    for jwt_payload in payloads:
+        user_id = str(jwt_payload[identity_claim])
+        revoked = cache.get(jwt_payload['jti'])
+        epoch = cache.get_epoch(user_id)
+        if revoked is None:
+            reads.setdefault(('jti', jwt_payload['jti']), jwt_payload['exp'])
+        if epoch is None:
+            reads.setdefault(('epoch', user_id), None)
+        states.append((user_id, revoked, epoch))
+    return states, reads
+
+
+def resolve_revocations(app, payloads: List[Dict[str, Any]], states, reads: Dict[Tuple[str, str], Any],
+                        values: List[Any]) -> List[bool]:
+    """
+    Termine la vérification groupée avec les valeurs lues par session_store.fetch_revocations.
+    """
+    fetched = dict(zip(reads, values))
+    return [
+        _resolve_revocation(app.revocation_cache, jwt_payload, user_id, revoked, epoch,
+                            fetched.get(('jti', jwt_payload['jti'])), fetched.get(('epoch', user_id)))
+        for jwt_payload, (user_id, revoked, epoch) in zip(payloads, states)
+    ]
@@ -0,0 +1,276 @@
+# app/services/session.py
+
+"""
+Sessions et révocations par scripts Lua, un aller-retour par opération.
+
+Les scripts supposent un Redis sur un seul nœud (ou un primaire répliqué) : ils écrivent dans des
+hashes de révocation dont ils calculent eux-mêmes la clé (voir REVOKE_FUNCTION), sans la recevoir
+dans KEYS. Ces clés ne sont pas connues avant l'exécution : les sessions évincées sont choisies par
+RECORD_SCRIPT, et l'expiration de la session révoquée par REVOKE_SCRIPT est lue dans l'index. Les
+déclarer demanderait un aller-retour de plus. Redis Cluster, et les ACL qui restreignent les clés
+accessibles aux scripts, ne sont donc pas pris en charge.
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.metrics import SESSIONS_EVICTED
+from app.services.revocation import RevocationCache, RevocationStore, revocation_epoch_key
+
+# KEYS[1] : index des sessions de l'utilisateur (ensemble trié des jti de rafraîchissement, score = exp)
+# ARGV[1] : maintenant ; ARGV[2] : sessions maximales (0 : illimité) ; ARGV[3] : jti de la session ;
+# ARGV[4] : expiration de la session ; ARGV[5] : canal des révocations
+# Élague les sessions expirées, ajoute la nouvelle et évince les plus anciennes au-delà du maximum :
+# leur token de rafraîchissement est révoqué (revoke, préfixée par RevocationStore.script) et les autres
+# workers notifiés. Renvoie le nombre d'évincées.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[3])
+local evicted = 0
+if limit > 0 then
+    local excess = redis.call('ZCARD', KEYS[1]) - limit
+    if excess > 0 then
+        local oldest = redis.call('ZPOPMIN', KEYS[1], excess)
+        for i = 1, #oldest, 2 do
+            if tonumber(oldest[i + 1]) > now then
+                revoke(oldest[i], oldest[i + 1])
+                local message = cjson.encode({jtis = {oldest[i]}, exp = math.floor(tonumber(oldest[i + 1]))})
+                redis.call('PUBLISH', ARGV[5], message)
+            end
+            evicted = evicted + 1
+        end
+    end
+end
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('EXPIREAT', KEYS[1], math.ceil(tonumber(last[2])))
+return evicted
+"""
+
+# KEYS[1] : index des sessions de l'utilisateur
+# ARGV[1] : jti ; ARGV[2] : expiration du token ; ARGV[3] : canal ; ARGV[4] : message ;
+# ARGV[5] : maintenant ; ARGV[6] : jti de la session du token ('' si inconnue)
+# La session est retirée de l'index et son token de rafraîchissement révoqué jusqu'à son expiration.
+REVOKE_SCRIPT = """
+local now = tonumber(ARGV[5])
+if tonumber(ARGV[2]) > now then
+    revoke(ARGV[1], ARGV[2])
+end
+if ARGV[6] ~= '' then
+    local exp = redis.call('ZSCORE', KEYS[1], ARGV[6])
+    if exp then
+        if tonumber(exp) > now then
+            revoke(ARGV[6], exp)
+        end
+        redis.call('ZREM', KEYS[1], ARGV[6])
+    end
+end
+redis.call('PUBLISH', ARGV[3], ARGV[4])
+return 1
+"""
+
+# KEYS[1] : époque de révocation de l'utilisateur ; KEYS[2] : index des sessions de l'utilisateur
+# ARGV[1] : époque ; ARGV[2] : durée de vie de l'époque ; ARGV[3] : canal ; ARGV[4] : message
+REVOKE_ALL_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if current < tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+redis.call('DEL', KEYS[2])
+redis.call('PUBLISH', ARGV[3], ARGV[4])
+return 1
+"""
+
+
+def user_sessions_key(user_id: str) -> str:
+    """
+    Clé Redis de l'index des sessions d'un utilisateur.
+    """
+    return f"user_sessions:{user_id}"
+
+
+class SessionStore:
+    """
+    Tenue des sessions et des révocations dans Redis.
+    Chaque opération sur les sessions (enregistrement, révocation, liste) coûte un seul aller-retour,
+    grâce à des scripts Lua exécutés par EVALSHA ; le rafraîchissement n'écrit rien. Une connexion
+    lit en plus le freinage et le cache utilisateur (voir UserService.authenticate_user).
+
+    Une session est identifiée par le jti de son token de rafraîchissement, repris dans le claim
+    `sid` des tokens d'accès qui en dérivent. L'index est un ensemble trié par expiration :
+    élagué à chaque écriture, borné à `max_sessions` et expiré avec sa dernière session.
+
+    :param refresh_ttl: Durée de vie d'une session (celle du token de rafraîchissement).
+    :param max_sessions: Sessions simultanées par utilisateur (0 pour ne pas borner).
+    """
+
+    def __init__(self, redis_client, revocation_cache: RevocationCache, session_ttl: int,
+                 refresh_ttl: int = None, max_sessions: int = 10, revocation_store: RevocationStore = None):
+        self.redis_client = redis_client
+        self.revocation_cache = revocation_cache
+        self.session_ttl = session_ttl
+        self.refresh_ttl = refresh_ttl or session_ttl
+        self.max_sessions = max_sessions
+        self.revocation_store = revocation_store or RevocationStore()
+        self._record = redis_client.register_script(self.revocation_store.script(RECORD_SCRIPT))
+        self._revoke = redis_client.register_script(self.revocation_store.script(REVOKE_SCRIPT))
+        self._revoke_all = redis_client.register_script(REVOKE_ALL_SCRIPT)
+
+    @staticmethod
+    def options_from_config(config) -> Dict[str, int]:
+        """
+        Durées de vie et borne des sessions, communes à tous les moteurs de stockage.
+        """
+        return {
+            'session_ttl': int(max(
+                config['JWT_ACCESS_TOKEN_EXPIRES'],
+                config['JWT_REFRESH_TOKEN_EXPIRES']
+            ).total_seconds()),
+            'refresh_ttl': int(config['JWT_REFRESH_TOKEN_EXPIRES'].total_seconds()),
+            'max_sessions': int(config.get('SESSION_MAX_PER_USER', 10)),
+        }
+
+    @classmethod
+    def from_app(cls, app) -> 'SessionStore':
+        """
+        Construit le magasin de sessions à partir de l'application.
+        """
+        return cls(app.redis_client, app.revocation_cache, revocation_store=app.revocation_store,
+                   **cls.options_from_config(app.config))
+
+    def preload(self) -> None:
+        """
+        Charge les scripts dans le cache de scripts Redis (SCRIPT LOAD).
+        Sans préchargement, le premier appel retombe sur un chargement à la volée.
+        """
+        try:
+            for script in (self._record, self._revoke, self._revoke_all):
+                script.sha = self.redis_client.script_load(script.script)
+        except Exception as e:
+            logging.warning(f'Préchargement des scripts Redis impossible: {e}')
+
+    def expires_at(self) -> int:
+        """
+        Expiration (claim `exp`) d'un token de rafraîchissement émis maintenant.
+        """
+        return int(time.time()) + self.refresh_ttl
+
+    @staticmethod
+    def _score(exp: int, now: float) -> float:
+        # L'expiration du token, plus la milliseconde d'ouverture pour ordonner les sessions
+        # d'une même seconde ; la partie entière reste `exp`, donc la même tranche de révocation
+        return exp + math.floor(now % 1 * 1000) / 1000
+
+    def _record_args(self, sid: str, exp: int) -> list:
+        now = time.time()
+        return [now, self.max_sessions, sid, self._score(exp, now), self.revocation_cache.channel]
+
+    def record(self, user_id: str, sid: str, exp: int) -> int:
+        """
+        Enregistre une nouvelle session dans l'index de l'utilisateur.
+
+        :param sid: Jti du token de rafraîchissement.
+        :param exp: Expiration du token de rafraîchissement (voir expires_at).
+        :return: Le nombre de sessions évincées.
+        """
+        evicted = self._record(keys=[user_sessions_key(user_id)], args=self._record_args(sid, exp))
+        SESSIONS_EVICTED.inc(evicted)
+        return evicted
+
+    def _revoke_args(self, jti: str, exp: int, sid: Optional[str]) -> list:
+        self.revocation_cache.set(jti, True, exp)
+        jtis = [jti]
+        if sid:
+            self.revocation_cache.set(sid, True, exp)
+            jtis.append(sid)
+        message = self.revocation_cache.revocation_message(jtis, exp)
+        return [jti, exp, self.revocation_cache.channel, message, time.time(), sid or '']
+
+    def revoke(self, jti: str, exp: int, user_id: str, sid: Optional[str] = None) -> Any:
+        """
+        Révoque un jti et, s'il est connu, la session dont il dérive ; notifie les autres workers.
+        """
+        return self._revoke(keys=[user_sessions_key(user_id)], args=self._revoke_args(jti, exp, sid))
+
+    def _sessions(self, entries, current: Optional[str]) -> List[Dict[str, Any]]:
+        return [
+            {
+                'session_id': sid,
+                'created_at': int(exp) - self.refresh_ttl,
+                'expires_at': int(exp),
+                'current': sid == current
+            }
+            for sid, exp in entries
+        ]
+
+    def sessions(self, user_id: str, current: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Liste les sessions actives de l'utilisateur, de la plus ancienne à la plus récente.
+        Lecture seule : les sessions expirées non encore élaguées sont filtrées par score.
+        """
+        entries = self.redis_client.zrangebyscore(
+            user_sessions_key(user_id), f'({int(time.time())}', '+inf', withscores=True)
+        return self._sessions(entries, current)
+
+    def revoke_all(self, user_id: str, epoch: float) -> Any:
+        """
+        Avance l'époque de révocation de l'utilisateur et supprime ses sessions.
+        """
+        exp = epoch + self.session_ttl
+        self.revocation_cache.set_epoch(user_id, epoch, float(exp))
+        message = self.revocation_cache.epoch_message(user_id, epoch, exp)
+        return self._revoke_all(
+            keys=[revocation_epoch_key(user_id), user_sessions_key(user_id)],
+            args=[epoch, self.session_ttl, self.revocation_cache.channel, message]
+        )
+
+    def _revocation_pipeline(self, reads: Dict[Tuple[str, str], Any]):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (kind, name), exp in reads.items():
+            if kind == 'jti':
+                self.revocation_store.queue_check(pipe, name, exp)
+            else:
+                pipe.get(revocation_epoch_key(name))
+        return pipe
+
+    def fetch_revocations(self, reads: Dict[Tuple[str, str], Any]) -> List[Any]:
+        """
+        Lit en un seul aller-retour les états demandés par pending_revocations, dans leur ordre :
+        pour ('jti', jti) -> exp, vrai si le jti est révoqué ; pour ('epoch', user_id), l'époque ou None.
+        """
+        return self._revocation_pipeline(reads).execute() if reads else []
+
+
+class AsyncSessionStore(SessionStore):
+    """
+    Variante de SessionStore pour un client redis.asyncio : mêmes scripts, méthodes à attendre.
+    """
+
+    async def preload(self) -> None:
+        try:
+            for script in (self._record, self._revoke, self._revoke_all):
+                script.sha = await self.redis_client.script_load(script.script)
+        except Exception as e:
+            logging.warning(f'Préchargement des scripts Redis impossible: {e}')
+
+    async def record(self, user_id: str, sid: str, exp: int) -> int:
+        evicted = await self._record(keys=[user_sessions_key(user_id)], args=self._record_args(sid, exp))
+        SESSIONS_EVICTED.inc(evicted)
+        return evicted
+
+    async def revoke(self, jti: str, exp: int, user_id: str, sid: Optional[str] = None) -> None:
+        await self._revoke(keys=[user_sessions_key(user_id)], args=self._revoke_args(jti, exp, sid))
+
+    async def sessions(self, user_id: str, current: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = await self.redis_client.zrangebyscore(
+            user_sessions_key(user_id), f'({int(time.time())}', '+inf', withscores=True)
+        return self._sessions(entries, current)
+
+    async def revoke_all(self, user_id: str, epoch: float) -> None:
+        await super().revoke_all(user_id, epoch)
+
+    async def fetch_revocations(self, reads: Dict[Tuple[str, str], Any]) -> List[Any]:
+        return await self._revocation_pipeline(reads).execute() if reads else []
@@ -0,0 +1,169 @@
+# app/services/storage.py
+
+"""
+Moteurs de stockage, choisis par STORAGE_BACKEND :
+
+- 'mongo' : MongoDB (modèle User, derrière le cache de lecture) et Redis ; le moteur de production.
+- 'memory' : structures Python du processus, sans serveur ; pour les tests et les bancs d'essai.
+- 'sqlite' : base SQLite embarquée (SQLITE_PATH), partagée par les workers d'une même machine.
+
+Chaque moteur pose sur l'application trois objets de même interface :
+- app.user_repository : create, find_credentials, find_by_email, update_password_hash ;
+- app.session_store : sessions, révocations et époques (voir SessionStore) ;
+- app.one_time_codes : issue, verify (voir OneTimeCodeStore).
+
+Le freinage des connexions et la file d'envoi des emails sont sur Redis avec 'mongo', dans la base
+avec un fichier SQLite, et en mémoire pour un état propre au processus (voir is_process_local).
+Hors de ce dernier cas, Redis reste requis, même avec SQLite : pub/sub des révocations et des codes
+émis vers les caches des autres workers, et compteurs du limiteur de débit.
+"""
+
+from typing import Any, Dict, Optional
+
+from mongoengine import NotUniqueError
+
+from app.models.user import User
+from app.services.login_throttle import LoginThrottle
+from app.services.one_time_code import OneTimeCodeStore
+from app.services.outbox import EmailOutbox
+from app.services.revocation import RevocationCache, RevocationStore
+from app.services.session import SessionStore
+from app.services.user_cache import CACHED_FIELDS, UserCache
+
+BACKENDS = ('mongo', 'memory', 'sqlite')
+
+
+class DuplicateUserError(Exception):
+    """
+    Nom d'utilisateur ou email déjà pris ; `field` vaut 'username' ou 'email'.
+    """
+
+    def __init__(self, field: str):
+        super().__init__(field)
+        self.field = field
+
+
+class MongoUserRepository:
+    """
+    Utilisateurs dans MongoDB (modèle User), lus à travers le cache de lecture s'il est actif.
+    Les enregistrements renvoyés sont des dict {'_id', 'username', 'email', 'password_hash'}.
+    """
+
+    def __init__(self, user_cache: Optional[UserCache] = None):
+        self.user_cache = user_cache
+
+    @classmethod
+    def from_app(cls, app) -> 'MongoUserRepository':
+        return cls(app.user_cache)
+
+    def create(self, username: str, email: str, password_hash: str) -> str:
+        """
+        Insère un utilisateur ; l'unicité est garantie par les index uniques, sans lecture préalable.
+
+        :return: L'identifiant du nouvel utilisateur.
+        :raises DuplicateUserError: Si le nom d'utilisateur ou l'email est déjà pris.
+        """
+        user = User(username=username, email=email, password_hash=password_hash)
+        try:
+            user.save(force_insert=True)
+        except NotUniqueError as e:
+            field = User.duplicate_key_field(e)
+            if field is None:
+                # Détails de collision indisponibles : on relit le seul champ à départager
+                field = 'username' if User.objects(username=username).only('id').first() else 'email'
+            raise DuplicateUserError(field) from e
+        return str(user.id)
+
+    def find_credentials(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """
+        Recherche un utilisateur par nom d'utilisateur ou email.
+        """
+        if self.user_cache is not None:
+            return self.user_cache.find_by_identifier(identifier)
+        # Lecture allégée : seuls les champs d'authentification sont projetés, sans hydrater de Document
+        return User.find_by_identifier(identifier, only=CACHED_FIELDS, raw=True)
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        if self.user_cache is not None:
+            return self.user_cache.find_by_email(email)
+        return User.objects(email=email).only(*CACHED_FIELDS).as_pymongo().first()
+
+    def update_password_hash(self, record: Dict[str, Any], password_hash: str) -> None:
+        """
+        Remplace le seul champ password_hash, sans charger le document.
+        """
+        User.objects(id=record['_id']).update_one(set__password_hash=password_hash)
+        # Mise à jour directe, sans signal post_save : invalidation explicite
+        if self.user_cache is not None:
+            self.user_cache.invalidate(record['_id'], record['username'], record['email'])
+
+
+def is_process_local(config) -> bool:
+    """
+    Indique si l'état est propre au processus (moteur 'memory' ou base SQLite ':memory:') :
+    aucun autre worker à prévenir, donc aucun serveur Redis.
+    """
+    backend = config.get('STORAGE_BACKEND', 'mongo')
+    return backend == 'memory' or (backend == 'sqlite' and config.get('SQLITE_PATH') == ':memory:')
+
+
+def init_storage(app) -> None:
+    """
+    Pose sur l'application le cache des révocations, les trois stockages du moteur configuré,
+    la file d'envoi des emails et le freinage des connexions.
+    À appeler après la création d'app.redis_client.
+    """
+    backend = app.config.get('STORAGE_BACKEND', 'mongo')
+    if backend not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND inconnu : {backend!r} (attendu : {', '.join(BACKENDS)}).")
+
+    if backend == 'mongo':
+        # Cache local des révocations, invalidé par pub/sub Redis
+        app.revocation_cache = RevocationCache.from_app(app)
+        # Révocations compactes : petits hashes par tranche d'expiration, expirés d'un bloc
+        app.revocation_store = RevocationStore.from_app(app)
+        # Tenue des sessions par scripts Lua (un aller-retour par opération), chargés dans Redis au premier appel
+        app.session_store = SessionStore.from_app(app)
+        # Codes à usage unique : condensat, identifiant et essais restants, vérifiés par un script Lua
+        app.one_time_codes = OneTimeCodeStore.from_app(app)
+        # Cache de lecture des utilisateurs, invalidé par les sauvegardes de User et par pub/sub
+        app.user_cache = UserCache.from_app(app)
+        app.user_repository = MongoUserRepository.from_app(app)
+    elif backend == 'memory':
+        from app.services.storage_memory import (
+            MemoryOneTimeCodeStore, MemorySessionStore, MemoryUserRepository
+        )
+        # État propre au processus : rien à diffuser aux autres workers
+        app.revocation_cache = RevocationCache.from_app(app, standalone=True)
+        app.revocation_store = None
+        app.session_store = MemorySessionStore.from_app(app)
+        app.one_time_codes = MemoryOneTimeCodeStore.from_app(app)
+        app.user_cache = None
+        app.user_repository = MemoryUserRepository()
+    else:
+        from app.services.storage_sqlite import (
+            SQLiteDatabase, SQLiteEmailOutbox, SQLiteLoginThrottle, SQLiteOneTimeCodeStore,
+            SQLiteSessionStore, SQLiteUserRepository
+        )
+        database = SQLiteDatabase(app.config.get('SQLITE_PATH', 'auth_service.db'))
+        # Les révocations restent diffusées par pub/sub Redis aux autres workers, s'il y en a
+        app.revocation_cache = RevocationCache.from_app(app, standalone=is_process_local(app.config))
+        app.revocation_store = None
+        app.session_store = SQLiteSessionStore.from_app(app, database)
+        app.one_time_codes = SQLiteOneTimeCodeStore.from_app(app, database)
+        app.user_cache = None
+        app.user_repository = SQLiteUserRepository(database)
+        if not is_process_local(app.config):
+            # Freinage et file d'envoi dans la base partagée (worker : SQLiteMailDispatcher)
+            app.email_outbox = SQLiteEmailOutbox.from_app(app, database)
+            app.login_throttle = SQLiteLoginThrottle.from_app(app, database)
+
+    if is_process_local(app.config):
+        from app.services.storage_memory import MemoryEmailOutbox, MemoryLoginThrottle
+        app.email_outbox = MemoryEmailOutbox.from_app(app)
+        app.login_throttle = MemoryLoginThrottle.from_app(app)
+    elif backend == 'mongo':
+        # File d'envoi durable des emails, traitée par le worker app.workers.mailer
+        app.email_outbox = EmailOutbox.from_app(app)
+        # Freinage des connexions par identifiant, vérifié avant la lecture de l'utilisateur et bcrypt
+        app.login_throttle = LoginThrottle.from_app(app)
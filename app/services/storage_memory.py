@@ -0,0 +1,335 @@
+# app/services/storage_memory.py
+
+"""
+Moteur de stockage en mémoire (STORAGE_BACKEND='memory') : utilisateurs, sessions, révocations
+et codes à usage unique dans des structures Python du processus, protégées par un verrou.
+
+Rien n'est partagé entre processus : un seul worker, pour les tests et les bancs d'essai. Les règles
+sont celles des scripts Lua du moteur Redis (élagage et éviction des sessions, époques croissantes,
+essais décomptés).
+
+Le freinage des connexions et la file d'envoi des emails ont aussi leur variante en mémoire, et le
+limiteur de débit compte en mémoire (memory://) : aucun serveur Redis n'est requis. Ces variantes
+servent aussi à une base SQLite ':memory:', elle aussi propre au processus (voir is_process_local).
+Le trousseau de clés de signature reste dans MongoDB : JWT_ALGORITHM='HS256' pour s'en passer.
+"""
+
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.login_throttle import LoginThrottle
+from app.services.metrics import LOGIN_FAILURES, LOGIN_THROTTLED, ONE_TIME_CODE_VERIFICATIONS, SESSIONS_EVICTED
+from app.services.one_time_code import EXPIRED, OneTimeCodeStore
+from app.services.outbox import EmailOutbox
+from app.services.session import SessionStore
+from app.services.storage import DuplicateUserError
+
+
+class MemoryUserRepository:
+    """
+    Utilisateurs en mémoire, indexés par identifiant, nom d'utilisateur et email.
+    Les enregistrements renvoyés sont des copies, de même forme que ceux de MongoUserRepository.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._ids = {'username': {}, 'email': {}}
+        self._lock = threading.Lock()
+
+    def create(self, username: str, email: str, password_hash: str) -> str:
+        with self._lock:
+            for field, value in (('username', username), ('email', email)):
+                if value in self._ids[field]:
+                    raise DuplicateUserError(field)
+            user_id = uuid.uuid4().hex
+            self._users[user_id] = {'_id': user_id, 'username': username, 'email': email,
+                                    'password_hash': password_hash}
+            self._ids['username'][username] = user_id
+            self._ids['email'][email] = user_id
+        return user_id
+
+    def _find(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            user_id = self._ids[field].get(value)
+            return dict(self._users[user_id]) if user_id is not None else None
+
+    def find_credentials(self, identifier: str) -> Optional[Dict[str, Any]]:
+        # Les noms d'utilisateur ne contiennent pas '@' (voir User.find_by_identifier)
+        return self._find('email' if '@' in identifier else 'username', identifier)
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._find('email', email)
+
+    def update_password_hash(self, record: Dict[str, Any], password_hash: str) -> None:
+        with self._lock:
+            user = self._users.get(str(record['_id']))
+            if user is not None:
+                user['password_hash'] = password_hash
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions et révocations en mémoire, avec l'interface de SessionStore.
+
+    Les jti révoqués sont regroupés par tranche d'expiration, comme dans RevocationStore :
+    une tranche est oubliée d'un bloc une fois tous ses tokens expirés.
+    """
+
+    def __init__(self, revocation_cache, session_ttl: int, refresh_ttl: int = None,
+                 max_sessions: int = 10, bucket_seconds: int = 3600):
+        self.revocation_cache = revocation_cache
+        self.session_ttl = session_ttl
+        self.refresh_ttl = refresh_ttl or session_ttl
+        self.max_sessions = max_sessions
+        self.bucket_seconds = bucket_seconds
+        # {user_id: {sid: score}}, {tranche: {jti}}, {user_id: (époque, fin de validité)}
+        self._index = {}
+        self._revoked = {}
+        self._epochs = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app) -> 'MemorySessionStore':
+        return cls(app.revocation_cache,
+                   bucket_seconds=int(app.config.get('REVOCATION_BUCKET_SECONDS', 3600)),
+                   **cls.options_from_config(app.config))
+
+    def preload(self) -> None:
+        pass
+
+    def _add_revoked(self, jti: str, exp: float, now: float) -> None:
+        # Appelé sous le verrou ; les tranches entièrement expirées sont purgées au passage
+        if exp <= now:
+            return
+        self._revoked.setdefault(int(exp) // self.bucket_seconds, set()).add(jti)
+        current = int(now) // self.bucket_seconds
+        for bucket in [b for b in self._revoked if b < current]:
+            del self._revoked[bucket]
+
+    def record(self, user_id: str, sid: str, exp: int) -> int:
+        now = time.time()
+        evicted = []
+        with self._lock:
+            sessions = {s: score for s, score in self._index.get(user_id, {}).items() if score > now}
+            sessions[sid] = self._score(exp, now)
+            if 0 < self.max_sessions < len(sessions):
+                for old in sorted(sessions, key=lambda s: (sessions[s], s))[:len(sessions) - self.max_sessions]:
+                    evicted.append((old, sessions.pop(old)))
+                    self._add_revoked(old, evicted[-1][1], now)
+            self._index[user_id] = sessions
+        for old, score in evicted:
+            self.revocation_cache.set(old, True, int(score))
+        SESSIONS_EVICTED.inc(len(evicted))
+        return len(evicted)
+
+    def revoke(self, jti: str, exp: int, user_id: str, sid: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._add_revoked(jti, exp, now)
+            if sid:
+                score = self._index.get(user_id, {}).pop(sid, None)
+                if score is not None:
+                    self._add_revoked(sid, score, now)
+        self.revocation_cache.set(jti, True, exp)
+        if sid:
+            self.revocation_cache.set(sid, True, exp)
+
+    def sessions(self, user_id: str, current: Optional[str] = None) -> List[Dict[str, Any]]:
+        now = int(time.time())
+        with self._lock:
+            entries = sorted(((sid, score) for sid, score in self._index.get(user_id, {}).items() if score > now),
+                             key=lambda entry: (entry[1], entry[0]))
+        return self._sessions(entries, current)
+
+    def revoke_all(self, user_id: str, epoch: float) -> None:
+        exp = epoch + self.session_ttl
+        with self._lock:
+            current = self._epochs.get(user_id)
+            if current is None or current[1] <= time.time() or current[0] < epoch:
+                self._epochs[user_id] = (epoch, exp)
+            self._index.pop(user_id, None)
+        self.revocation_cache.set_epoch(user_id, epoch, float(exp))
+
+    def fetch_revocations(self, reads: Dict[Tuple[str, str], Any]) -> List[Any]:
+        now = time.time()
+        values = []
+        with self._lock:
+            for (kind, name), exp in reads.items():
+                if kind == 'jti':
+                    values.append(name in self._revoked.get(int(exp) // self.bucket_seconds, ()))
+                else:
+                    epoch = self._epochs.get(name)
+                    values.append(epoch[0] if epoch is not None and epoch[1] > now else None)
+        return values
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Renvoie la taille des structures (sessions indexées, jti révoqués, époques).
+        """
+        with self._lock:
+            return {
+                'sessions': sum(len(sessions) for sessions in self._index.values()),
+                'revoked': sum(len(jtis) for jtis in self._revoked.values()),
+                'epochs': len(self._epochs)
+            }
+
+
+class MemoryOneTimeCodeStore(OneTimeCodeStore):
+    """
+    Codes à usage unique en mémoire, avec l'interface d'OneTimeCodeStore.
+    Les entrées sont rangées par date d'émission : les expirées sont purgées en tête à chaque émission.
+    """
+
+    def __init__(self, secret: str, expiration: int = 600, max_attempts: int = 5,
+                 miss_ttl: float = 5.0, max_size: int = 10000, channel: str = None):
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.expiration = expiration
+        self.max_attempts = max_attempts
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        # Processus unique : aucune émission à annoncer
+        self.channel = channel
+        self._misses = OrderedDict()
+        self._lock = threading.Lock()
+        # {email: [condensat, identifiant, essais restants, fin de validité]}
+        self._codes = OrderedDict()
+
+    @classmethod
+    def from_app(cls, app) -> 'MemoryOneTimeCodeStore':
+        return cls(app.config['SECRET_KEY'], **cls.options_from_config(app.config))
+
+    def issue(self, email: str, user_id: str, code: str) -> None:
+        fields = self._fields(email, user_id, code)
+        now = time.monotonic()
+        with self._lock:
+            self._codes.pop(email, None)
+            while self._codes and next(iter(self._codes.values()))[3] <= now:
+                self._codes.popitem(last=False)
+            self._codes[email] = [fields['h'], fields['uid'], fields['a'], now + self.expiration]
+
+    def verify(self, email: str, code: str) -> Tuple[str, Optional[str], int]:
+        if self._missed(email):
+            ONE_TIME_CODE_VERIFICATIONS.labels('local', EXPIRED).inc()
+            return EXPIRED, None, 0
+        digest = self.digest(email, code)
+        with self._lock:
+            # Même logique que VERIFY_SCRIPT, sous le verrou
+            entry = self._codes.get(email)
+            if entry is None or entry[3] <= time.monotonic():
+                self._codes.pop(email, None)
+                result = [0]
+            elif entry[0] == digest:
+                del self._codes[email]
+                result = [1, entry[1]]
+            else:
+                entry[2] -= 1
+                if entry[2] <= 0:
+                    del self._codes[email]
+                result = [-1, entry[2]]
+        return self._settle(email, result, source='memory')
+
+
+class MemoryLoginThrottle(LoginThrottle):
+    """
+    Freinage des connexions en mémoire, avec l'interface de LoginThrottle et les règles de
+    RECORD_FAILURE_SCRIPT. Les `local_size` identifiants les plus récemment en échec sont suivis.
+    """
+
+    def __init__(self, free_attempts: int = 5, base_delay: int = 1, max_delay: int = 900,
+                 window: int = 900, local_size: int = 10000):
+        self.free_attempts = free_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window = window
+        self.local_size = local_size
+        self.prefix = 'login_throttle'
+        self._lock = threading.Lock()
+        # {clé: [échecs, bloqué jusqu'à, fin de rétention]}
+        self._states = OrderedDict()
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> Optional['MemoryLoginThrottle']:
+        if not app.config.get('LOGIN_THROTTLE_ENABLED', True):
+            return None
+        return cls(**cls.options_from_config(app.config))
+
+    def _state(self, key: str, now: float) -> Optional[list]:
+        # Appelé sous le verrou ; un état dont la rétention est écoulée est oublié
+        state = self._states.get(key)
+        if state is not None and state[2] <= now:
+            del self._states[key]
+            return None
+        return state
+
+    def check(self, identifier: str) -> Tuple[int, bool]:
+        key, now = self.key(identifier), time.time()
+        with self._lock:
+            state = self._state(key, now)
+        if state is None:
+            return 0, False
+        if state[1] > now:
+            LOGIN_THROTTLED.labels('local').inc()
+            return math.ceil(state[1] - now), True
+        return 0, True
+
+    def record_failure(self, identifier: str, *aliases: str) -> int:
+        now = time.time()
+        LOGIN_FAILURES.inc()
+        result = 0
+        with self._lock:
+            for key in self.keys(identifier, aliases):
+                state = self._state(key, now) or [0, 0, 0]
+                state[0] += 1
+                excess = state[0] - self.free_attempts
+                if excess > 0:
+                    state[1] = int(now) + math.ceil(min(self.base_delay * 2 ** (excess - 1), self.max_delay))
+                state[2] = now + max(self.window, state[1] - now)
+                result = max(result, state[1])
+                self._states[key] = state
+                self._states.move_to_end(key)
+            while len(self._states) > max(self.local_size, 1):
+                self._states.popitem(last=False)
+        return math.ceil(result - now) if result > now else 0
+
+    def reset(self, identifier: str, *aliases: str) -> None:
+        with self._lock:
+            for key in self.keys(identifier, aliases):
+                self._states.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {'blocked_keys': sum(1 for state in self._states.values() if state[1] > now)}
+
+
+class MemoryEmailOutbox(EmailOutbox):
+    """
+    File d'envoi des emails en mémoire, avec l'interface d'EmailOutbox : aucun envoi SMTP ni worker.
+    Les derniers `max_pending` messages déposés sont conservés pour inspection ; la file ne sature jamais.
+    """
+
+    def __init__(self, max_pending: int = 10000):
+        self.max_pending = max_pending
+        self.messages = deque(maxlen=max_pending or None)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app, redis_client=None) -> 'MemoryEmailOutbox':
+        return cls(max_pending=int(app.config.get('MAIL_OUTBOX_MAX_PENDING', 10000)))
+
+    def enqueue(self, subject: str, recipients: Iterable[str], body: str,
+                sender: Optional[str] = None) -> str:
+        fields = self.message_fields(subject, recipients, body, sender)
+        with self._lock:
+            self.messages.append(fields)
+            return f'{int(time.time() * 1000)}-{next(self._ids)}'
+
+    def backlog(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'queued': len(self.messages), 'pending': 0, 'dead': 0}
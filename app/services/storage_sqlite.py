@@ -0,0 +1,499 @@
+# app/services/storage_sqlite.py
+
+"""
+Moteur de stockage SQLite (STORAGE_BACKEND='sqlite') : utilisateurs, sessions, révocations
+et codes à usage unique dans une base embarquée (SQLITE_PATH).
+
+Un fichier est partagé par les workers d'une même machine (journal WAL, écritures en
+BEGIN IMMEDIATE) ; ':memory:' donne une base propre au processus.
+
+Avec un fichier, le freinage des connexions et la file d'envoi des emails sont aussi dans la base
+(SQLiteLoginThrottle, SQLiteEmailOutbox, traitée par SQLiteMailDispatcher), mais Redis reste
+requis : les révocations et les émissions de codes sont diffusées aux caches des autres workers
+par son canal pub/sub, et le limiteur de débit y compte les requêtes (RATELIMIT_STORAGE_URI).
+Seule une base ':memory:' se passe de Redis (voir is_process_local).
+"""
+
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.services.login_throttle import LoginThrottle
+from app.services.metrics import LOGIN_FAILURES, ONE_TIME_CODE_VERIFICATIONS, SESSIONS_EVICTED
+from app.services.one_time_code import EXPIRED, OneTimeCodeStore
+from app.services.outbox import EmailOutbox, OutboxFull
+from app.services.session import SessionStore
+from app.services.storage import DuplicateUserError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    sid TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (user_id, sid)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    expires_at INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at ON revoked_tokens (expires_at);
+CREATE TABLE IF NOT EXISTS revocation_epochs (
+    user_id TEXT PRIMARY KEY,
+    epoch REAL NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS one_time_codes (
+    email TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS login_throttle (
+    key TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    blocked_until INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS login_throttle_expires_at ON login_throttle (expires_at);
+CREATE TABLE IF NOT EXISTS mail_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fields TEXT NOT NULL,
+    deliveries INTEGER NOT NULL DEFAULT 0,
+    consumer TEXT,
+    delivered_at REAL,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS mail_outbox_state ON mail_outbox (dead, deliveries, id);
+"""
+
+
+class SQLiteDatabase:
+    """
+    Connexion SQLite du processus, ouverte au premier usage (après le fork des workers)
+    et partagée par ses threads sous un verrou.
+    """
+
+    def __init__(self, path: str, busy_timeout: int = 5000):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connection = None
+        self._pid = None
+        self._lock = threading.RLock()
+
+    def connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if self._connection is None or self._pid != pid:
+            # Mode autocommit : les transactions sont ouvertes explicitement par transaction()
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            if self.path != ':memory:':
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.execute('PRAGMA synchronous=NORMAL')
+                connection.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+            connection.executescript(SCHEMA)
+            self._connection, self._pid = connection, pid
+        return self._connection
+
+    def query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self.reading() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    @contextmanager
+    def reading(self):
+        """
+        Connexion réservée au thread courant, pour enchaîner plusieurs lectures.
+        """
+        with self._lock:
+            yield self.connection()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Transaction en écriture : le verrou d'écriture est pris dès BEGIN IMMEDIATE,
+        les lectures qui suivent voient donc un état que personne ne modifie.
+        """
+        with self._lock:
+            connection = self.connection()
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield connection
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+
+class SQLiteUserRepository:
+    """
+    Utilisateurs dans la table users ; l'unicité est garantie par ses contraintes UNIQUE.
+    """
+
+    def __init__(self, database: SQLiteDatabase):
+        self.database = database
+
+    def create(self, username: str, email: str, password_hash: str) -> str:
+        user_id = uuid.uuid4().hex
+        try:
+            with self.database.transaction() as connection:
+                connection.execute('INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+                                   (user_id, username, email, password_hash))
+        except sqlite3.IntegrityError as e:
+            # « UNIQUE constraint failed: users.username »
+            raise DuplicateUserError(str(e).rsplit('.', 1)[-1]) from e
+        return user_id
+
+    def _find(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        rows = self.database.query(
+            f'SELECT id, username, email, password_hash FROM users WHERE {field} = ?', (value,))
+        if not rows:
+            return None
+        return dict(zip(('_id', 'username', 'email', 'password_hash'), rows[0]))
+
+    def find_credentials(self, identifier: str) -> Optional[Dict[str, Any]]:
+        # Les noms d'utilisateur ne contiennent pas '@' (voir User.find_by_identifier)
+        return self._find('email' if '@' in identifier else 'username', identifier)
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._find('email', email)
+
+    def update_password_hash(self, record: Dict[str, Any], password_hash: str) -> None:
+        with self.database.transaction() as connection:
+            connection.execute('UPDATE users SET password_hash = ? WHERE id = ?', (password_hash, str(record['_id'])))
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions et révocations dans SQLite, avec l'interface de SessionStore.
+    Chaque écriture est une transaction ; les jti révoqués expirés sont purgés au passage.
+    """
+
+    def __init__(self, database: SQLiteDatabase, revocation_cache, session_ttl: int,
+                 refresh_ttl: int = None, max_sessions: int = 10):
+        self.database = database
+        self.revocation_cache = revocation_cache
+        self.session_ttl = session_ttl
+        self.refresh_ttl = refresh_ttl or session_ttl
+        self.max_sessions = max_sessions
+
+    @classmethod
+    def from_app(cls, app, database: SQLiteDatabase) -> 'SQLiteSessionStore':
+        return cls(database, app.revocation_cache, **cls.options_from_config(app.config))
+
+    def preload(self) -> None:
+        self.database.connection()
+
+    @staticmethod
+    def _revoke_rows(connection, rows, now: float) -> None:
+        connection.execute('DELETE FROM revoked_tokens WHERE expires_at <= ?', (int(now),))
+        connection.executemany('INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)',
+                               [(jti, int(exp)) for jti, exp in rows if exp > now])
+
+    def record(self, user_id: str, sid: str, exp: int) -> int:
+        now = time.time()
+        with self.database.transaction() as connection:
+            connection.execute('DELETE FROM sessions WHERE user_id = ? AND expires_at <= ?', (user_id, now))
+            connection.execute('INSERT OR REPLACE INTO sessions (user_id, sid, expires_at) VALUES (?, ?, ?)',
+                               (user_id, sid, self._score(exp, now)))
+            evicted = []
+            if self.max_sessions > 0:
+                # Au-delà du maximum, les sessions les plus anciennes sont évincées et leur token révoqué
+                evicted = connection.execute(
+                    'SELECT sid, expires_at FROM sessions WHERE user_id = ? '
+                    'ORDER BY expires_at DESC, sid DESC LIMIT -1 OFFSET ?',
+                    (user_id, self.max_sessions)).fetchall()
+                connection.executemany('DELETE FROM sessions WHERE user_id = ? AND sid = ?',
+                                       [(user_id, old) for old, _ in evicted])
+                if evicted:
+                    self._revoke_rows(connection, evicted, now)
+        for old, score in evicted:
+            self.revocation_cache.publish([old], int(score))
+        SESSIONS_EVICTED.inc(len(evicted))
+        return len(evicted)
+
+    def revoke(self, jti: str, exp: int, user_id: str, sid: Optional[str] = None) -> None:
+        now = time.time()
+        rows = [(jti, exp)]
+        with self.database.transaction() as connection:
+            if sid:
+                session = connection.execute('SELECT expires_at FROM sessions WHERE user_id = ? AND sid = ?',
+                                             (user_id, sid)).fetchone()
+                if session is not None:
+                    rows.append((sid, session[0]))
+                    connection.execute('DELETE FROM sessions WHERE user_id = ? AND sid = ?', (user_id, sid))
+            self._revoke_rows(connection, rows, now)
+        self.revocation_cache.publish([jti, sid] if sid else [jti], exp)
+
+    def sessions(self, user_id: str, current: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = self.database.query(
+            'SELECT sid, expires_at FROM sessions WHERE user_id = ? AND expires_at > ? ORDER BY expires_at, sid',
+            (user_id, int(time.time())))
+        return self._sessions(entries, current)
+
+    def revoke_all(self, user_id: str, epoch: float) -> None:
+        exp = epoch + self.session_ttl
+        with self.database.transaction() as connection:
+            connection.execute('DELETE FROM revocation_epochs WHERE expires_at <= ?', (int(time.time()),))
+            # Une époque ne peut qu'augmenter
+            connection.execute(
+                'INSERT INTO revocation_epochs (user_id, epoch, expires_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (user_id) DO UPDATE SET epoch = excluded.epoch, expires_at = excluded.expires_at '
+                'WHERE excluded.epoch > revocation_epochs.epoch',
+                (user_id, epoch, exp))
+            connection.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+        self.revocation_cache.set_epoch(user_id, epoch, float(exp))
+        if self.revocation_cache.redis_client is not None:
+            self.revocation_cache.redis_client.publish(
+                self.revocation_cache.channel, self.revocation_cache.epoch_message(user_id, epoch, exp))
+
+    def fetch_revocations(self, reads: Dict[Tuple[str, str], Any]) -> List[Any]:
+        now = int(time.time())
+        values = []
+        with self.database.reading() as connection:
+            for (kind, name), exp in reads.items():
+                if kind == 'jti':
+                    row = connection.execute('SELECT 1 FROM revoked_tokens WHERE jti = ?', (name,)).fetchone()
+                    values.append(row is not None)
+                else:
+                    row = connection.execute(
+                        'SELECT epoch FROM revocation_epochs WHERE user_id = ? AND expires_at > ?',
+                        (name, now)).fetchone()
+                    values.append(row[0] if row is not None else None)
+        return values
+
+
+class SQLiteOneTimeCodeStore(OneTimeCodeStore):
+    """
+    Codes à usage unique dans la table one_time_codes, avec l'interface d'OneTimeCodeStore.
+    La vérification est une transaction : lecture, comparaison, décompte et consommation.
+    """
+
+    def __init__(self, database: SQLiteDatabase, secret: str, expiration: int = 600, max_attempts: int = 5,
+                 miss_ttl: float = 5.0, max_size: int = 10000, channel: str = 'one_time_code_issues',
+                 redis_client=None):
+        self.database = database
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.expiration = expiration
+        self.max_attempts = max_attempts
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        self.channel = channel
+        self.redis_client = redis_client
+        self._misses = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app, database: SQLiteDatabase) -> 'SQLiteOneTimeCodeStore':
+        # Les émissions sont annoncées aux autres workers par le même client que les révocations
+        store = cls(database, app.config['SECRET_KEY'], redis_client=app.revocation_cache.redis_client,
+                    **cls.options_from_config(app.config))
+        app.revocation_cache.subscribe(store.channel, store._handle_message)
+        return store
+
+    def issue(self, email: str, user_id: str, code: str) -> None:
+        fields = self._fields(email, user_id, code)
+        now = time.time()
+        with self.database.transaction() as connection:
+            connection.execute('DELETE FROM one_time_codes WHERE expires_at <= ?', (now,))
+            connection.execute(
+                'INSERT OR REPLACE INTO one_time_codes (email, digest, user_id, attempts, expires_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (email, fields['h'], fields['uid'], fields['a'], now + self.expiration))
+        if self.redis_client is not None:
+            self.redis_client.publish(self.channel, email)
+
+    def verify(self, email: str, code: str) -> Tuple[str, Optional[str], int]:
+        if self._missed(email):
+            ONE_TIME_CODE_VERIFICATIONS.labels('local', EXPIRED).inc()
+            return EXPIRED, None, 0
+        digest = self.digest(email, code)
+        with self.database.transaction() as connection:
+            # Même logique que VERIFY_SCRIPT, dans une transaction
+            entry = connection.execute(
+                'SELECT digest, user_id, attempts, expires_at FROM one_time_codes WHERE email = ?',
+                (email,)).fetchone()
+            if entry is None or entry[3] <= time.time():
+                connection.execute('DELETE FROM one_time_codes WHERE email = ?', (email,))
+                result = [0]
+            elif entry[0] == digest:
+                connection.execute('DELETE FROM one_time_codes WHERE email = ?', (email,))
+                result = [1, entry[1]]
+            elif entry[2] <= 1:
+                connection.execute('DELETE FROM one_time_codes WHERE email = ?', (email,))
+                result = [-1, 0]
+            else:
+                connection.execute('UPDATE one_time_codes SET attempts = attempts - 1 WHERE email = ?', (email,))
+                result = [-1, entry[2] - 1]
+        return self._settle(email, result, source='sqlite')
+
+
+class SQLiteLoginThrottle(LoginThrottle):
+    """
+    Freinage des connexions dans la table login_throttle, avec l'interface de LoginThrottle et les
+    règles de RECORD_FAILURE_SCRIPT. Comme avec Redis, les blocages lus ou posés sont retenus
+    localement jusqu'à leur échéance ; une erreur SQLite laisse passer la tentative.
+    """
+
+    def __init__(self, database: SQLiteDatabase, free_attempts: int = 5, base_delay: int = 1,
+                 max_delay: int = 900, window: int = 900, local_size: int = 10000,
+                 prefix: str = 'login_throttle'):
+        self.database = database
+        self.free_attempts = free_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.window = window
+        self.local_size = local_size
+        self.prefix = prefix
+        self._blocked = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_app(cls, app, database: SQLiteDatabase) -> Optional['SQLiteLoginThrottle']:
+        if not app.config.get('LOGIN_THROTTLE_ENABLED', True):
+            return None
+        return cls(database, **cls.options_from_config(app.config))
+
+    def check(self, identifier: str) -> Tuple[int, bool]:
+        key, now = self.key(identifier), time.time()
+        retry_after = self._local(key, now)
+        if retry_after:
+            return retry_after, True
+        try:
+            rows = self.database.query(
+                'SELECT failures, blocked_until FROM login_throttle WHERE key = ? AND expires_at > ?', (key, now))
+        except sqlite3.Error as e:
+            logging.error(f'Erreur lors de la lecture du freinage des connexions: {e}')
+            return 0, False
+        return self._checked(key, rows[0] if rows else (None, None), now, source='sqlite')
+
+    def record_failure(self, identifier: str, *aliases: str) -> int:
+        keys, now = self.keys(identifier, aliases), time.time()
+        LOGIN_FAILURES.inc()
+        result = 0
+        try:
+            with self.database.transaction() as connection:
+                connection.execute('DELETE FROM login_throttle WHERE expires_at <= ?', (now,))
+                # Même logique que RECORD_FAILURE_SCRIPT, dans une transaction
+                for key in keys:
+                    row = connection.execute('SELECT failures, blocked_until FROM login_throttle WHERE key = ?',
+                                             (key,)).fetchone()
+                    failures, blocked_until = (row[0] + 1, row[1]) if row else (1, 0)
+                    excess = failures - self.free_attempts
+                    if excess > 0:
+                        blocked_until = int(now) + math.ceil(min(self.base_delay * 2 ** (excess - 1), self.max_delay))
+                    connection.execute(
+                        'INSERT OR REPLACE INTO login_throttle (key, failures, blocked_until, expires_at) '
+                        'VALUES (?, ?, ?, ?)',
+                        (key, failures, blocked_until, now + max(self.window, blocked_until - now)))
+                    result = max(result, blocked_until)
+        except sqlite3.Error as e:
+            logging.error(f'Erreur lors de l\'enregistrement d\'un échec de connexion: {e}')
+            return 0
+        return self._remember(keys, result, now)
+
+    def reset(self, identifier: str, *aliases: str) -> None:
+        keys = self.keys(identifier, aliases)
+        self._forget(keys)
+        try:
+            with self.database.transaction() as connection:
+                connection.executemany('DELETE FROM login_throttle WHERE key = ?', [(key,) for key in keys])
+        except sqlite3.Error as e:
+            logging.error(f'Erreur lors de la réinitialisation du freinage des connexions: {e}')
+
+
+class SQLiteEmailOutbox(EmailOutbox):
+    """
+    File d'envoi durable des emails dans la table mail_outbox, avec l'interface d'EmailOutbox.
+
+    Les lignes tiennent lieu d'entrées du flux et de leur suivi par le groupe de consommateurs :
+    nombre de remises, consommateur et date de la dernière remise, abandon. Le worker
+    SQLiteMailDispatcher les lit et les acquitte par les méthodes ci-dessous.
+    """
+
+    def __init__(self, database: SQLiteDatabase, max_pending: int = 10000):
+        self.database = database
+        self.stream = 'mail_outbox'
+        self.max_pending = max_pending
+
+    @classmethod
+    def from_app(cls, app, database: SQLiteDatabase) -> 'SQLiteEmailOutbox':
+        return cls(database, max_pending=int(app.config.get('MAIL_OUTBOX_MAX_PENDING', 10000)))
+
+    def enqueue(self, subject: str, recipients: Iterable[str], body: str,
+                sender: Optional[str] = None) -> str:
+        fields = json.dumps(self.message_fields(subject, recipients, body, sender))
+        with self.database.transaction() as connection:
+            if self.max_pending > 0:
+                queued = connection.execute('SELECT COUNT(*) FROM mail_outbox WHERE dead = 0').fetchone()[0]
+                if queued >= self.max_pending:
+                    raise OutboxFull()
+            message_id = connection.execute('INSERT INTO mail_outbox (fields) VALUES (?)', (fields,)).lastrowid
+        return str(message_id)
+
+    @staticmethod
+    def _deliver(connection, rows, consumer: str, now: float) -> List[Tuple[str, Dict[str, str]]]:
+        connection.executemany(
+            'UPDATE mail_outbox SET deliveries = deliveries + 1, consumer = ?, delivered_at = ? WHERE id = ?',
+            [(consumer, now, message_id) for message_id, _ in rows])
+        return [(str(message_id), json.loads(fields)) for message_id, fields in rows]
+
+    def read_new(self, consumer: str, count: int) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        Remet à `consumer` jusqu'à `count` messages jamais lus (XREADGROUP avec '>').
+        """
+        with self.database.transaction() as connection:
+            rows = connection.execute(
+                'SELECT id, fields FROM mail_outbox WHERE dead = 0 AND deliveries = 0 ORDER BY id LIMIT ?',
+                (count,)).fetchall()
+            return self._deliver(connection, rows, consumer, time.time())
+
+    def claim_stale(self, consumer: str, count: int, min_idle: float,
+                    max_attempts: int) -> Tuple[List[Tuple[str, Dict[str, str]]], List[Tuple[str, Dict[str, str]]]]:
+        """
+        Reprend les messages remis depuis plus de `min_idle` secondes et non acquittés (XPENDING puis XCLAIM).
+
+        :return: Les messages à retenter, puis ceux qui ont épuisé leurs `max_attempts` tentatives.
+        """
+        now = time.time()
+        with self.database.transaction() as connection:
+            rows = connection.execute(
+                'SELECT id, fields, deliveries FROM mail_outbox '
+                'WHERE dead = 0 AND deliveries > 0 AND delivered_at <= ? ORDER BY id LIMIT ?',
+                (now - min_idle, count)).fetchall()
+            retry = self._deliver(connection, [row[:2] for row in rows if row[2] < max_attempts], consumer, now)
+        exhausted = [(str(message_id), json.loads(fields)) for message_id, fields, deliveries in rows
+                     if deliveries >= max_attempts]
+        return retry, exhausted
+
+    def acknowledge(self, message_ids: List[str]) -> None:
+        """
+        Retire de la file les messages envoyés.
+        """
+        with self.database.transaction() as connection:
+            connection.executemany('DELETE FROM mail_outbox WHERE id = ?', [(int(i),) for i in message_ids])
+
+    def abandon(self, message_ids: List[str]) -> None:
+        """
+        Marque des messages comme abandonnés : ils restent dans la table, hors de la file.
+        """
+        with self.database.transaction() as connection:
+            connection.executemany('UPDATE mail_outbox SET dead = 1 WHERE id = ?', [(int(i),) for i in message_ids])
+
+    def backlog(self) -> Dict[str, Any]:
+        queued, pending, dead = self.database.query(
+            'SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 0 AND deliveries > 0), 0), '
+            'COALESCE(SUM(dead), 0) FROM mail_outbox')[0]
+        return {'queued': queued, 'pending': pending, 'dead': dead}
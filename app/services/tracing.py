@@ -0,0 +1,550 @@
+# app/services/tracing.py
+
+"""
+Traçage léger des requêtes : un span par requête HTTP, des spans enfants par méthode de service
+et par appel aux dépendances (MongoDB, Redis, hachage, JWT, SMTP).
+
+- Contexte W3C Trace Context : l'en-tête `traceparent` entrant est prolongé, et le contexte
+  courant est transmis aux emails de la file d'envoi (le worker SMTP poursuit la trace).
+- Échantillonnage en tête : la décision est prise une fois, à la racine (drapeau `sampled`
+  du parent, sinon TRACING_SAMPLE_RATIO appliqué à l'identifiant de trace) ; une requête non
+  échantillonnée ne crée aucun span enfant.
+- Export par lots au format OTLP/JSON, par un thread de fond : vers un fichier (une ligne par lot)
+  ou un collecteur local (OTLP/HTTP). La file est bornée : si elle est pleine, les spans sont
+  abandonnés plutôt que de ralentir les requêtes.
+"""
+
+import inspect
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import g, request
+from pymongo import monitoring
+
+# Types de span OTLP
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_CONSUMER = 5
+
+# Statuts de span OTLP
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+TRACEPARENT_REGEX = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(-.*)?$')
+
+# Dépendances appelées sur le réseau : spans de type client, système selon les conventions OpenTelemetry
+DEPENDENCY_SYSTEMS = {'mongo': 'mongodb', 'redis': 'redis', 'smtp': 'smtp'}
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    Opération tracée. Seuls les spans échantillonnés sont exportés ; un span racine non
+    échantillonné ne sert qu'à propager la décision (drapeau `sampled` à 0).
+    """
+
+    __slots__ = ('tracer', 'trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes',
+                 'start_ns', 'end_ns', 'status', 'sampled', '_previous', '_active')
+
+    def __init__(self, tracer: 'Tracer', trace_id: int, parent_id: Optional[int], name: str,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+                 sampled: bool = True):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = random.getrandbits(64) or 1
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = STATUS_UNSET
+        self.sampled = sampled
+        self._previous = None
+        self._active = False
+
+    @property
+    def traceparent(self) -> str:
+        """
+        En-tête W3C `traceparent` désignant ce span comme parent.
+        """
+        return f"00-{self.trace_id:032x}-{self.span_id:016x}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_status_code(self, status_code: int) -> None:
+        """
+        Enregistre le statut HTTP de la réponse ; les réponses 5xx sont marquées en erreur.
+        """
+        self.attributes['http.response.status_code'] = status_code
+        if status_code >= 500:
+            self.status = STATUS_ERROR
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = STATUS_ERROR
+        self.attributes['exception.type'] = type(exc).__name__
+        self.attributes['exception.message'] = str(exc)[:256]
+
+    def activate(self) -> 'Span':
+        """
+        Fait de ce span le span courant (parent des spans ouverts ensuite dans le même contexte).
+        """
+        self._previous = _current_span.get()
+        self._active = True
+        _current_span.set(self)
+        return self
+
+    def end(self, exc: Optional[BaseException] = None, end_ns: Optional[int] = None) -> None:
+        """
+        Termine le span, restaure le span courant précédent et le transmet à l'export.
+        """
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if exc is not None:
+            self.record_exception(exc)
+        if self._active:
+            _current_span.set(self._previous)
+            self._previous = None
+        if self.sampled:
+            self.tracer.exporter.export(self)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """
+    En-tête `traceparent` du contexte courant, à transmettre aux traitements différés.
+    """
+    current = _current_span.get()
+    return current.traceparent if current is not None else None
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[int, int, bool]]:
+    """
+    Analyse un en-tête W3C `traceparent` : (trace_id, parent_id, sampled), ou None s'il est invalide.
+    """
+    if not header:
+        return None
+    match = TRACEPARENT_REGEX.match(header.strip().lower())
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags, rest = match.groups()
+    # Version 00 : aucun champ supplémentaire ; ff est interdite
+    if version == 'ff' or (version == '00' and rest):
+        return None
+    trace_id, parent_id = int(trace_id, 16), int(parent_id, 16)
+    if not trace_id or not parent_id:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 0x01)
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               activate: bool = True) -> Optional[Span]:
+    """
+    Ouvre un span enfant du span courant, ou renvoie None hors d'une trace échantillonnée
+    (coût limité à la lecture du contexte).
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return None
+    child = Span(parent.tracer, parent.trace_id, parent.span_id, name, kind, attributes)
+    return child.activate() if activate else child
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL,
+         attributes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[Span]]:
+    """
+    Span enfant du span courant le temps du bloc ; les exceptions sont enregistrées sur le span.
+    """
+    child = start_span(name, kind, attributes)
+    if child is None:
+        yield None
+        return
+    try:
+        yield child
+    except BaseException as e:
+        child.end(e)
+        raise
+    child.end()
+
+
+def dependency_span(dependency: str, operation: str, activate: bool = True) -> Optional[Span]:
+    """
+    Ouvre le span d'un appel à une dépendance (nommé « dépendance opération »).
+    """
+    system = DEPENDENCY_SYSTEMS.get(dependency)
+    if system is None:
+        return start_span(f'{dependency} {operation}', SPAN_KIND_INTERNAL, {'operation': operation}, activate)
+    return start_span(
+        f'{dependency} {operation}', SPAN_KIND_CLIENT,
+        {'db.system.name': system, 'db.operation.name': operation}, activate
+    )
+
+
+def traced(name: str) -> Callable:
+    """
+    Décorateur : exécute la fonction (synchrone ou coroutine) dans un span enfant.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_methods(cls: type) -> type:
+    """
+    Décorateur de classe : un span `Classe.méthode` par appel de chaque méthode publique.
+    """
+    for name, member in list(vars(cls).items()):
+        if not name.startswith('_') and inspect.isfunction(member):
+            setattr(cls, name, traced(f'{cls.__name__}.{name}')(member))
+    return cls
+
+
+# -- Export ----------------------------------------------------------------
+
+def _attribute_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _attribute_value(value)} for key, value in attributes.items()]
+
+
+def otlp_payload(spans: List[Span], service_name: str) -> Dict[str, Any]:
+    """
+    Encode un lot de spans au format OTLP/JSON (ExportTraceServiceRequest).
+    """
+    encoded = []
+    for s in spans:
+        item = {
+            'traceId': f'{s.trace_id:032x}',
+            'spanId': f'{s.span_id:016x}',
+            'name': s.name,
+            'kind': s.kind,
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(s.end_ns),
+            'attributes': _attributes(s.attributes),
+            'status': {'code': s.status},
+        }
+        if s.parent_id:
+            item['parentSpanId'] = f'{s.parent_id:016x}'
+        encoded.append(item)
+    resource = {'service.name': service_name, 'process.pid': os.getpid()}
+    return {'resourceSpans': [{
+        'resource': {'attributes': _attributes(resource)},
+        'scopeSpans': [{'scope': {'name': 'app.services.tracing'}, 'spans': encoded}],
+    }]}
+
+
+class FileSpanSink:
+    """
+    Écrit chaque lot sur une ligne JSON (format lisible par le récepteur otlpjsonfile du collecteur).
+    `{pid}` dans le chemin donne un fichier par processus worker.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        with open(self.path.format(pid=os.getpid()), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload, separators=(',', ':')) + '\n')
+
+
+class OtlpHttpSpanSink:
+    """
+    Envoie chaque lot à un collecteur OTLP/HTTP (encodage JSON), par exemple http://localhost:4318/v1/traces.
+    """
+
+    def __init__(self, endpoint: str, timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        req = urllib.request.Request(self.endpoint, data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+class BatchSpanExporter:
+    """
+    Export asynchrone des spans terminés : file bornée, vidée par lots par un thread de fond
+    (au plus `batch_size` spans, ou toutes les `interval` secondes).
+
+    export() ne bloque jamais : au-delà de `max_queue` spans en attente, ils sont abandonnés et comptés.
+    Le thread est démarré au premier span du processus (après le fork des workers gunicorn).
+    """
+
+    def __init__(self, sink, service_name: str = 'auth-service', max_queue: int = 2048,
+                 batch_size: int = 512, interval: float = 5.0):
+        self.sink = sink
+        self.service_name = service_name
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stats = {'exported': 0, 'dropped': 0, 'failed': 0}
+
+    def _ensure_started(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Nouveau processus : file et thread hérités du parent inutilisables
+            self._queue = queue.Queue(self.max_queue)
+            self._stats = {'exported': 0, 'dropped': 0, 'failed': 0}
+            self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def export(self, finished: Span) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self._stats['dropped'] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Exporte les spans en attente ; renvoie False si l'export n'est pas terminé dans le délai.
+        """
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _write(self, batch: List[Span]) -> None:
+        try:
+            self.sink.write(otlp_payload(batch, self.service_name))
+            self._stats['exported'] += len(batch)
+        except Exception as e:
+            self._stats['failed'] += len(batch)
+            logging.warning(f'Export de {len(batch)} spans impossible: {e}')
+
+    def _run(self) -> None:
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, Span):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+            if batch:
+                self._write(batch)
+                batch = []
+            if isinstance(item, threading.Event):
+                item.set()
+            deadline = time.monotonic() + self.interval
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs d'export du processus courant et le nombre de spans en attente.
+        """
+        queued = self._queue.qsize() if self._pid == os.getpid() else 0
+        return dict(self._stats, queued=queued)
+
+
+class Tracer:
+    """
+    Crée les spans racines (requêtes, messages de la file d'envoi) et décide de leur échantillonnage.
+
+    :param sample_ratio: Part des nouvelles traces enregistrées (une trace prolongée suit la décision de son parent).
+    """
+
+    def __init__(self, exporter: BatchSpanExporter, sample_ratio: float = 0.01):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self._threshold = int(max(0.0, min(1.0, sample_ratio)) * (1 << 64))
+
+    @classmethod
+    def from_app(cls, app) -> Optional['Tracer']:
+        """
+        Construit le traceur à partir de la configuration, ou renvoie None si TRACING_EXPORTER est vide.
+        """
+        exporter_name = app.config.get('TRACING_EXPORTER') or ''
+        if not exporter_name:
+            return None
+        if exporter_name == 'file':
+            sink = FileSpanSink(app.config.get('TRACING_FILE', 'traces-{pid}.jsonl'))
+        elif exporter_name == 'otlp':
+            sink = OtlpHttpSpanSink(
+                app.config.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'),
+                timeout=float(app.config.get('TRACING_OTLP_TIMEOUT', 2.0))
+            )
+        else:
+            raise ValueError(f"TRACING_EXPORTER inconnu : '{exporter_name}' (attendu : 'file' ou 'otlp')")
+        exporter = BatchSpanExporter(
+            sink,
+            service_name=app.config.get('TRACING_SERVICE_NAME', 'auth-service'),
+            max_queue=int(app.config.get('TRACING_QUEUE_SIZE', 2048)),
+            batch_size=int(app.config.get('TRACING_BATCH_SIZE', 512)),
+            interval=float(app.config.get('TRACING_EXPORT_INTERVAL', 5.0))
+        )
+        return cls(exporter, float(app.config.get('TRACING_SAMPLE_RATIO', 0.01)))
+
+    def should_sample(self, trace_id: int) -> bool:
+        # Décision déterministe : tous les services appliquant le même taux s'accordent sur une trace
+        return (trace_id & 0xFFFFFFFFFFFFFFFF) < self._threshold
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER,
+                    attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """
+        Ouvre et active un span racine, qui prolonge `traceparent` s'il est valide.
+        """
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id = random.getrandbits(128) or 1
+            parent_id, sampled = None, self.should_sample(trace_id)
+        return Span(self, trace_id, parent_id, name, kind, attributes, sampled).activate()
+
+    @contextmanager
+    def trace(self, name: str, traceparent: Optional[str] = None, kind: int = SPAN_KIND_SERVER,
+              attributes: Optional[Dict[str, Any]] = None) -> Iterator[Span]:
+        root = self.start_trace(name, traceparent, kind, attributes)
+        try:
+            yield root
+        except BaseException as e:
+            root.end(e)
+            raise
+        root.end()
+
+    def start_request(self, req) -> Span:
+        """
+        Ouvre le span racine d'une requête HTTP (Flask ou Quart).
+        """
+        route = req.url_rule.rule if req.url_rule is not None else None
+        attributes = {'http.request.method': req.method, 'url.path': req.path}
+        if route:
+            attributes['http.route'] = route
+        return self.start_trace(
+            f'{req.method} {route}' if route else req.method,
+            req.headers.get('traceparent'), SPAN_KIND_SERVER, attributes
+        )
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """
+    Un span par commande MongoDB, enfant du span courant ; la durée est celle mesurée par le driver.
+    """
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        child = dependency_span('mongo', event.command_name, activate=False)
+        if child is None:
+            return
+        child.set_attribute('db.namespace', event.database_name)
+        collection = event.command.get(event.command_name)
+        if isinstance(collection, str):
+            child.set_attribute('db.collection.name', collection)
+        self._spans[(event.connection_id, event.request_id)] = child
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.end(end_ns=child.start_ns + event.duration_micros * 1000)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        child = self._spans.pop((event.connection_id, event.request_id), None)
+        if child is not None:
+            child.status = STATUS_ERROR
+            child.set_attribute('error.type', str(event.failure.get('codeName', 'error')))
+            child.end(end_ns=child.start_ns + event.duration_micros * 1000)
+
+
+_mongo_listener = None
+
+
+def register_mongo_tracing() -> None:
+    """
+    Enregistre l'écouteur de traçage MongoDB (une seule fois, avant la création des clients).
+    """
+    global _mongo_listener
+    if _mongo_listener is None:
+        _mongo_listener = MongoTracingListener()
+        monitoring.register(_mongo_listener)
+
+
+class Tracing:
+    """
+    Extension de traçage : span racine par requête et spans des commandes MongoDB (si TRACING_EXPORTER).
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        app.tracer = Tracer.from_app(app)
+        if app.tracer is None:
+            return
+        register_mongo_tracing()
+
+        @app.before_request
+        def start_request_span():
+            g.trace_span = app.tracer.start_request(request)
+
+        @app.after_request
+        def record_response_status(response):
+            root = g.get('trace_span')
+            if root is not None:
+                root.set_status_code(response.status_code)
+            return response
+
+        @app.teardown_request
+        def end_request_span(exc):
+            root = g.pop('trace_span', None)
+            if root is not None:
+                root.end(exc)
+
+        app.extensions['tracing'] = self
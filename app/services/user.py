@@ -1,214 +1,234 @@
 # app/services/user.py
 
-from app.models.user import User
 from flask_jwt_extended import (
     create_access_token,
-    create_refresh_token,
-    decode_token
+    create_refresh_token
 )
 from flask import current_app
-from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
-from app.schemas.user import ResetPasswordSchema
-from marshmallow import ValidationError
 import logging
-from threading import Thread
 from flask_mail import Message
 from typing import Tuple, Dict, Any, Optional
-from datetime import datetime
-from mongoengine import Q
-import random
-from app.extensions import mail
+import uuid
+from app.extensions import hasher
+from app.services.metrics import timed
+from app.services.revocation import issued_at
+from app.services.storage import DuplicateUserError
+from app.services.tracing import trace_methods
+from app.services.user_base import (
+    AUTHENTICATED_MESSAGE,
+    INVALID_RESET_TOKEN_ERROR,
+    ONE_TIME_CODE_SENT_MESSAGE,
+    PASSWORD_RESET_MESSAGE,
+    PASSWORD_RESET_REQUESTED_MESSAGE,
+    REGISTERED_MESSAGE,
+    SESSIONS_ERROR,
+    USER_NOT_FOUND_ERROR,
+    UserServiceBase
+)
 
-class UserService:
+@trace_methods
+class UserService(UserServiceBase):
     """
     Service pour les opérations liées aux utilisateurs.
+    Messages, tokens de réinitialisation et contenu des emails sont partagés avec
+    AsyncUserService (voir app.services.user_base).
     """
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        return current_app.config
+
     def register_user(self, username: str, email: str, password: str) -> Tuple[Dict[str, Any], int]:
         """
         Enregistre un nouvel utilisateur.
+        L'unicité est garantie par le stockage : une seule insertion, sans lecture préalable.
         """
-        if User.objects(username=username).first():
-            return {'errors': 'Le nom d\'utilisateur est déjà pris.'}, 400
-        if User.objects(email=email).first():
-            return {'errors': 'Un compte avec cet email existe déjà.'}, 400
-        user = User(username=username, email=email)
-        user.set_password(password)
-        user.save()
-        return {'message': 'Utilisateur créé avec succès'}, 201
+        try:
+            current_app.user_repository.create(username, email, hasher.generate_password_hash(password))
+        except DuplicateUserError as e:
+            return self.duplicate_response(e.field)
+        return {'message': REGISTERED_MESSAGE}, 201
 
     def authenticate_user(self, identifier: str, password: str) -> Tuple[Dict[str, Any], int]:
         """
         Authentifie un utilisateur et génère des tokens JWT.
-        """
-        user = User.find_by_identifier(identifier)
-        if not user or not user.check_password(password):
-            return {'errors': 'Identifiants incorrects.'}, 401
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
 
-        # Décoder les tokens pour obtenir le jti
-        decoded_access_token = decode_token(access_token)
-        decoded_refresh_token = decode_token(refresh_token)
-        access_jti = decoded_access_token['jti']
-        refresh_jti = decoded_refresh_token['jti']
-
-        # Stocker les jti dans Redis sous une clé associée à l'utilisateur
-        redis_client = current_app.redis_client
-        if redis_client:
-            user_token_key = f"user_tokens:{str(user.id)}"
-            redis_client.sadd(user_token_key, access_jti, refresh_jti)
-
-        return {'access_token': access_token, 'refresh_token': refresh_token}, 200
+        Une connexion coûte jusqu'à trois allers-retours Redis : lecture du freinage, lecture du cache
+        utilisateur (évitée par un succès du LRU local) puis enregistrement de la session. Seule la tenue
+        des sessions tient en un aller-retour ; freinage et cache, lus avant bcrypt, ne peuvent pas
+        rejoindre le script d'enregistrement, exécuté après.
+        """
+        # Identifiant bloqué après des échecs répétés : refus sans lecture ni bcrypt
+        throttle = current_app.login_throttle
+        retry_after, has_failures = throttle.check(identifier) if throttle else (0, False)
+        if retry_after:
+            return self.throttled_response(retry_after)
+        credentials = self.find_credentials(identifier)
+        # Échecs comptés pour le compte, sous ses deux formes d'identifiant
+        aliases = (credentials['username'], credentials['email']) if credentials else ()
+        if not credentials or not hasher.check_password_hash(credentials['password_hash'], password):
+            if throttle:
+                throttle.record_failure(identifier, *aliases)
+            return self.invalid_credentials_response()
+        if has_failures:
+            throttle.reset(identifier, *aliases)
+        self.rehash_password_if_needed(credentials, password)
+        return self.issue_tokens(str(credentials['_id'])), 200
+
+    def find_credentials(self, identifier: str) -> Optional[Dict[str, Any]]:
+        """
+        Recherche un utilisateur par nom d'utilisateur ou email (champs d'authentification seulement).
+        """
+        return current_app.user_repository.find_credentials(identifier)
+
+    def issue_tokens(self, user_id: str) -> Dict[str, str]:
+        """
+        Génère un couple de tokens d'accès et de rafraîchissement et enregistre la session.
+        Les jti sont fixés à l'émission : aucun décodage, et l'enregistrement de la session
+        coûte un seul aller-retour (voir authenticate_user pour le coût complet d'une connexion).
+        La session est identifiée par le jti de rafraîchissement, repris dans le claim `sid`.
+        """
+        access_jti = str(uuid.uuid4())
+        refresh_jti = str(uuid.uuid4())
+        # Expiration fixée à l'émission : la session est indexée et révoquée sous la même
+        refresh_exp = current_app.session_store.expires_at()
+        # `iat` à la milliseconde, comparé à l'époque de révocation de l'utilisateur
+        iat = issued_at()
+        with timed('jwt', 'encode'):
+            access_token = create_access_token(identity=user_id,
+                                               additional_claims={'jti': access_jti, 'sid': refresh_jti, 'iat': iat})
+            refresh_token = create_refresh_token(identity=user_id,
+                                                 additional_claims={'jti': refresh_jti, 'exp': refresh_exp, 'iat': iat})
+
+        # Ajouter la session à l'index de l'utilisateur (élagage et éviction dans la même opération)
+        current_app.session_store.record(user_id, refresh_jti, refresh_exp)
+
+        return {'access_token': access_token, 'refresh_token': refresh_token}
+
+    def refresh_access_token(self, user_id: str, sid: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Génère un nouveau token d'accès rattaché à la session `sid` (jti du token de rafraîchissement).
+        La session est déjà indexée : aucune écriture.
+        """
+        claims = {'jti': str(uuid.uuid4()), 'iat': issued_at()}
+        if sid:
+            claims['sid'] = sid
+        with timed('jwt', 'encode'):
+            access_token = create_access_token(identity=user_id, additional_claims=claims)
+        return {'access_token': access_token}, 200
+
+    def rehash_password_if_needed(self, credentials: Dict[str, Any], password: str) -> None:
+        """
+        Rehache le mot de passe après une connexion réussie si le hachage stocké
+        ne correspond plus à la politique courante. Un échec n'empêche pas la connexion.
+        """
+        if not hasher.needs_rehash(credentials['password_hash']):
+            return
+        try:
+            current_app.user_repository.update_password_hash(credentials, hasher.generate_password_hash(password))
+        except Exception as e:
+            logging.error(f'Erreur lors du rehachage du mot de passe: {e}')
 
-    def revoke_token(self, jti: str, token_type: str, exp: int, user_id: str) -> None:
+    def revoke_token(self, jti: str, token_type: str, exp: int, user_id: str, sid: Optional[str] = None) -> None:
         """
-        Révoque un token JWT en le stockant dans Redis.
+        Révoque un token JWT, ainsi que la session `sid` dont il dérive.
         """
         try:
-            expires_in_seconds = exp - int(datetime.utcnow().timestamp())
-            redis_client = current_app.redis_client
-            if redis_client:
-                # Marquer le token comme révoqué
-                redis_client.set(jti, 'true', ex=expires_in_seconds)
-                # Retirer le jti de l'ensemble des tokens de l'utilisateur
-                user_token_key = f"user_tokens:{user_id}"
-                redis_client.srem(user_token_key, jti)
+            # Inscrire le token et sa session parmi les révocations, retirer la session de l'index
+            # et notifier les workers
+            current_app.session_store.revoke(jti, exp, user_id, sid)
         except Exception as e:
             logging.error(f'Erreur lors de la révocation du token: {e}')
 
     def revoke_all_tokens(self, user_id: str) -> None:
         """
-        Révoque tous les tokens associés à un utilisateur.
+        Révoque tous les tokens associés à un utilisateur en avançant son époque de révocation :
+        tout token émis jusqu'à cette milliseconde incluse est refusé, ceux émis ensuite restent valides.
         """
-        redis_client = current_app.redis_client
-        if redis_client:
-            user_token_key = f"user_tokens:{user_id}"
-            jtis = redis_client.smembers(user_token_key)
-            for jti in jtis:
-                # Marquer chaque token comme révoqué
-                redis_client.set(jti, 'true', ex=3600)  # Définir une expiration appropriée
-            # Supprimer l'ensemble des tokens de l'utilisateur
-            redis_client.delete(user_token_key)
+        # L'époque survit au token le plus long émis avant elle ; les sessions sont supprimées
+        current_app.session_store.revoke_all(user_id, issued_at())
+
+    def list_sessions(self, user_id: str, sid: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Liste les sessions actives de l'utilisateur ; `sid` marque la session courante.
+        """
+        try:
+            return {'sessions': current_app.session_store.sessions(user_id, sid)}, 200
+        except Exception as e:
+            logging.error(f'Erreur lors de la lecture des sessions: {e}')
+            return {'errors': SESSIONS_ERROR}, 500
 
     def request_password_reset(self, email: str) -> Tuple[Dict[str, Any], int]:
         """
         Génère un token de réinitialisation et envoie un email à l'utilisateur.
         """
-        user = User.objects(email=email).first()
-        if user:
+        if self.find_by_email(email):
             token = self.generate_password_reset_token(email)
             self.send_password_reset_email(email, token)
-        return {'message': 'Si un compte avec cet email existe, un email de réinitialisation a été envoyé.'}, 200
+        return {'message': PASSWORD_RESET_REQUESTED_MESSAGE}, 200
 
-    def generate_password_reset_token(self, identifier: str) -> str:
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """
-        Génère un token sécurisé pour la réinitialisation du mot de passe.
+        Recherche un utilisateur par email (champs d'authentification seulement).
         """
-        serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
-        return serializer.dumps(identifier, salt='password-reset-salt')
+        return current_app.user_repository.find_by_email(email)
 
     def send_password_reset_email(self, email: str, token: str) -> None:
         """
         Envoie un email de réinitialisation de mot de passe à l'utilisateur.
         """
         try:
-            reset_url = f"{current_app.config.get('FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={token}"
-            msg = Message(
-                subject="Réinitialisation de votre mot de passe",
-                sender=current_app.config['MAIL_DEFAULT_SENDER'],
-                recipients=[email]
-            )
-            msg.body = (
-                f"Pour réinitialiser votre mot de passe, cliquez sur le lien suivant : {reset_url}\n\n"
-                "Si vous n'avez pas demandé cette réinitialisation, veuillez ignorer cet email."
-            )
-            # Envoi asynchrone de l'email avec contexte d'application
-            Thread(target=self.send_async_email, args=(msg,)).start()
-            logging.info(f'Email de réinitialisation envoyé à {email}')
+            subject, body = self.password_reset_email(token)
+            msg = Message(subject=subject, sender=current_app.config['MAIL_DEFAULT_SENDER'], recipients=[email])
+            msg.body = body
+            self.send_async_email(msg)
+            logging.info(f'Email de réinitialisation mis en file pour {email}')
         except Exception as e:
             logging.error(f'Erreur lors de l\'envoi de l\'email de réinitialisation: {e}')
 
-    def verify_password_reset_token(self, token: str, expiration: int = 3600) -> Optional[str]:
-        """
-        Vérifie la validité du token de réinitialisation.
-        """
-        serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
-        try:
-            identifier = serializer.loads(token, salt='password-reset-salt', max_age=expiration)
-            return identifier
-        except SignatureExpired:
-            logging.error('Token de réinitialisation de mot de passe expiré')
-            return None
-        except BadSignature:
-            logging.error('Token de réinitialisation de mot de passe invalide')
-            return None
-
     def reset_password(self, token: str, new_password: str) -> Tuple[Dict[str, Any], int]:
         """
         Réinitialise le mot de passe de l'utilisateur.
         """
         email = self.verify_password_reset_token(token)
         if not email:
-            return {'errors': 'Token invalide ou expiré.'}, 400
-        user = User.objects(email=email).first()
+            return {'errors': INVALID_RESET_TOKEN_ERROR}, 400
+        user = self.find_by_email(email)
         if not user:
-            return {'errors': 'Utilisateur non trouvé.'}, 400
-        try:
-            # Validation du nouveau mot de passe
-            password_field = ResetPasswordSchema().fields['password']
-            password_field.deserialize(new_password)
-        except ValidationError as err:
-            return {'errors': err.messages}, 400
-        user.set_password(new_password)
-        user.save()
-        self.revoke_all_tokens(str(user.id))
-        return {'message': 'Mot de passe réinitialisé avec succès.'}, 200
-
-    def generate_one_time_code(self) -> str:
-        """
-        Génère un code à usage unique de 6 chiffres.
-        """
-        return f"{random.randint(100000, 999999)}"
+            return {'errors': USER_NOT_FOUND_ERROR}, 400
+        # Validation du nouveau mot de passe
+        error = self.new_password_error(new_password)
+        if error:
+            return error
+        current_app.user_repository.update_password_hash(user, hasher.generate_password_hash(new_password))
+        self.revoke_all_tokens(str(user['_id']))
+        return {'message': PASSWORD_RESET_MESSAGE}, 200
 
     def request_one_time_code(self, email: str) -> Tuple[Dict[str, Any], int]:
         """
-        Génère un code à usage unique, le stocke dans Redis et envoie un email à l'utilisateur.
+        Génère un code à usage unique, l'enregistre et envoie un email à l'utilisateur.
         """
-        user = User.objects(email=email).first()
+        user = self.find_by_email(email)
         if not user:
-            return {'errors': 'Utilisateur non trouvé.'}, 404
+            return {'errors': USER_NOT_FOUND_ERROR}, 404
 
         code = self.generate_one_time_code()
-        redis_client = current_app.redis_client
-        if redis_client:
-            # Stocker le code dans Redis avec une durée de validité
-            expires_in_seconds = current_app.config.get('ONE_TIME_CODE_EXPIRATION', 600)
-            redis_client.set(f"one_time_code:{email}", code, ex=expires_in_seconds)
-        else:
-            current_app.logger.error("Redis client non disponible.")
-            return {'errors': 'Service temporairement indisponible.'}, 503
+        # Condensat du code, identifiant résolu et essais restants, avec une durée de validité
+        current_app.one_time_codes.issue(email, str(user['_id']), code)
 
         self.send_one_time_code_email(email, code)
-        return {'message': 'Un code à usage unique a été envoyé à votre adresse email.'}, 200
+        return {'message': ONE_TIME_CODE_SENT_MESSAGE}, 200
 
     def send_one_time_code_email(self, email: str, code: str) -> None:
         """
         Envoie le code à usage unique par email à l'utilisateur.
         """
         try:
-            msg = Message(
-                subject="Votre code à usage unique",
-                sender=current_app.config['MAIL_DEFAULT_SENDER'],
-                recipients=[email]
-            )
-            msg.body = (
-                f"Votre code à usage unique est : {code}\n\n"
-                "Ce code est valable pendant 10 minutes."
-            )
-            # Envoi asynchrone de l'email avec contexte d'application
-            Thread(target=self.send_async_email, args=(msg,)).start()
-            logging.info(f'One-time code envoyé à {email}')
+            subject, body = self.one_time_code_email(code)
+            msg = Message(subject=subject, sender=current_app.config['MAIL_DEFAULT_SENDER'], recipients=[email])
+            msg.body = body
+            self.send_async_email(msg)
+            logging.info(f'One-time code mis en file pour {email}')
         except Exception as e:
             logging.error(f'Erreur lors de l\'envoi du one-time code: {e}')
 
@@ -216,35 +236,18 @@ class UserService:
         """
         Vérifie le code à usage unique fourni par l'utilisateur.
         """
-        redis_client = current_app.redis_client
-        if not redis_client:
-            current_app.logger.error("Redis client non disponible.")
-            return {'errors': 'Service temporairement indisponible.'}, 503
-
-        stored_code = redis_client.get(f"one_time_code:{email}")
-        if not stored_code:
-            return {'errors': 'Code invalide ou expiré.'}, 400
-
-        if stored_code != code:
-            return {'errors': 'Code incorrect.'}, 400
-
-        # Optionnel : Révoquer le code après utilisation
-        redis_client.delete(f"one_time_code:{email}")
-
-        # Générer un token d'accès pour l'utilisateur
-        user = User.objects(email=email).first()
-        if not user:
-            return {'errors': 'Utilisateur non trouvé.'}, 400
-
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
-
+        # Comparaison, décompte des essais et consommation en un appel ; l'identifiant vient de l'entrée
+        result, user_id, remaining = current_app.one_time_codes.verify(email, code)
+        error = self.one_time_code_error(result, remaining)
+        if error:
+            return error
         return {
-            'access_token': access_token,
-            'refresh_token': refresh_token,
-            'message': 'Authentification réussie.'
+            **self.issue_tokens(user_id),
+            'message': AUTHENTICATED_MESSAGE
         }, 200
     
-    def send_async_email(self, msg):
-        with current_app.app_context():
-            mail.send(msg)
+    def send_async_email(self, msg: Message) -> None:
+        """
+        Dépose l'email dans la file d'envoi durable ; l'envoi SMTP est fait par le worker app.workers.mailer.
+        """
+        current_app.email_outbox.enqueue(msg.subject, msg.recipients, msg.body, msg.sender)
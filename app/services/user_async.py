@@ -0,0 +1,259 @@
+# app/services/user_async.py
+
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+import jwt as pyjwt
+from quart import current_app
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from app.extensions import hasher
+from app.models.user import User
+from app.services.keyring import decode_algorithms, decode_key
+from app.services.revocation import issued_at
+from app.services.tracing import trace_methods
+from app.services.user_base import (
+    AUTHENTICATED_MESSAGE,
+    INVALID_RESET_TOKEN_ERROR,
+    ONE_TIME_CODE_SENT_MESSAGE,
+    PASSWORD_RESET_MESSAGE,
+    PASSWORD_RESET_REQUESTED_MESSAGE,
+    REGISTERED_MESSAGE,
+    SESSIONS_ERROR,
+    USER_NOT_FOUND_ERROR,
+    UserServiceBase
+)
+
+
+def create_token(identity: str, token_type: str, jti: Optional[str] = None,
+                 sid: Optional[str] = None, exp: Optional[int] = None) -> Tuple[str, str]:
+    """
+    Génère un token JWT compatible avec flask_jwt_extended (mêmes claims, même trousseau de clés).
+    `sid` rattache un token d'accès à sa session ; `exp` impose l'expiration.
+
+    :return: Le token encodé et son jti.
+    """
+    config = current_app.config
+    now = datetime.now(timezone.utc)
+    expires = config['JWT_REFRESH_TOKEN_EXPIRES'] if token_type == 'refresh' else config['JWT_ACCESS_TOKEN_EXPIRES']
+    jti = jti or str(uuid.uuid4())
+    claims = {
+        'fresh': False,
+        'iat': issued_at(),
+        'jti': jti,
+        'type': token_type,
+        config.get('JWT_IDENTITY_CLAIM', 'sub'): identity,
+        'nbf': now,
+        'exp': exp or now + expires,
+    }
+    if sid:
+        claims['sid'] = sid
+    keyring = current_app.keyring
+    if keyring is None:
+        token = pyjwt.encode(claims, config['JWT_SECRET_KEY'], algorithm=config['JWT_ALGORITHM'])
+    else:
+        key = keyring.signing_key()
+        token = pyjwt.encode(claims, key.private_key, algorithm=key.algorithm, headers={'kid': key.kid})
+    return token, jti
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Vérifie la signature et l'expiration d'un token et renvoie ses claims.
+    """
+    config = current_app.config
+    return pyjwt.decode(
+        token,
+        decode_key(current_app, pyjwt.get_unverified_header(token)),
+        algorithms=decode_algorithms(config),
+        leeway=config.get('JWT_DECODE_LEEWAY', 0)
+    )
+
+
+@trace_methods
+class AsyncUserService(UserServiceBase):
+    """
+    Variante asynchrone de UserService pour le mode ASGI.
+
+    Aucune opération ne bloque la boucle d'événements : MongoDB via AsyncMongoClient,
+    Redis via redis.asyncio, bcrypt attendu depuis le pool de hachage et emails déposés
+    dans la file d'envoi traitée par le worker app.workers.mailer. Messages, tokens de
+    réinitialisation et contenu des emails viennent de app.services.user_base.
+    """
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return current_app.config
+
+    # -- Tokens JWT --------------------------------------------------------
+
+    async def issue_tokens(self, user_id: str) -> Dict[str, str]:
+        """
+        Génère un couple de tokens et enregistre la session en un seul aller-retour Redis
+        (la connexion lit aussi le freinage et le cache utilisateur, voir UserService.authenticate_user).
+        """
+        refresh_exp = current_app.session_store.expires_at()
+        refresh_token, refresh_jti = create_token(user_id, 'refresh', exp=refresh_exp)
+        access_token, _ = create_token(user_id, 'access', sid=refresh_jti)
+        await current_app.session_store.record(user_id, refresh_jti, refresh_exp)
+        return {'access_token': access_token, 'refresh_token': refresh_token}
+
+    async def refresh_access_token(self, user_id: str, sid: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Génère un nouveau token d'accès rattaché à la session `sid`, sans écriture Redis.
+        """
+        access_token, _ = create_token(user_id, 'access', sid=sid)
+        return {'access_token': access_token}, 200
+
+    async def list_sessions(self, user_id: str, sid: Optional[str] = None) -> Tuple[Dict[str, Any], int]:
+        """
+        Liste les sessions actives de l'utilisateur ; `sid` marque la session courante.
+        """
+        try:
+            return {'sessions': await current_app.session_store.sessions(user_id, sid)}, 200
+        except Exception as e:
+            logging.error(f'Erreur lors de la lecture des sessions: {e}')
+            return {'errors': SESSIONS_ERROR}, 500
+
+    # -- Utilisateurs ------------------------------------------------------
+
+    async def register_user(self, username: str, email: str, password: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Enregistre un nouvel utilisateur en une seule insertion.
+        """
+        password_hash = await hasher.generate_password_hash_async(password)
+        try:
+            await current_app.users.insert_one({'username': username, 'email': email, 'password_hash': password_hash})
+        except DuplicateKeyError as e:
+            field = User.duplicate_key_field(e)
+            if field is None:
+                field = 'username' if await current_app.users.find_one({'username': username}, {'_id': 1}) else 'email'
+            return self.duplicate_response(field)
+        # Insertion directe, sans signal post_save : oubli des entrées négatives de l'inscrit
+        await self.invalidate_user(username=username, email=email)
+        return {'message': REGISTERED_MESSAGE}, 201
+
+    async def find_user(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        """
+        Recherche un utilisateur ('username' ou 'email'), via le cache de lecture s'il est actif.
+        """
+        if current_app.user_cache is not None:
+            return await current_app.user_cache.get(field, value)
+        return await current_app.users.find_one({field: value}, {'username': 1, 'email': 1, 'password_hash': 1})
+
+    async def invalidate_user(self, user_id: Optional[str] = None, username: Optional[str] = None,
+                              email: Optional[str] = None) -> None:
+        if current_app.user_cache is not None:
+            await current_app.user_cache.invalidate(user_id, username, email)
+
+    async def authenticate_user(self, identifier: str, password: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Authentifie un utilisateur et génère des tokens JWT.
+        """
+        throttle = current_app.login_throttle
+        retry_after, has_failures = await throttle.check(identifier) if throttle else (0, False)
+        if retry_after:
+            return self.throttled_response(retry_after)
+        credentials = await self.find_user('email' if '@' in identifier else 'username', identifier)
+        aliases = (credentials['username'], credentials['email']) if credentials else ()
+        if not credentials or not await hasher.check_password_hash_async(credentials['password_hash'], password):
+            if throttle:
+                await throttle.record_failure(identifier, *aliases)
+            return self.invalid_credentials_response()
+        if has_failures:
+            await throttle.reset(identifier, *aliases)
+        user_id = str(credentials['_id'])
+        if hasher.needs_rehash(credentials['password_hash']):
+            try:
+                password_hash = await hasher.generate_password_hash_async(password)
+                await current_app.users.update_one({'_id': ObjectId(user_id)}, {'$set': {'password_hash': password_hash}})
+                await self.invalidate_user(user_id, credentials['username'], credentials['email'])
+            except Exception as e:
+                logging.error(f'Erreur lors du rehachage du mot de passe: {e}')
+        return await self.issue_tokens(user_id), 200
+
+    async def revoke_token(self, jti: str, token_type: str, exp: int, user_id: str,
+                           sid: Optional[str] = None) -> None:
+        """
+        Révoque un token JWT en le stockant dans Redis, ainsi que la session `sid` dont il dérive.
+        """
+        try:
+            await current_app.session_store.revoke(jti, exp, user_id, sid)
+        except Exception as e:
+            logging.error(f'Erreur lors de la révocation du token: {e}')
+
+    async def revoke_all_tokens(self, user_id: str) -> None:
+        """
+        Révoque tous les tokens associés à un utilisateur (époque de révocation).
+        """
+        await current_app.session_store.revoke_all(user_id, issued_at())
+
+    async def request_password_reset(self, email: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Génère un token de réinitialisation et envoie un email à l'utilisateur.
+        """
+        if await self.find_user('email', email):
+            token = self.generate_password_reset_token(email)
+            await self.send_email(email, *self.password_reset_email(token))
+        return {'message': PASSWORD_RESET_REQUESTED_MESSAGE}, 200
+
+    async def reset_password(self, token: str, new_password: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Réinitialise le mot de passe de l'utilisateur.
+        """
+        email = self.verify_password_reset_token(token)
+        if not email:
+            return {'errors': INVALID_RESET_TOKEN_ERROR}, 400
+        user = await current_app.users.find_one({'email': email}, {'username': 1})
+        if not user:
+            return {'errors': USER_NOT_FOUND_ERROR}, 400
+        error = self.new_password_error(new_password)
+        if error:
+            return error
+        password_hash = await hasher.generate_password_hash_async(new_password)
+        await current_app.users.update_one({'_id': user['_id']}, {'$set': {'password_hash': password_hash}})
+        await self.invalidate_user(str(user['_id']), user['username'], email)
+        await self.revoke_all_tokens(str(user['_id']))
+        return {'message': PASSWORD_RESET_MESSAGE}, 200
+
+    async def request_one_time_code(self, email: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Génère un code à usage unique, le stocke dans Redis et envoie un email à l'utilisateur.
+        """
+        user = await self.find_user('email', email)
+        if not user:
+            return {'errors': USER_NOT_FOUND_ERROR}, 404
+        code = self.generate_one_time_code()
+        await current_app.one_time_codes.issue(email, str(user['_id']), code)
+        await self.send_email(email, *self.one_time_code_email(code))
+        return {'message': ONE_TIME_CODE_SENT_MESSAGE}, 200
+
+    async def verify_one_time_code(self, email: str, code: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Vérifie le code à usage unique fourni par l'utilisateur.
+        """
+        result, user_id, remaining = await current_app.one_time_codes.verify(email, code)
+        error = self.one_time_code_error(result, remaining)
+        if error:
+            return error
+        return {
+            **await self.issue_tokens(user_id),
+            'message': AUTHENTICATED_MESSAGE
+        }, 200
+
+    # -- Emails ------------------------------------------------------------
+
+    async def send_email(self, recipient: str, subject: str, body: str) -> None:
+        """
+        Dépose l'email dans la file d'envoi durable ; l'envoi SMTP est fait par le worker app.workers.mailer.
+        """
+        try:
+            await current_app.email_outbox.enqueue(
+                subject, [recipient], body, current_app.config.get('MAIL_DEFAULT_SENDER')
+            )
+            logging.info(f"Email '{subject}' mis en file pour {recipient}")
+        except Exception as e:
+            logging.error(f"Erreur lors de l'envoi de l'email: {e}")
@@ -0,0 +1,134 @@
+# app/services/user_base.py
+
+"""
+Logique commune aux services utilisateur synchrone (UserService) et asynchrone (AsyncUserService).
+
+Rien ici ne fait d'entrée-sortie : messages de réponse, tokens de réinitialisation, codes à usage
+unique et contenu des emails. Chaque variante ne garde que ses accès au stockage, à Redis et à bcrypt.
+"""
+
+import logging
+import random
+from typing import Any, Dict, Optional, Tuple
+
+from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
+from marshmallow import ValidationError
+
+from app.schemas.user import reset_password_schema
+from app.services.one_time_code import EXPIRED, INCORRECT
+
+DUPLICATE_FIELD_ERRORS = {
+    'username': 'Le nom d\'utilisateur est déjà pris.',
+    'email': 'Un compte avec cet email existe déjà.',
+}
+THROTTLED_ERROR = 'Trop de tentatives de connexion échouées. Réessayez plus tard.'
+INVALID_CREDENTIALS_ERROR = 'Identifiants incorrects.'
+REGISTERED_MESSAGE = 'Utilisateur créé avec succès'
+PASSWORD_RESET_REQUESTED_MESSAGE = 'Si un compte avec cet email existe, un email de réinitialisation a été envoyé.'
+PASSWORD_RESET_MESSAGE = 'Mot de passe réinitialisé avec succès.'
+INVALID_RESET_TOKEN_ERROR = 'Token invalide ou expiré.'
+USER_NOT_FOUND_ERROR = 'Utilisateur non trouvé.'
+AUTHENTICATED_MESSAGE = 'Authentification réussie.'
+ONE_TIME_CODE_SENT_MESSAGE = 'Un code à usage unique a été envoyé à votre adresse email.'
+SESSIONS_ERROR = 'Une erreur interne est survenue.'
+RESET_SALT = 'password-reset-salt'
+
+
+class UserServiceBase:
+    """
+    Base commune de UserService et AsyncUserService.
+    """
+
+    # -- Réponses ----------------------------------------------------------
+
+    def duplicate_response(self, field: str) -> Tuple[Dict[str, Any], int]:
+        """
+        Réponse à une inscription refusée par l'index unique `field`.
+        """
+        logging.info(f"Inscription refusée : collision sur l'index unique '{field}'")
+        return {'errors': DUPLICATE_FIELD_ERRORS.get(field, DUPLICATE_FIELD_ERRORS['email']), 'field': field}, 400
+
+    def throttled_response(self, retry_after: int) -> Tuple[Dict[str, Any], int]:
+        return {'errors': THROTTLED_ERROR, 'retry_after': retry_after}, 429
+
+    def invalid_credentials_response(self) -> Tuple[Dict[str, Any], int]:
+        return {'errors': INVALID_CREDENTIALS_ERROR}, 401
+
+    def one_time_code_error(self, result: str, remaining: Optional[int]) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Réponse d'erreur pour un code expiré ou incorrect, None si le code est accepté.
+        """
+        if result == EXPIRED:
+            return {'errors': 'Code invalide ou expiré.'}, 400
+        if result == INCORRECT:
+            return {'errors': 'Code incorrect.', 'attempts_remaining': remaining}, 400
+        return None
+
+    def new_password_error(self, new_password: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        """
+        Valide le nouveau mot de passe ; réponse d'erreur s'il ne respecte pas la politique, sinon None.
+        """
+        try:
+            reset_password_schema.fields['password'].deserialize(new_password)
+        except ValidationError as err:
+            return {'errors': err.messages}, 400
+        return None
+
+    # -- Réinitialisation du mot de passe ----------------------------------
+
+    def generate_password_reset_token(self, identifier: str) -> str:
+        """
+        Génère un token sécurisé pour la réinitialisation du mot de passe.
+        """
+        serializer = URLSafeTimedSerializer(self.config['SECRET_KEY'])
+        return serializer.dumps(identifier, salt=RESET_SALT)
+
+    def verify_password_reset_token(self, token: str, expiration: int = 3600) -> Optional[str]:
+        """
+        Vérifie la validité du token de réinitialisation.
+        """
+        serializer = URLSafeTimedSerializer(self.config['SECRET_KEY'])
+        try:
+            return serializer.loads(token, salt=RESET_SALT, max_age=expiration)
+        except SignatureExpired:
+            logging.error('Token de réinitialisation de mot de passe expiré')
+            return None
+        except BadSignature:
+            logging.error('Token de réinitialisation de mot de passe invalide')
+            return None
+
+    def password_reset_email(self, token: str) -> Tuple[str, str]:
+        """
+        Sujet et corps de l'email de réinitialisation.
+        """
+        reset_url = f"{self.config.get('FRONTEND_URL', 'http://localhost:3000')}/reset-password?token={token}"
+        return (
+            "Réinitialisation de votre mot de passe",
+            f"Pour réinitialiser votre mot de passe, cliquez sur le lien suivant : {reset_url}\n\n"
+            "Si vous n'avez pas demandé cette réinitialisation, veuillez ignorer cet email."
+        )
+
+    # -- Codes à usage unique ----------------------------------------------
+
+    def generate_one_time_code(self) -> str:
+        """
+        Génère un code à usage unique de 6 chiffres.
+        """
+        return f"{random.randint(100000, 999999)}"
+
+    def one_time_code_email(self, code: str) -> Tuple[str, str]:
+        """
+        Sujet et corps de l'email portant le code à usage unique.
+        """
+        return (
+            "Votre code à usage unique",
+            f"Votre code à usage unique est : {code}\n\n"
+            "Ce code est valable pendant 10 minutes."
+        )
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """
+        Configuration de l'application courante (Flask ou Quart), fournie par chaque variante.
+        """
+        raise NotImplementedError
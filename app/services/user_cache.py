@@ -0,0 +1,431 @@
+# app/services/user_cache.py
+
+"""
+Cache de lecture des utilisateurs (recherche par nom d'utilisateur, email ou identifiant),
+à deux niveaux devant MongoDB :
+- un LRU local par worker, à durée de vie courte (`local_ttl`) ;
+- un niveau Redis partagé (`ttl`), une chaîne JSON par clé de recherche.
+
+Les identifiants inconnus sont mis en cache négativement (`negative_ttl`, plus court).
+Les recherches identiques simultanées sont regroupées : une seule lecture MongoDB, attendue par les autres.
+
+Invalidation à l'écriture : chaque sauvegarde d'un User (signal post_save de mongoengine) et chaque
+mise à jour directe du hachage remplacent les clés de l'utilisateur dans Redis par une pierre tombale
+de `fill_guard` secondes, et diffusent les clés sur un canal pub/sub pour vider les LRU des autres
+workers. Les remplissages se font par SET NX : une lecture MongoDB commencée avant l'écriture ne
+peut pas réinscrire l'ancien hachage derrière la pierre tombale. Sans message pub/sub (abonnement
+interrompu), un LRU local reste obsolète au plus `local_ttl` secondes.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, List, Optional
+
+import asyncio
+from bson import ObjectId
+from mongoengine import signals
+
+from app.models.user import User
+from app.services.metrics import USER_CACHE_REQUESTS
+
+# Champs mis en cache : ceux des parcours d'authentification
+CACHED_FIELDS = ('id', 'username', 'email', 'password_hash')
+NEGATIVE = '-'
+TOMBSTONE = '!'
+
+
+def cache_record(document: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Forme en cache d'un document brut : identifiant en chaîne, champs d'authentification seulement.
+    """
+    if document is None:
+        return None
+    return {
+        '_id': str(document['_id']),
+        'username': document.get('username'),
+        'email': document.get('email'),
+        'password_hash': document.get('password_hash'),
+    }
+
+
+def lookup_field(identifier: str) -> str:
+    # Même règle que User.find_by_identifier : les noms d'utilisateur ne contiennent pas '@'
+    return 'email' if '@' in identifier else 'username'
+
+
+class UserCache:
+    """
+    Cache de lecture des utilisateurs devant MongoDB (client mongoengine synchrone).
+
+    :param local_size: Entrées du LRU local (0 pour le désactiver).
+    :param local_ttl: Durée de vie d'une entrée locale, en secondes.
+    :param ttl: Durée de vie d'une entrée Redis, en secondes.
+    :param negative_ttl: Durée de vie d'un identifiant inconnu, en secondes (0 pour ne pas les retenir).
+    :param fill_guard: Durée des pierres tombales posées à l'invalidation, en secondes.
+    """
+
+    def __init__(self, redis_client, local_size: int = 10000, local_ttl: float = 1.0, ttl: int = 300,
+                 negative_ttl: int = 10, fill_guard: int = 5, channel: str = 'user_cache_invalidations',
+                 prefix: str = 'user_cache'):
+        self.redis_client = redis_client
+        self.local_size = local_size
+        self.local_ttl = local_ttl
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.fill_guard = fill_guard
+        self.channel = channel
+        self.prefix = prefix
+        self._entries = OrderedDict()
+        self._inflight: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'coalesced': 0, 'invalidations': 0}
+
+    @staticmethod
+    def options_from_config(config) -> Dict[str, Any]:
+        """
+        Paramètres du cache lus dans la configuration de l'application.
+        """
+        return {
+            'local_size': int(config.get('USER_CACHE_LOCAL_SIZE', 10000)),
+            'local_ttl': float(config.get('USER_CACHE_LOCAL_TTL', 1.0)),
+            'ttl': int(config.get('USER_CACHE_TTL', 300)),
+            'negative_ttl': int(config.get('USER_CACHE_NEGATIVE_TTL', 10)),
+            'fill_guard': int(config.get('USER_CACHE_FILL_GUARD', 5)),
+            'channel': config.get('USER_CACHE_CHANNEL', 'user_cache_invalidations'),
+        }
+
+    @classmethod
+    def from_app(cls, app) -> Optional['UserCache']:
+        """
+        Construit le cache (None si désactivé) : invalidé par les sauvegardes de User
+        et par les messages reçus sur le thread d'abonnement des révocations.
+        """
+        if not app.config.get('USER_CACHE_ENABLED', True):
+            return None
+        cache = cls(app.redis_client, **cls.options_from_config(app.config))
+        # Références faibles : le récepteur disparaît avec le cache
+        signals.post_save.connect(cache._document_changed, sender=User)
+        signals.post_delete.connect(cache._document_changed, sender=User)
+        app.revocation_cache.subscribe(cache.channel, cache._handle_message)
+        return cache
+
+    def key(self, field: str, value: str) -> str:
+        return f'{self.prefix}:{field}:{value}'
+
+    def user_keys(self, user_id: Optional[str] = None, username: Optional[str] = None,
+                  email: Optional[str] = None) -> List[str]:
+        """
+        Clés de recherche d'un utilisateur (identifiant, nom d'utilisateur, email).
+        """
+        fields = (('id', user_id), ('username', username), ('email', email))
+        return [self.key(field, str(value)) for field, value in fields if value]
+
+    # -- Niveau local ------------------------------------------------------
+
+    def _local_get(self, key: str):
+        """
+        Renvoie (True, entrée) si la clé est en cache local (entrée None : utilisateur inconnu).
+        """
+        if self.local_size <= 0:
+            return False, None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                record, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['local_hits'] += 1
+                    return True, record
+                del self._entries[key]
+        return False, None
+
+    def _local_set(self, key: str, record: Optional[Dict[str, Any]]) -> None:
+        if self.local_size <= 0:
+            return
+        ttl = self.local_ttl if record is not None else min(self.local_ttl, self.negative_ttl)
+        with self._lock:
+            self._entries[key] = (record, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.local_size:
+                self._entries.popitem(last=False)
+
+    def _local_drop(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._stats['invalidations'] += 1
+
+    # -- Niveau Redis ------------------------------------------------------
+
+    @staticmethod
+    def _decode(value: Optional[str]):
+        """
+        Renvoie (trouvé, entrée) d'après la valeur Redis ; une pierre tombale ou une absence
+        imposent une lecture MongoDB.
+        """
+        if value is None or value == TOMBSTONE:
+            return False, None
+        if value == NEGATIVE:
+            return True, None
+        return True, json.loads(value)
+
+    def _fill_args(self, record: Optional[Dict[str, Any]]):
+        if record is None:
+            return NEGATIVE, self.negative_ttl
+        return json.dumps(record), self.ttl
+
+    def _invalidation_pipeline(self, keys: List[str]):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(key, TOMBSTONE, ex=self.fill_guard)
+        pipe.publish(self.channel, json.dumps(keys))
+        return pipe
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        try:
+            self._local_drop(json.loads(message['data']))
+        except (ValueError, KeyError, TypeError) as e:
+            logging.error(f'Message d\'invalidation du cache utilisateur invalide: {e}')
+
+    # -- Regroupement des recherches simultanées ---------------------------
+
+    def _join(self, key: str):
+        """
+        Renvoie (True, futur) si la recherche doit être faite par l'appelant, (False, futur)
+        si une recherche identique est déjà en cours.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['coalesced'] += 1
+                return False, future
+            future = self._inflight[key] = Future()
+            return True, future
+
+    def _leave(self, key: str) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _count(self, result: str) -> None:
+        if result == 'miss':
+            with self._lock:
+                self._stats['misses'] += 1
+        elif result == 'redis_hit':
+            with self._lock:
+                self._stats['redis_hits'] += 1
+        USER_CACHE_REQUESTS.labels(result).inc()
+
+    # -- Recherches --------------------------------------------------------
+
+    def _load(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        if field == 'id':
+            field = 'pk'
+        return cache_record(User.objects(**{field: value}).only(*CACHED_FIELDS).as_pymongo().first())
+
+    def _fetch(self, key: str, field: str, value: str) -> Optional[Dict[str, Any]]:
+        """
+        Lecture Redis puis MongoDB, avec remplissage des deux niveaux.
+        """
+        try:
+            cached = self.redis_client.get(key)
+        except Exception as e:
+            logging.error(f'Erreur de lecture du cache utilisateur: {e}')
+            cached = TOMBSTONE
+        found, record = self._decode(cached)
+        if found:
+            self._count('redis_hit')
+            self._local_set(key, record)
+            return record
+        self._count('miss')
+        record = self._load(field, value)
+        if cached == TOMBSTONE:
+            # Écriture récente : lecture postérieure à l'invalidation, retenue localement seulement
+            self._local_set(key, record)
+        elif record is not None or self.negative_ttl:
+            try:
+                data, ttl = self._fill_args(record)
+                if self.redis_client.set(key, data, ex=ttl, nx=True):
+                    self._local_set(key, record)
+            except Exception as e:
+                logging.error(f'Erreur d\'écriture du cache utilisateur: {e}')
+        return record
+
+    def get(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        """
+        Renvoie l'utilisateur ({'_id', 'username', 'email', 'password_hash'}) ou None s'il est inconnu.
+
+        :param field: 'username', 'email' ou 'id'.
+        """
+        key = self.key(field, value)
+        found, record = self._local_get(key)
+        if found:
+            USER_CACHE_REQUESTS.labels('local_hit').inc()
+            return record
+        leader, future = self._join(key)
+        if not leader:
+            USER_CACHE_REQUESTS.labels('coalesced').inc()
+            return future.result()
+        try:
+            record = self._fetch(key, field, value)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(record)
+            return record
+        finally:
+            self._leave(key)
+            if not future.done():
+                future.cancel()
+
+    def find_by_identifier(self, identifier: str) -> Optional[Dict[str, Any]]:
+        return self.get(lookup_field(identifier), identifier)
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return self.get('email', email)
+
+    def find_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self.get('id', user_id)
+
+    # -- Invalidation ------------------------------------------------------
+
+    def invalidate(self, user_id: Optional[str] = None, username: Optional[str] = None,
+                   email: Optional[str] = None) -> None:
+        """
+        Invalide les clés d'un utilisateur, dans Redis et dans les LRU de tous les workers.
+        À l'inscription, seules les clés du nom d'utilisateur et de l'email (entrées négatives) sont connues.
+        """
+        keys = self.user_keys(user_id, username, email)
+        if not keys:
+            return
+        self._local_drop(keys)
+        try:
+            self._invalidation_pipeline(keys).execute()
+        except Exception as e:
+            logging.error(f'Erreur lors de l\'invalidation du cache utilisateur: {e}')
+
+    def _document_changed(self, sender, document, **kwargs) -> None:
+        self.invalidate(document.pk, document.username, document.email)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs du cache et son taux de succès (niveaux local et Redis confondus).
+        """
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries))
+        lookups = stats['local_hits'] + stats['redis_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['local_hits'] + stats['redis_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+class AsyncUserCache(UserCache):
+    """
+    Variante d'UserCache pour un client redis.asyncio et la collection pymongo asynchrone.
+    Les invalidations des autres workers arrivent par le même abonnement (thread synchrone).
+    """
+
+    def __init__(self, redis_client, collection=None, **options):
+        super().__init__(redis_client, **options)
+        self.collection = collection
+
+    @classmethod
+    def from_app(cls, app) -> Optional['AsyncUserCache']:
+        if not app.config.get('USER_CACHE_ENABLED', True):
+            return None
+        cache = cls(app.redis_client, app.users, **cls.options_from_config(app.config))
+        app.revocation_cache.subscribe(cache.channel, cache._handle_message)
+        return cache
+
+    def _join(self, key: str):
+        # Une seule boucle d'événements : pas de verrou nécessaire autour des futurs asyncio
+        future = self._inflight.get(key)
+        if future is not None:
+            with self._lock:
+                self._stats['coalesced'] += 1
+            return False, future
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        return True, future
+
+    async def _load(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        if field == 'id':
+            field, value = '_id', ObjectId(value)
+        projection = {'username': 1, 'email': 1, 'password_hash': 1}
+        return cache_record(await self.collection.find_one({field: value}, projection))
+
+    async def _fetch(self, key: str, field: str, value: str) -> Optional[Dict[str, Any]]:
+        try:
+            cached = await self.redis_client.get(key)
+        except Exception as e:
+            logging.error(f'Erreur de lecture du cache utilisateur: {e}')
+            cached = TOMBSTONE
+        found, record = self._decode(cached)
+        if found:
+            self._count('redis_hit')
+            self._local_set(key, record)
+            return record
+        self._count('miss')
+        record = await self._load(field, value)
+        if cached == TOMBSTONE:
+            # Écriture récente : lecture postérieure à l'invalidation, retenue localement seulement
+            self._local_set(key, record)
+        elif record is not None or self.negative_ttl:
+            try:
+                data, ttl = self._fill_args(record)
+                if await self.redis_client.set(key, data, ex=ttl, nx=True):
+                    self._local_set(key, record)
+            except Exception as e:
+                logging.error(f'Erreur d\'écriture du cache utilisateur: {e}')
+        return record
+
+    async def get(self, field: str, value: str) -> Optional[Dict[str, Any]]:
+        key = self.key(field, value)
+        found, record = self._local_get(key)
+        if found:
+            USER_CACHE_REQUESTS.labels('local_hit').inc()
+            return record
+        leader, future = self._join(key)
+        if not leader:
+            USER_CACHE_REQUESTS.labels('coalesced').inc()
+            return await asyncio.shield(future)
+        try:
+            record = await self._fetch(key, field, value)
+        except Exception as e:
+            future.set_exception(e)
+            # Exception déjà propagée à l'appelant : pas d'avertissement si aucun autre ne l'attend
+            future.exception()
+            raise
+        else:
+            future.set_result(record)
+            return record
+        finally:
+            self._leave(key)
+            if not future.done():
+                future.cancel()
+
+    async def find_by_identifier(self, identifier: str) -> Optional[Dict[str, Any]]:
+        return await self.get(lookup_field(identifier), identifier)
+
+    async def find_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        return await self.get('email', email)
+
+    async def find_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.get('id', user_id)
+
+    async def invalidate(self, user_id: Optional[str] = None, username: Optional[str] = None,
+                         email: Optional[str] = None) -> None:
+        keys = self.user_keys(user_id, username, email)
+        if not keys:
+            return
+        self._local_drop(keys)
+        try:
+            await self._invalidation_pipeline(keys).execute()
+        except Exception as e:
+            logging.error(f'Erreur lors de l\'invalidation du cache utilisateur: {e}')
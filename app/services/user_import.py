@@ -0,0 +1,211 @@
+# app/services/user_import.py
+
+import csv
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from marshmallow import ValidationError
+from pymongo.errors import BulkWriteError
+
+from app.extensions import hasher
+from app.models.user import User
+from app.schemas.user import RegisterSchema
+from app.services.hashing import identify_hash
+from app.services.user_base import DUPLICATE_FIELD_ERRORS
+
+# Une ligne lue : (numéro de ligne dans le fichier, champs)
+Row = Tuple[int, Dict[str, Any]]
+
+
+def _run_task(task: Tuple[Callable, tuple]) -> str:
+    """
+    Exécute une tâche de hachage dans le pool (fonction de module, sérialisable).
+    """
+    func, args = task
+    return func(*args)
+
+
+def read_ndjson(stream: TextIO) -> Iterator[Row]:
+    """
+    Lit un fichier NDJSON ligne à ligne (un objet JSON par ligne, lignes vides ignorées).
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = {'_error': f'JSON invalide : {e}'}
+        if not isinstance(row, dict):
+            row = {'_error': 'Un objet JSON est attendu.'}
+        yield line_number, row
+
+
+def read_csv(stream: TextIO) -> Iterator[Row]:
+    """
+    Lit un fichier CSV avec en-tête (username, email, password ou password_hash).
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        # Les cellules vides sont traitées comme absentes
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, '')}
+
+
+class _WriteError(Exception):
+    """
+    Adapte une entrée writeErrors d'un BulkWriteError à User.duplicate_key_field.
+    """
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error.get('errmsg', ''))
+        self.details = error
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class UserImporter:
+    """
+    Import en masse d'utilisateurs depuis un flux NDJSON ou CSV.
+
+    Le fichier est lu par lots de `batch_size` lignes, sans jamais être chargé en entier :
+    chaque lot est validé avec RegisterSchema, les mots de passe en clair sont hachés dans
+    un pool de processus dédié (les hachages bcrypt/argon2id fournis sont repris tels quels),
+    puis le lot est écrit par un insert_many non ordonné. Les collisions avec les index
+    uniques, y compris entre lignes du fichier, sont rapportées ligne par ligne.
+    """
+
+    def __init__(self, batch_size: int = 1000, workers: Optional[int] = None, executor: str = 'process',
+                 on_error: Optional[Callable[[int, Any], None]] = None,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"Exécuteur invalide : {executor}")
+        self.batch_size = batch_size
+        self.workers = workers or hasher.max_workers
+        self.executor = executor
+        self.on_error = on_error
+        self.on_progress = on_progress
+        self.schema = RegisterSchema()
+        self.prehashed_schema = RegisterSchema(partial=('password',))
+        self._stats = {'total': 0, 'inserted': 0, 'invalid': 0, 'duplicates': 0, 'prehashed': 0}
+        self._started = None
+
+    def _report_error(self, line_number: int, errors: Any) -> None:
+        if self.on_error is not None:
+            self.on_error(line_number, errors)
+
+    def _validate(self, line_number: int, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Valide une ligne ; renvoie le document à insérer (mot de passe encore en clair) ou None.
+        """
+        if '_error' in row:
+            self._report_error(line_number, row['_error'])
+            return None
+        password_hash = row.pop('password_hash', None)
+        try:
+            if password_hash is not None:
+                if 'password' in row:
+                    raise ValidationError({'password': ['Fournir password ou password_hash, pas les deux.']})
+                data = self.prehashed_schema.load(row)
+                if identify_hash(password_hash)['scheme'] == 'unknown':
+                    raise ValidationError({'password_hash': ['Hachage non reconnu (bcrypt ou argon2id attendu).']})
+            else:
+                data = self.schema.load(row)
+        except ValidationError as err:
+            self._report_error(line_number, err.messages)
+            return None
+        if password_hash is not None:
+            self._stats['prehashed'] += 1
+            return {'username': data['username'], 'email': data['email'], 'password_hash': password_hash}
+        return {'username': data['username'], 'email': data['email'], 'password': data['password']}
+
+    def _hash(self, pool: Executor, documents: List[Dict[str, Any]]) -> None:
+        to_hash = [doc for doc in documents if 'password' in doc]
+        if not to_hash:
+            return
+        tasks = [hasher.hash_task(doc.pop('password')) for doc in to_hash]
+        chunksize = max(1, len(tasks) // (self.workers * 4))
+        for doc, password_hash in zip(to_hash, pool.map(_run_task, tasks, chunksize=chunksize)):
+            doc['password_hash'] = password_hash
+
+    def _insert(self, lines: List[int], documents: List[Dict[str, Any]]) -> None:
+        try:
+            result = User._get_collection().insert_many(documents, ordered=False)
+            self._stats['inserted'] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            self._stats['inserted'] += e.details.get('nInserted', len(documents) - len(write_errors))
+            for error in write_errors:
+                line_number = lines[error['index']]
+                if error.get('code') == 11000:
+                    self._stats['duplicates'] += 1
+                    field = User.duplicate_key_field(_WriteError(error))
+                    if field is None:
+                        # Détails de collision indisponibles : on relit le seul champ à départager
+                        username = error.get('op', {}).get('username')
+                        field = 'username' if User.objects(username=username).only('id').first() else 'email'
+                    self._report_error(line_number, {field: [DUPLICATE_FIELD_ERRORS.get(field, DUPLICATE_FIELD_ERRORS['email'])]})
+                else:
+                    self._stats['invalid'] += 1
+                    self._report_error(line_number, error.get('errmsg', 'Erreur d\'écriture.'))
+
+    def _process_batch(self, pool: Executor, batch: List[Row]) -> None:
+        lines, documents = [], []
+        for line_number, row in batch:
+            document = self._validate(line_number, row)
+            if document is None:
+                self._stats['invalid'] += 1
+                continue
+            lines.append(line_number)
+            documents.append(document)
+        self._stats['total'] += len(batch)
+        if documents:
+            self._hash(pool, documents)
+            self._insert(lines, documents)
+        if self.on_progress is not None:
+            self.on_progress(self.stats())
+
+    def _create_pool(self) -> Executor:
+        if self.executor == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='import')
+
+    def run(self, rows: Iterable[Row]) -> Dict[str, Any]:
+        """
+        Importe les lignes fournies, lot par lot.
+
+        :param rows: Itérable de (numéro de ligne, champs), par exemple read_ndjson(fichier).
+        :return: Les compteurs de l'import et le débit en lignes par seconde.
+        """
+        self._started = time.perf_counter()
+        rows = iter(rows)
+        with self._create_pool() as pool:
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self._process_batch(pool, batch)
+        stats = self.stats()
+        logging.info(f'Import terminé : {stats}')
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs courants et le débit moyen (lignes par seconde).
+        """
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return dict(
+            self._stats,
+            elapsed=round(elapsed, 3),
+            rows_per_second=round(self._stats['total'] / elapsed, 1) if elapsed else 0.0
+        )
+
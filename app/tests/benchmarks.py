@@ -0,0 +1,37 @@
+# app/tests/benchmarks.py
+
+import unittest
+from app.benchmarks.report import compare, percentile, summarize
+
+
+class BenchmarkReportTestCase(unittest.TestCase):
+    def test_summarize(self):
+        """
+        Teste le calcul des percentiles (en millisecondes) et du débit.
+        """
+        timings = [i / 1000 for i in range(1, 101)]
+        result = summarize(timings, elapsed=2.0)
+        self.assertEqual(result['count'], 100)
+        self.assertAlmostEqual(result['p50_ms'], 50.0)
+        self.assertAlmostEqual(result['p95_ms'], 95.0)
+        self.assertAlmostEqual(result['p99_ms'], 99.0)
+        self.assertAlmostEqual(result['rps'], 50.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_compare_detects_regression(self):
+        """
+        Teste la détection d'une médiane dégradée au-delà de la tolérance.
+        """
+        baseline = {'/user/login': {'p50_ms': 10.0}, '/user/refresh': {'p50_ms': 2.0}}
+        results = {
+            '/user/login': {'p50_ms': 11.5},
+            '/user/refresh': {'p50_ms': 2.1},
+            '/user/register': {'p50_ms': 5.0},
+        }
+        regressions = compare(results, baseline, tolerance=0.10)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('/user/login'))
+
+
+if __name__ == '__main__':
+    unittest.main()
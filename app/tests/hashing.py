@@ -0,0 +1,97 @@
+# app/tests/hashing.py
+
+import unittest
+import threading
+from unittest.mock import patch
+from app.services import hashing
+from app.services.hashing import HashingEngine, HashingQueueFull, HashingTimeout, identify_hash
+
+
+class _Config:
+    def __init__(self, **values):
+        self.config = {'BCRYPT_LOG_ROUNDS': 4, 'HASHING_WORKERS': 1, **values}
+        self.extensions = {}
+
+
+class HashingEngineTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        self.engine = HashingEngine(_Config())
+        self.addCleanup(self.engine.shutdown)
+
+    def test_hash_and_check(self):
+        """
+        Teste le hachage puis la vérification d'un mot de passe.
+        """
+        pw_hash = self.engine.generate_password_hash('Password123!')
+        self.assertTrue(pw_hash.startswith('$2b$04$'))
+        self.assertTrue(self.engine.check_password_hash(pw_hash, 'Password123!'))
+        self.assertFalse(self.engine.check_password_hash(pw_hash, 'WrongPassword!'))
+        self.assertFalse(self.engine.check_password_hash('invalid', 'Password123!'))
+
+        stats = self.engine.stats()
+        self.assertEqual(stats['completed'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_needs_rehash(self):
+        """
+        Teste la détection des hachages qui diffèrent de la politique courante.
+        """
+        self.assertEqual(identify_hash('$2b$12$' + 'a' * 53), {'scheme': 'bcrypt', 'rounds': 12})
+        self.assertFalse(self.engine.needs_rehash('$2b$04$' + 'a' * 53))
+        self.assertFalse(self.engine.needs_rehash('$2b$05$' + 'a' * 53))
+        self.assertTrue(self.engine.needs_rehash('$2b$06$' + 'a' * 53))
+        self.engine.rounds = 12
+        self.assertTrue(self.engine.needs_rehash('$2b$10$' + 'a' * 53))
+        self.assertTrue(self.engine.needs_rehash('$argon2id$v=19$m=65536,t=3,p=1$c2FsdA$aGFzaA'))
+
+    def test_calibrate(self):
+        """
+        Teste que la calibration reste dans les bornes configurées.
+        """
+        self.engine.min_rounds, self.engine.max_rounds = 4, 6
+        self.assertEqual(self.engine.calibrate(0.001, samples=1), {'scheme': 'bcrypt', 'rounds': 4})
+        self.assertEqual(self.engine.calibrate(60000, samples=1), {'scheme': 'bcrypt', 'rounds': 6})
+
+    def test_queue_full(self):
+        """
+        Teste le rejet des appels lorsque la file est pleine.
+        """
+        engine = HashingEngine(_Config(HASHING_MAX_QUEUE=0))
+        self.addCleanup(engine.shutdown)
+        release = threading.Event()
+        started = threading.Event()
+
+        def _slow_hash(*args):
+            started.set()
+            release.wait(5)
+            return 'hash'
+
+        with patch.object(hashing, '_bcrypt_hash', _slow_hash):
+            worker = threading.Thread(target=engine.generate_password_hash, args=('Password123!',))
+            worker.start()
+            started.wait(5)
+            with self.assertRaises(HashingQueueFull):
+                engine.generate_password_hash('Password123!')
+            release.set()
+            worker.join()
+        self.assertEqual(engine.stats()['rejected'], 1)
+
+    def test_timeout(self):
+        """
+        Teste l'expiration du délai d'un appel.
+        """
+        engine = HashingEngine(_Config(HASHING_TIMEOUT=0.05))
+        self.addCleanup(engine.shutdown)
+        release = threading.Event()
+        with patch.object(hashing, '_bcrypt_hash', lambda *args: release.wait(5)):
+            with self.assertRaises(HashingTimeout):
+                engine.generate_password_hash('Password123!')
+            release.set()
+        self.assertEqual(engine.stats()['timeouts'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# app/tests/introspection.py
+
+import time
+import unittest
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from mongoengine import disconnect
+
+
+class IntrospectionConfig(TestingConfig):
+    INTROSPECTION_API_KEYS = 'gateway-key, other-key'
+    INTROSPECTION_MAX_BATCH = 5
+
+
+GATEWAY = {'Authorization': 'Bearer gateway-key'}
+
+
+class IntrospectionTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(IntrospectionConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        patcher = patch('app.services.user.UserService.send_async_email')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def login(self, username):
+        self.client.post('/user/register', json={
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': 'Password123!'
+        })
+        return self.client.post('/user/login', json={
+            'identifier': username,
+            'password': 'Password123!'
+        }).get_json()
+
+    def introspect(self, tokens, headers=GATEWAY):
+        return self.client.post('/token/introspect', json={'tokens': tokens}, headers=headers)
+
+    def test_batch_statuses(self):
+        """
+        Teste l'état et les claims renvoyés pour un lot de tokens, résolus en un seul pipeline.
+        """
+        first = self.login('firstuser')
+        second = self.login('seconduser')
+        self.client.post('/user/logout', headers={'Authorization': f"Bearer {second['access_token']}"})
+        self.app.revocation_cache.clear()
+
+        mget_before = REGISTRY.get_sample_value(
+            'dependency_duration_seconds_count', {'dependency': 'redis', 'operation': 'PIPELINE'}) or 0.0
+        response = self.introspect([first['access_token'], second['access_token'], 'pas-un-jwt', first['refresh_token']])
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual(REGISTRY.get_sample_value(
+            'dependency_duration_seconds_count', {'dependency': 'redis', 'operation': 'PIPELINE'}), mget_before + 1)
+
+        self.assertTrue(results[0]['active'])
+        self.assertEqual(results[0]['type'], 'access')
+        self.assertIn('sub', results[0])
+        self.assertEqual(results[1], {'active': False, 'error': 'revoked'})
+        self.assertEqual(results[2], {'active': False, 'error': 'invalid'})
+        self.assertTrue(results[3]['active'])
+        self.assertEqual(results[3]['type'], 'refresh')
+
+    def test_verification_cache(self):
+        """
+        Teste la réutilisation des vérifications de signature entre deux requêtes.
+        """
+        tokens = self.login('testuser')
+        self.introspect([tokens['refresh_token']])
+        hits = self.app.introspector.cache.stats()['hits']
+        response = self.introspect([tokens['refresh_token']])
+        self.assertTrue(response.get_json()['results'][0]['active'])
+        self.assertEqual(self.app.introspector.cache.stats()['hits'], hits + 1)
+
+        # La révocation reste prise en compte pour un token en cache
+        self.client.post('/user/logout_all', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+        response = self.introspect([tokens['refresh_token']])
+        self.assertEqual(response.get_json()['results'][0], {'active': False, 'error': 'revoked'})
+
+    def test_expired_token(self):
+        """
+        Teste le refus d'un token expiré.
+        """
+        access_token = self.login('testuser')['access_token']
+        time.sleep(1.1)
+        response = self.introspect([access_token])
+        self.assertEqual(response.get_json()['results'][0], {'active': False, 'error': 'expired'})
+
+    def test_gateway_authentication_and_limits(self):
+        """
+        Teste l'authentification de la passerelle et la taille maximale des lots.
+        """
+        self.assertEqual(self.introspect(['x']).status_code, 200)
+        self.assertEqual(self.introspect(['x'], headers={'Authorization': 'Bearer other-key'}).status_code, 200)
+        self.assertEqual(self.introspect(['x'], headers={}).status_code, 401)
+        self.assertEqual(self.introspect(['x'], headers={'Authorization': 'Bearer mauvaise'}).status_code, 401)
+        self.assertEqual(self.introspect([]).status_code, 400)
+        self.assertEqual(self.introspect(['x'] * 6).status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
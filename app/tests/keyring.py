@@ -0,0 +1,173 @@
+# app/tests/keyring.py
+
+import time
+import unittest
+from unittest.mock import patch
+import jwt as pyjwt
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from app.services.keyring import COLLECTION
+from mongoengine import disconnect
+from mongoengine.connection import get_db
+
+
+class KeyringConfig(TestingConfig):
+    JWT_ALGORITHM = 'EdDSA'
+
+
+class KeyringTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(KeyringConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        patcher = patch('app.services.user.UserService.send_async_email')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+        self.keyring = self.app.keyring
+        # Le trousseau est amorcé au premier usage ; première clé créée explicitement
+        self.keyring.ensure_key()
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        get_db().drop_collection(COLLECTION)
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def login(self):
+        self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        return self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'Password123!'
+        }).get_json()
+
+    def verify_with_jwks(self, token):
+        """
+        Vérification locale d'un token, comme le ferait un service consommateur.
+        """
+        jwks = self.client.get('/.well-known/jwks.json').get_json()
+        header = pyjwt.get_unverified_header(token)
+        jwk = next(k for k in jwks['keys'] if k['kid'] == header['kid'])
+        return pyjwt.decode(token, pyjwt.PyJWK(jwk).key, algorithms=[jwk['alg']])
+
+    def test_tokens_signed_with_kid(self):
+        """
+        Teste la signature EdDSA des tokens et leur vérification avec le JWKS publié.
+        """
+        tokens = self.login()
+        header = pyjwt.get_unverified_header(tokens['access_token'])
+        self.assertEqual(header['alg'], 'EdDSA')
+        self.assertEqual(header['kid'], self.keyring.signing_key().kid)
+        self.assertEqual(self.verify_with_jwks(tokens['refresh_token'])['type'], 'refresh')
+
+    def test_jwks_cache_headers(self):
+        """
+        Teste les en-têtes de cache du JWKS et la réponse 304 sur ETag inchangé.
+        """
+        response = self.client.get('/.well-known/jwks.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response.headers['Cache-Control'])
+        self.assertIn('max-age=300', response.headers['Cache-Control'])
+        etag = response.headers['ETag']
+        response = self.client.get('/.well-known/jwks.json', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        # Une nouvelle clé change l'ETag
+        self.keyring.rotate()
+        response = self.client.get('/.well-known/jwks.json', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()['keys']), 2)
+
+    def test_rotation_keeps_tokens_valid(self):
+        """
+        Teste qu'une rotation n'invalide pas les tokens signés avec la clé précédente.
+        """
+        tokens = self.login()
+        old_kid = pyjwt.get_unverified_header(tokens['refresh_token'])['kid']
+
+        # Clé publiée avant de signer
+        pending = self.keyring.rotate()
+        self.assertEqual(self.keyring.signing_key().kid, old_kid)
+        self.assertGreater(pending.activates_at, time.time())
+
+        new_key = self.keyring.rotate(immediate=True)
+        self.assertEqual(self.keyring.signing_key().kid, new_key.kid)
+
+        response = self.client.post('/user/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+        self.assertEqual(response.status_code, 200)
+        new_access = response.get_json()['access_token']
+        self.assertEqual(pyjwt.get_unverified_header(new_access)['kid'], new_key.kid)
+        self.verify_with_jwks(new_access)
+        kids = {k['kid'] for k in self.client.get('/.well-known/jwks.json').get_json()['keys']}
+        self.assertIn(old_kid, kids)
+
+    def test_expired_key_rejected_and_pruned(self):
+        """
+        Teste le refus des tokens d'une clé expirée et sa suppression.
+        """
+        tokens = self.login()
+        old_kid = pyjwt.get_unverified_header(tokens['refresh_token'])['kid']
+        self.keyring.rotate(immediate=True)
+        self.keyring.collection.update_one({'_id': old_kid}, {'$set': {'expires_at': time.time() - 1}})
+        self.keyring.refresh(force=True)
+
+        response = self.client.post('/user/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.keyring.prune(), 1)
+
+    def test_unknown_kid_rejected(self):
+        """
+        Teste le refus d'un token signé par une clé inconnue ou avec le secret partagé.
+        """
+        forged = pyjwt.encode({'sub': 'x', 'type': 'access', 'jti': 'j'}, 'secret', algorithm='HS256',
+                              headers={'kid': 'inconnu'})
+        response = self.client.post('/user/logout', headers={'Authorization': f'Bearer {forged}'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_hs256_tokens_accepted_during_migration(self):
+        """
+        Teste qu'un token HS256 émis avant le passage au trousseau reste accepté par défaut, puis refusé
+        une fois JWT_ACCEPT_HS256 désactivé.
+        """
+        claims = pyjwt.decode(self.login()['refresh_token'], options={'verify_signature': False})
+        legacy = pyjwt.encode(claims, self.app.config['JWT_SECRET_KEY'], algorithm='HS256')
+        response = self.client.post('/user/refresh', headers={'Authorization': f'Bearer {legacy}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('kid', pyjwt.get_unverified_header(response.get_json()['access_token']))
+
+        self.app.config['JWT_ACCEPT_HS256'] = False
+        response = self.client.post('/user/refresh', headers={'Authorization': f'Bearer {legacy}'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_rotate_command(self):
+        """
+        Teste la commande de rotation planifiée.
+        """
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['keys', 'rotate', '--if-older-than', '30'])
+        self.assertIn('moins de 30 jours', result.output)
+        result = runner.invoke(args=['keys', 'rotate', '--algorithm', 'RS256', '--immediate'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.keyring.signing_key().algorithm, 'RS256')
+        self.assertEqual(self.verify_with_jwks(self.login()['access_token'])['type'], 'access')
+
+
+if __name__ == '__main__':
+    unittest.main()
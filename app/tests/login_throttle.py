@@ -0,0 +1,241 @@
+# app/tests/login_throttle.py
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.models.user import User
+from app.services.login_throttle import LoginThrottle
+from app.services.storage_sqlite import SQLiteDatabase, SQLiteLoginThrottle
+from app.services.user import UserService
+from mongoengine import disconnect
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+
+class ThrottleConfig(TestingConfig):
+    LOGIN_THROTTLE_FREE_ATTEMPTS = 2
+
+
+class LoginThrottleTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(ThrottleConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        self.redis_client = self.app.redis_client
+        self.throttle = self.app.login_throttle
+        self.user_service = UserService()
+        self.user_service.register_user('testuser', 'testuser@example.com', 'Password123!')
+        self.addCleanup(self.redis_client.delete, self.throttle.key('testuser'),
+                        self.throttle.key('testuser@example.com'))
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def fail_login(self):
+        return self.user_service.authenticate_user('testuser', 'WrongPassword1!')
+
+    def test_exponential_backoff(self):
+        """
+        Teste le blocage après les échecs tolérés, doublé à chaque échec suivant et borné.
+        """
+        throttle = LoginThrottle(self.redis_client, free_attempts=2, base_delay=1, max_delay=4, local_size=0)
+        delays = [throttle.record_failure('testuser') for _ in range(6)]
+        self.assertEqual(delays, [0, 0, 1, 2, 4, 4])
+
+    def test_compact_state(self):
+        """
+        Teste l'état stocké : un hash de deux champs, sous une clé condensée, avec expiration.
+        """
+        for _ in range(3):
+            self.fail_login()
+        key = self.throttle.key(' TestUser ')
+        self.assertEqual(key, self.throttle.key('testuser'))
+        self.assertNotIn('testuser', key)
+        self.assertEqual(set(self.redis_client.hgetall(key)), {'n', 'u'})
+        self.assertEqual(self.redis_client.hget(key, 'n'), '3')
+        self.assertGreater(self.redis_client.ttl(key), 0)
+
+    def test_failures_counted_per_account(self):
+        """
+        Teste qu'alterner nom d'utilisateur et email ne double pas les essais tolérés pour un compte.
+        """
+        self.throttle.base_delay = 60
+        for identifier in ('testuser', 'testuser@example.com', 'testuser'):
+            self.assertEqual(self.user_service.authenticate_user(identifier, 'WrongPassword1!')[1], 401)
+        self.throttle._blocked.clear()
+        for identifier in ('testuser', 'testuser@example.com'):
+            self.assertEqual(self.user_service.authenticate_user(identifier, 'Password123!')[1], 429)
+
+        self.redis_client.hdel(self.throttle.key('testuser@example.com'), 'u')
+        self.throttle._blocked.clear()
+        self.assertEqual(self.user_service.authenticate_user('testuser@example.com', 'Password123!')[1], 200)
+        self.assertFalse(self.redis_client.exists(self.throttle.key('testuser')))
+
+    def test_throttled_before_lookup_and_bcrypt(self):
+        """
+        Teste qu'une tentative bloquée est refusée sans lecture de l'utilisateur ni bcrypt,
+        même avec le bon mot de passe.
+        """
+        for _ in range(3):
+            self.assertEqual(self.fail_login()[1], 401)
+        with patch.object(self.app.user_repository, 'find_credentials') as find, \
+                patch('app.services.user.hasher.check_password_hash') as check:
+            response, status = self.user_service.authenticate_user('testuser', 'Password123!')
+        self.assertEqual(status, 429)
+        self.assertGreater(response['retry_after'], 0)
+        find.assert_not_called()
+        check.assert_not_called()
+
+    def test_block_retained_locally(self):
+        """
+        Teste le refus servi localement, sans aller-retour Redis, pendant le blocage.
+        """
+        for _ in range(3):
+            self.fail_login()
+        with patch.object(self.redis_client, 'hmget') as hmget:
+            self.assertEqual(self.fail_login()[1], 429)
+        hmget.assert_not_called()
+        # Le compte est bloqué sous son nom d'utilisateur et sous son email
+        self.assertEqual(self.throttle.stats()['blocked_keys'], 2)
+
+    def test_block_read_from_redis(self):
+        """
+        Teste le blocage posé par un autre worker, lu dans Redis puis retenu localement.
+        """
+        for _ in range(3):
+            self.fail_login()
+        self.throttle._blocked.clear()
+        retry_after, has_failures = self.throttle.check('testuser')
+        self.assertGreater(retry_after, 0)
+        self.assertTrue(has_failures)
+        self.assertEqual(self.throttle.stats()['blocked_keys'], 1)
+
+    def test_success_resets_failures(self):
+        """
+        Teste l'oubli des échecs après une connexion réussie.
+        """
+        self.fail_login()
+        self.fail_login()
+        self.assertEqual(self.user_service.authenticate_user('testuser', 'Password123!')[1], 200)
+        self.assertFalse(self.redis_client.exists(self.throttle.key('testuser')))
+        self.assertEqual(self.fail_login()[1], 401)
+
+    def test_redis_error_fails_open(self):
+        """
+        Teste qu'une panne Redis n'empêche pas la connexion.
+        """
+        with patch.object(self.redis_client, 'hmget', side_effect=RedisConnectionError()):
+            self.assertEqual(self.throttle.check('testuser'), (0, False))
+        with patch.object(self.throttle, '_record', side_effect=RedisConnectionError()):
+            self.assertEqual(self.throttle.record_failure('testuser'), 0)
+
+
+class SQLiteLoginThrottleTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test : une base SQLite fichier, ouverte par deux workers.
+        """
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'auth_service.db')
+        self.throttle = SQLiteLoginThrottle(SQLiteDatabase(path), free_attempts=2, base_delay=1, max_delay=4)
+        self.other = SQLiteLoginThrottle(SQLiteDatabase(path), free_attempts=2, base_delay=1, max_delay=4)
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        for throttle in (self.throttle, self.other):
+            throttle.database.connection().close()
+
+    def test_exponential_backoff(self):
+        """
+        Teste les règles de RECORD_FAILURE_SCRIPT : blocage doublé à chaque échec, borné.
+        """
+        delays = [self.throttle.record_failure('testuser') for _ in range(6)]
+        self.assertEqual(delays, [0, 0, 1, 2, 4, 4])
+
+    def test_block_shared_between_workers(self):
+        """
+        Teste le blocage posé par un worker, lu dans la base par un autre puis retenu localement,
+        et l'oubli des échecs de tous les alias.
+        """
+        for _ in range(3):
+            self.throttle.record_failure('testuser', 'testuser@example.com')
+        retry_after, has_failures = self.other.check('testuser@example.com')
+        self.assertGreater(retry_after, 0)
+        self.assertTrue(has_failures)
+        self.assertEqual(self.other.stats()['blocked_keys'], 1)
+
+        self.other.reset('testuser', 'testuser@example.com')
+        self.throttle._blocked.clear()
+        self.assertEqual(self.throttle.check('testuser'), (0, False))
+
+    def test_database_error_fails_open(self):
+        """
+        Teste qu'une erreur SQLite n'empêche pas la connexion.
+        """
+        with patch.object(self.throttle.database, 'query', side_effect=sqlite3.OperationalError('locked')):
+            self.assertEqual(self.throttle.check('testuser'), (0, False))
+        with patch.object(self.throttle.database, 'transaction', side_effect=sqlite3.OperationalError('locked')):
+            self.assertEqual(self.throttle.record_failure('testuser'), 0)
+
+
+class AsyncLoginThrottleTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        use_stand_ins(self, asgi=True)
+        self.app = create_asgi_app(ThrottleConfig)
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.client = self.app.test_client()
+        await self.app.users.delete_many({})
+        async for key in self.app.redis_client.scan_iter('LIMITER_ASYNC/*'):
+            await self.app.redis_client.delete(key)
+        await self.app.redis_client.delete(self.app.login_throttle.key('testuser'))
+
+    async def asyncTearDown(self):
+        await self.app.users.delete_many({})
+        await self.app.redis_client.delete(self.app.login_throttle.key('testuser'))
+        await self.test_app.shutdown()
+
+    async def test_throttled_login(self):
+        """
+        Teste le blocage en mode asynchrone : 429 avant vérification, même avec le bon mot de passe.
+        """
+        await self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        for _ in range(3):
+            response = await self.client.post('/user/login', json={
+                'identifier': 'testuser',
+                'password': 'WrongPassword1!'
+            })
+            self.assertEqual(response.status_code, 401)
+        with patch('app.services.user_async.hasher.check_password_hash_async') as check:
+            response = await self.client.post('/user/login', json={
+                'identifier': 'testuser',
+                'password': 'Password123!'
+            })
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater((await response.get_json())['retry_after'], 0)
+        check.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
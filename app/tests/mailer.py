@@ -0,0 +1,204 @@
+# app/tests/mailer.py
+
+import json
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import patch
+from aiosmtpd.controller import Controller
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.models.user import User
+from app.services.outbox import OutboxFull
+from app.services.user import UserService
+from app.services.storage_sqlite import SQLiteEmailOutbox
+from app.workers.mailer import MailDispatcher, SQLiteMailDispatcher
+from mongoengine import disconnect
+
+
+class RecordingHandler:
+    """
+    Serveur SMTP local : enregistre les messages reçus et refuse les destinataires « reject@… ».
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('reject@'):
+            return '550 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.messages.append(envelope)
+        return '250 Message accepted for delivery'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class MailerTestCase(unittest.TestCase):
+    dispatcher_class = MailDispatcher
+
+    @classmethod
+    def setUpClass(cls):
+        cls.handler = RecordingHandler()
+        cls.smtp = Controller(cls.handler, hostname='127.0.0.1', port=free_port())
+        cls.smtp.start()
+
+        class MailerTestingConfig(TestingConfig):
+            MAIL_SERVER = '127.0.0.1'
+            MAIL_PORT = cls.smtp.port
+            MAIL_USE_TLS = False
+            MAIL_SUPPRESS_SEND = False
+            MAIL_DEFAULT_SENDER = 'noreply@example.com'
+            MAIL_OUTBOX_STREAM = 'test_mail_outbox'
+            MAIL_OUTBOX_DEAD_LETTER = 'test_mail_outbox:dead'
+            MAIL_OUTBOX_MAX_PENDING = 100
+            MAIL_RETRY_DELAY = 0
+            MAIL_MAX_ATTEMPTS = 2
+            MAIL_BATCH_SIZE = 10
+
+        cls.config_class = MailerTestingConfig
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.smtp.stop()
+
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test : file d'envoi vide, serveur SMTP local remis à zéro.
+        """
+        use_stand_ins(self)
+        self.app = create_app(self.config_class)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.outbox = self.app.email_outbox
+        self.clear_outbox()
+        self.handler.messages.clear()
+        self.handler.sessions.clear()
+        self.dispatcher = self.dispatcher_class.from_app(self.app, consumer='test-worker')
+        self.dispatcher.ensure_group()
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        self.dispatcher.close_connection()
+        self.clear_outbox()
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def clear_outbox(self):
+        self.app.redis_client.delete(self.outbox.stream, self.outbox.dead_letter)
+
+    def dead_letters(self):
+        return [fields for _, fields in self.app.redis_client.xrange(self.outbox.dead_letter)]
+
+    def test_batch_sent_over_single_connection(self):
+        """
+        Teste l'envoi d'un lot sur une seule connexion SMTP, puis le retrait des messages de la file.
+        """
+        for i in range(5):
+            self.outbox.enqueue('Sujet', [f'user{i}@example.com'], f'Message {i}')
+
+        self.assertEqual(self.dispatcher.run_once(), 5)
+        self.assertEqual(len(self.handler.messages), 5)
+        self.assertEqual(len(self.handler.sessions), 1)
+        self.assertEqual(self.dispatcher.stats()['connections'], 1)
+        self.assertEqual(self.outbox.backlog(), {'queued': 0, 'pending': 0, 'dead': 0})
+
+        # File vide : la connexion est fermée jusqu'au prochain lot
+        self.assertEqual(self.dispatcher.run_once(), 0)
+        self.assertIsNone(self.dispatcher._connection)
+
+    def test_failed_message_retried_then_dead_lettered(self):
+        """
+        Teste la reprise d'un message refusé puis son déplacement dans le flux des messages abandonnés.
+        """
+        self.outbox.enqueue('Sujet', ['reject@example.com'], 'Refusé')
+        self.outbox.enqueue('Sujet', ['ok@example.com'], 'Accepté')
+
+        self.assertEqual(self.dispatcher.run_once(), 1)
+        self.assertEqual(self.outbox.backlog()['pending'], 1)
+
+        # Seconde tentative, puis abandon
+        self.assertEqual(self.dispatcher.run_once(), 0)
+        self.assertEqual(self.dispatcher.run_once(), 0)
+
+        stats = self.dispatcher.stats()
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(stats['retried'], 1)
+        self.assertEqual(stats['dead_lettered'], 1)
+        self.assertEqual(self.outbox.backlog(), {'queued': 0, 'pending': 0, 'dead': 1})
+        self.assertEqual(self.dead_letters()[0]['recipients'], '["reject@example.com"]')
+
+    def test_outbox_full(self):
+        """
+        Teste le refus de dépôt lorsque la file atteint sa capacité.
+        """
+        self.outbox.max_pending = 2
+        self.outbox.enqueue('Sujet', ['a@example.com'], 'Message')
+        self.outbox.enqueue('Sujet', ['b@example.com'], 'Message')
+        with self.assertRaises(OutboxFull):
+            self.outbox.enqueue('Sujet', ['c@example.com'], 'Message')
+
+    @patch('app.services.user.UserService.generate_one_time_code', return_value='123456')
+    def test_one_time_code_delivered_through_outbox(self, _):
+        """
+        Teste le parcours complet : demande d'un code, dépôt dans la file puis remise par le worker.
+        """
+        self.app.user_repository.create('testuser', 'testuser@example.com', 'x')
+
+        response, status = UserService().request_one_time_code('testuser@example.com')
+        self.assertEqual(status, 200)
+        self.assertEqual(self.outbox.backlog()['queued'], 1)
+        self.assertEqual(self.handler.messages, [])
+
+        self.dispatcher.run_once()
+        self.assertEqual(len(self.handler.messages), 1)
+        envelope = self.handler.messages[0]
+        self.assertEqual(envelope.rcpt_tos, ['testuser@example.com'])
+        self.assertIn('123456', envelope.content.decode())
+
+
+class SQLiteMailerTestCase(MailerTestCase):
+    """
+    Mêmes parcours sur une base SQLite fichier : file d'envoi dans la table mail_outbox.
+    """
+    dispatcher_class = SQLiteMailDispatcher
+
+    def setUp(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'auth_service.db')
+        self.config_class = type('SQLiteMailerConfig', (self.config_class,), {
+            'STORAGE_BACKEND': 'sqlite',
+            'SQLITE_PATH': path,
+        })
+        super().setUp()
+        self.assertIsInstance(self.outbox, SQLiteEmailOutbox)
+
+    def tearDown(self):
+        super().tearDown()
+        self.outbox.database.connection().close()
+
+    def clear_outbox(self):
+        with self.outbox.database.transaction() as connection:
+            connection.execute('DELETE FROM mail_outbox')
+
+    def dead_letters(self):
+        return [json.loads(fields) for fields, in self.outbox.database.query(
+            'SELECT fields FROM mail_outbox WHERE dead = 1 ORDER BY id')]
+
+
+if __name__ == '__main__':
+    unittest.main()
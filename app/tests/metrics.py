@@ -0,0 +1,132 @@
+# app/tests/metrics.py
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from app.services.metrics import MongoCommandListener
+from mongoengine import disconnect
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        patcher = patch('app.services.user.UserService.send_async_email')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def register_and_login(self):
+        self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        return self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'Password123!'
+        })
+
+    def test_login_breakdown(self):
+        """
+        Teste la mesure de la requête de connexion et de ses dépendances (bcrypt, JWT, Redis).
+        """
+        before = {
+            'request': sample('http_request_duration_seconds_count', method='POST', endpoint='user_bp.login', status='200'),
+            'check': sample('dependency_duration_seconds_count', dependency='hashing', operation='check'),
+            'jwt': sample('dependency_duration_seconds_count', dependency='jwt', operation='encode'),
+            'evalsha': sample('dependency_duration_seconds_count', dependency='redis', operation='EVALSHA'),
+        }
+        response = self.register_and_login()
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(sample('http_request_duration_seconds_count', method='POST', endpoint='user_bp.login', status='200'), before['request'] + 1)
+        self.assertEqual(sample('dependency_duration_seconds_count', dependency='hashing', operation='check'), before['check'] + 1)
+        self.assertEqual(sample('dependency_duration_seconds_count', dependency='jwt', operation='encode'), before['jwt'] + 1)
+        # Enregistrement de la session par script Lua
+        self.assertGreater(sample('dependency_duration_seconds_count', dependency='redis', operation='EVALSHA'), before['evalsha'])
+
+    def test_blocklist_lookup_measured(self):
+        """
+        Teste la mesure de la lecture Redis du blocklist loader.
+        """
+        access_token = self.register_and_login().get_json()['access_token']
+        self.app.revocation_cache.clear()
+        before = sample('dependency_duration_seconds_count', dependency='redis', operation='PIPELINE')
+        self.client.post('/user/logout', headers={'Authorization': f'Bearer {access_token}'})
+        self.assertEqual(sample('dependency_duration_seconds_count', dependency='redis', operation='PIPELINE'), before + 1)
+
+    def test_ratelimit_rejections_counted(self):
+        """
+        Teste le comptage des refus du limiteur de débit.
+        """
+        before = sample('ratelimit_rejections_total', endpoint='user_bp.request_one_time_code')
+        for _ in range(6):
+            response = self.client.post('/user/request_one_time_code', json={'email': 'unknown@example.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(sample('ratelimit_rejections_total', endpoint='user_bp.request_one_time_code'), before + 1)
+
+    def test_mongo_listener(self):
+        """
+        Teste l'enregistrement des commandes MongoDB à partir des événements du driver.
+        """
+        before = sample('dependency_duration_seconds_count', dependency='mongo', operation='find')
+        MongoCommandListener().succeeded(SimpleNamespace(command_name='find', duration_micros=1500))
+        self.assertEqual(sample('dependency_duration_seconds_count', dependency='mongo', operation='find'), before + 1)
+
+    def test_metrics_endpoint(self):
+        """
+        Teste l'endpoint /metrics au format texte Prometheus.
+        """
+        self.register_and_login()
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_bucket', body)
+        self.assertIn('dependency_duration_seconds_bucket', body)
+
+    def test_multiproc_dir_created_on_import(self):
+        """
+        Teste qu'un processus hors gunicorn (worker d'emails, commande flask) importe les métriques
+        sans que le répertoire multiprocessus existe déjà.
+        """
+        with tempfile.TemporaryDirectory() as parent:
+            directory = os.path.join(parent, 'prometheus_multiproc')
+            env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory)
+            subprocess.run([sys.executable, '-c', 'import app.services.metrics'], env=env, check=True)
+            self.assertTrue(os.listdir(directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# app/tests/ratelimit.py
+
+import time
+import unittest
+from unittest.mock import Mock, patch
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.services.ratelimit import HybridRateLimiter, HybridRedisStorage, parse_route_ratios
+from mongoengine import disconnect
+
+
+class RateLimitTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(TestingConfig)
+        self.redis_client = self.app.redis_client
+        self.key = f'ratelimit_test/user_bp.login/{time.time_ns()}'
+        self.addCleanup(self.redis_client.delete, self.key)
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        disconnect()
+        self.app.revocation_cache.stop()
+
+    def limiter(self, **options):
+        rate_limiter = HybridRateLimiter(self.redis_client, **options)
+        # Compte les allers-retours Redis
+        rate_limiter._script = Mock(wraps=rate_limiter._script)
+        return rate_limiter
+
+    def test_storage_configured(self):
+        """
+        Teste que Flask-Limiter utilise le stockage hybride sur le pool partagé.
+        """
+        self.assertIsInstance(limiter._storage, HybridRedisStorage)
+        self.assertIs(limiter._storage.storage.connection_pool, self.app.redis_pool)
+
+    def test_exact_mode(self):
+        """
+        Teste le décompte exact (taux nul) : un aller-retour par requête, aucun refus local.
+        """
+        rate_limiter = self.limiter(lease_ratio=0)
+        results = [rate_limiter.acquire(self.key, 5, 60) for _ in range(7)]
+        self.assertEqual(results, [True] * 5 + [False] * 2)
+        self.assertEqual(rate_limiter._script.call_count, 7)
+
+    def test_lease_served_locally(self):
+        """
+        Teste la réservation par lots : un aller-retour Redis pour dix requêtes.
+        """
+        rate_limiter = self.limiter(lease_ratio=0.1)
+        self.assertTrue(all(rate_limiter.acquire(self.key, 100, 60) for _ in range(20)))
+        self.assertEqual(rate_limiter._script.call_count, 2)
+        self.assertEqual(int(self.redis_client.hget(self.key, int(time.time() // 60))), 20)
+
+    def test_global_limit_across_workers(self):
+        """
+        Teste que la limite globale tient entre plusieurs workers (jetons réservés avant consommation).
+        """
+        workers = [self.limiter(lease_ratio=0.1) for _ in range(3)]
+        allowed = sum(worker.acquire(self.key, 50, 60) for _ in range(40) for worker in workers)
+        self.assertEqual(allowed, 50)
+
+    def test_rejections_served_locally(self):
+        """
+        Teste les refus servis localement après un refus Redis, jusqu'à expiration.
+        """
+        rate_limiter = self.limiter(lease_ratio=0.1, deny_ttl=0.05)
+        for _ in range(5):
+            self.assertTrue(rate_limiter.acquire(self.key, 5, 60))
+        self.assertFalse(rate_limiter.acquire(self.key, 5, 60))
+        calls = rate_limiter._script.call_count
+        self.assertFalse(any(rate_limiter.acquire(self.key, 5, 60) for _ in range(100)))
+        self.assertEqual(rate_limiter._script.call_count, calls)
+        self.assertEqual(rate_limiter.stats()['denied_keys'], 1)
+        time.sleep(0.06)
+        self.assertFalse(rate_limiter.acquire(self.key, 5, 60))
+        self.assertEqual(rate_limiter._script.call_count, calls + 1)
+
+    def test_sliding_window(self):
+        """
+        Teste la pondération de la fenêtre précédente par la part restant à couvrir.
+        """
+        rate_limiter = self.limiter(lease_ratio=0)
+        now = 1000 * 60 + 15  # Quart de la fenêtre courante écoulé
+        self.redis_client.hset(self.key, 999, 8)
+        with patch('app.services.ratelimit.time.time', return_value=now):
+            # 8 × 0,75 = 6 jetons encore comptés sur 10
+            self.assertEqual(sum(rate_limiter.acquire(self.key, 10, 60) for _ in range(10)), 4)
+            self.assertEqual(rate_limiter.usage(self.key, 10, 60), (60000, 10))
+
+    def test_route_ratios(self):
+        """
+        Teste le taux de réservation propre à une route, lu dans RATELIMIT_ROUTE_LEASE_RATIOS.
+        """
+        ratios = parse_route_ratios('user_bp.login=0, user_bp.refresh=0.5')
+        self.assertEqual(ratios, {'user_bp.login': 0.0, 'user_bp.refresh': 0.5})
+        rate_limiter = self.limiter(lease_ratio=0.1, route_ratios=ratios)
+        for _ in range(10):
+            rate_limiter.acquire(self.key, 100, 60)
+        self.assertEqual(rate_limiter._script.call_count, 10)
+
+    def test_lease_expires(self):
+        """
+        Teste l'abandon des jetons réservés non consommés après lease_ttl.
+        """
+        rate_limiter = self.limiter(lease_ratio=0.1, lease_ttl=0.05)
+        rate_limiter.acquire(self.key, 100, 60)
+        self.assertEqual(rate_limiter.stats()['leased_tokens'], 9)
+        time.sleep(0.06)
+        rate_limiter.acquire(self.key, 100, 60)
+        self.assertEqual(rate_limiter._script.call_count, 2)
+
+    def test_reset_clears_local_state(self):
+        """
+        Teste que limiter.reset() vide aussi les seaux locaux.
+        """
+        storage = limiter._storage
+        for _ in range(6):
+            storage.acquire_entry('reset_test', 5, 60)
+        self.assertFalse(storage.acquire_entry('reset_test', 5, 60))
+        limiter.reset()
+        self.assertTrue(storage.acquire_entry('reset_test', 5, 60))
+        storage.clear('reset_test')
+
+
+if __name__ == '__main__':
+    unittest.main()
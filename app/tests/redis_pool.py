@@ -0,0 +1,90 @@
+# app/tests/redis_pool.py
+
+import unittest
+import redis
+from app import create_app, init_worker
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from limits.storage import RedisStorage
+from mongoengine import disconnect
+
+
+class RedisPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(TestingConfig)
+        self.pool = self.app.redis_pool
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        disconnect()
+        self.app.revocation_cache.stop()
+
+    def test_pool_shared_by_clients(self):
+        """
+        Teste que le client de l'application, l'abonnement pub/sub et le limiter partagent le même pool.
+        """
+        self.assertIs(self.app.redis_client.connection_pool, self.pool)
+        self.assertIs(self.app.revocation_cache.redis_client.connection_pool, self.pool)
+        storage = limiter._storage
+        if isinstance(storage, RedisStorage):  # RATELIMIT_STORAGE_URI peut désigner un autre stockage (memory://)
+            self.assertIs(storage.storage.connection_pool, self.pool)
+
+    def test_pool_stats(self):
+        """
+        Teste les compteurs d'utilisation du pool.
+        """
+        self.app.revocation_cache.stop()
+        for i in range(5):
+            self.app.redis_client.set(f'pool_test:{i}', i, ex=10)
+        stats = self.pool.stats()
+        self.assertEqual(stats['max_connections'], TestingConfig.REDIS_MAX_CONNECTIONS)
+        self.assertGreaterEqual(stats['acquired'], 5)
+        self.assertGreaterEqual(stats['created'], 1)
+        self.assertLessEqual(stats['created'], stats['in_use_max'])
+        self.assertGreaterEqual(stats['wait_time_max'], stats['wait_time_avg'])
+
+    def test_pool_exhausted(self):
+        """
+        Teste l'attente bornée puis l'échec lorsque toutes les connexions sont utilisées.
+        """
+        self.pool.max_connections = 1
+        self.pool.timeout = 0.05
+        self.pool.disconnect()
+        self.pool.reset()
+        connection = self.pool.get_connection('PING')
+        try:
+            with self.assertRaises(redis.ConnectionError):
+                self.pool.get_connection('PING')
+            stats = self.pool.stats()
+            self.assertEqual(stats['timeouts'], 1)
+            self.assertEqual(stats['utilisation'], 1.0)
+        finally:
+            self.pool.release(connection)
+        self.assertEqual(self.pool.stats()['in_use'], 0)
+
+    def test_init_worker(self):
+        """
+        Teste la réinitialisation des clients dans un worker (hook post_fork) : pool Redis vidé, MongoDB reconnecté.
+        """
+        self.app.revocation_cache.stop()
+        self.app.redis_client.ping()
+        self.assertGreaterEqual(self.pool.stats()['created'], 1)
+        with self.app.app_context():
+            User.objects.count()
+        init_worker(self.app)
+        self.assertEqual(self.pool.stats()['created'], 0)
+        with self.app.app_context():
+            self.assertEqual(User.objects(username='inconnu').count(), 0)
+        self.assertTrue(self.app.redis_client.ping())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+# app/tests/revocation.py
+
+import time
+import unittest
+from datetime import timedelta
+from flask_jwt_extended import decode_token
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.services.session import user_sessions_key
+from app.models.user import User
+from app.services.revocation import RevocationStore, is_token_revoked
+from app.services.user import UserService
+from mongoengine import disconnect
+
+
+class RevocationConfig(TestingConfig):
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=60)
+
+
+class RevocationStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(RevocationConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        self.redis_client = self.app.redis_client
+        self.store = self.app.revocation_store
+        self.clear_redis()
+        self.addCleanup(self.clear_redis)
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def clear_redis(self):
+        for key in self.redis_client.scan_iter(f'{self.store.prefix}:*'):
+            self.redis_client.delete(key)
+
+    def test_bucketed_keys(self):
+        """
+        Teste le schéma de clés : préfixe, tranche de l'expiration, shard ; expiration en fin de tranche.
+        """
+        store = RevocationStore(bucket_seconds=3600, shards=16)
+        key = store.key('jti', 7200.5)
+        self.assertEqual(key, f"revoked:2:{store.shard('jti')}")
+        self.assertLess(store.shard('jti'), 16)
+        self.assertEqual(store.key('jti', 10799), key)
+        self.assertEqual(store.expire_at(7200), 10800)
+
+        exp = int(time.time()) + 60
+        pipe = self.redis_client.pipeline()
+        self.store.queue_revoke(pipe, 'jti', exp)
+        pipe.execute()
+        self.assertEqual(self.redis_client.type('jti'), 'none')
+        self.assertTrue(self.redis_client.hexists(self.store.key('jti', exp), 'jti'))
+        self.assertGreaterEqual(self.redis_client.ttl(self.store.key('jti', exp)), 60)
+
+    def test_lua_and_python_agree(self):
+        """
+        Teste que les révocations écrites par les scripts Lua sont lues aux clés calculées en Python.
+        """
+        service = UserService()
+        self.addCleanup(self.redis_client.delete, user_sessions_key('user-id'))
+        tokens = service.issue_tokens('user-id')
+        access, refresh = decode_token(tokens['access_token']), decode_token(tokens['refresh_token'])
+        service.revoke_token(access['jti'], 'access', access['exp'], 'user-id', access['sid'])
+        self.app.revocation_cache.clear()
+        self.assertTrue(is_token_revoked(self.app, access))
+        self.assertTrue(is_token_revoked(self.app, refresh))
+        self.assertTrue(self.redis_client.hexists(self.store.key(refresh['jti'], refresh['exp']), refresh['jti']))
+
+        other = decode_token(service.issue_tokens('user-id')['access_token'])
+        self.assertFalse(is_token_revoked(self.app, other))
+
+    def test_memory_report(self):
+        """
+        Teste le rapport : hashes, tranches et jti comptés.
+        """
+        now = int(time.time())
+        pipe = self.redis_client.pipeline()
+        for i in range(20):
+            self.store.queue_revoke(pipe, f'jti-{i}', now + 60 + (i % 2) * self.store.bucket_seconds)
+        pipe.execute()
+        report = self.store.memory_report()
+        self.assertEqual(report['entries'], 20)
+        self.assertEqual(report['buckets'], 2)
+        self.assertLessEqual(report['keys'], 20)
+
+    def test_migrate_legacy(self):
+        """
+        Teste la reprise des clés de l'ancien schéma dans leurs tranches.
+        """
+        jti = '0f8c2a3e-1b2c-4d5e-8f90-123456789abc'
+        self.redis_client.set(jti, 'true', ex=120)
+        self.redis_client.set('sans-rapport-a-b-c-d', 'autre', ex=120)
+        self.addCleanup(self.redis_client.delete, 'sans-rapport-a-b-c-d')
+        self.assertEqual(self.store.migrate_legacy(), 1)
+        self.assertFalse(self.redis_client.exists(jti))
+        self.assertEqual(self.store.memory_report()['entries'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+# app/tests/session.py
+
+import json
+import time
+import unittest
+from datetime import timedelta
+from flask_jwt_extended import decode_token
+from app import create_app
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from app.services.session import user_sessions_key
+from app.services.user import UserService
+from mongoengine import disconnect
+
+
+class SessionConfig(TestingConfig):
+    SESSION_MAX_PER_USER = 3
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=60)
+
+
+class SessionTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(SessionConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        limiter.reset()
+        self.redis_client = self.app.redis_client
+        self.store = self.app.session_store
+        self.user_service = UserService()
+        self.user = User(username='testuser', email='testuser@example.com')
+        self.user.set_password('Password123!')
+        self.user.save()
+        self.user_id = str(self.user.id)
+        self.key = user_sessions_key(self.user_id)
+        self.addCleanup(self.redis_client.delete, self.key)
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def test_expired_sessions_pruned_on_write(self):
+        """
+        Teste l'élagage des sessions expirées à l'écriture suivante et l'expiration de l'index.
+        """
+        now = int(time.time())
+        self.redis_client.zadd(self.key, {'ancienne': now - 10, 'echue': now})
+        self.store.record(self.user_id, 'nouvelle', self.store.expires_at())
+        self.assertEqual(self.redis_client.zrange(self.key, 0, -1), ['nouvelle'])
+        ttl = self.redis_client.ttl(self.key)
+        self.assertGreater(ttl, 0)
+        self.assertLessEqual(ttl, self.store.refresh_ttl + 1)
+
+    def test_oldest_session_evicted(self):
+        """
+        Teste l'éviction de la plus ancienne session au-delà du maximum : son token de rafraîchissement
+        est révoqué, les autres restent valides.
+        """
+        tokens = [self.user_service.issue_tokens(self.user_id) for _ in range(4)]
+        refresh_jtis = [decode_token(t['refresh_token'])['jti'] for t in tokens]
+        self.assertEqual(self.redis_client.zcard(self.key), 3)
+        self.assertNotIn(refresh_jtis[0], self.redis_client.zrange(self.key, 0, -1))
+        exp = decode_token(tokens[0]['refresh_token'])['exp']
+        self.assertTrue(self.redis_client.hexists(self.app.revocation_store.key(refresh_jtis[0], exp), refresh_jtis[0]))
+
+        response = self.client.post('/user/refresh', headers={
+            'Authorization': f"Bearer {tokens[0]['refresh_token']}"
+        })
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/user/refresh', headers={
+            'Authorization': f"Bearer {tokens[1]['refresh_token']}"
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_eviction_broadcast(self):
+        """
+        Teste le message d'éviction diffusé aux autres workers : JSON encodé par cjson, expiration entière.
+        """
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.app.revocation_cache.channel)
+        self.addCleanup(pubsub.close)
+        exp = self.store.expires_at()
+        for sid in ('s1', 's2', 's3', 's4'):
+            self.store.record(self.user_id, sid, exp)
+        message = None
+        for _ in range(3):
+            message = message or pubsub.get_message(timeout=1)
+        self.assertEqual(json.loads(message['data']), {'jtis': ['s1'], 'exp': exp})
+
+    def test_list_sessions(self):
+        """
+        Teste la liste des sessions actives, la session courante marquée.
+        """
+        first = self.user_service.issue_tokens(self.user_id)
+        second = self.user_service.issue_tokens(self.user_id)
+        response = self.client.get('/user/sessions', headers={
+            'Authorization': f"Bearer {second['access_token']}"
+        })
+        self.assertEqual(response.status_code, 200)
+        sessions = json.loads(response.data)['sessions']
+        self.assertEqual([s['session_id'] for s in sessions],
+                         [decode_token(first['refresh_token'])['jti'], decode_token(second['refresh_token'])['jti']])
+        self.assertEqual([s['current'] for s in sessions], [False, True])
+        self.assertEqual(sessions[1]['expires_at'] - sessions[1]['created_at'], self.store.refresh_ttl)
+
+        # La déconnexion retire la session de la liste
+        self.client.post('/user/logout', headers={'Authorization': f"Bearer {first['access_token']}"})
+        response = self.client.get('/user/sessions', headers={
+            'Authorization': f"Bearer {second['access_token']}"
+        })
+        self.assertEqual(len(json.loads(response.data)['sessions']), 1)
+
+    def test_unbounded(self):
+        """
+        Teste l'absence de borne avec un maximum nul.
+        """
+        self.store.max_sessions = 0
+        for i in range(5):
+            self.assertEqual(self.store.record(self.user_id, f'session-{i}', self.store.expires_at()), 0)
+        self.assertEqual(self.redis_client.zcard(self.key), 5)
+
+
+class AsyncSessionTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        use_stand_ins(self, asgi=True)
+        self.app = create_asgi_app(SessionConfig)
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.client = self.app.test_client()
+        await self.app.users.delete_many({})
+        async for key in self.app.redis_client.scan_iter('LIMITER_ASYNC/*'):
+            await self.app.redis_client.delete(key)
+
+    async def asyncTearDown(self):
+        await self.app.users.delete_many({})
+        await self.test_app.shutdown()
+
+    async def test_sessions_bounded_and_listed(self):
+        """
+        Teste le mode asynchrone : éviction au-delà du maximum et liste des sessions.
+        """
+        await self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        user = await self.app.users.find_one({'username': 'testuser'})
+        key = user_sessions_key(str(user['_id']))
+        await self.app.redis_client.delete(key)
+        tokens = []
+        for _ in range(4):
+            response = await self.client.post('/user/login', json={
+                'identifier': 'testuser',
+                'password': 'Password123!'
+            })
+            tokens.append(await response.get_json())
+        self.assertEqual(await self.app.redis_client.zcard(key), 3)
+
+        response = await self.client.get('/user/sessions', headers={
+            'Authorization': f"Bearer {tokens[-1]['access_token']}"
+        })
+        self.assertEqual(response.status_code, 200)
+        sessions = (await response.get_json())['sessions']
+        self.assertEqual(len(sessions), 3)
+        self.assertTrue(sessions[-1]['current'])
+
+        response = await self.client.post('/user/refresh', headers={
+            'Authorization': f"Bearer {tokens[0]['refresh_token']}"
+        })
+        self.assertEqual(response.status_code, 401)
+        await self.app.redis_client.delete(key)
+
+
+if __name__ == '__main__':
+    unittest.main()
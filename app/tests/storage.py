@@ -0,0 +1,66 @@
+# app/tests/storage.py
+
+import os
+import tempfile
+import unittest
+from app import create_app
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.services.storage_sqlite import SQLiteEmailOutbox, SQLiteLoginThrottle
+from mongoengine import disconnect
+
+
+class MemoryConfig(TestingConfig):
+    STORAGE_BACKEND = 'memory'
+
+
+class StorageConfigTestCase(unittest.TestCase):
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test : connexion MongoDB ouverte avant le refus.
+        """
+        disconnect()
+
+    def test_unknown_backend(self):
+        """
+        Teste le refus d'un moteur inconnu, et des moteurs sans variante asynchrone pour l'application ASGI.
+        """
+        class UnknownConfig(TestingConfig):
+            STORAGE_BACKEND = 'cassandra'
+
+        with self.assertRaises(ValueError):
+            create_app(UnknownConfig)
+        with self.assertRaises(ValueError):
+            create_asgi_app(MemoryConfig)
+
+    def test_asymmetric_signing_requires_mongo(self):
+        """
+        Teste le refus, dès la création de l'application, d'un trousseau de clés sans MongoDB.
+        """
+        class EdDSAMemoryConfig(MemoryConfig):
+            JWT_ALGORITHM = 'EdDSA'
+
+        with self.assertRaises(ValueError):
+            create_app(EdDSAMemoryConfig)
+
+    def test_sqlite_file_backend(self):
+        """
+        Teste qu'un fichier SQLite garde freinage et file d'envoi dans la base, et Redis pour le reste.
+        """
+        use_stand_ins(self)
+
+        class SQLiteFileConfig(TestingConfig):
+            STORAGE_BACKEND = 'sqlite'
+            SQLITE_PATH = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'auth_service.db')
+
+        app = create_app(SQLiteFileConfig)
+        self.addCleanup(app.revocation_cache.stop)
+        self.assertIsInstance(app.login_throttle, SQLiteLoginThrottle)
+        self.assertIsInstance(app.email_outbox, SQLiteEmailOutbox)
+        self.assertIsNotNone(app.revocation_cache.redis_client)
+        self.assertNotEqual(app.config['RATELIMIT_STORAGE_URI'], 'memory://')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+# app/tests/tracing.py
+
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from app import create_app
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import limiter
+from app.models.user import User
+from app.services.outbox import EmailOutbox
+from app.services.tracing import (
+    BatchSpanExporter,
+    MongoTracingListener,
+    Span,
+    Tracer,
+    parse_traceparent
+)
+from mongoengine import disconnect
+
+TRACEPARENT = '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+
+
+class TracingConfig(TestingConfig):
+    TRACING_EXPORTER = 'file'
+    TRACING_SAMPLE_RATIO = 1.0
+
+
+def read_spans(path):
+    """
+    Relit les lots OTLP/JSON écrits par l'exporteur et renvoie la liste des spans.
+    """
+    if not os.path.exists(path):
+        return []
+    spans = []
+    with open(path) as f:
+        for line in f:
+            for resource in json.loads(line)['resourceSpans']:
+                for scope in resource['scopeSpans']:
+                    spans.extend(scope['spans'])
+    return spans
+
+
+class ListSink:
+    def __init__(self):
+        self.payloads = []
+
+    def write(self, payload):
+        self.payloads.append(payload)
+
+
+class TracingTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test : export des spans dans un fichier temporaire.
+        """
+        use_stand_ins(self)
+        handle, self.trace_file = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        os.remove(self.trace_file)
+        config = type('Config', (TracingConfig,), {'TRACING_FILE': self.trace_file})
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        patcher = patch('app.services.user.UserService.send_async_email')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        limiter.reset()
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+        if os.path.exists(self.trace_file):
+            os.remove(self.trace_file)
+
+    def exported_spans(self):
+        self.assertTrue(self.app.tracer.exporter.flush())
+        return read_spans(self.trace_file)
+
+    def login(self, headers=None):
+        self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        return self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'Password123!'
+        }, headers=headers)
+
+    def test_login_spans(self):
+        """
+        Teste l'arbre de spans de la connexion : requête, méthode du service, bcrypt, JWT et Redis.
+        """
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+
+        spans = self.exported_spans()
+        root = next(s for s in spans if s['name'] == 'POST /user/login')
+        self.assertNotIn('parentSpanId', root)
+        by_name = {s['name']: s for s in spans if s['traceId'] == root['traceId']}
+        service = by_name['UserService.authenticate_user']
+        self.assertEqual(service['parentSpanId'], root['spanId'])
+        self.assertEqual(by_name['hashing check']['parentSpanId'], service['spanId'])
+        self.assertIn('jwt encode', by_name)
+        self.assertIn('redis EVALSHA', by_name)
+        status = {a['key']: a['value'] for a in root['attributes']}['http.response.status_code']
+        self.assertEqual(status, {'intValue': '200'})
+
+    def test_incoming_traceparent_continued(self):
+        """
+        Teste la reprise du contexte W3C reçu : même trace, span racine rattaché à l'appelant.
+        """
+        self.login(headers={'traceparent': TRACEPARENT})
+        root = next(s for s in self.exported_spans() if s['name'] == 'POST /user/login')
+        self.assertEqual(root['traceId'], '0af7651916cd43dd8448eb211c80319c')
+        self.assertEqual(root['parentSpanId'], 'b7ad6b7169203331')
+
+    def test_unsampled_parent_not_exported(self):
+        """
+        Teste l'échantillonnage en tête : un parent non échantillonné ne produit aucun span.
+        """
+        self.login(headers={'traceparent': TRACEPARENT[:-2] + '00'})
+        self.assertFalse([s for s in self.exported_spans() if s['name'] == 'POST /user/login'])
+
+    def test_sample_ratio(self):
+        """
+        Teste la décision d'échantillonnage : taux nul, taux plein, et décision déterministe par trace.
+        """
+        exporter = BatchSpanExporter(ListSink())
+        self.assertFalse(Tracer(exporter, 0.0).should_sample((1 << 128) - 1))
+        self.assertTrue(Tracer(exporter, 1.0).should_sample((1 << 128) - 1))
+        tracer = Tracer(exporter, 0.5)
+        self.assertTrue(tracer.should_sample(1 << 62))
+        self.assertFalse(tracer.should_sample(3 << 62))
+
+    def test_parse_traceparent(self):
+        """
+        Teste l'analyse de l'en-tête traceparent.
+        """
+        self.assertEqual(parse_traceparent(TRACEPARENT), (0x0af7651916cd43dd8448eb211c80319c, 0xb7ad6b7169203331, True))
+        self.assertIsNone(parse_traceparent('00-' + '0' * 32 + '-b7ad6b7169203331-01'))
+        self.assertIsNone(parse_traceparent('ff-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'))
+        self.assertIsNone(parse_traceparent(TRACEPARENT + '-extra'))
+        self.assertIsNone(parse_traceparent('invalide'))
+
+    def test_exporter_drops_when_full(self):
+        """
+        Teste l'export non bloquant : au-delà de la file bornée, les spans sont abandonnés et comptés.
+        """
+        exporter = BatchSpanExporter(ListSink(), max_queue=2, interval=60.0)
+        tracer = Tracer(exporter, 1.0)
+        with patch.object(exporter, '_run'):
+            for _ in range(5):
+                tracer.start_trace('test').end()
+            self.assertEqual(exporter.stats()['dropped'], 3)
+            self.assertEqual(exporter.stats()['queued'], 2)
+
+    def test_exporter_batches(self):
+        """
+        Teste l'envoi par lots au format OTLP/JSON.
+        """
+        sink = ListSink()
+        exporter = BatchSpanExporter(sink, batch_size=2, interval=60.0)
+        tracer = Tracer(exporter, 1.0)
+        for _ in range(3):
+            tracer.start_trace('test').end()
+        self.assertTrue(exporter.flush())
+        self.assertEqual([len(p['resourceSpans'][0]['scopeSpans'][0]['spans']) for p in sink.payloads], [2, 1])
+        self.assertEqual(exporter.stats()['exported'], 3)
+
+    def test_mongo_command_span(self):
+        """
+        Teste le span d'une commande MongoDB, enfant du span courant, d'après les événements du driver.
+        """
+        exporter = BatchSpanExporter(ListSink())
+        listener = MongoTracingListener()
+        started = SimpleNamespace(command_name='find', database_name='auth', command={'find': 'users'},
+                                  connection_id=('localhost', 27017), request_id=1)
+        with patch.object(exporter, 'export') as export:
+            with Tracer(exporter, 1.0).trace('test') as root:
+                listener.started(started)
+                listener.succeeded(SimpleNamespace(connection_id=('localhost', 27017), request_id=1,
+                                                   duration_micros=1500))
+        child = export.call_args_list[0].args[0]
+        self.assertIsInstance(child, Span)
+        self.assertEqual(child.name, 'mongo find')
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertEqual(child.attributes['db.collection.name'], 'users')
+        self.assertEqual(child.end_ns - child.start_ns, 1500000)
+
+    def test_outbox_propagates_trace_context(self):
+        """
+        Teste la transmission du contexte de trace aux emails de la file d'envoi.
+        """
+        self.assertNotIn('traceparent', EmailOutbox.message_fields('Sujet', ['a@example.com'], 'Corps'))
+        with self.app.tracer.trace('test', TRACEPARENT) as root:
+            fields = EmailOutbox.message_fields('Sujet', ['a@example.com'], 'Corps')
+        self.assertEqual(fields['traceparent'], root.traceparent)
+        self.assertEqual(parse_traceparent(fields['traceparent'])[0], 0x0af7651916cd43dd8448eb211c80319c)
+
+
+class AsyncTracingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        use_stand_ins(self, asgi=True)
+        handle, self.trace_file = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        os.remove(self.trace_file)
+        self.app = create_asgi_app(type('Config', (TracingConfig,), {'TRACING_FILE': self.trace_file}))
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.client = self.app.test_client()
+        await self.app.users.delete_many({})
+        async for key in self.app.redis_client.scan_iter('LIMITER_ASYNC/*'):
+            await self.app.redis_client.delete(key)
+
+    async def asyncTearDown(self):
+        await self.app.users.delete_many({})
+        await self.test_app.shutdown()
+        if os.path.exists(self.trace_file):
+            os.remove(self.trace_file)
+
+    async def test_login_spans(self):
+        """
+        Teste les spans de la connexion en mode asynchrone : requête, service et dépendances.
+        """
+        await self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        response = await self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'Password123!'
+        }, headers={'traceparent': TRACEPARENT})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(self.app.tracer.exporter.flush())
+        spans = [s for s in read_spans(self.trace_file) if s['traceId'] == '0af7651916cd43dd8448eb211c80319c']
+        by_name = {s['name']: s for s in spans}
+        root = by_name['POST /user/login']
+        service = by_name['AsyncUserService.authenticate_user']
+        self.assertEqual(service['parentSpanId'], root['spanId'])
+        self.assertEqual(by_name['hashing check']['parentSpanId'], service['spanId'])
+        self.assertTrue(any(name.startswith('redis ') for name in by_name))
+
+
+if __name__ == '__main__':
+    unittest.main()
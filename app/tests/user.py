@@ -1,22 +1,59 @@
 # app/tests/user.py
 
 import unittest
+from datetime import timedelta
 from unittest.mock import patch
 from app import create_app
+from app.benchmarks.standins import use_stand_ins
 from app.models.user import User
-from mongoengine import disconnect
+from mongoengine import disconnect, NotUniqueError
+from pymongo.errors import DuplicateKeyError
 import json
 from app.config import TestingConfig
+from app.services.login_throttle import LoginThrottle
+from app.services.outbox import EmailOutbox
+from app.services.revocation import RevocationCache
+from app.services.one_time_code import OneTimeCodeStore
+from app.services.storage import MongoUserRepository
+from app.services.storage_memory import MemoryEmailOutbox, MemoryLoginThrottle, MemoryUserRepository
+from app.services.storage_sqlite import SQLiteUserRepository
+import time
+from flask_jwt_extended import decode_token
 from app.services.user import UserService
-from app.extensions import limiter  # Import du limiter pour le reset
+from app.extensions import limiter, hasher  # Import du limiter pour le reset
+
+
+class UserConfig(TestingConfig):
+    SESSION_MAX_PER_USER = 3
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=60)
+
+
+class MemoryConfig(UserConfig):
+    STORAGE_BACKEND = 'memory'
+
+
+class SQLiteConfig(UserConfig):
+    STORAGE_BACKEND = 'sqlite'
+    SQLITE_PATH = ':memory:'
+
+
+class UserFlows:
+    """
+    Parcours d'authentification, rejoués sur chaque moteur de stockage.
+    Les moteurs 'memory' et 'sqlite' s'exécutent sans serveur ; le moteur 'mongo' sur les doublures
+    mongomock et fakeredis, ou sur MongoDB et Redis avec TEST_SERVICES=live.
+    """
+    config_class = None
+    repository_class = None
+    throttle_class = None
+    outbox_class = None
 
-class UserTestCase(unittest.TestCase):
     def setUp(self):
         """
         Configuration exécutée avant chaque test.
         """
-        # Création de l'application avec la configuration de test
-        self.app = create_app(TestingConfig)
+        # Création de l'application avec la configuration du moteur testé
+        self.app = create_app(self.config_class)
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
         self.app_context.push()
@@ -24,10 +61,6 @@ class UserTestCase(unittest.TestCase):
         # Initialisation du service utilisateur
         self.user_service = UserService()
 
-        # Connexion à une base de données MongoDB de test
-        with self.app.app_context():
-            User.drop_collection()  # Assurez-vous que la collection est vide avant chaque test
-
         # Mock send_async_email pour éviter l'erreur de contexte d'application
         patcher = patch('app.services.user.UserService.send_async_email')
         self.mock_send_async_email = patcher.start()
@@ -40,11 +73,32 @@ class UserTestCase(unittest.TestCase):
         """
         Nettoyage exécuté après chaque test.
         """
-        with self.app.app_context():
-            User.drop_collection()
-            disconnect()
+        disconnect()
+        self.app.revocation_cache.stop()
         self.app_context.pop()
 
+    def create_user(self, username='testuser', email='testuser@example.com', password='Password123!',
+                    rounds=None):
+        """
+        Crée un utilisateur directement dans le stockage et renvoie son identifiant.
+        """
+        return self.app.user_repository.create(username, email,
+                                               hasher.generate_password_hash(password, rounds=rounds))
+
+    def login(self, identifier='testuser', password='Password123!'):
+        return self.client.post('/user/login', json={'identifier': identifier, 'password': password})
+
+    def bearer(self, token):
+        return {'Authorization': f'Bearer {token}'}
+
+    def test_backend_selected(self):
+        """
+        Teste le choix du moteur, du freinage et de la file d'envoi par la configuration.
+        """
+        self.assertIsInstance(self.app.user_repository, self.repository_class)
+        self.assertIsInstance(self.app.login_throttle, self.throttle_class)
+        self.assertIsInstance(self.app.email_outbox, self.outbox_class)
+
     def test_register_user_success(self):
         """
         Teste l'enregistrement réussi d'un nouvel utilisateur.
@@ -63,10 +117,7 @@ class UserTestCase(unittest.TestCase):
         """
         Teste l'enregistrement avec un nom d'utilisateur déjà existant.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser1@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user(email='testuser1@example.com')
 
         response = self.client.post('/user/register', json={
             'username': 'testuser',
@@ -76,16 +127,14 @@ class UserTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         data = json.loads(response.data)
         self.assertIn('Le nom d\'utilisateur est déjà pris.', data.get('errors', ''))
+        self.assertEqual(data.get('field'), 'username')
         self.mock_send_async_email.assert_not_called()
 
     def test_register_user_existing_email(self):
         """
         Teste l'enregistrement avec un email déjà existant.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser1', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user(username='testuser1')
 
         response = self.client.post('/user/register', json={
             'username': 'testuser2',
@@ -95,40 +144,30 @@ class UserTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         data = json.loads(response.data)
         self.assertIn('Un compte avec cet email existe déjà.', data.get('errors', ''))
+        self.assertEqual(data.get('field'), 'email')
         self.mock_send_async_email.assert_not_called()
 
     def test_login_success(self):
         """
-        Teste la connexion réussie avec des identifiants valides.
+        Teste la connexion réussie par nom d'utilisateur ou par email.
         """
-        # Crée un utilisateur initial
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
-        response = self.client.post('/user/login', json={
-            'identifier': 'testuser',
-            'password': 'Password123!'
-        })
+        response = self.login()
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertIn('access_token', data)
         self.assertIn('refresh_token', data)
+        self.assertEqual(self.login('testuser@example.com').status_code, 200)
         self.mock_send_async_email.assert_not_called()
 
     def test_login_invalid_password(self):
         """
         Teste la connexion avec un mot de passe invalide.
         """
-        # Crée un utilisateur initial
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
-        response = self.client.post('/user/login', json={
-            'identifier': 'testuser',
-            'password': 'WrongPassword!'
-        })
+        response = self.login(password='WrongPassword!')
         self.assertEqual(response.status_code, 401)
         data = json.loads(response.data)
         self.assertIn('Identifiants incorrects.', data.get('errors', ''))
@@ -138,23 +177,54 @@ class UserTestCase(unittest.TestCase):
         """
         Teste la connexion avec un utilisateur qui n'existe pas.
         """
-        response = self.client.post('/user/login', json={
-            'identifier': 'nonexistent',
-            'password': 'Password123!'
-        })
+        response = self.login('nonexistent')
         self.assertEqual(response.status_code, 401)
         data = json.loads(response.data)
         self.assertIn('Identifiants incorrects.', data.get('errors', ''))
         self.mock_send_async_email.assert_not_called()
 
+    def test_login_rehashes_outdated_password(self):
+        """
+        Teste le rehachage transparent d'un mot de passe dont le coût diffère de la politique.
+        """
+        self.create_user(rounds=6)
+        self.assertTrue(hasher.needs_rehash(self.app.user_repository.find_credentials('testuser')['password_hash']))
+
+        self.assertEqual(self.login().status_code, 200)
+
+        password_hash = self.app.user_repository.find_credentials('testuser')['password_hash']
+        self.assertTrue(password_hash.startswith('$2b$04$'))
+        self.assertFalse(hasher.needs_rehash(password_hash))
+        self.assertTrue(hasher.check_password_hash(password_hash, 'Password123!'))
+
+    def test_login_throttle(self):
+        """
+        Teste le freinage des connexions, compté pour le compte sous ses deux identifiants.
+        """
+        self.create_user()
+        throttle = self.app.login_throttle
+        throttle.free_attempts, throttle.base_delay = 2, 60
+        for identifier in ('testuser', 'testuser@example.com', 'testuser'):
+            self.assertEqual(self.user_service.authenticate_user(identifier, 'WrongPassword1!')[1], 401)
+        response, status = self.user_service.authenticate_user('testuser@example.com', 'Password123!')
+        self.assertEqual(status, 429)
+        self.assertGreater(response['retry_after'], 0)
+
+        throttle.reset('testuser', 'testuser@example.com')
+        self.assertEqual(self.user_service.authenticate_user('testuser', 'Password123!')[1], 200)
+
+    def test_email_outbox(self):
+        """
+        Teste le dépôt d'un email dans la file d'envoi, sans SMTP.
+        """
+        self.app.email_outbox.enqueue('Sujet', ['testuser@example.com'], 'Corps')
+        self.assertEqual(self.app.email_outbox.backlog(), {'queued': 1, 'pending': 0, 'dead': 0})
+
     def test_request_password_reset(self):
         """
         Teste la demande de réinitialisation de mot de passe.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
         response = self.client.post('/user/request_password_reset', json={
             'email': 'testuser@example.com'
@@ -167,11 +237,10 @@ class UserTestCase(unittest.TestCase):
 
     def test_reset_password_success(self):
         """
-        Teste la réinitialisation réussie du mot de passe avec un token valide.
+        Teste la réinitialisation du mot de passe : nouveau hachage, anciens tokens révoqués.
         """
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('OldPassword123!')
-        user.save()
+        self.create_user(password='OldPassword123!')
+        tokens = json.loads(self.login(password='OldPassword123!').data)
 
         # Génère un token de réinitialisation valide
         token = self.user_service.generate_password_reset_token('testuser@example.com')
@@ -185,9 +254,12 @@ class UserTestCase(unittest.TestCase):
         self.assertEqual(data.get('message'), 'Mot de passe réinitialisé avec succès.')
         self.mock_send_async_email.assert_not_called()
 
-        # Vérifie que le mot de passe a été mis à jour
-        updated_user = User.objects(username='testuser').first()
-        self.assertTrue(updated_user.check_password('NewPassword123!'))
+        # Vérifie que le mot de passe a été mis à jour et que les anciens tokens sont refusés
+        password_hash = self.app.user_repository.find_credentials('testuser')['password_hash']
+        self.assertTrue(hasher.check_password_hash(password_hash, 'NewPassword123!'))
+        self.assertEqual(self.login(password='OldPassword123!').status_code, 401)
+        response = self.client.get('/user/sessions', headers=self.bearer(tokens['access_token']))
+        self.assertEqual(response.status_code, 401)
 
     def test_reset_password_invalid_token(self):
         """
@@ -202,14 +274,31 @@ class UserTestCase(unittest.TestCase):
         self.assertIn('Token invalide ou expiré.', data.get('errors', ''))
         self.mock_send_async_email.assert_not_called()
 
+    def test_login_right_after_reset_password(self):
+        """
+        Teste qu'une connexion dans la même seconde qu'une réinitialisation donne des tokens valides,
+        tandis que ceux émis avant restent refusés.
+        """
+        user_id = self.create_user(password='OldPassword123!')
+        old = self.user_service.issue_tokens(user_id)
+
+        token = self.user_service.generate_password_reset_token('testuser@example.com')
+        response = self.client.post('/user/reset_password', json={'token': token, 'password': 'NewPassword123!'})
+        self.assertEqual(response.status_code, 200)
+        new = json.loads(self.login(password='NewPassword123!').data)
+
+        response = self.client.get('/user/sessions', headers=self.bearer(new['access_token']))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/user/refresh', headers=self.bearer(new['refresh_token']))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/user/sessions', headers=self.bearer(old['access_token']))
+        self.assertEqual(response.status_code, 401)
+
     def test_request_one_time_code(self):
         """
         Teste la demande d'un code à usage unique.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
         response = self.client.post('/user/request_one_time_code', json={
             'email': 'testuser@example.com'
@@ -222,98 +311,158 @@ class UserTestCase(unittest.TestCase):
 
     def test_verify_one_time_code_success(self):
         """
-        Teste la vérification réussie du code à usage unique.
+        Teste l'émission, le décompte des essais et la consommation d'un code à usage unique.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
-
-        # Génère et stocke un code dans Redis
-        code = '123456'
-        self.app.redis_client.set(f'one_time_code:{user.email}', code, ex=600)
+        user_id = self.create_user()
+        with patch('app.services.user.UserService.generate_one_time_code', return_value='123456'):
+            response = self.client.post('/user/request_one_time_code', json={'email': 'testuser@example.com'})
+        self.assertEqual(response.status_code, 200)
 
+        response = self.client.post('/user/verify_one_time_code', json={
+            'email': 'testuser@example.com',
+            'code': '000000'
+        })
+        self.assertEqual(json.loads(response.data)['attempts_remaining'], 4)
         response = self.client.post('/user/verify_one_time_code', json={
             'email': 'testuser@example.com',
             'code': '123456'
         })
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
-        self.assertIn('access_token', data)
         self.assertIn('refresh_token', data)
         self.assertEqual(data.get('message'), 'Authentification réussie.')
+        self.assertEqual(decode_token(data['access_token'])['sub'], user_id)
 
     def test_verify_one_time_code_invalid(self):
         """
-        Teste la vérification avec un code invalide.
+        Teste la vérification sans code émis.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
         response = self.client.post('/user/verify_one_time_code', json={
             'email': 'testuser@example.com',
             'code': '654321'
         })
         self.assertEqual(response.status_code, 400)
-        data = json.loads(response.data)
-        # Accepter les deux messages possibles
-        self.assertTrue(
-            'Code invalide ou expiré.' in data.get('errors', '') or
-            'Code incorrect.' in data.get('errors', ''),
-            "Expected either 'Code invalide ou expiré.' or 'Code incorrect.' in errors."
-        )
+        self.assertEqual(json.loads(response.data)['errors'], 'Code invalide ou expiré.')
 
-    def test_logout(self):
+    def test_verify_one_time_code_without_user_lookup(self):
         """
-        Teste la déconnexion de l'utilisateur.
+        Teste qu'une vérification réussie émet les tokens sans lire l'utilisateur, puis consomme le code.
         """
-        # Crée un utilisateur et connecte-le
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.app.one_time_codes.issue('testuser@example.com', '0123456789abcdef01234567', '123456')
+        repository = self.app.user_repository
+        with patch.object(repository, 'find_credentials') as find_credentials, \
+                patch.object(repository, 'find_by_email') as find_by_email:
+            response = self.client.post('/user/verify_one_time_code', json={
+                'email': 'testuser@example.com',
+                'code': '123456'
+            })
+        self.assertEqual(response.status_code, 200)
+        find_credentials.assert_not_called()
+        find_by_email.assert_not_called()
+        payload = decode_token(json.loads(response.data)['access_token'])
+        self.assertEqual(payload['sub'], '0123456789abcdef01234567')
 
-        response = self.client.post('/user/login', json={
-            'identifier': 'testuser',
-            'password': 'Password123!'
+        # Le code est consommé
+        response = self.client.post('/user/verify_one_time_code', json={
+            'email': 'testuser@example.com',
+            'code': '123456'
         })
-        data = json.loads(response.data)
-        access_token = data.get('access_token')
+        self.assertEqual(json.loads(response.data)['errors'], 'Code invalide ou expiré.')
 
-        # Déconnexion
-        response = self.client.post('/user/logout', headers={
-            'Authorization': f'Bearer {access_token}'
-        })
+    def test_verify_one_time_code_attempts_exhausted(self):
+        """
+        Teste le décompte des essais : code perdu au dernier essai manqué, jusqu'à l'émission d'un nouveau.
+        """
+        store = self.app.one_time_codes
+        store.issue('testuser@example.com', '0123456789abcdef01234567', '123456')
+        remaining = [store.verify('testuser@example.com', '000000')[2] for _ in range(5)]
+        self.assertEqual(remaining, [4, 3, 2, 1, 0])
+        self.assertEqual(store.verify('testuser@example.com', '123456')[0], 'expired')
+
+        store.issue('testuser@example.com', '0123456789abcdef01234567', '654321')
+        self.assertEqual(store.verify('testuser@example.com', '654321')[0], 'valid')
+
+    def test_logout(self):
+        """
+        Teste la déconnexion : le token d'accès et sa session sont révoqués.
+        """
+        self.create_user()
+        tokens = json.loads(self.login().data)
+
+        response = self.client.post('/user/logout', headers=self.bearer(tokens['access_token']))
         self.assertEqual(response.status_code, 200)
         data = json.loads(response.data)
         self.assertEqual(data.get('message'), 'Déconnexion réussie.')
 
-    def test_refresh_token(self):
+        response = self.client.get('/user/sessions', headers=self.bearer(tokens['access_token']))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/user/refresh', headers=self.bearer(tokens['refresh_token']))
+        self.assertEqual(response.status_code, 401)
+
+    def test_logout_revokes_token(self):
         """
-        Teste le rafraîchissement du token d'accès.
+        Teste qu'un token révoqué est refusé, depuis le cache local.
         """
-        # Crée un utilisateur et connecte-le
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
+        headers = self.bearer(json.loads(self.login().data)['access_token'])
 
-        response = self.client.post('/user/login', json={
-            'identifier': 'testuser',
-            'password': 'Password123!'
-        })
+        response = self.client.post('/user/logout', headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        # Le token révoqué est refusé sans relire le stockage
+        misses = self.app.revocation_cache.stats()['misses']
+        response = self.client.post('/user/logout', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.app.revocation_cache.stats()['misses'], misses)
+
+    def test_logout_all_revokes_previous_tokens(self):
+        """
+        Teste que la déconnexion globale invalide les tokens émis auparavant.
+        """
+        self.create_user()
+        data = json.loads(self.login().data)
+
+        response = self.client.post('/user/logout_all', headers=self.bearer(data['access_token']))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/user/refresh', headers=self.bearer(data['refresh_token']))
+        self.assertEqual(response.status_code, 401)
+
+    def test_sessions_bounded(self):
+        """
+        Teste la liste des sessions et l'éviction de la plus ancienne au-delà du maximum.
+        """
+        self.create_user()
+        tokens = [json.loads(self.login().data) for _ in range(4)]
+        response = self.client.get('/user/sessions', headers=self.bearer(tokens[-1]['access_token']))
+        sessions = json.loads(response.data)['sessions']
+        self.assertEqual([s['session_id'] for s in sessions],
+                         [decode_token(t['refresh_token'])['jti'] for t in tokens[1:]])
+        self.assertEqual([s['current'] for s in sessions], [False, False, True])
+
+        response = self.client.post('/user/refresh', headers=self.bearer(tokens[0]['refresh_token']))
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/user/refresh', headers=self.bearer(tokens[1]['refresh_token']))
+        self.assertEqual(response.status_code, 200)
+
+    def test_refresh_token(self):
+        """
+        Teste le rafraîchissement du token d'accès, rattaché à la même session.
+        """
+        self.create_user()
+        response = self.login()
         self.assertEqual(response.status_code, 200)  # Vérifier que la connexion est réussie
         data = json.loads(response.data)
         refresh_token = data.get('refresh_token')
         self.assertIsNotNone(refresh_token, "Refresh token should be present in the response.")
 
         # Rafraîchir le token
-        response = self.client.post('/user/refresh', headers={
-            'Authorization': f'Bearer {refresh_token}'
-        })
+        response = self.client.post('/user/refresh', headers=self.bearer(refresh_token))
         self.assertEqual(response.status_code, 200)
-        data = json.loads(response.data)
-        self.assertIn('access_token', data)
+        access_token = json.loads(response.data)['access_token']
+        self.assertEqual(decode_token(access_token)['sid'], decode_token(refresh_token)['jti'])
 
     def test_access_protected_route_without_token(self):
         """
@@ -329,29 +478,260 @@ class UserTestCase(unittest.TestCase):
         """
         Teste le rate limiting sur une route spécifique.
         """
-        # Crée un utilisateur initial avec un mot de passe valide
-        user = User(username='testuser', email='testuser@example.com')
-        user.set_password('Password123!')
-        user.save()
+        self.create_user()
 
         # Effectue 5 requêtes légitimes
         for _ in range(5):
-            response = self.client.post('/user/login', json={
-                'identifier': 'testuser',
-                'password': 'Password123!'
-            })
-            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.login().status_code, 200)
 
         # 6ème requête devrait être limitée
-        response = self.client.post('/user/login', json={
-            'identifier': 'testuser',
-            'password': 'Password123!'
-        })
+        response = self.login()
         self.assertEqual(response.status_code, 429)
         data = json.loads(response.data)
         self.assertIn('error', data)
         # Ajustement de l'assertion pour correspondre au message réel
         self.assertIn('5 per 1 minute', data['error'])
 
+    def test_json_provider(self):
+        """
+        Teste l'encodage des réponses et le décodage des requêtes par le fournisseur orjson.
+        """
+        from app.services.json_provider import OrjsonProvider
+        self.assertIsInstance(self.app.json, OrjsonProvider)
+        response = self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.data), response.get_json())
+
+        # Corps JSON invalide : erreur 400
+        response = self.client.post('/user/login', data='{"identifier": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class MemoryUserTestCase(UserFlows, unittest.TestCase):
+    config_class = MemoryConfig
+    repository_class = MemoryUserRepository
+    throttle_class = MemoryLoginThrottle
+    outbox_class = MemoryEmailOutbox
+
+
+class SQLiteUserTestCase(UserFlows, unittest.TestCase):
+    config_class = SQLiteConfig
+    repository_class = SQLiteUserRepository
+    throttle_class = MemoryLoginThrottle
+    outbox_class = MemoryEmailOutbox
+
+
+class UserTestCase(UserFlows, unittest.TestCase):
+    """
+    Moteur 'mongo' : parcours communs, plus les tests propres au modèle User et aux clés Redis.
+    """
+    config_class = UserConfig
+    repository_class = MongoUserRepository
+    throttle_class = LoginThrottle
+    outbox_class = EmailOutbox
+
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test : doublures (ou serveurs réels), collection vide.
+        """
+        use_stand_ins(self)
+        super().setUp()
+        User.drop_collection()  # Assurez-vous que la collection est vide avant chaque test
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        super().tearDown()
+
+    def test_duplicate_key_field(self):
+        """
+        Teste l'identification de l'index unique en collision à partir de l'erreur MongoDB.
+        """
+        try:
+            try:
+                raise DuplicateKeyError('E11000 duplicate key error', 11000, {
+                    'keyPattern': {'email': 1},
+                    'keyValue': {'email': 'testuser@example.com'}
+                })
+            except DuplicateKeyError as err:
+                raise NotUniqueError(f'Tried to save duplicate unique keys ({err})')
+        except NotUniqueError as e:
+            self.assertEqual(User.duplicate_key_field(e), 'email')
+
+        error = NotUniqueError(
+            'Tried to save duplicate unique keys (E11000 duplicate key error collection: '
+            'auth_service_db.users index: username_1 dup key: { username: "testuser" })'
+        )
+        self.assertEqual(User.duplicate_key_field(error), 'username')
+        self.assertIsNone(User.duplicate_key_field(NotUniqueError('E11000 Duplicate Key Error')))
+
+    def test_find_by_identifier_lean(self):
+        """
+        Teste la recherche par email ou nom d'utilisateur et la lecture allégée des identifiants.
+        """
+        user = User(username='testuser', email='testuser@example.com')
+        user.set_password('Password123!')
+        user.save()
+
+        self.assertEqual(User.find_by_identifier('testuser').id, user.id)
+        self.assertEqual(User.find_by_identifier('testuser@example.com').id, user.id)
+        self.assertIsNone(User.find_by_identifier('unknown@example.com'))
+
+        credentials = User.find_by_identifier('testuser@example.com', only=('id', 'password_hash'), raw=True)
+        self.assertEqual(set(credentials), {'_id', 'password_hash'})
+        self.assertEqual(credentials['_id'], user.id)
+
+        self.assertEqual(self.login('testuser@example.com').status_code, 200)
+
+    def test_hash_parameter_census(self):
+        """
+        Teste le recensement des paramètres de hachage.
+        """
+        self.create_user('testuser1', 'testuser1@example.com')
+        self.create_user('testuser2', 'testuser2@example.com', rounds=6)
+
+        census = User.hash_parameter_census()
+        self.assertEqual(census['total'], 2)
+        self.assertEqual(census['outdated'], 1)
+        self.assertEqual(census['params'], {'bcrypt$4': 1, 'bcrypt$6': 1})
+
+    def test_verify_one_time_code_without_mongo(self):
+        """
+        Teste qu'une vérification réussie émet les tokens sans requête MongoDB.
+        """
+        self.app.one_time_codes.issue('testuser@example.com', '0123456789abcdef01234567', '123456')
+        with patch('app.services.storage.User.objects') as objects:
+            response = self.client.post('/user/verify_one_time_code', json={
+                'email': 'testuser@example.com',
+                'code': '123456'
+            })
+        self.assertEqual(response.status_code, 200)
+        objects.assert_not_called()
+
+    def test_one_time_code_stored_hashed(self):
+        """
+        Teste l'entrée stockée : condensat du code, identifiant de l'utilisateur et essais restants.
+        """
+        user_id = self.create_user()
+        with patch('app.services.user.UserService.generate_one_time_code', return_value='123456'):
+            self.client.post('/user/request_one_time_code', json={'email': 'testuser@example.com'})
+
+        entry = self.app.redis_client.hgetall('one_time_code:testuser@example.com')
+        self.assertEqual(entry['uid'], user_id)
+        self.assertEqual(entry['a'], '5')
+        self.assertNotIn('123456', entry.values())
+        self.assertGreater(self.app.redis_client.ttl('one_time_code:testuser@example.com'), 0)
+
+    def test_one_time_code_refused_locally_once_exhausted(self):
+        """
+        Teste l'entrée supprimée au dernier essai manqué, puis les essais suivants refusés localement,
+        sans appel à Redis.
+        """
+        store = self.app.one_time_codes
+        store.issue('testuser@example.com', '0123456789abcdef01234567', '123456')
+        for _ in range(5):
+            store.verify('testuser@example.com', '000000')
+        self.assertFalse(self.app.redis_client.exists('one_time_code:testuser@example.com'))
+
+        with patch.object(store, '_verify') as verify:
+            self.assertEqual(store.verify('testuser@example.com', '123456')[0], 'expired')
+        verify.assert_not_called()
+
+    def test_one_time_code_issue_clears_other_workers(self):
+        """
+        Teste qu'un code émis par un worker lève le refus local retenu par un autre, via pub/sub.
+        """
+        store = self.app.one_time_codes
+        other = OneTimeCodeStore(self.app.redis_client, self.app.config['SECRET_KEY'],
+                                 **OneTimeCodeStore.options_from_config(self.app.config))
+        store.issue('testuser@example.com', '0123456789abcdef01234567', '123456')
+        for _ in range(5):
+            other.verify('testuser@example.com', '000000')
+        self.assertEqual(other.verify('testuser@example.com', '123456')[0], 'expired')
+
+        pubsub = self.app.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(store.channel)
+        self.addCleanup(pubsub.close)
+        store.issue('testuser@example.com', '0123456789abcdef01234567', '654321')
+        message = None
+        for _ in range(3):
+            message = message or pubsub.get_message(timeout=1)
+        self.assertEqual(message['data'], 'testuser@example.com')
+        other._handle_message(message)
+        self.assertEqual(other.verify('testuser@example.com', '654321')[0], 'valid')
+
+    def test_login_records_session_jtis(self):
+        """
+        Teste l'indexation de la session à la connexion, son rattachement aux tokens d'accès
+        et son retrait à la déconnexion.
+        """
+        user_id = self.create_user()
+
+        data = json.loads(self.login().data)
+        access_jti = decode_token(data['access_token'])['jti']
+        refresh_jti = decode_token(data['refresh_token'])['jti']
+        self.assertEqual(decode_token(data['access_token'])['sid'], refresh_jti)
+        sessions_key = f'user_sessions:{user_id}'
+        self.assertEqual(self.app.redis_client.zrange(sessions_key, 0, -1), [refresh_jti])
+        self.assertGreater(self.app.redis_client.ttl(sessions_key), 0)
+
+        response = self.client.post('/user/refresh', headers=self.bearer(data['refresh_token']))
+        self.assertEqual(decode_token(json.loads(response.data)['access_token'])['sid'], refresh_jti)
+        self.assertEqual(self.app.redis_client.zcard(sessions_key), 1)
+
+        self.client.post('/user/logout', headers=self.bearer(data['access_token']))
+        self.assertEqual(self.app.redis_client.zcard(sessions_key), 0)
+        store = self.app.revocation_store
+        self.assertTrue(self.app.redis_client.hexists(store.key(access_jti, decode_token(data['access_token'])['exp']), access_jti))
+        self.assertTrue(self.app.redis_client.hexists(store.key(refresh_jti, decode_token(data['refresh_token'])['exp']), refresh_jti))
+
+    def test_logout_all_sets_epoch(self):
+        """
+        Teste l'époque de révocation écrite dans Redis par la déconnexion globale.
+        """
+        user_id = self.create_user()
+        data = json.loads(self.login().data)
+        self.client.post('/user/logout_all', headers=self.bearer(data['access_token']))
+        self.assertIsNotNone(self.app.redis_client.get(f'revoked_before:{user_id}'))
+
+    def test_revocation_cache_invalidation(self):
+        """
+        Teste l'invalidation par pub/sub du cache de révocation d'un autre worker.
+        """
+        other_cache = RevocationCache(self.app.redis_client, channel=self.app.revocation_cache.channel)
+        self.addCleanup(other_cache.stop)
+        exp = int(time.time()) + 60
+        self.assertIsNone(other_cache.get('some-jti'))
+        other_cache.set('some-jti', False, exp)
+        self.assertFalse(other_cache.get('some-jti'))
+
+        self.app.revocation_cache.publish(['some-jti'], exp)
+        deadline = time.time() + 5
+        while not other_cache.get('some-jti') and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(other_cache.get('some-jti'))
+        self.assertEqual(other_cache.stats()['invalidations'], 1)
+
+    def test_revocation_cache_counts_epochs_separately(self):
+        """
+        Teste que les lectures d'époque ne faussent pas le taux de succès des jti.
+        """
+        cache = RevocationCache(None)
+        exp = int(time.time()) + 60
+        cache.set('some-jti', False, exp)
+        self.assertFalse(cache.get('some-jti'))
+        self.assertIsNone(cache.get_epoch('some-user'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 0))
+        self.assertEqual((stats['epoch_hits'], stats['epoch_misses']), (0, 1))
+        self.assertEqual((stats['hit_rate'], stats['epoch_hit_rate']), (1.0, 0.0))
+
 if __name__ == '__main__':
     unittest.main()
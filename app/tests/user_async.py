@@ -0,0 +1,160 @@
+# app/tests/user_async.py
+
+import unittest
+import jwt as pyjwt
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+
+
+class AsyncConfig(TestingConfig):
+    # Tokens signés par le trousseau, vérifiables avec le JWKS
+    JWT_ALGORITHM = 'EdDSA'
+
+
+class AsyncUserTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        """
+        Configuration exécutée avant chaque test : application ASGI démarrée sur les doublures
+        mongomock et fakeredis (serveurs réels avec TEST_SERVICES=live), collection vide.
+        """
+        use_stand_ins(self, asgi=True)
+        self.app = create_asgi_app(AsyncConfig)
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.client = self.app.test_client()
+        await self.app.users.delete_many({})
+        # Réinitialiser le rate limiting pour chaque test
+        async for key in self.app.redis_client.scan_iter('LIMITER_ASYNC/*'):
+            await self.app.redis_client.delete(key)
+
+    async def asyncTearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        await self.app.users.delete_many({})
+        await self.test_app.shutdown()
+
+    async def register(self, username='testuser', email='testuser@example.com'):
+        return await self.client.post('/user/register', json={
+            'username': username,
+            'email': email,
+            'password': 'Password123!'
+        })
+
+    async def login(self, identifier='testuser'):
+        return await self.client.post('/user/login', json={
+            'identifier': identifier,
+            'password': 'Password123!'
+        })
+
+    async def test_register_and_login(self):
+        """
+        Teste l'enregistrement puis la connexion en mode asynchrone.
+        """
+        response = await self.register()
+        self.assertEqual(response.status_code, 201)
+
+        response = await self.login('testuser@example.com')
+        self.assertEqual(response.status_code, 200)
+        data = await response.get_json()
+        self.assertIn('access_token', data)
+        self.assertIn('refresh_token', data)
+
+    async def test_register_existing_username(self):
+        """
+        Teste l'enregistrement avec un nom d'utilisateur déjà existant.
+        """
+        await self.register()
+        response = await self.register(email='other@example.com')
+        self.assertEqual(response.status_code, 400)
+        data = await response.get_json()
+        self.assertEqual(data['errors'], 'Le nom d\'utilisateur est déjà pris.')
+        self.assertEqual(data['field'], 'username')
+
+    async def test_login_invalid_password(self):
+        """
+        Teste la connexion avec un mot de passe invalide.
+        """
+        await self.register()
+        response = await self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'WrongPassword!'
+        })
+        self.assertEqual(response.status_code, 401)
+
+    async def test_refresh_and_logout(self):
+        """
+        Teste le rafraîchissement, la déconnexion et le refus du token révoqué.
+        """
+        await self.register()
+        data = await (await self.login()).get_json()
+
+        response = await self.client.post('/user/refresh', headers={
+            'Authorization': f"Bearer {data['refresh_token']}"
+        })
+        self.assertEqual(response.status_code, 200)
+        access_token = (await response.get_json())['access_token']
+
+        headers = {'Authorization': f'Bearer {access_token}'}
+        response = await self.client.post('/user/logout', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.client.post('/user/logout', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual((await response.get_json())['msg'], 'Token has been revoked')
+
+    async def test_access_protected_route_without_token(self):
+        """
+        Teste l'accès à une route protégée sans token.
+        """
+        response = await self.client.post('/user/logout')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual((await response.get_json())['msg'], 'Missing Authorization Header')
+
+    async def test_verify_one_time_code(self):
+        """
+        Teste la vérification d'un code à usage unique.
+        """
+        await self.register()
+        user = await self.app.users.find_one({'email': 'testuser@example.com'}, {'_id': 1})
+        await self.app.one_time_codes.issue('testuser@example.com', str(user['_id']), '123456')
+
+        response = await self.client.post('/user/verify_one_time_code', json={
+            'email': 'testuser@example.com',
+            'code': '654321'
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = await self.client.post('/user/verify_one_time_code', json={
+            'email': 'testuser@example.com',
+            'code': '123456'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access_token', await response.get_json())
+
+    async def test_metrics_endpoint(self):
+        """
+        Teste l'endpoint /metrics du mode asynchrone.
+        """
+        await self.register()
+        response = await self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = (await response.get_data()).decode()
+        self.assertIn('endpoint="user_async_bp.register"', body)
+
+    async def test_jwks_verifies_tokens(self):
+        """
+        Teste la vérification d'un token du mode asynchrone avec le JWKS publié.
+        """
+        await self.register()
+        response = await self.client.post('/user/login', json={'identifier': 'testuser', 'password': 'Password123!'})
+        token = (await response.get_json())['access_token']
+        response = await self.client.get('/.well-known/jwks.json')
+        self.assertIn('max-age=300', response.headers['Cache-Control'])
+        header = pyjwt.get_unverified_header(token)
+        jwk = next(k for k in (await response.get_json())['keys'] if k['kid'] == header['kid'])
+        self.assertEqual(pyjwt.decode(token, pyjwt.PyJWK(jwk).key, algorithms=[jwk['alg']])['type'], 'access')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,209 @@
+# app/tests/user_cache.py
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from app import create_app
+from app.asgi import create_asgi_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.models.user import User
+from app.services.user import UserService
+from app.services.user_cache import TOMBSTONE
+from mongoengine import disconnect
+
+
+class UserCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        self.cache = self.app.user_cache
+        self.redis_client = self.app.redis_client
+        self.user = User(username='testuser', email='testuser@example.com')
+        self.user.set_password('Password123!')
+        self.user.save()
+        # Sans les pierres tombales posées par la sauvegarde
+        self.clear_redis()
+        self.addCleanup(self.clear_redis)
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def clear_redis(self):
+        for key in self.redis_client.scan_iter('user_cache:*'):
+            self.redis_client.delete(key)
+
+    def count_loads(self):
+        patcher = patch.object(self.cache, '_load', wraps=self.cache._load)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_tiers(self):
+        """
+        Teste la lecture MongoDB au premier accès, puis les succès Redis et locaux.
+        """
+        load = self.count_loads()
+        record = self.cache.find_by_identifier('testuser')
+        self.assertEqual(record['_id'], str(self.user.id))
+        self.assertEqual(record['password_hash'], self.user.password_hash)
+        self.assertEqual(self.cache.find_by_identifier('testuser'), record)
+        self.cache.clear()
+        self.assertEqual(self.cache.find_by_identifier('testuser'), record)
+        self.assertEqual(self.cache.find_by_id(str(self.user.id))['username'], 'testuser')
+        self.assertEqual(load.call_count, 2)
+        stats = self.cache.stats()
+        self.assertEqual((stats['local_hits'], stats['redis_hits'], stats['misses']), (1, 1, 2))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_negative_cache_cleared_on_register(self):
+        """
+        Teste la mise en cache d'un identifiant inconnu, oubliée à l'inscription.
+        """
+        load = self.count_loads()
+        self.assertIsNone(self.cache.find_by_email('newuser@example.com'))
+        self.assertIsNone(self.cache.find_by_email('newuser@example.com'))
+        self.assertEqual(load.call_count, 1)
+        self.assertLessEqual(self.redis_client.ttl('user_cache:email:newuser@example.com'), 10)
+
+        UserService().register_user('newuser', 'newuser@example.com', 'Password123!')
+        self.assertEqual(self.cache.find_by_email('newuser@example.com')['username'], 'newuser')
+
+    def test_save_invalidates(self):
+        """
+        Teste qu'un changement de mot de passe n'est jamais masqué par le cache.
+        """
+        self.cache.find_by_identifier('testuser@example.com')
+        self.user.set_password('NewPassword123!')
+        self.user.save()
+        self.assertEqual(self.redis_client.get('user_cache:email:testuser@example.com'), TOMBSTONE)
+        self.assertEqual(self.cache.find_by_identifier('testuser@example.com')['password_hash'], self.user.password_hash)
+
+    def test_tombstone_blocks_stale_fill(self):
+        """
+        Teste qu'une lecture commencée avant l'invalidation ne réinscrit pas l'ancien hachage.
+        """
+        stale = {'_id': str(self.user.id), 'username': 'testuser', 'email': 'testuser@example.com',
+                 'password_hash': 'ancien'}
+
+        def slow_load(field, value):
+            # L'écriture concurrente survient pendant la lecture MongoDB
+            self.cache.invalidate(str(self.user.id), 'testuser', 'testuser@example.com')
+            return stale
+
+        with patch.object(self.cache, '_load', side_effect=slow_load):
+            self.assertEqual(self.cache.find_by_identifier('testuser')['password_hash'], 'ancien')
+        self.assertEqual(self.redis_client.get('user_cache:username:testuser'), TOMBSTONE)
+        self.assertEqual(self.cache.find_by_identifier('testuser')['password_hash'], self.user.password_hash)
+
+    def test_concurrent_lookups_coalesced(self):
+        """
+        Teste le regroupement des recherches identiques simultanées : une seule lecture MongoDB.
+        """
+        original = self.cache._load
+        release = threading.Event()
+
+        def slow_load(field, value):
+            release.wait(1)
+            return original(field, value)
+
+        results = []
+        with patch.object(self.cache, '_load', side_effect=slow_load) as load:
+            threads = [threading.Thread(target=lambda: results.append(self.cache.find_by_identifier('testuser')))
+                       for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(r['username'] == 'testuser' for r in results))
+        self.assertEqual(self.cache.stats()['coalesced'], 4)
+
+    def test_invalidation_message(self):
+        """
+        Teste l'invalidation du LRU local par un message d'un autre worker.
+        """
+        self.cache.find_by_identifier('testuser')
+        self.cache._handle_message({'data': json.dumps(['user_cache:username:testuser'])})
+        load = self.count_loads()
+        self.redis_client.delete('user_cache:username:testuser')
+        self.cache.find_by_identifier('testuser')
+        self.assertEqual(load.call_count, 1)
+
+    def test_login_served_from_cache(self):
+        """
+        Teste une connexion sans lecture MongoDB lorsque l'utilisateur est en cache.
+        """
+        self.cache.find_by_identifier('testuser')
+        with patch('app.services.user_cache.User.objects') as objects:
+            response, status = UserService().authenticate_user('testuser', 'Password123!')
+        self.assertEqual(status, 200)
+        objects.assert_not_called()
+
+
+class AsyncUserCacheTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        use_stand_ins(self, asgi=True)
+        self.app = create_asgi_app(TestingConfig)
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.client = self.app.test_client()
+        await self.app.users.delete_many({})
+        async for key in self.app.redis_client.scan_iter('user_cache:*'):
+            await self.app.redis_client.delete(key)
+        async for key in self.app.redis_client.scan_iter('LIMITER_ASYNC/*'):
+            await self.app.redis_client.delete(key)
+
+    async def asyncTearDown(self):
+        await self.app.users.delete_many({})
+        await self.test_app.shutdown()
+
+    async def test_coalesced_and_invalidated(self):
+        """
+        Teste le mode asynchrone : recherches regroupées, entrée négative oubliée à l'inscription.
+        """
+        cache = self.app.user_cache
+        self.assertIsNone(await cache.find_by_identifier('testuser'))
+        await self.client.post('/user/register', json={
+            'username': 'testuser',
+            'email': 'testuser@example.com',
+            'password': 'Password123!'
+        })
+        cache.clear()
+        original = cache._load
+
+        async def slow_load(field, value):
+            await asyncio.sleep(0.01)
+            return await original(field, value)
+
+        with patch.object(cache, '_load', side_effect=slow_load) as load:
+            results = await asyncio.gather(*(cache.find_by_identifier('testuser') for _ in range(5)))
+        self.assertEqual(load.call_count, 1)
+        self.assertTrue(all(r['email'] == 'testuser@example.com' for r in results))
+
+        response = await self.client.post('/user/login', json={
+            'identifier': 'testuser',
+            'password': 'Password123!'
+        })
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# app/tests/user_import.py
+
+import json
+import os
+import tempfile
+import unittest
+from app import create_app
+from app.benchmarks.standins import use_stand_ins
+from app.config import TestingConfig
+from app.extensions import hasher
+from app.models.user import User
+from app.services.user_import import UserImporter, read_csv, read_ndjson
+from mongoengine import disconnect
+
+
+class UserImportTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Configuration exécutée avant chaque test.
+        """
+        use_stand_ins(self)
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        User.drop_collection()
+        User.ensure_indexes()
+        self.errors = []
+
+    def tearDown(self):
+        """
+        Nettoyage exécuté après chaque test.
+        """
+        User.drop_collection()
+        disconnect()
+        self.app.revocation_cache.stop()
+        self.app_context.pop()
+
+    def write_file(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def importer(self, **kwargs):
+        return UserImporter(executor='thread', workers=2,
+                            on_error=lambda line, errors: self.errors.append((line, errors)), **kwargs)
+
+    def test_import_ndjson(self):
+        """
+        Teste l'import NDJSON : lignes valides, invalides, hachées à l'avance et doublons.
+        """
+        prehashed = hasher.generate_password_hash('Password123!')
+        lines = [
+            {'username': 'alice', 'email': 'alice@example.com', 'password': 'Password123!'},
+            {'username': 'bob', 'email': 'bob@example.com', 'password_hash': prehashed},
+            {'username': 'x', 'email': 'invalid', 'password': 'short'},
+            {'username': 'alice', 'email': 'alice2@example.com', 'password': 'Password123!'},
+            {'username': 'carol', 'email': 'carol@example.com', 'password_hash': 'not-a-hash'},
+        ]
+        path = self.write_file('.ndjson', '\n'.join(json.dumps(line) for line in lines) + '\n{invalid\n')
+
+        with open(path, encoding='utf-8') as f:
+            stats = self.importer(batch_size=2).run(read_ndjson(f))
+
+        self.assertEqual(stats['total'], 6)
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(stats['duplicates'], 1)
+        self.assertEqual(stats['invalid'], 3)
+        self.assertEqual(stats['prehashed'], 1)
+        self.assertIn('rows_per_second', stats)
+
+        errors = dict(self.errors)
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        self.assertIn('username', errors[3])
+        self.assertEqual(errors[4], {'username': ['Le nom d\'utilisateur est déjà pris.']})
+        self.assertIn('password_hash', errors[5])
+
+        self.assertTrue(User.objects.get(username='alice').check_password('Password123!'))
+        self.assertEqual(User.objects.get(username='bob').password_hash, prehashed)
+
+    def test_import_csv_with_process_pool(self):
+        """
+        Teste l'import CSV avec hachage dans un pool de processus puis la connexion d'un compte importé.
+        """
+        path = self.write_file('.csv', (
+            'username,email,password\n'
+            'dave,dave@example.com,Password123!\n'
+            'erin,erin@example.com,Password123!\n'
+            'frank,dave@example.com,Password123!\n'
+        ))
+
+        with open(path, encoding='utf-8', newline='') as f:
+            stats = UserImporter(executor='process', workers=2,
+                                 on_error=lambda line, errors: self.errors.append((line, errors))).run(read_csv(f))
+
+        self.assertEqual(stats['inserted'], 2)
+        self.assertEqual(self.errors, [(4, {'email': ['Un compte avec cet email existe déjà.']})])
+
+        response = self.app.test_client().post('/user/login', json={
+            'identifier': 'erin@example.com',
+            'password': 'Password123!'
+        })
+        self.assertEqual(response.status_code, 200)
+
+    def test_import_command(self):
+        """
+        Teste la commande `flask user import` et son rapport d'erreurs par ligne.
+        """
+        path = self.write_file('.ndjson', (
+            '{"username": "grace", "email": "grace@example.com", "password": "Password123!"}\n'
+            '{"username": "heidi", "email": "not-an-email", "password": "Password123!"}\n'
+        ))
+        errors_path = self.write_file('.ndjson', '')
+
+        result = self.app.test_cli_runner().invoke(args=[
+            'user', 'import', path, '--executor', 'thread', '--errors', errors_path
+        ])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(User.objects.count(), 1)
+        with open(errors_path, encoding='utf-8') as f:
+            errors = [json.loads(line) for line in f]
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(errors[0]['line'], 2)
+        self.assertIn('email', errors[0]['errors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,311 @@
+# app/workers/mailer.py
+
+"""
+Worker d'envoi des emails déposés dans la file d'envoi (app.services.outbox).
+
+Les messages sont lus par lots depuis le flux Redis via un groupe de consommateurs
+et envoyés sur une connexion SMTP réutilisée tant que la file n'est pas vide.
+Un message en échec reste en attente et est repris après MAIL_RETRY_DELAY secondes ;
+au-delà de MAIL_MAX_ATTEMPTS tentatives, il est déplacé dans le flux des messages abandonnés.
+Avec une base SQLite partagée (STORAGE_BACKEND='sqlite'), la file est la table mail_outbox,
+consommée selon les mêmes règles par SQLiteMailDispatcher.
+
+Usage :
+    python -m app.workers.mailer
+"""
+
+import os
+import signal
+import smtplib
+import socket
+import threading
+import time
+import logging
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+from redis.exceptions import ResponseError
+
+from app.extensions import mail
+from app.services.metrics import timed
+from app.services.tracing import SPAN_KIND_CONSUMER
+
+# Erreurs qui rendent la connexion SMTP inutilisable : le reste du lot est repris plus tard
+# (les refus du serveur, SMTPResponseException et dérivées, ne concernent que le message en cours)
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+    socket.gaierror,
+)
+
+
+class MailDispatcher:
+    """
+    Consommateur de la file d'envoi des emails.
+    """
+
+    messaging_system = 'redis'
+
+    def __init__(self, outbox, consumer: Optional[str] = None, batch_size: int = 50,
+                 max_attempts: int = 5, retry_delay: float = 30.0, block_ms: int = 2000,
+                 metrics_interval: float = 60.0, tracer=None):
+        self.outbox = outbox
+        self.redis_client = getattr(outbox, 'redis_client', None)
+        self.consumer = consumer or f'{socket.gethostname()}-{os.getpid()}'
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.block_ms = block_ms
+        self.metrics_interval = metrics_interval
+        self.tracer = tracer
+        self._connection = None
+        self._started = time.monotonic()
+        self._last_report = self._started
+        self._stats = {'sent': 0, 'failed': 0, 'retried': 0, 'dead_lettered': 0, 'batches': 0, 'connections': 0}
+
+    @classmethod
+    def from_app(cls, app, consumer: Optional[str] = None) -> 'MailDispatcher':
+        """
+        Construit le worker à partir de la configuration de l'application.
+        """
+        return cls(
+            app.email_outbox,
+            consumer=consumer or app.config.get('MAIL_WORKER_NAME'),
+            batch_size=int(app.config.get('MAIL_BATCH_SIZE', 50)),
+            max_attempts=int(app.config.get('MAIL_MAX_ATTEMPTS', 5)),
+            retry_delay=float(app.config.get('MAIL_RETRY_DELAY', 30.0)),
+            block_ms=int(app.config.get('MAIL_BLOCK_MS', 2000)),
+            metrics_interval=float(app.config.get('MAIL_METRICS_INTERVAL', 60.0)),
+            tracer=getattr(app, 'tracer', None)
+        )
+
+    def ensure_group(self) -> None:
+        """
+        Crée le groupe de consommateurs (et le flux) s'ils n'existent pas encore.
+        """
+        try:
+            self.redis_client.xgroup_create(self.outbox.stream, self.outbox.group, id='0', mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    # -- Lecture de la file ------------------------------------------------
+
+    def _claim_stale(self) -> List[Tuple[str, Dict[str, str]]]:
+        """
+        Reprend les messages restés en attente plus de `retry_delay` secondes.
+        Ceux qui ont épuisé leurs tentatives sont déplacés dans le flux des messages abandonnés.
+        """
+        min_idle_ms = int(self.retry_delay * 1000)
+        pending = self.redis_client.xpending_range(
+            self.outbox.stream, self.outbox.group, min='-', max='+',
+            count=self.batch_size, idle=min_idle_ms
+        )
+        if not pending:
+            return []
+        exhausted = [p['message_id'] for p in pending if p['times_delivered'] >= self.max_attempts]
+        retry = [p['message_id'] for p in pending if p['times_delivered'] < self.max_attempts]
+        if exhausted:
+            self._dead_letter(self.redis_client.xclaim(
+                self.outbox.stream, self.outbox.group, self.consumer, min_idle_ms, exhausted
+            ))
+        if not retry:
+            return []
+        entries = self.redis_client.xclaim(self.outbox.stream, self.outbox.group, self.consumer, min_idle_ms, retry)
+        self._stats['retried'] += len(entries)
+        return entries
+
+    def _read_new(self, block_ms: Optional[int]) -> List[Tuple[str, Dict[str, str]]]:
+        response = self.redis_client.xreadgroup(
+            self.outbox.group, self.consumer, {self.outbox.stream: '>'},
+            count=self.batch_size, block=block_ms
+        )
+        return response[0][1] if response else []
+
+    def _dead_letter(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        pipe = self.redis_client.pipeline(transaction=True)
+        for message_id, fields in entries:
+            pipe.xadd(self.outbox.dead_letter, {**fields, 'original_id': message_id})
+            logging.error(f'Email {message_id} abandonné après {self.max_attempts} tentatives')
+        pipe.xack(self.outbox.stream, self.outbox.group, *[message_id for message_id, _ in entries])
+        pipe.xdel(self.outbox.stream, *[message_id for message_id, _ in entries])
+        pipe.execute()
+        self._stats['dead_lettered'] += len(entries)
+
+    def _acknowledge(self, message_ids: List[str]) -> None:
+        if not message_ids:
+            return
+        # Acquittement et suppression : la longueur du flux reflète le travail restant
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.xack(self.outbox.stream, self.outbox.group, *message_ids)
+        pipe.xdel(self.outbox.stream, *message_ids)
+        pipe.execute()
+
+    # -- Envoi SMTP --------------------------------------------------------
+
+    def _get_connection(self):
+        # Connexion ouverte à la demande puis réutilisée d'un lot à l'autre
+        if self._connection is None:
+            with timed('smtp', 'connect'):
+                connection = mail.connect()
+                self._connection = connection.__enter__()
+            self._stats['connections'] += 1
+        return self._connection
+
+    def close_connection(self) -> None:
+        """
+        Ferme la connexion SMTP courante (QUIT), si elle est ouverte.
+        """
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                logging.warning(f'Fermeture de la connexion SMTP interrompue: {e}')
+
+    def _trace(self, message_id: str, fields: Dict[str, str]):
+        """
+        Span racine de l'envoi d'un message, rattaché à la trace de la requête qui l'a déposé.
+        """
+        if self.tracer is None:
+            return nullcontext()
+        return self.tracer.trace(
+            'mailer send', fields.get('traceparent'), SPAN_KIND_CONSUMER,
+            {'messaging.system': self.messaging_system, 'messaging.message.id': message_id}
+        )
+
+    def _send_batch(self, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        """
+        Envoie un lot sur une seule connexion et acquitte les messages envoyés.
+        Les messages en échec restent en attente et seront repris.
+        """
+        sent = []
+        default_sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+        for message_id, fields in entries:
+            try:
+                with self._trace(message_id, fields):
+                    connection = self._get_connection()
+                    with timed('smtp', 'send'):
+                        connection.send(self.outbox.build_message(fields, default_sender))
+                sent.append(message_id)
+            except CONNECTION_ERRORS as e:
+                logging.error(f'Connexion SMTP perdue, reprise ultérieure du lot: {e}')
+                self._stats['failed'] += 1
+                self._connection = None
+                break
+            except Exception as e:
+                logging.error(f"Erreur lors de l'envoi de l'email {message_id}: {e}")
+                self._stats['failed'] += 1
+        self._acknowledge(sent)
+        self._stats['sent'] += len(sent)
+        self._stats['batches'] += 1
+        return len(sent)
+
+    # -- Boucle principale -------------------------------------------------
+
+    def run_once(self, block_ms: Optional[int] = None) -> int:
+        """
+        Traite un lot (messages à reprendre en priorité, sinon nouveaux messages).
+
+        :return: Le nombre de messages envoyés.
+        """
+        entries = self._claim_stale() or self._read_new(block_ms)
+        if not entries:
+            # File vide : inutile de garder la connexion SMTP ouverte
+            self.close_connection()
+            return 0
+        return self._send_batch(entries)
+
+    def run(self, stop_event: Optional[threading.Event] = None) -> None:
+        """
+        Traite la file jusqu'à ce que stop_event soit positionné.
+        """
+        stop_event = stop_event or threading.Event()
+        self.ensure_group()
+        logging.info(f"Worker d'envoi '{self.consumer}' démarré sur le flux '{self.outbox.stream}'")
+        try:
+            while not stop_event.is_set():
+                try:
+                    self.run_once(block_ms=self.block_ms)
+                except Exception as e:
+                    logging.error(f"Erreur du worker d'envoi: {e}")
+                    self.close_connection()
+                    stop_event.wait(1.0)
+                self._report_metrics()
+        finally:
+            self.close_connection()
+            logging.info(f"Worker d'envoi arrêté : {self.stats()}")
+
+    def _report_metrics(self) -> None:
+        now = time.monotonic()
+        if now - self._last_report >= self.metrics_interval:
+            self._last_report = now
+            logging.info(f"Worker d'envoi : {self.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Renvoie les compteurs du worker et le débit moyen d'envoi (emails par seconde).
+        """
+        elapsed = time.monotonic() - self._started
+        return dict(self._stats, throughput=self._stats['sent'] / elapsed if elapsed else 0.0)
+
+
+class SQLiteMailDispatcher(MailDispatcher):
+    """
+    Consommateur de la file d'envoi SQLite (SQLiteEmailOutbox) : mêmes lots, reprises et abandons,
+    la table tenant lieu de flux et de groupe de consommateurs.
+    """
+
+    messaging_system = 'sqlite'
+
+    def ensure_group(self) -> None:
+        # La table est créée avec le schéma de la base
+        pass
+
+    def _claim_stale(self) -> List[Tuple[str, Dict[str, str]]]:
+        retry, exhausted = self.outbox.claim_stale(self.consumer, self.batch_size, self.retry_delay,
+                                                   self.max_attempts)
+        if exhausted:
+            self._dead_letter(exhausted)
+        self._stats['retried'] += len(retry)
+        return retry
+
+    def _read_new(self, block_ms: Optional[int]) -> List[Tuple[str, Dict[str, str]]]:
+        entries = self.outbox.read_new(self.consumer, self.batch_size)
+        if not entries and block_ms:
+            # Pas de lecture bloquante : attente avant le prochain relevé
+            time.sleep(block_ms / 1000)
+        return entries
+
+    def _dead_letter(self, entries: List[Tuple[str, Dict[str, str]]]) -> None:
+        for message_id, _ in entries:
+            logging.error(f'Email {message_id} abandonné après {self.max_attempts} tentatives')
+        self.outbox.abandon([message_id for message_id, _ in entries])
+        self._stats['dead_lettered'] += len(entries)
+
+    def _acknowledge(self, message_ids: List[str]) -> None:
+        if message_ids:
+            self.outbox.acknowledge(message_ids)
+
+
+def main() -> None:
+    from app import create_app
+
+    app = create_app()
+    logging.basicConfig(level=app.config['LOG_LEVEL'], format='%(asctime)s %(levelname)s %(message)s')
+    stop_event = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop_event.set())
+    from app.services.storage_sqlite import SQLiteEmailOutbox
+    dispatcher_class = SQLiteMailDispatcher if isinstance(app.email_outbox, SQLiteEmailOutbox) else MailDispatcher
+    with app.app_context():
+        dispatcher_class.from_app(app).run(stop_event)
+    if app.tracer is not None:
+        app.tracer.exporter.flush()
+
+
+if __name__ == '__main__':
+    main()